@@ -10,22 +10,70 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
-from typing import Dict, Any
+from typing import Dict, Any, List, Literal, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import hashlib
+import secrets
+import threading
+import time
+import uuid
 import uvicorn
 import os
 
 from backend.app import MedicalService
+from backend.app.response_encoding import (
+    CompressionMiddleware,
+    serialize_payload,
+    compute_etag,
+    etag_matches,
+    negotiate_encoding,
+    compress
+)
+from backend.app.profiling import SamplingProfiler, ProfileStore
+from backend.app.static_assets import StaticAssets, Asset
+from backend.app.scheduler import FairScheduler, SchedulerRejection, Ticket, PRIORITIES
+from backend.app.job_queue import JobQueue
+from backend.config import (
+    RESUME_ON_STARTUP,
+    CREW_ASYNC_EXECUTION,
+    PROFILING_ENABLED,
+    PROFILING_ADMIN_TOKEN,
+    HISTORY_ADMIN_TOKEN,
+    CLIENT_API_KEYS,
+    WORKER_MODE,
+    JOB_POLL_INTERVAL,
+    JOB_WAIT_TIMEOUT,
+    COMPRESSION_MIN_SIZE
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Resume analyses interrupted by the previous worker, off the startup path, and purge stores periodically"""
+    # Queued jobs of a crashed worker are redelivered by the job queue instead
+    if RESUME_ON_STARTUP and job_queue is None:
+        threading.Thread(
+            target=medical_service.resume_incomplete,
+            name="resume-incomplete",
+            daemon=True
+        ).start()
+    stop_purging = medical_service.start_purging()
+    yield
+    stop_purging.set()
+
 
 # Initialize FastAPI app
 app = FastAPI(
     title="Medical Diagnostic API",
     description="AI-powered medical symptom analysis using CrewAI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -35,10 +83,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
+# Negotiated gzip/brotli compression for JSON, msgpack and static text
+app.add_middleware(CompressionMiddleware)
+
 # Initialize medical service
 medical_service = MedicalService()
+profile_store = ProfileStore()
+scheduler = FairScheduler()
+
+# Analyses go to `python -m backend.worker` processes in queue mode
+job_queue = JobQueue() if WORKER_MODE == 'queue' else None
 
 # ============================================================================
 # MOUNT STATIC FILES AND FRONTEND
@@ -50,9 +107,8 @@ frontend_dir = current_dir / "frontend"
 static_dir = frontend_dir / "static"
 templates_dir = frontend_dir / "templates"
 
-# Mount static files (CSS, JS)
-if static_dir.exists():
-    app.mount("/static", StaticFiles(directory=str(static_dir)), name="static")
+# Frontend held in memory with precompressed variants (see serve_static)
+static_assets = StaticAssets(static_dir, templates_dir / "index.html")
 
 # ============================================================================
 # REQUEST/RESPONSE MODELS
@@ -66,14 +122,65 @@ class SymptomAnalysisRequest(BaseModel):
         min_length=10,
         json_schema_extra={"example": "I'm a 45-year-old male with chest pain for 3 days..."}
     )
+    request_id: Optional[str] = Field(
+        None,
+        description="Id of a previous analysis to resume from its last completed stage",
+        max_length=64
+    )
+    include_stages: bool = Field(
+        False,
+        description="Also return the intake and diagnosis reports under 'stages'"
+    )
+    priority: Optional[Literal["interactive", "batch"]] = Field(
+        None,
+        description="Scheduling class; 'batch' analyses wait while interactive ones are queued. "
+                    "Only clients with a configured API key may choose 'interactive' (their default)"
+    )
+    prompt_profile: Optional[str] = Field(
+        None,
+        description="Prompt profile to run with, e.g. 'compact' (the deployment's PROMPT_PROFILE by default)",
+        max_length=64
+    )
+
+
+class SessionAppendRequest(BaseModel):
+    """Request model for appending follow-up information to a session"""
+    patient_input: str = Field(
+        ...,
+        description="Full updated description: the previous text plus any new information",
+        min_length=10,
+        json_schema_extra={"example": "I'm a 45-year-old male with chest pain for 3 days... I also take aspirin daily."}
+    )
+    priority: Optional[Literal["interactive", "batch"]] = Field(
+        None,
+        description="Scheduling class; 'batch' analyses wait while interactive ones are queued. "
+                    "Only clients with a configured API key may choose 'interactive' (their default)"
+    )
+
+
+class EstimateRequest(BaseModel):
+    """Request model for a pre-flight estimate"""
+    patient_input: str = Field(
+        ...,
+        description="Patient's description of symptoms, as it would be sent to /api/analyze",
+        min_length=1
+    )
+    prompt_profile: Optional[str] = Field(
+        None,
+        description="Prompt profile the analysis would run with",
+        max_length=64
+    )
 
 
 class SymptomAnalysisResponse(BaseModel):
     """Response model for symptom analysis"""
     success: bool
+    status: str = None
     result: str = None
+    follow_up_questions: List[str] = None
     error: str = None
     metadata: Dict[str, Any] = None
+    stages: Dict[str, str] = None
 
 
 class HealthCheckResponse(BaseModel):
@@ -84,16 +191,217 @@ class HealthCheckResponse(BaseModel):
     error: str = None
 
 
+# ============================================================================
+# RESPONSE ENCODING
+# ============================================================================
+
+def encoded_response(request: Request, payload: Dict[str, Any], with_etag: bool = False) -> Response:
+    """
+    Encode a payload as JSON or msgpack (Accept header or ?format=msgpack).
+
+    The body is compressed here rather than by CompressionMiddleware, so
+    that with with_etag the response carries the ETag of the encoding it
+    is sent with, and a matching If-None-Match is answered with 304 Not
+    Modified.
+    """
+    body, media_type = serialize_payload(
+        payload,
+        accept=request.headers.get("accept"),
+        format=request.query_params.get("format")
+    )
+    encoding = None
+    if len(body) >= COMPRESSION_MIN_SIZE:
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept, Accept-Encoding"}
+
+    if with_etag:
+        etag = compute_etag(body, encoding)
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+
+    if encoding:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+# ============================================================================
+# SCHEDULING
+# ============================================================================
+
+def configured_api_key(request: Request) -> Optional[str]:
+    """The request's X-API-Key when it is one of CLIENT_API_KEYS"""
+    api_key = request.headers.get("x-api-key", "")
+    if any(secrets.compare_digest(api_key, key) for key in CLIENT_API_KEYS):
+        return api_key
+    return None
+
+
+def client_identity(request: Request) -> str:
+    """Client an analysis is queued and charged under: its configured API key, else its IP"""
+    api_key = configured_api_key(request)
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    return "ip:" + (request.client.host if request.client else "unknown")
+
+
+def client_priority(request: Request, requested: Optional[str]) -> str:
+    """Scheduling class of an analysis: only clients with a configured API key run as 'interactive'"""
+    if configured_api_key(request) is None:
+        return "batch"
+    return requested or "interactive"
+
+
+def add_queue_metadata(result: Dict[str, Any], ticket: Ticket):
+    """Record how the scheduler handled an analysis in its metadata"""
+    result.setdefault("metadata", {})["queue"] = {
+        "client_id": ticket.client_id,
+        "priority": ticket.priority,
+        "waited_seconds": round(ticket.waited_seconds, 2)
+    }
+
+
+# ============================================================================
+# WORKER QUEUE
+# ============================================================================
+
+class JobPending(Exception):
+    """Raised when a queued analysis is still running after JOB_WAIT_TIMEOUT"""
+
+    def __init__(self, job_id: str):
+        super().__init__(f"Job '{job_id}' is still running")
+        self.job_id = job_id
+
+
+async def run_queued(
+    job_id: str,
+    kind: str,
+    payload: Dict[str, Any],
+    priority: str,
+    client_id: str
+) -> Dict[str, Any]:
+    """
+    Hand an analysis to the workers and wait for its result.
+
+    Resubmitting the id of a job that is still queued or running waits
+    for that job instead of adding another, if the same client enqueued it.
+
+    Raises:
+        JobPending: When the job has not finished within JOB_WAIT_TIMEOUT
+        RuntimeError: When the job failed on every attempt
+    """
+    await run_in_threadpool(job_queue.enqueue, job_id, kind, payload, PRIORITIES.index(priority), client_id)
+    deadline = time.monotonic() + JOB_WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        job = await run_in_threadpool(job_queue.get, job_id, client_id)
+        if job is None:
+            raise RuntimeError(f"Job '{job_id}' is no longer in the queue")
+        if job["status"] == JobQueue.DONE:
+            return job["result"]
+        if job["status"] == JobQueue.FAILED:
+            raise RuntimeError(job["error"])
+        await asyncio.sleep(JOB_POLL_INTERVAL)
+    raise JobPending(job_id)
+
+
+def job_pending_response(job_id: str) -> JSONResponse:
+    """202 Accepted pointing at the job's status endpoint"""
+    status_url = f"/api/jobs/{job_id}"
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job_id, "status": "pending", "status_url": status_url},
+        headers={"Location": status_url}
+    )
+
+
+# ============================================================================
+# PROFILING
+# ============================================================================
+
+def check_prompt_profile(prompt_profile: Optional[str]):
+    """Refuse an unknown prompt profile with 400"""
+    if prompt_profile and prompt_profile not in medical_service.prompt_profiles():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown prompt profile '{prompt_profile}'; "
+                   f"available: {', '.join(medical_service.prompt_profiles())}"
+        )
+
+
+async def preflight(patient_input: str, prompt_profile: Optional[str] = None) -> Dict[str, Any]:
+    """Estimate an analysis and refuse it with 413 when it is over the token limits"""
+    check_prompt_profile(prompt_profile)
+    estimate = await run_in_threadpool(medical_service.estimate, patient_input, prompt_profile)
+    if not estimate["admitted"]:
+        raise HTTPException(status_code=413, detail={"message": estimate["reason"], "estimate": estimate})
+    return estimate
+
+
+def check_profiling_access(request: Request):
+    """Raise 404 when profiling is disabled and 403 unless the admin token is configured and sent"""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not PROFILING_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Profiling is not served without PROFILING_ADMIN_TOKEN")
+    if not secrets.compare_digest(request.headers.get("x-admin-token", ""), PROFILING_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def check_history_access(request: Request):
+    """Raise 404 when the history is disabled and 403 unless the admin token is configured and sent"""
+    if medical_service.history is None:
+        raise HTTPException(status_code=404, detail="History is disabled")
+    if not HISTORY_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="History is not served without HISTORY_ADMIN_TOKEN")
+    if not secrets.compare_digest(request.headers.get("x-admin-token", ""), HISTORY_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+def profiling_requested(request: Request) -> bool:
+    """Whether a request asked to be profiled (?profile=1 or X-Profile: 1)"""
+    if not PROFILING_ENABLED:
+        return False
+    if "1" not in (request.query_params.get("profile"), request.headers.get("x-profile")):
+        return False
+    check_profiling_access(request)
+    return True
+
+
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
 
+def asset_response(request: Request, asset: Asset) -> Response:
+    """Serve an in-memory asset in the client's preferred encoding, or 304"""
+    status, body, headers = asset.respond(
+        request.headers.get("accept-encoding"),
+        request.headers.get("if-none-match")
+    )
+    if status == 304:
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=asset.content_type, headers=headers)
+
+
+@app.api_route("/static/{name:path}", methods=["GET", "HEAD"], include_in_schema=False)
+async def serve_static(name: str, request: Request):
+    """
+    Serve a frontend file from memory.
+
+    Fingerprinted names (app.<hash>.js), which index.html links to, are
+    cacheable for a year; the original names are revalidated with ETags.
+    """
+    asset = static_assets.get(name)
+    if asset is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    return asset_response(request, asset)
+
+
 @app.get("/", tags=["General"], include_in_schema=False)
-async def serve_frontend():
+async def serve_frontend(request: Request):
     """Serve the frontend HTML page"""
-    index_path = templates_dir / "index.html"
-    if index_path.exists():
-        return FileResponse(index_path)
+    if static_assets.index is not None:
+        return asset_response(request, static_assets.index)
     else:
         # Fallback to API info if frontend not found
         return {
@@ -103,6 +411,13 @@ async def serve_frontend():
             "endpoints": {
                 "health": "/health",
                 "analyze": "/api/analyze",
+                "estimate": "/api/estimate",
+                "analyses": "/api/analyses/{request_id}",
+                "sessions": "/api/sessions/{session_id}/append",
+                "history": "/api/history",
+                "queue": "/api/queue/{request_id}",
+                "metrics": "/api/metrics",
+                "profiles": "/api/profiles",
                 "docs": "/docs"
             }
         }
@@ -118,6 +433,13 @@ async def api_info():
         "endpoints": {
             "health": "/health",
             "analyze": "/api/analyze",
+            "estimate": "/api/estimate",
+            "analyses": "/api/analyses/{request_id}",
+            "sessions": "/api/sessions/{session_id}/append",
+            "history": "/api/history",
+            "queue": "/api/queue/{request_id}",
+            "metrics": "/api/metrics",
+            "profiles": "/api/profiles",
             "docs": "/docs",
             "frontend": "/"
         }
@@ -132,7 +454,7 @@ async def health_check():
 
 
 @app.post("/api/analyze", response_model=SymptomAnalysisResponse, tags=["Analysis"])
-async def analyze_symptoms(request: SymptomAnalysisRequest):
+async def analyze_symptoms(request: SymptomAnalysisRequest, http_request: Request):
     """
     Analyze patient symptoms and provide diagnostic guidance.
 
@@ -142,13 +464,165 @@ async def analyze_symptoms(request: SymptomAnalysisRequest):
     - Senior diagnostic physician for multi-specialty analysis
     - Patient communication specialist for clear, actionable guidance
 
+    When the description is too incomplete to diagnose, the response has
+    status 'needs_more_info' and lists follow-up questions instead; the
+    diagnosis and communication stages are skipped.
+
+    Inputs whose pre-flight estimate (see /api/estimate) is over the
+    configured token limits are refused with 413.
+
+    With profiling enabled, `?profile=1` (or an `X-Profile: 1` header) runs
+    the analysis under a sampling profiler; `metadata.profile` then links
+    to the saved flame graph.
+
     **Important**: This is for educational purposes only and does not replace
     professional medical care.
     """
+    profile = profiling_requested(http_request)
+    request_id = request.request_id or uuid.uuid4().hex
+    client_id = client_identity(http_request)
+    priority = client_priority(http_request, request.priority)
+    cost = (await preflight(request.patient_input, request.prompt_profile))["prompt_tokens"]
+
     try:
-        result = medical_service.analyze_symptoms(request.patient_input)
-        return result
+        async with scheduler.admit(client_id, cost, priority, ticket_id=request_id) as ticket:
+            if profile:
+                result = await profiled_analysis(request, request_id)
+            elif job_queue is not None:
+                result = await run_queued(request_id, "analyze", {
+                    "patient_input": request.patient_input,
+                    "include_stages": request.include_stages,
+                    "prompt_profile": request.prompt_profile
+                }, priority, client_id)
+            elif CREW_ASYNC_EXECUTION:
+                result = await medical_service.analyze_symptoms_async(
+                    request.patient_input,
+                    request_id=request_id,
+                    include_stages=request.include_stages,
+                    prompt_profile=request.prompt_profile
+                )
+            else:
+                result = await run_in_threadpool(
+                    medical_service.analyze_symptoms,
+                    request.patient_input,
+                    request_id=request_id,
+                    include_stages=request.include_stages,
+                    prompt_profile=request.prompt_profile
+                )
+            ticket.failed = not result["success"]
+        add_queue_metadata(result, ticket)
+        return encoded_response(http_request, result)
+
+    except JobPending as e:
+        return job_pending_response(e.job_id)
+    except SchedulerRejection as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Analysis failed: {str(e)}"
+        )
+
+
+@app.post("/api/estimate", tags=["Analysis"])
+async def estimate_analysis(request: EstimateRequest):
+    """
+    Estimate the tokens and latency of an analysis without running it.
+
+    Each stage's prompt is rendered and counted locally; completion sizes
+    and generation speed come from recently finished analyses. `admitted`
+    tells whether /api/analyze would accept the input under the configured
+    token limits, and `reason` why not. `prompt_profile` estimates the
+    analysis with another prompt profile.
+    """
+    check_prompt_profile(request.prompt_profile)
+    return await run_in_threadpool(medical_service.estimate, request.patient_input, request.prompt_profile)
+
+
+async def profiled_analysis(request: SymptomAnalysisRequest, request_id: str) -> Dict[str, Any]:
+    """
+    Run one analysis under the sampling profiler and save the profile.
+
+    The analysis takes the path an unprofiled one would in this process:
+    the async pipeline with CREW_ASYNC_EXECUTION, a worker thread otherwise.
+    With a job queue it still runs here, since the worker's threads cannot
+    be sampled from this process.
+    """
+    with SamplingProfiler() as profiler:
+        if CREW_ASYNC_EXECUTION:
+            result = await medical_service.analyze_symptoms_async(
+                request.patient_input,
+                request_id=request_id,
+                include_stages=request.include_stages,
+                prompt_profile=request.prompt_profile
+            )
+        else:
+            result = await run_in_threadpool(
+                medical_service.analyze_symptoms,
+                request.patient_input,
+                request_id=request_id,
+                include_stages=request.include_stages,
+                prompt_profile=request.prompt_profile
+            )
+    profile_id = await run_in_threadpool(profile_store.save, profiler, request_id)
+    result.setdefault("metadata", {})["profile"] = {
+        "id": profile_id,
+        "samples": profiler.samples,
+        "url": f"/api/profiles/{profile_id}"
+    }
+    return result
+
+
+@app.get("/api/analyses/{request_id}", response_model=SymptomAnalysisResponse, tags=["Analysis"])
+async def get_analysis(request_id: str, request: Request, include_stages: bool = False):
+    """
+    Fetch a previous analysis by its request id.
+
+    Finished results are cacheable: the response carries an ETag and a
+    matching If-None-Match returns 304 Not Modified.
+    """
+    result = await run_in_threadpool(medical_service.get_analysis, request_id, include_stages)
+    if result is None:
+        raise HTTPException(status_code=404, detail=f"Analysis '{request_id}' not found")
+    return encoded_response(request, result, with_etag=result["success"])
+
+
+@app.post("/api/sessions/{session_id}/append", response_model=SymptomAnalysisResponse, tags=["Analysis"])
+async def append_to_session(session_id: str, request: SessionAppendRequest, http_request: Request):
+    """
+    Re-analyze a session after the patient adds follow-up information.
+
+    Only the information added since the session's previous submission is
+    merged into the cached intake report; diagnosis and communication are
+    then re-run. The first call for a session id, or for an expired one,
+    runs a full analysis. `metadata.stages_updated` lists the stages updated
+    from the session and `metadata.stages_skipped` those that were not run.
+    """
+    client_id = client_identity(http_request)
+    priority = client_priority(http_request, request.priority)
+    cost = (await preflight(request.patient_input))["prompt_tokens"]
 
+    try:
+        async with scheduler.admit(client_id, cost, priority) as ticket:
+            if job_queue is not None:
+                result = await run_queued(uuid.uuid4().hex, "append_to_session", {
+                    "session_id": session_id,
+                    "patient_input": request.patient_input
+                }, priority, client_id)
+            else:
+                result = await run_in_threadpool(
+                    medical_service.append_to_session,
+                    session_id,
+                    request.patient_input
+                )
+            ticket.failed = not result["success"]
+        add_queue_metadata(result, ticket)
+        return encoded_response(http_request, result)
+
+    except JobPending as e:
+        return job_pending_response(e.job_id)
+    except SchedulerRejection as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -156,6 +630,130 @@ async def analyze_symptoms(request: SymptomAnalysisRequest):
         )
 
 
+@app.get("/api/history", tags=["History"])
+async def list_history(
+    request: Request,
+    q: Optional[str] = None,
+    status: Optional[str] = None,
+    urgency: Optional[str] = None,
+    prompt_version: Optional[str] = None,
+    cursor: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Page through past analyses, newest first.
+
+    `q` searches the patient inputs and final reports (every word must
+    match; `word*` matches a prefix). `status`, `urgency` ('emergent',
+    'urgent', 'non-urgent') and `prompt_version` filter the results.
+    Pass a page's `next_cursor` as `cursor` to get the next page.
+    Analyses appear within HISTORY_FLUSH_INTERVAL of finishing. Requires
+    the X-Admin-Token header.
+    """
+    check_history_access(request)
+    page = await run_in_threadpool(
+        medical_service.history.list, q, status, urgency, prompt_version, cursor, limit
+    )
+    return encoded_response(request, page)
+
+
+@app.get("/api/history/{history_id}", tags=["History"])
+async def get_history_record(history_id: int, request: Request):
+    """One past analysis with its full input, report and metadata (requires the X-Admin-Token header)"""
+    check_history_access(request)
+    record = await run_in_threadpool(medical_service.history.get, history_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail=f"History record {history_id} not found")
+    return encoded_response(request, record, with_etag=True)
+
+
+@app.get("/api/jobs/{job_id}", tags=["Queue"])
+async def get_job(job_id: str, request: Request):
+    """
+    State of an analysis handed to the workers (WORKER_MODE=queue).
+
+    `result` holds the analysis response once `status` is 'done'. Only the
+    client that submitted the analysis (same API key, or same IP without
+    one) sees the job; others get 404.
+    """
+    job = None
+    if job_queue is not None:
+        job = await run_in_threadpool(job_queue.get, job_id, client_identity(request))
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found")
+    return job
+
+
+@app.get("/api/queue", tags=["Queue"])
+async def queue_status(request: Request):
+    """
+    Scheduler load plus the calling client's queued analyses and token quota.
+
+    Clients are identified by their X-API-Key header when it is one of
+    CLIENT_API_KEYS, or else by their IP address.
+    """
+    client_id = client_identity(request)
+    return {
+        "client_id": client_id,
+        "scheduler": scheduler.stats(),
+        "analyses": scheduler.client_tickets(client_id),
+        "quota": await run_in_threadpool(scheduler.ledger.usage, client_id),
+        "jobs": await run_in_threadpool(job_queue.stats) if job_queue is not None else None
+    }
+
+
+@app.get("/api/queue/{request_id}", tags=["Queue"])
+async def queue_position(request_id: str):
+    """
+    Queue position and estimated start of a pending analysis.
+
+    Poll this with the request_id sent to /api/analyze while waiting for
+    the response; 404 means it is not queued or running (anymore).
+    """
+    position = scheduler.position(request_id)
+    if position is None:
+        raise HTTPException(status_code=404, detail=f"Analysis '{request_id}' is not queued")
+    return {"request_id": request_id, **position}
+
+
+@app.get("/api/metrics", tags=["General"])
+async def metrics():
+    """
+    Output validation counts since startup, per stage.
+
+    For every validated stage: reports validated, valid as written,
+    repaired by regenerating sections, still invalid after regeneration,
+    the regeneration calls made and sections regenerated, and how often
+    each section problem was found. Analyses run by separate worker
+    processes are not counted here; their regenerations show in the
+    worker logs.
+    """
+    return {"output_validation": medical_service.validation_metrics.stats()}
+
+
+@app.get("/api/profiles", tags=["Profiling"])
+async def list_profiles(request: Request):
+    """List saved request profiles, newest first"""
+    check_profiling_access(request)
+    return {"profiles": await run_in_threadpool(profile_store.list)}
+
+
+@app.get("/api/profiles/{profile_id}", tags=["Profiling"])
+async def get_profile(profile_id: str, request: Request, format: str = "speedscope"):
+    """
+    Download a saved profile.
+
+    `format=speedscope` returns JSON for https://www.speedscope.app;
+    `format=collapsed` returns collapsed stacks for flamegraph.pl.
+    """
+    check_profiling_access(request)
+    path = profile_store.get_path(profile_id, format)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Profile '{profile_id}' not found")
+    media_type = "application/json" if format == "speedscope" else "text/plain"
+    return FileResponse(path, media_type=media_type, filename=path.name)
+
+
 # ============================================================================
 # RUN SERVER
 # ============================================================================
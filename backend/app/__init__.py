@@ -2,5 +2,6 @@
 from .medical_service import MedicalService
 from .crew_factory import CrewFactory
 from .prompt_loader import PromptLoader
+from .llm_registry import LLMRegistry, LLMProvider, get_llm_registry
 
-__all__ = ['MedicalService', 'CrewFactory', 'PromptLoader']
+__all__ = ['MedicalService', 'CrewFactory', 'PromptLoader', 'LLMRegistry', 'LLMProvider', 'get_llm_registry']
@@ -0,0 +1,501 @@
+"""
+Audit Log
+Append-only, compressed and checksummed segment files of every analysis input and output
+
+Records are buffered in memory and written by a background thread, many
+at a time, as one compressed block (zstd when zstandard is installed,
+otherwise gzip). Each block starts with a header giving its codec,
+length, record count, time range and a CRC32 of the compressed bytes. A
+segment file is a run of blocks. Next to each segment, a `.idx` file
+holds one fixed-size entry per block (offset, length, count, time range).
+A reader can therefore find a record by position or time from the index
+and decompress only the block that holds it.
+
+Segments are never reopened for writing. A new segment starts when the
+current one passes AUDIT_SEGMENT_MAX_BYTES or AUDIT_SEGMENT_MAX_SECONDS,
+and on every process start. Segment names start with their creation time
+and include the process id, so API and worker processes can share a
+directory. A block without an index entry (the process died between the
+two writes) is found again by scanning the headers after the last entry.
+"""
+
+import atexit
+import gzip
+import itertools
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from bisect import bisect_right
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from backend.config import (
+    AUDIT_DIR,
+    AUDIT_COMPRESSION,
+    AUDIT_BUFFER_RECORDS,
+    AUDIT_BUFFER_BYTES,
+    AUDIT_FLUSH_INTERVAL,
+    AUDIT_SEGMENT_MAX_BYTES,
+    AUDIT_SEGMENT_MAX_SECONDS,
+    AUDIT_FSYNC
+)
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"AUD1"
+# magic, codec, compressed length, record count, CRC32 of the compressed bytes, first and last timestamp
+BLOCK_HEADER = struct.Struct(">4sBIIIdd")
+# block offset, block length (header included), record count, first and last timestamp
+INDEX_ENTRY = struct.Struct(">QIIdd")
+
+GZIP, ZSTD = 0, 1
+CODECS = {'gzip': GZIP, 'zstd': ZSTD}
+CODEC_NAMES = {GZIP: 'gzip', ZSTD: 'zstd'}
+
+SEGMENT_SUFFIX = ".seg"
+INDEX_SUFFIX = ".idx"
+
+
+class AuditLogError(ValueError):
+    """Raised for a corrupt block or an unreadable segment"""
+
+
+def compress(data: bytes, codec: int) -> bytes:
+    """Compress a block payload"""
+    if codec == ZSTD:
+        return zstandard.ZstdCompressor(level=3).compress(data)
+    return gzip.compress(data, compresslevel=3, mtime=0)
+
+
+def decompress(data: bytes, codec: int) -> bytes:
+    """Decompress a block payload"""
+    if codec == ZSTD:
+        if zstandard is None:
+            raise AuditLogError("Block is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == GZIP:
+        return gzip.decompress(data)
+    raise AuditLogError(f"Unknown block codec {codec}")
+
+
+def encode_block(records: List[Dict[str, Any]], codec: int) -> bytes:
+    """
+    One block holding the records as compressed JSON Lines.
+
+    Args:
+        records: Records with a 'ts' timestamp, oldest first
+        codec: GZIP or ZSTD
+
+    Returns:
+        Header and compressed payload
+    """
+    payload = "".join(json.dumps(record, default=str) + "\n" for record in records)
+    compressed = compress(payload.encode('utf-8'), codec)
+    header = BLOCK_HEADER.pack(
+        MAGIC, codec, len(compressed), len(records), zlib.crc32(compressed),
+        records[0]['ts'], records[-1]['ts']
+    )
+    return header + compressed
+
+
+def _segment_name() -> str:
+    return f"audit-{datetime.now():%Y%m%dT%H%M%S}-{os.getpid()}"
+
+
+def _text_size(value: Any) -> int:
+    """Characters of text in a record value (nested dicts and lists included)"""
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_text_size(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_text_size(item) for item in value)
+    return 8
+
+
+class AuditSink:
+    """Buffers audit records and writes them to compressed segment files"""
+
+    _names = itertools.count()
+
+    def __init__(
+        self,
+        directory: Path = AUDIT_DIR,
+        compression: str = AUDIT_COMPRESSION,
+        buffer_records: int = AUDIT_BUFFER_RECORDS,
+        buffer_bytes: int = AUDIT_BUFFER_BYTES,
+        flush_interval: float = AUDIT_FLUSH_INTERVAL,
+        segment_max_bytes: int = AUDIT_SEGMENT_MAX_BYTES,
+        segment_max_seconds: float = AUDIT_SEGMENT_MAX_SECONDS,
+        fsync: bool = AUDIT_FSYNC
+    ):
+        """
+        Initialize the sink and start its writer thread.
+
+        Args:
+            directory: Directory of the segment and index files
+            compression: 'zstd' or 'gzip' (zstd falls back to gzip
+                without zstandard)
+            buffer_records: Records buffered before a block is written
+            buffer_bytes: Approximate buffered bytes before a block is written
+            flush_interval: Most seconds a record waits in the buffer
+            segment_max_bytes: Size after which a new segment is started
+            segment_max_seconds: Age after which a new segment is started
+            fsync: Sync each block to disk before indexing it
+        """
+        if compression not in CODECS:
+            raise ValueError(f"Unknown audit compression '{compression}' (use zstd or gzip)")
+        if compression == 'zstd' and zstandard is None:
+            logger.warning("zstandard is not installed, audit segments are gzip-compressed")
+            compression = 'gzip'
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.codec = CODECS[compression]
+        self.buffer_records = buffer_records
+        self.buffer_bytes = buffer_bytes
+        self.flush_interval = flush_interval
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_seconds = segment_max_seconds
+        self.fsync = fsync
+
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._condition = threading.Condition()
+        # Held while a block is written, so blocks keep their order
+        self._write_lock = threading.Lock()
+        self._segment = None
+        self._index = None
+        self._segment_started = 0.0
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name="audit-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def write(self, kind: str, **fields):
+        """
+        Buffer one audit record; it reaches disk within the flush interval.
+
+        When the buffer is far behind (four times its limits), the caller
+        writes the buffer itself rather than let it grow further.
+
+        Args:
+            kind: Record type, e.g. 'analysis'
+            fields: Record content (JSON-serializable)
+        """
+        record = {"ts": time.time(), "kind": kind, **fields}
+        size = _text_size(fields) + 64
+        with self._condition:
+            self._buffer.append((record, size))
+            self._buffered_bytes += size
+            full = len(self._buffer) >= self.buffer_records or self._buffered_bytes >= self.buffer_bytes
+            overflowing = (len(self._buffer) >= 4 * self.buffer_records
+                           or self._buffered_bytes >= 4 * self.buffer_bytes)
+            if full:
+                self._condition.notify()
+        if overflowing:
+            self.flush()
+
+    def _take(self) -> List[Tuple[Dict[str, Any], int]]:
+        with self._condition:
+            buffered, self._buffer, self._buffered_bytes = self._buffer, [], 0
+        return buffered
+
+    def _split(self, buffered: List[Tuple[Dict[str, Any], int]]) -> Iterator[List[Dict[str, Any]]]:
+        """Cut buffered records into blocks within the buffer limits, so a seek decompresses little"""
+        block, size = [], 0
+        for record, record_size in buffered:
+            if block and (len(block) >= self.buffer_records or size + record_size > self.buffer_bytes):
+                yield block
+                block, size = [], 0
+            block.append(record)
+            size += record_size
+        if block:
+            yield block
+
+    def _write_loop(self):
+        """Writer thread: write the buffer when it fills up or the interval passes"""
+        while True:
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._closed
+                    or len(self._buffer) >= self.buffer_records
+                    or self._buffered_bytes >= self.buffer_bytes,
+                    timeout=self.flush_interval
+                )
+                if self._closed:
+                    return
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Could not write audit records: {str(e)}")
+
+    def _open_segment(self):
+        name = f"{_segment_name()}-{next(self._names):04d}"
+        self._segment = open(self.directory / (name + SEGMENT_SUFFIX), 'ab')
+        self._index = open(self.directory / (name + INDEX_SUFFIX), 'ab')
+        self._segment_started = time.monotonic()
+
+    def _close_segment(self):
+        if self._segment is not None:
+            self._segment.close()
+            self._index.close()
+            self._segment = self._index = None
+
+    def flush(self):
+        """Write every buffered record, in blocks of at most the buffer limits"""
+        with self._write_lock:
+            for records in self._split(self._take()):
+                self._write_block(records)
+
+    def _write_block(self, records: List[Dict[str, Any]]):
+        """Append one block to the current segment (rotating it first if due) and index it"""
+        if self._segment is not None and (
+            self._segment.tell() >= self.segment_max_bytes
+            or time.monotonic() - self._segment_started >= self.segment_max_seconds
+        ):
+            self._close_segment()
+        if self._segment is None:
+            self._open_segment()
+
+        block = encode_block(records, self.codec)
+        offset = self._segment.tell()
+        self._segment.write(block)
+        self._segment.flush()
+        if self.fsync:
+            os.fsync(self._segment.fileno())
+        # The index entry follows the block, so it never points at a partial block
+        self._index.write(INDEX_ENTRY.pack(offset, len(block), len(records), records[0]['ts'], records[-1]['ts']))
+        self._index.flush()
+
+    def close(self):
+        """Write the buffer and close the current segment"""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self.flush()
+        with self._write_lock:
+            self._close_segment()
+
+
+class AuditSegment:
+    """Read access to one segment through its block index"""
+
+    def __init__(self, path: Path):
+        """
+        Open a segment and load its index.
+
+        Args:
+            path: Segment (.seg) file
+        """
+        self.path = Path(path)
+        self.name = self.path.name[:-len(SEGMENT_SUFFIX)]
+        self.blocks = self._load_index()
+        # Position of each block's first record, for seeking by position
+        self.starts = []
+        total = 0
+        for block in self.blocks:
+            self.starts.append(total)
+            total += block[2]
+        self.records = total
+
+    def _load_index(self) -> List[Tuple[int, int, int, float, float]]:
+        """Index entries, plus those of blocks written after the index's last entry"""
+        blocks = []
+        index_path = self.path.with_suffix(INDEX_SUFFIX)
+        if index_path.exists():
+            data = index_path.read_bytes()
+            usable = len(data) - len(data) % INDEX_ENTRY.size
+            blocks = [entry for entry in INDEX_ENTRY.iter_unpack(data[:usable])]
+
+        size = self.path.stat().st_size
+        offset = blocks[-1][0] + blocks[-1][1] if blocks else 0
+        with open(self.path, 'rb') as f:
+            while offset + BLOCK_HEADER.size <= size:
+                f.seek(offset)
+                magic, _, length, records, _, first_ts, last_ts = BLOCK_HEADER.unpack(f.read(BLOCK_HEADER.size))
+                if magic != MAGIC or offset + BLOCK_HEADER.size + length > size:
+                    # Torn write at the end of the segment
+                    break
+                blocks.append((offset, BLOCK_HEADER.size + length, records, first_ts, last_ts))
+                offset += BLOCK_HEADER.size + length
+        return blocks
+
+    @property
+    def first_ts(self) -> Optional[float]:
+        return self.blocks[0][3] if self.blocks else None
+
+    @property
+    def last_ts(self) -> Optional[float]:
+        return self.blocks[-1][4] if self.blocks else None
+
+    def _block_lines(self, number: int, f) -> List[bytes]:
+        """Decompress one block after checking its header and checksum"""
+        offset, length, _, _, _ = self.blocks[number]
+        f.seek(offset)
+        data = f.read(length)
+        magic, codec, size, _, crc, _, _ = BLOCK_HEADER.unpack(data[:BLOCK_HEADER.size])
+        payload = data[BLOCK_HEADER.size:]
+        if magic != MAGIC or size != len(payload) or zlib.crc32(payload) != crc:
+            raise AuditLogError(f"{self.name}: block {number} at offset {offset} is corrupt")
+        return decompress(payload, codec).splitlines()
+
+    def read_block(self, number: int, f=None) -> List[Dict[str, Any]]:
+        """
+        Decompress and parse one block.
+
+        Args:
+            number: Block number in the segment
+            f: Open segment file to read from (opened if not given)
+
+        Returns:
+            The block's records, each with its 'address' ('segment:position')
+        """
+        if f is None:
+            with open(self.path, 'rb') as f:
+                return self.read_block(number, f)
+        start = self.starts[number]
+        return [
+            {**json.loads(line), "address": f"{self.name}:{start + i}"}
+            for i, line in enumerate(self._block_lines(number, f))
+        ]
+
+    def get(self, position: int) -> Dict[str, Any]:
+        """
+        One record by its position in the segment, decompressing only its block.
+
+        Args:
+            position: Record number, from 0
+
+        Returns:
+            The record
+        """
+        if not 0 <= position < self.records:
+            raise IndexError(f"{self.name} has {self.records} records")
+        number = bisect_right(self.starts, position) - 1
+        with open(self.path, 'rb') as f:
+            line = self._block_lines(number, f)[position - self.starts[number]]
+        return {**json.loads(line), "address": f"{self.name}:{position}"}
+
+    def iter_records(self, since: float = None, until: float = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream records block by block, skipping blocks outside the time range.
+
+        Args:
+            since: Only records at or after this timestamp
+            until: Only records at or before this timestamp
+
+        Yields:
+            Records in write order
+        """
+        with open(self.path, 'rb') as f:
+            for number, (_, _, _, first_ts, last_ts) in enumerate(self.blocks):
+                if (since is not None and last_ts < since) or (until is not None and first_ts > until):
+                    continue
+                for record in self.read_block(number, f):
+                    if (since is None or record['ts'] >= since) and (until is None or record['ts'] <= until):
+                        yield record
+
+    def verify(self) -> List[str]:
+        """
+        Check every block's header and checksum without decompressing.
+
+        Returns:
+            Problems found (empty when the segment is intact)
+        """
+        problems = []
+        with open(self.path, 'rb') as f:
+            for number, (offset, length, records, _, _) in enumerate(self.blocks):
+                f.seek(offset)
+                data = f.read(length)
+                magic, _, size, header_records, crc, _, _ = BLOCK_HEADER.unpack(data[:BLOCK_HEADER.size])
+                payload = data[BLOCK_HEADER.size:]
+                if magic != MAGIC or size != len(payload) or header_records != records:
+                    problems.append(f"block {number} at offset {offset}: header does not match the index")
+                elif zlib.crc32(payload) != crc:
+                    problems.append(f"block {number} at offset {offset}: checksum mismatch")
+            end = self.blocks[-1][0] + self.blocks[-1][1] if self.blocks else 0
+            trailing = self.path.stat().st_size - end
+            if trailing:
+                problems.append(f"{trailing} trailing bytes after the last block (torn write)")
+        return problems
+
+    def summary(self) -> Dict[str, Any]:
+        """Name, size, record and block counts and time range of the segment"""
+        return {
+            "segment": self.name,
+            "bytes": self.path.stat().st_size,
+            "blocks": len(self.blocks),
+            "records": self.records,
+            "first": datetime.fromtimestamp(self.first_ts).isoformat() if self.blocks else None,
+            "last": datetime.fromtimestamp(self.last_ts).isoformat() if self.blocks else None
+        }
+
+
+class AuditReader:
+    """Reads the segments of an audit directory in write order"""
+
+    def __init__(self, directory: Path = AUDIT_DIR):
+        """
+        Initialize the reader.
+
+        Args:
+            directory: Directory of the segment and index files
+        """
+        self.directory = Path(directory)
+
+    def segments(self) -> List[AuditSegment]:
+        """Segments, oldest first"""
+        return [AuditSegment(path) for path in sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}"))]
+
+    def segment(self, name: str) -> AuditSegment:
+        """One segment by name (with or without the .seg suffix)"""
+        if name.endswith(SEGMENT_SUFFIX):
+            name = name[:-len(SEGMENT_SUFFIX)]
+        path = self.directory / (name + SEGMENT_SUFFIX)
+        if not path.exists():
+            raise AuditLogError(f"No segment '{name}' in {self.directory}")
+        return AuditSegment(path)
+
+    def get(self, address: str) -> Dict[str, Any]:
+        """
+        One record by its address.
+
+        Args:
+            address: 'segment:position', as listed in each record
+
+        Returns:
+            The record
+        """
+        name, _, position = address.rpartition(':')
+        return self.segment(name).get(int(position))
+
+    def iter_records(self, since: float = None, until: float = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the records of every segment, skipping segments and blocks
+        outside the time range.
+
+        Args:
+            since: Only records at or after this timestamp
+            until: Only records at or before this timestamp
+
+        Yields:
+            Records, segment by segment
+        """
+        for segment in self.segments():
+            if not segment.blocks:
+                continue
+            if (since is not None and segment.last_ts < since) or (until is not None and segment.first_ts > until):
+                continue
+            yield from segment.iter_records(since, until)
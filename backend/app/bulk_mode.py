@@ -0,0 +1,674 @@
+"""
+Bulk Mode
+Runs the pipeline for many patients offline through the provider Batch API
+
+Every stage of the pipeline becomes batch-request files: one chat
+completion request per patient whose dependencies have finished, prompted
+the way the stage's agent prompts its LLM. The files are uploaded and
+submitted as batches and polled until complete, and their answers become
+the context of the next stage's requests. Batch requests cost less, count
+against a separate provider rate limit and may take up to the completion
+window, so nightly re-analyses do not compete with live traffic.
+
+A SQLite ledger tracks every (patient, stage) item and every submitted
+batch, so a run survives restarts of the runner and its progress can be
+checked at any time. Batch requests are single LLM calls: stage agents do
+not use their tools in bulk mode.
+"""
+
+import itertools
+import json
+import logging
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from crewai import Task
+from crewai.utilities.string_utils import interpolate_only
+from openai import OpenAI
+
+from .crew_factory import CrewFactory
+from .intake_gate import assess_intake
+from .phi_redaction import Redaction, redact
+from .sqlite_store import SQLiteStore
+from backend.config import (
+    BULK_DB_PATH,
+    BULK_OUTPUT_DIR,
+    BULK_BATCH_MAX_REQUESTS,
+    BULK_COMPLETION_WINDOW,
+    BULK_POLL_INTERVAL,
+    BULK_MAX_ATTEMPTS,
+    INTAKE_GATE_ENABLED,
+    PHI_REDACTION_ENABLED
+)
+
+logger = logging.getLogger(__name__)
+
+# LLM settings sent with each request besides the model
+REQUEST_FIELDS = ('temperature', 'top_p', 'max_tokens', 'seed', 'reasoning_effort')
+
+# Batch statuses after which nothing changes any more
+FINAL_BATCH_STATUSES = ('completed', 'failed', 'expired', 'cancelled')
+
+BATCH_ENDPOINT = '/v1/chat/completions'
+
+
+def render_messages(task: Task, inputs: Dict[str, Any], context: List[str]) -> List[Dict[str, str]]:
+    """
+    Chat messages asking a stage's agent for the task's final answer.
+
+    Args:
+        task: Pipeline task (its agent provides the system prompt)
+        inputs: Values its description is interpolated with
+        context: Outputs of the tasks it depends on, in order
+
+    Returns:
+        System and user messages
+    """
+    agent = task.agent
+    prompt = (
+        f"{interpolate_only(task.description, inputs)}\n\n"
+        f"This is the expected criteria for your final answer: {interpolate_only(task.expected_output, inputs)}\n"
+        "you MUST return the actual complete content as the final answer, not a summary."
+    )
+    if context:
+        prompt += "\n\nThis is the context you're working with:\n" + "\n\n----------\n\n".join(context)
+    return [
+        {"role": "system", "content": f"You are {agent.role}. {agent.backstory}\nYour personal goal is: {agent.goal}"},
+        {"role": "user", "content": prompt}
+    ]
+
+
+class BulkLedger(SQLiteStore):
+    """SQLite ledger of bulk runs, their per-stage items and submitted batches"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS bulk_runs (
+        run_id TEXT PRIMARY KEY,
+        prompt_version TEXT NOT NULL,
+        status TEXT NOT NULL,
+        output_path TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS bulk_patients (
+        run_id TEXT NOT NULL,
+        patient_id TEXT NOT NULL,
+        patient_input TEXT NOT NULL,
+        PRIMARY KEY (run_id, patient_id)
+    );
+    CREATE TABLE IF NOT EXISTS bulk_items (
+        run_id TEXT NOT NULL,
+        patient_id TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        batch_id TEXT,
+        output TEXT,
+        error TEXT,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (run_id, patient_id, stage)
+    );
+    CREATE INDEX IF NOT EXISTS idx_bulk_items_status ON bulk_items (run_id, stage, status);
+    CREATE INDEX IF NOT EXISTS idx_bulk_items_batch ON bulk_items (batch_id);
+    CREATE TABLE IF NOT EXISTS bulk_batches (
+        batch_id TEXT PRIMARY KEY,
+        run_id TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        provider TEXT,
+        status TEXT NOT NULL,
+        requests INTEGER NOT NULL,
+        submitted_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_bulk_batches_run ON bulk_batches (run_id, status);
+    """
+
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+
+    PENDING = 'pending'
+    SUBMITTED = 'submitted'
+    DONE = 'done'
+    FAILED = 'failed'
+    SKIPPED = 'skipped'
+
+    def __init__(self, db_path: Path = BULK_DB_PATH):
+        """
+        Initialize the ledger.
+
+        Args:
+            db_path: SQLite database file
+        """
+        super().__init__(db_path)
+
+    def create_run(self, run_id: str, prompt_version: str, stages: List[str], patients: Iterable[Dict[str, Any]]) -> int:
+        """
+        Register a run and an item for every patient and stage.
+
+        Args:
+            run_id: Run identifier
+            prompt_version: Version of the prompts the requests are built from
+            stages: Pipeline stage names
+            patients: Dictionaries with 'patient_id', 'patient_input' and
+                optional 'outputs' (stage outputs that are already known,
+                e.g. a stored intake report)
+
+        Returns:
+            Number of patients added
+        """
+        now = time.time()
+        count = 0
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO bulk_runs (run_id, prompt_version, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (run_id, prompt_version, self.RUNNING, now, now)
+            )
+            for patient in patients:
+                patient_id, outputs = str(patient['patient_id']), patient.get('outputs') or {}
+                conn.execute(
+                    "INSERT OR REPLACE INTO bulk_patients (run_id, patient_id, patient_input) VALUES (?, ?, ?)",
+                    (run_id, patient_id, patient['patient_input'])
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO bulk_items (run_id, patient_id, stage, status, output, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [
+                        (run_id, patient_id, stage, self.DONE if stage in outputs else self.PENDING,
+                         outputs.get(stage), now)
+                        for stage in stages
+                    ]
+                )
+                count += 1
+        return count
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a run record.
+
+        Returns:
+            Dictionary with 'run_id', 'prompt_version', 'status',
+            'output_path', 'created_at' and 'updated_at', or None
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT prompt_version, status, output_path, created_at, updated_at FROM bulk_runs WHERE run_id = ?",
+                (run_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "run_id": run_id,
+            "prompt_version": row[0],
+            "status": row[1],
+            "output_path": row[2],
+            "created_at": row[3],
+            "updated_at": row[4]
+        }
+
+    def finish_run(self, run_id: str, output_path: Path):
+        """Mark a run completed once every item is done, failed or skipped"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE bulk_runs SET status = ?, output_path = ?, updated_at = ? WHERE run_id = ?",
+                (self.COMPLETED, str(output_path), time.time(), run_id)
+            )
+
+    def ready(self, run_id: str, stage: str, dependencies: List[str], limit: int) -> List[Dict[str, Any]]:
+        """
+        Pending items of a stage whose dependencies are all done.
+
+        Args:
+            run_id: Run identifier
+            stage: Stage name
+            dependencies: Stages the stage takes as context, in order
+            limit: Maximum number of items
+
+        Returns:
+            Dictionaries with 'patient_id', 'patient_input' and 'context'
+            (dependency outputs in order)
+        """
+        placeholders = ", ".join("?" for _ in dependencies) or "NULL"
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT i.patient_id, p.patient_input FROM bulk_items i "
+                "JOIN bulk_patients p ON p.run_id = i.run_id AND p.patient_id = i.patient_id "
+                "WHERE i.run_id = ? AND i.stage = ? AND i.status = ? AND NOT EXISTS ("
+                f"SELECT 1 FROM bulk_items d WHERE d.run_id = i.run_id AND d.patient_id = i.patient_id "
+                f"AND d.stage IN ({placeholders}) AND d.status != ?) LIMIT ?",
+                (run_id, stage, self.PENDING, *dependencies, self.DONE, limit)
+            ).fetchall()
+            items = []
+            for patient_id, patient_input in rows:
+                outputs = dict(conn.execute(
+                    f"SELECT stage, output FROM bulk_items WHERE run_id = ? AND patient_id = ? AND stage IN ({placeholders})",
+                    (run_id, patient_id, *dependencies)
+                ).fetchall())
+                items.append({
+                    "patient_id": patient_id,
+                    "patient_input": patient_input,
+                    "context": [outputs[dep] for dep in dependencies]
+                })
+        return items
+
+    def record_batch(self, batch_id: str, run_id: str, stage: str, provider: Optional[str], patient_ids: List[str]):
+        """Record a submitted batch and mark its items submitted"""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO bulk_batches (batch_id, run_id, stage, provider, status, requests, submitted_at, updated_at) "
+                "VALUES (?, ?, ?, ?, 'submitted', ?, ?, ?)",
+                (batch_id, run_id, stage, provider, len(patient_ids), now, now)
+            )
+            conn.executemany(
+                "UPDATE bulk_items SET status = ?, batch_id = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE run_id = ? AND patient_id = ? AND stage = ?",
+                [(self.SUBMITTED, batch_id, now, run_id, patient_id, stage) for patient_id in patient_ids]
+            )
+
+    def open_batches(self, run_id: str) -> List[Dict[str, Any]]:
+        """Batches of a run that have not reached a final status"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT batch_id, stage, provider FROM bulk_batches WHERE run_id = ? "
+                f"AND status NOT IN ({', '.join('?' for _ in FINAL_BATCH_STATUSES)}) ORDER BY submitted_at",
+                (run_id, *FINAL_BATCH_STATUSES)
+            ).fetchall()
+        return [{"batch_id": batch_id, "stage": stage, "provider": provider} for batch_id, stage, provider in rows]
+
+    def update_batch(self, batch_id: str, status: str):
+        """Record a batch's latest provider status"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE bulk_batches SET status = ?, updated_at = ? WHERE batch_id = ?",
+                (status, time.time(), batch_id)
+            )
+
+    def complete_batch(
+        self,
+        batch_id: str,
+        status: str,
+        outputs: Dict[str, str],
+        errors: Dict[str, str],
+        max_attempts: int = BULK_MAX_ATTEMPTS
+    ):
+        """
+        Store the results of a finished batch.
+
+        Items without an answer (failed requests, or missing from the
+        results of an expired or cancelled batch) are pending again until
+        they run out of attempts.
+
+        Args:
+            batch_id: Provider batch identifier
+            status: Final provider status
+            outputs: Answers keyed by patient id
+            errors: Error messages keyed by patient id
+            max_attempts: Submissions before an item is marked failed
+        """
+        now = time.time()
+        with self._connect() as conn:
+            run_id, stage = conn.execute(
+                "SELECT run_id, stage FROM bulk_batches WHERE batch_id = ?", (batch_id,)
+            ).fetchone()
+            # Looked up by primary key; the batch_id condition ignores answers
+            # to an item that was resubmitted in the meantime
+            conn.executemany(
+                "UPDATE bulk_items SET status = ?, output = ?, error = NULL, updated_at = ? "
+                "WHERE run_id = ? AND patient_id = ? AND stage = ? AND batch_id = ? AND status = ?",
+                [
+                    (self.DONE, output, now, run_id, patient_id, stage, batch_id, self.SUBMITTED)
+                    for patient_id, output in outputs.items()
+                ]
+            )
+            conn.executemany(
+                "UPDATE bulk_items SET error = ? WHERE run_id = ? AND patient_id = ? AND stage = ? AND batch_id = ?",
+                [(error, run_id, patient_id, stage, batch_id) for patient_id, error in errors.items()]
+            )
+            conn.execute(
+                "UPDATE bulk_items SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "error = COALESCE(error, ?), updated_at = ? WHERE batch_id = ? AND status = ?",
+                (max_attempts, self.FAILED, self.PENDING, f"No result (batch {status})", now, batch_id, self.SUBMITTED)
+            )
+            conn.execute(
+                "UPDATE bulk_batches SET status = ?, updated_at = ? WHERE batch_id = ?",
+                (status, now, batch_id)
+            )
+
+    def skip_patients(self, run_id: str, patient_ids: List[str], reason: str):
+        """Skip the pending stages of patients that cannot go further"""
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE bulk_items SET status = ?, error = ?, updated_at = ? "
+                "WHERE run_id = ? AND patient_id = ? AND status = ?",
+                [(self.SKIPPED, reason, time.time(), run_id, patient_id, self.PENDING) for patient_id in patient_ids]
+            )
+
+    def skip_blocked(self, run_id: str, stage: str, dependencies: List[str]) -> int:
+        """
+        Skip pending items of a stage whose dependencies failed or were skipped.
+
+        Returns:
+            Number of items skipped
+        """
+        if not dependencies:
+            return 0
+        placeholders = ", ".join("?" for _ in dependencies)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE bulk_items SET status = ?, error = 'A stage it depends on did not finish', updated_at = ? "
+                "WHERE run_id = ? AND stage = ? AND status = ? AND EXISTS ("
+                "SELECT 1 FROM bulk_items d WHERE d.run_id = bulk_items.run_id "
+                f"AND d.patient_id = bulk_items.patient_id AND d.stage IN ({placeholders}) AND d.status IN (?, ?))",
+                (self.SKIPPED, time.time(), run_id, stage, self.PENDING, *dependencies, self.FAILED, self.SKIPPED)
+            )
+        return cursor.rowcount
+
+    def stage_outputs(self, run_id: str, stage: str, patient_ids: List[str]) -> Dict[str, str]:
+        """Outputs of one stage for the given patients"""
+        with self._connect() as conn:
+            return {
+                patient_id: output
+                for patient_id in patient_ids
+                for (output,) in conn.execute(
+                    "SELECT output FROM bulk_items WHERE run_id = ? AND patient_id = ? AND stage = ? AND status = ?",
+                    (run_id, patient_id, stage, self.DONE)
+                )
+            }
+
+    def progress(self, run_id: str) -> Dict[str, Dict[str, int]]:
+        """Number of items in each status per stage"""
+        statuses = (self.PENDING, self.SUBMITTED, self.DONE, self.FAILED, self.SKIPPED)
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT stage, status, COUNT(*) FROM bulk_items WHERE run_id = ? GROUP BY stage, status",
+                (run_id,)
+            ).fetchall()
+        progress: Dict[str, Dict[str, int]] = {}
+        for stage, status, count in rows:
+            progress.setdefault(stage, dict.fromkeys(statuses, 0))[status] = count
+        return progress
+
+    def active(self, run_id: str) -> int:
+        """Items still pending or submitted"""
+        with self._connect() as conn:
+            return conn.execute(
+                "SELECT COUNT(*) FROM bulk_items WHERE run_id = ? AND status IN (?, ?)",
+                (run_id, self.PENDING, self.SUBMITTED)
+            ).fetchone()[0]
+
+    def patient_results(self, run_id: str) -> Iterable[Tuple[str, str, Dict[str, Dict[str, Any]]]]:
+        """
+        Input and stage items of every patient, in the order patients were added.
+
+        Yields:
+            (patient_id, patient_input, {stage: {'status', 'output', 'error'}})
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT i.patient_id, p.patient_input, i.stage, i.status, i.output, i.error FROM bulk_items i "
+                "JOIN bulk_patients p ON p.run_id = i.run_id AND p.patient_id = i.patient_id "
+                "WHERE i.run_id = ? ORDER BY p.rowid",
+                (run_id,)
+            ).fetchall()
+        for (patient_id, patient_input), items in itertools.groupby(rows, key=lambda row: row[:2]):
+            yield patient_id, patient_input, {
+                stage: {"status": status, "output": output, "error": error}
+                for _, _, stage, status, output, error in items
+            }
+
+
+class BatchClient:
+    """Uploads request files to a provider's Batch API and collects the results"""
+
+    def __init__(self, client: OpenAI, completion_window: str = BULK_COMPLETION_WINDOW):
+        """
+        Initialize the client.
+
+        Args:
+            client: OpenAI SDK client of the provider
+            completion_window: Time the provider has to finish a batch
+        """
+        # File transfers are few and large; retry them unlike completion calls
+        self.client = client.with_options(max_retries=3)
+        self.completion_window = completion_window
+
+    def submit(self, requests: List[Dict[str, Any]], metadata: Dict[str, str]) -> str:
+        """
+        Upload a request file and submit it as a batch.
+
+        Args:
+            requests: Batch request lines ('custom_id', 'method', 'url', 'body')
+            metadata: Labels stored with the batch
+
+        Returns:
+            Provider batch identifier
+        """
+        content = "".join(json.dumps(request) + "\n" for request in requests).encode('utf-8')
+        upload = self.client.files.create(file=("requests.jsonl", content), purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=upload.id,
+            endpoint=BATCH_ENDPOINT,
+            completion_window=self.completion_window,
+            metadata=metadata
+        )
+        return batch.id
+
+    def _read_results(self, file_id: Optional[str]) -> List[Dict[str, Any]]:
+        if not file_id:
+            return []
+        text = self.client.files.content(file_id).text
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    def poll(self, batch_id: str) -> Tuple[str, Dict[str, str], Dict[str, str]]:
+        """
+        Check a batch.
+
+        Returns:
+            (status, answers, errors); answers and errors are keyed by
+            custom_id and only filled once the batch reached a final status
+        """
+        batch = self.client.batches.retrieve(batch_id)
+        answers, errors = {}, {}
+        if batch.status not in FINAL_BATCH_STATUSES:
+            return batch.status, answers, errors
+
+        for result in self._read_results(batch.output_file_id) + self._read_results(batch.error_file_id):
+            response = result.get('response') or {}
+            body = response.get('body') or {}
+            if response.get('status_code') == 200 and body.get('choices'):
+                answers[result['custom_id']] = body['choices'][0]['message']['content'] or ""
+            else:
+                error = result.get('error') or body.get('error') or {}
+                errors[result['custom_id']] = error.get('message') or f"HTTP {response.get('status_code')}"
+        return batch.status, answers, errors
+
+
+class BulkRunner:
+    """Drives bulk runs stage by stage through the Batch API"""
+
+    def __init__(
+        self,
+        crew_factory: CrewFactory = None,
+        ledger: BulkLedger = None,
+        batch_max_requests: int = BULK_BATCH_MAX_REQUESTS,
+        max_attempts: int = BULK_MAX_ATTEMPTS,
+        output_dir: Path = BULK_OUTPUT_DIR
+    ):
+        """
+        Initialize the runner.
+
+        Args:
+            crew_factory: Factory the pipeline's tasks and prompts come from
+            ledger: Ledger the runs are tracked in
+            batch_max_requests: Requests per batch file
+            max_attempts: Submissions of a request before it is given up on
+            output_dir: Directory the final reports are written to
+        """
+        self.crew_factory = crew_factory or CrewFactory()
+        self.ledger = ledger or BulkLedger()
+        self.batch_max_requests = batch_max_requests
+        self.max_attempts = max_attempts
+        self.output_dir = Path(output_dir)
+        # Tasks are only prompt templates here; they are built once per runner
+        self.tasks = self.crew_factory.create_medical_diagnostic_tasks()
+        self.dependencies = self.crew_factory.create_executor().dependencies
+        self.output_stage = self.crew_factory.get_output_stage()
+        self.intake_stage = self.crew_factory.get_intake_stage()
+        self._clients: Dict[Optional[str], BatchClient] = {}
+
+    def _client(self, provider: Optional[str]) -> BatchClient:
+        if provider not in self._clients:
+            registry = self.crew_factory.llm_registry
+            self._clients[provider] = BatchClient(registry.get_provider(provider).get_client())
+        return self._clients[provider]
+
+    def create_run(self, patients: Iterable[Dict[str, Any]], run_id: str = None) -> str:
+        """
+        Register a run; nothing is submitted until step() or run().
+
+        Args:
+            patients: Dictionaries with 'patient_id', 'patient_input' and
+                optional 'outputs' (known stage outputs keyed by stage name)
+            run_id: Run identifier (generated when omitted)
+
+        Returns:
+            The run identifier
+        """
+        run_id = run_id or f"bulk-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        patients = list(patients)
+        count = self.ledger.create_run(
+            run_id, self.crew_factory.prompt_loader.get_prompt_version(), list(self.dependencies), patients
+        )
+        # Stored intakes that are too incomplete go no further
+        known_intakes = {
+            str(p['patient_id']): p['outputs'][self.intake_stage]
+            for p in patients if self.intake_stage in (p.get('outputs') or {})
+        }
+        self._gate_intakes(run_id, known_intakes)
+        logger.info(f"Created bulk run {run_id} for {count} patients")
+        return run_id
+
+    def _gate_intakes(self, run_id: str, intakes: Dict[str, str]):
+        if not INTAKE_GATE_ENABLED or not intakes:
+            return
+        incomplete = [patient_id for patient_id, report in intakes.items() if not assess_intake(report)['sufficient']]
+        if incomplete:
+            self.ledger.skip_patients(run_id, incomplete, 'needs_more_info')
+
+    @staticmethod
+    def _redact(patient_input: str) -> Redaction:
+        """Patient input with its identifiers replaced, when redaction is enabled"""
+        return redact(patient_input) if PHI_REDACTION_ENABLED else Redaction(patient_input)
+
+    def _request(self, stage: str, item: Dict[str, Any]) -> Dict[str, Any]:
+        task = self.tasks[stage]
+        llm = task.agent.llm
+        # The provider only ever sees the redacted input; earlier stages' answers were written from it
+        patient_input = self._redact(item['patient_input']).text
+        body = {
+            "model": llm.model,
+            "messages": render_messages(task, {"patient_input": patient_input}, item['context'])
+        }
+        body.update({field: getattr(llm, field) for field in REQUEST_FIELDS if getattr(llm, field, None) is not None})
+        return {"custom_id": item['patient_id'], "method": "POST", "url": BATCH_ENDPOINT, "body": body}
+
+    def _collect(self, run_id: str) -> int:
+        """Poll the run's open batches and store finished results"""
+        finished = 0
+        for batch in self.ledger.open_batches(run_id):
+            status, answers, errors = self._client(batch['provider']).poll(batch['batch_id'])
+            if status not in FINAL_BATCH_STATUSES:
+                self.ledger.update_batch(batch['batch_id'], status)
+                continue
+            self.ledger.complete_batch(batch['batch_id'], status, answers, errors, self.max_attempts)
+            if batch['stage'] == self.intake_stage:
+                self._gate_intakes(run_id, self.ledger.stage_outputs(run_id, self.intake_stage, list(answers)))
+            logger.info(
+                f"Batch {batch['batch_id']} ({batch['stage']}) {status}: "
+                f"{len(answers)} answered, {len(errors)} failed"
+            )
+            finished += 1
+        return finished
+
+    def _submit(self, run_id: str) -> int:
+        """Submit every stage item whose dependencies are done"""
+        submitted = 0
+        for stage, dependencies in self.dependencies.items():
+            self.ledger.skip_blocked(run_id, stage, dependencies)
+            provider = self.crew_factory.get_stage_llm_config(stage).get('provider')
+            while True:
+                items = self.ledger.ready(run_id, stage, dependencies, self.batch_max_requests)
+                if not items:
+                    break
+                requests = [self._request(stage, item) for item in items]
+                batch_id = self._client(provider).submit(requests, {"run_id": run_id, "stage": stage})
+                self.ledger.record_batch(batch_id, run_id, stage, provider, [item['patient_id'] for item in items])
+                logger.info(f"Submitted batch {batch_id} with {len(items)} {stage} requests")
+                submitted += len(items)
+        return submitted
+
+    def step(self, run_id: str) -> bool:
+        """
+        Collect finished batches and submit the stages that became ready.
+
+        Returns:
+            True while the run has unfinished items
+        """
+        self._collect(run_id)
+        self._submit(run_id)
+        if self.ledger.active(run_id):
+            return True
+        run = self.ledger.get_run(run_id)
+        if run['status'] != BulkLedger.COMPLETED:
+            path = self.export(run_id)
+            self.ledger.finish_run(run_id, path)
+            logger.info(f"Bulk run {run_id} finished, reports written to {path}")
+        return False
+
+    def run(self, run_id: str, poll_interval: float = BULK_POLL_INTERVAL) -> Path:
+        """
+        Step a run until every item is finished.
+
+        Returns:
+            Path of the final reports
+        """
+        while self.step(run_id):
+            time.sleep(poll_interval)
+        return Path(self.ledger.get_run(run_id)['output_path'])
+
+    def export(self, run_id: str) -> Path:
+        """
+        Write the final report of every patient as JSON lines.
+
+        Each line has 'patient_id', 'status' ('completed', 'needs_more_info'
+        or 'failed'), 'result' (the output stage's report), 'stages' (every
+        stage output) and 'error'.
+
+        Returns:
+            Path of the written file
+        """
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        path = self.output_dir / f"{run_id}.jsonl"
+        with open(path, 'w', encoding='utf-8') as f:
+            for patient_id, patient_input, items in self.ledger.patient_results(run_id):
+                # Redaction numbers placeholders the same way every time, so it is redone to restore them
+                redaction = self._redact(patient_input)
+                final = items.get(self.output_stage, {})
+                # The first stage that failed explains why the later ones were skipped
+                failed = [items[stage] for stage in self.dependencies if items[stage]['status'] == BulkLedger.FAILED]
+                if final.get('status') == BulkLedger.DONE:
+                    status, error = 'completed', None
+                elif failed:
+                    status, error = 'failed', failed[0]['error']
+                else:
+                    status, error = 'needs_more_info', None
+                f.write(json.dumps({
+                    "patient_id": patient_id,
+                    "status": status,
+                    "result": redaction.rehydrate(final.get('output')),
+                    "stages": {stage: redaction.rehydrate(items[stage]['output']) for stage in self.dependencies},
+                    "error": error
+                }) + "\n")
+        return path
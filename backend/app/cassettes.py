@@ -0,0 +1,421 @@
+"""
+LLM Cassettes
+Records LLM HTTP traffic to compressed cassette files and replays it
+
+A cassette is a gzip-compressed JSON Lines file with one record per LLM
+call: status, headers, and every response chunk with its arrival time,
+so streamed responses replay chunk by chunk. Recording and replaying
+are httpx transports that sit under the resilient transport in place of
+the network pool.
+
+Calls are matched on a hash of their request body. A call with no exact
+recording fails, since its prompt changed since recording. With strict
+matching off, it falls back to a recording made for the same model and
+agent (the first line of its system prompt) instead; the replayed
+response carries an 'x-cassette-match: fallback' header and is counted
+in the stats.
+"""
+
+import asyncio
+import atexit
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, List
+
+import httpx
+
+from backend.config import LLM_CASSETTE_PATH, LLM_CASSETTE_LATENCY_SCALE, LLM_CASSETTE_STRICT
+
+logger = logging.getLogger(__name__)
+
+CASSETTE_VERSION = 1
+
+# Response headers worth replaying
+KEPT_HEADERS = ('content-type', 'content-encoding')
+
+
+class CassetteMissError(LookupError):
+    """Raised when a replayed call has no matching recording"""
+
+
+def _estimate_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+def request_keys(body: bytes) -> Dict[str, Any]:
+    """
+    Matching keys of an LLM request.
+
+    Args:
+        body: Raw request body
+
+    Returns:
+        Dictionary with the exact 'key', the 'agent_key' fallback, the
+        'model' and the estimated 'prompt_tokens'
+    """
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError:
+        payload = {}
+    messages = payload.get('messages') or []
+    contents = [str(message.get('content', '')) for message in messages]
+    system = next(
+        (str(m.get('content', '')) for m in messages if m.get('role') == 'system'),
+        contents[0] if contents else ''
+    )
+    agent = (system.strip().splitlines() or [''])[0]
+    model = str(payload.get('model', ''))
+    return {
+        "key": hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest(),
+        "agent_key": hashlib.sha256(f"{model}\n{agent}".encode('utf-8')).hexdigest(),
+        "model": model,
+        "prompt_tokens": sum(_estimate_tokens(content) for content in contents)
+    }
+
+
+def encode_chunk(chunk: bytes) -> Any:
+    try:
+        return chunk.decode('utf-8')
+    except UnicodeDecodeError:
+        return {"b64": base64.b64encode(chunk).decode('ascii')}
+
+
+def decode_chunk(chunk: Any) -> bytes:
+    if isinstance(chunk, dict):
+        return base64.b64decode(chunk['b64'])
+    return chunk.encode('utf-8')
+
+
+def _completion_tokens(chunks: List[list]) -> int:
+    """Completion tokens reported in a recorded response (0 when unknown)"""
+    text = "".join(chunk if isinstance(chunk, str) else "" for _, chunk in chunks)
+    for line in reversed(text.splitlines() or [""]):
+        line = line.removeprefix("data:").strip()
+        if '"usage"' not in line:
+            continue
+        try:
+            usage = json.loads(line).get('usage') or {}
+        except ValueError:
+            continue
+        return int(usage.get('completion_tokens') or 0)
+    return 0
+
+
+class Cassette:
+    """Recorded LLM calls kept in memory and saved to a compressed file"""
+
+    def __init__(self, path: Path = LLM_CASSETTE_PATH, strict: bool = LLM_CASSETTE_STRICT):
+        """
+        Initialize the cassette, loading the file when it exists.
+
+        Args:
+            path: Cassette file (.jsonl.gz)
+            strict: Replay exact matches only; otherwise fall back to a
+                recording of the same model and agent
+        """
+        self.path = Path(path)
+        self.strict = strict
+        self.records: List[Dict[str, Any]] = []
+        self._by_key: Dict[str, List[int]] = {}
+        self._by_agent: Dict[str, List[int]] = {}
+        self._served: Dict[str, int] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+        if self.path.exists():
+            with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    record = json.loads(line)
+                    if 'version' not in record:
+                        self._index(record)
+
+    def _index(self, record: Dict[str, Any]):
+        position = len(self.records)
+        self.records.append(record)
+        self._by_key.setdefault(record['key'], []).append(position)
+        self._by_agent.setdefault(record['agent_key'], []).append(position)
+
+    def reset_stats(self):
+        """Reset the replay counters"""
+        with self._lock:
+            self.stats = {
+                "calls": 0, "exact": 0, "fallback": 0, "misses": 0,
+                "prompt_tokens": 0, "completion_tokens": 0
+            }
+
+    def add(self, record: Dict[str, Any]):
+        """Append a recorded call"""
+        with self._lock:
+            self._index(record)
+            self._dirty = True
+
+    def match(self, body: bytes) -> Dict[str, Any]:
+        """
+        Find the recording to replay for a request.
+
+        Identical requests are served their recordings in turn.
+
+        Args:
+            body: Raw request body
+
+        Returns:
+            Recorded call, with 'match' set to 'exact' or 'fallback'
+
+        Raises:
+            CassetteMissError: When nothing was recorded for the request, or
+                only a fallback was and matching is strict
+        """
+        keys = request_keys(body)
+        lookups = [("exact", self._by_key, keys['key'])]
+        if not self.strict:
+            lookups.append(("fallback", self._by_agent, keys['agent_key']))
+        with self._lock:
+            self.stats["calls"] += 1
+            self.stats["prompt_tokens"] += keys['prompt_tokens']
+            for kind, index, key in lookups:
+                positions = index.get(key)
+                if positions:
+                    served = self._served.get(kind + key, 0)
+                    self._served[kind + key] = served + 1
+                    record = self.records[positions[served % len(positions)]]
+                    self.stats[kind] += 1
+                    self.stats["completion_tokens"] += record.get('completion_tokens', 0)
+                    break
+            else:
+                record = None
+                self.stats["misses"] += 1
+                fallback = self.strict and keys['agent_key'] in self._by_agent
+        if record is None:
+            if fallback:
+                raise CassetteMissError(
+                    f"No exact recording for {keys['model'] or 'request'} in {self.path}; its prompt "
+                    f"changed since recording (set LLM_CASSETTE_STRICT=false to replay the agent's)"
+                )
+            raise CassetteMissError(f"No recording for {keys['model'] or 'request'} in {self.path}")
+        if kind == "fallback":
+            logger.warning(f"Replaying a fallback recording for {keys['model'] or 'request'}: prompt changed")
+        return {**record, "match": kind}
+
+    def save(self):
+        """Write the cassette if calls were recorded since it was loaded"""
+        with self._lock:
+            if not self._dirty:
+                return
+            records = list(self.records)
+            self._dirty = False
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(self.path.name + f".{os.getpid()}.tmp")
+        with gzip.open(temp_path, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps({"version": CASSETTE_VERSION, "created_at": time.time()}) + "\n")
+            for record in records:
+                f.write(json.dumps(record, separators=(',', ':')) + "\n")
+        os.replace(temp_path, self.path)
+        logger.info(f"Saved {len(records)} LLM calls to {self.path}")
+
+
+# ============================================================================
+# RECORDING
+# ============================================================================
+
+def _new_record(request: httpx.Request, response: httpx.Response, headers_after: float) -> Dict[str, Any]:
+    keys = request_keys(request.content)
+    return {
+        "key": keys['key'],
+        "agent_key": keys['agent_key'],
+        "model": keys['model'],
+        "path": request.url.path,
+        "status": response.status_code,
+        "headers": {name: response.headers[name] for name in KEPT_HEADERS if name in response.headers},
+        "headers_after": round(headers_after, 4),
+        "chunks": []
+    }
+
+
+def _finish_record(cassette: Cassette, record: Dict[str, Any]):
+    record["completion_tokens"] = _completion_tokens(record["chunks"])
+    cassette.add(record)
+
+
+class _RecordingStream(httpx.SyncByteStream):
+    def __init__(self, stream, cassette: Cassette, record: Dict[str, Any], start: float):
+        self._stream, self._cassette, self._record, self._start = stream, cassette, record, start
+
+    def __iter__(self):
+        for chunk in self._stream:
+            self._record["chunks"].append([round(time.perf_counter() - self._start, 4), encode_chunk(chunk)])
+            yield chunk
+
+    def close(self):
+        self._stream.close()
+        if self._record is not None:
+            _finish_record(self._cassette, self._record)
+            self._record = None
+
+
+class _AsyncRecordingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, cassette: Cassette, record: Dict[str, Any], start: float):
+        self._stream, self._cassette, self._record, self._start = stream, cassette, record, start
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._record["chunks"].append([round(time.perf_counter() - self._start, 4), encode_chunk(chunk)])
+            yield chunk
+
+    async def aclose(self):
+        await self._stream.aclose()
+        if self._record is not None:
+            _finish_record(self._cassette, self._record)
+            self._record = None
+
+
+class RecordingTransport(httpx.BaseTransport):
+    """Sync transport recording every call made through it"""
+
+    def __init__(self, transport: httpx.BaseTransport, cassette: Cassette):
+        """
+        Initialize the transport.
+
+        Args:
+            transport: Transport the calls really go to
+            cassette: Cassette to record into
+        """
+        self._transport = transport
+        self.cassette = cassette
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        response = self._transport.handle_request(request)
+        record = _new_record(request, response, time.perf_counter() - start)
+        response.stream = _RecordingStream(response.stream, self.cassette, record, start)
+        return response
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncRecordingTransport(httpx.AsyncBaseTransport):
+    """Async transport recording every call made through it"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, cassette: Cassette):
+        """
+        Initialize the transport.
+
+        Args:
+            transport: Transport the calls really go to
+            cassette: Cassette to record into
+        """
+        self._transport = transport
+        self.cassette = cassette
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        response = await self._transport.handle_async_request(request)
+        record = _new_record(request, response, time.perf_counter() - start)
+        response.stream = _AsyncRecordingStream(response.stream, self.cassette, record, start)
+        return response
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+# ============================================================================
+# REPLAY
+# ============================================================================
+
+class _ReplayStream(httpx.SyncByteStream):
+    def __init__(self, record: Dict[str, Any], start: float, latency_scale: float):
+        self._record, self._start, self._scale = record, start, latency_scale
+
+    def __iter__(self):
+        for offset, chunk in self._record["chunks"]:
+            delay = self._start + offset * self._scale - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            yield decode_chunk(chunk)
+
+
+class _AsyncReplayStream(httpx.AsyncByteStream):
+    def __init__(self, record: Dict[str, Any], start: float, latency_scale: float):
+        self._record, self._start, self._scale = record, start, latency_scale
+
+    async def __aiter__(self):
+        for offset, chunk in self._record["chunks"]:
+            delay = self._start + offset * self._scale - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            yield decode_chunk(chunk)
+
+
+class ReplayTransport(httpx.BaseTransport):
+    """Sync transport answering calls from a cassette instead of the network"""
+
+    def __init__(self, cassette: Cassette, latency_scale: float = LLM_CASSETTE_LATENCY_SCALE):
+        """
+        Initialize the transport.
+
+        Args:
+            cassette: Cassette to replay
+            latency_scale: Multiplier on the recorded timing (1 replays the
+                original latency, 0 answers as fast as possible)
+        """
+        self.cassette = cassette
+        self.latency_scale = latency_scale
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        record = self.cassette.match(request.read())
+        time.sleep(record["headers_after"] * self.latency_scale)
+        return httpx.Response(
+            record["status"],
+            headers={**record["headers"], "x-cassette-match": record["match"]},
+            stream=_ReplayStream(record, start, self.latency_scale),
+            request=request
+        )
+
+
+class AsyncReplayTransport(httpx.AsyncBaseTransport):
+    """Async transport answering calls from a cassette instead of the network"""
+
+    def __init__(self, cassette: Cassette, latency_scale: float = LLM_CASSETTE_LATENCY_SCALE):
+        """
+        Initialize the transport.
+
+        Args:
+            cassette: Cassette to replay
+            latency_scale: Multiplier on the recorded timing
+        """
+        self.cassette = cassette
+        self.latency_scale = latency_scale
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        start = time.perf_counter()
+        record = self.cassette.match(await request.aread())
+        await asyncio.sleep(record["headers_after"] * self.latency_scale)
+        return httpx.Response(
+            record["status"],
+            headers={**record["headers"], "x-cassette-match": record["match"]},
+            stream=_AsyncReplayStream(record, start, self.latency_scale),
+            request=request
+        )
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Cassette:
+    """Get the process-wide cassette, saved when the process exits"""
+    global _cassette
+    with _cassette_lock:
+        if _cassette is None:
+            _cassette = Cassette()
+            atexit.register(_cassette.save)
+        return _cassette
@@ -0,0 +1,230 @@
+"""
+Task Checkpoints
+Persists completed task outputs so analyses survive failures and restarts
+
+The patient input is stored only while an analysis is running, so that an
+interrupted analysis can be resumed; it is cleared when the analysis
+finishes. Finished analyses keep their input's hash and their stage
+outputs, which were written from the redacted input.
+"""
+
+import hashlib
+import time
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from .sqlite_store import SQLiteStore
+from backend.config import CHECKPOINT_DB_PATH, CHECKPOINT_RETENTION_HOURS
+
+
+def hash_text(text: str) -> str:
+    """Stable hash of a text value"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class CheckpointStore(SQLiteStore):
+    """SQLite store of completed task outputs, keyed by request id and prompt version"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS analyses (
+        request_id TEXT PRIMARY KEY,
+        prompt_version TEXT NOT NULL,
+        input_hash TEXT NOT NULL,
+        patient_input TEXT NOT NULL,
+        status TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS checkpoints (
+        request_id TEXT NOT NULL,
+        prompt_version TEXT NOT NULL,
+        task_name TEXT NOT NULL,
+        output TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        PRIMARY KEY (request_id, prompt_version, task_name)
+    );
+    CREATE INDEX IF NOT EXISTS idx_analyses_status ON analyses (status, updated_at);
+    """
+
+    RUNNING = 'running'
+    COMPLETED = 'completed'
+    NEEDS_MORE_INFO = 'needs_more_info'
+
+    def __init__(self, db_path: Path = CHECKPOINT_DB_PATH, retention_hours: float = CHECKPOINT_RETENTION_HOURS):
+        """
+        Initialize the checkpoint store.
+
+        Args:
+            db_path: SQLite database file
+            retention_hours: How long finished analyses stay available for retries
+        """
+        super().__init__(db_path)
+        self.retention_seconds = retention_hours * 3600
+
+    def start(self, request_id: str, prompt_version: str, patient_input: str):
+        """
+        Register an analysis before it runs.
+
+        Checkpoints are dropped if the request id is reused for a different input.
+
+        Args:
+            request_id: Request identifier
+            prompt_version: Version of the prompts the analysis runs with
+            patient_input: Patient's description of symptoms
+        """
+        input_hash = hash_text(patient_input)
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT input_hash FROM analyses WHERE request_id = ?", (request_id,)
+            ).fetchone()
+            if row is not None and row[0] != input_hash:
+                conn.execute("DELETE FROM checkpoints WHERE request_id = ?", (request_id,))
+            conn.execute(
+                "INSERT INTO analyses (request_id, prompt_version, input_hash, patient_input, status, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(request_id) DO UPDATE SET prompt_version = excluded.prompt_version, "
+                "input_hash = excluded.input_hash, patient_input = excluded.patient_input, "
+                "status = CASE WHEN analyses.input_hash = excluded.input_hash "
+                "AND analyses.prompt_version = excluded.prompt_version "
+                "THEN analyses.status ELSE excluded.status END, "
+                "updated_at = excluded.updated_at",
+                (request_id, prompt_version, input_hash, patient_input, self.RUNNING, time.time())
+            )
+
+    def load(self, request_id: str, prompt_version: str, patient_input: Optional[str] = None) -> Dict[str, str]:
+        """
+        Get the completed task outputs for a request.
+
+        Args:
+            request_id: Request identifier
+            prompt_version: Only checkpoints made with this prompt version are returned
+            patient_input: When given, nothing is returned if the request id
+                was last used for another input (start() drops those checkpoints)
+
+        Returns:
+            Task outputs keyed by task name (empty if none)
+        """
+        with self._connect() as conn:
+            if patient_input is not None:
+                row = conn.execute(
+                    "SELECT input_hash FROM analyses WHERE request_id = ?", (request_id,)
+                ).fetchone()
+                if row is not None and row[0] != hash_text(patient_input):
+                    return {}
+            rows = conn.execute(
+                "SELECT task_name, output FROM checkpoints "
+                "WHERE request_id = ? AND prompt_version = ? ORDER BY created_at",
+                (request_id, prompt_version)
+            ).fetchall()
+        return {task_name: output for task_name, output in rows}
+
+    def save(self, request_id: str, prompt_version: str, task_name: str, output: str):
+        """
+        Record a completed task output.
+
+        Args:
+            request_id: Request identifier
+            prompt_version: Version of the prompts the task ran with
+            task_name: Name of the completed task
+            output: Raw task output
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO checkpoints (request_id, prompt_version, task_name, output, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (request_id, prompt_version, task_name, output, time.time())
+            )
+
+    def complete(self, request_id: str, status: str = COMPLETED):
+        """
+        Mark an analysis finished and clear its stored patient input.
+
+        Its checkpoints are kept for the retention period so a client
+        retry gets the finished result without re-running anything.
+
+        Args:
+            request_id: Request identifier
+            status: COMPLETED, or NEEDS_MORE_INFO when the intake gate
+                stopped the analysis
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE analyses SET status = ?, patient_input = '', updated_at = ? WHERE request_id = ?",
+                (status, time.time(), request_id)
+            )
+
+    def get_analysis(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get an analysis record.
+
+        Args:
+            request_id: Request identifier
+
+        Returns:
+            Dictionary with 'prompt_version', 'patient_input' (empty once
+            finished) and 'status', or None
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT prompt_version, patient_input, status FROM analyses WHERE request_id = ?",
+                (request_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"prompt_version": row[0], "patient_input": row[1], "status": row[2]}
+
+    def list_incomplete(self, prompt_version: str) -> List[Dict[str, Any]]:
+        """
+        Analyses that started with this prompt version but never finished.
+
+        Args:
+            prompt_version: Current prompt version
+
+        Returns:
+            List of dictionaries with 'request_id' and 'patient_input'
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT request_id, patient_input FROM analyses "
+                "WHERE status = ? AND prompt_version = ? ORDER BY updated_at",
+                (self.RUNNING, prompt_version)
+            ).fetchall()
+        return [{"request_id": request_id, "patient_input": text} for request_id, text in rows]
+
+    def list_stage_outputs(self, task_name: str) -> List[Dict[str, Any]]:
+        """
+        Latest checkpointed output of one task for every stored analysis.
+
+        Args:
+            task_name: Task whose outputs to list (e.g. the intake task)
+
+        Returns:
+            List of dictionaries with 'request_id', 'patient_input' (empty
+            for finished analyses) and 'output'
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT a.request_id, a.patient_input, c.output FROM analyses a "
+                "JOIN checkpoints c ON c.request_id = a.request_id AND c.prompt_version = a.prompt_version "
+                "WHERE c.task_name = ? ORDER BY a.updated_at",
+                (task_name,)
+            ).fetchall()
+        return [
+            {"request_id": request_id, "patient_input": text, "output": output}
+            for request_id, text, output in rows
+        ]
+
+    def purge_expired(self) -> int:
+        """
+        Delete analyses (and their checkpoints) past the retention period.
+
+        Returns:
+            Number of analyses removed
+        """
+        cutoff = time.time() - self.retention_seconds
+        with self._connect() as conn:
+            expired = [row[0] for row in conn.execute(
+                "SELECT request_id FROM analyses WHERE updated_at < ?", (cutoff,)
+            )]
+            conn.executemany("DELETE FROM checkpoints WHERE request_id = ?", [(r,) for r in expired])
+            conn.executemany("DELETE FROM analyses WHERE request_id = ?", [(r,) for r in expired])
+        return len(expired)
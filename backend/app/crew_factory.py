@@ -5,15 +5,19 @@ Creates and configures the medical diagnostic crew with agents and tasks
 
 from crewai import Agent, Task, Crew, Process
 from crewai.tools import tool
-from typing import Dict, Any
+from typing import Dict, Any, List, Callable, Optional
 from pathlib import Path
 
 from .prompt_loader import PromptLoader
+from .llm_registry import LLMRegistry, get_llm_registry
+from .dag_executor import DAGExecutor, topological_order
 from backend.config import (
     CREW_MAX_RPM,
     CREW_VERBOSE,
     CREW_MEMORY_ENABLED,
-    PROMPTS_DIR
+    PIPELINE_MAX_PARALLELISM,
+    PROMPTS_DIR,
+    PROMPT_PROFILE
 )
 
 
@@ -57,6 +61,15 @@ def check_health_literacy(medical_text: str) -> str:
     return f"Checking health literacy of communication: {medical_text}"
 
 
+# Tools that pipeline.json nodes can reference by name
+TOOLS = {
+    'conduct_medical_interview': conduct_medical_interview,
+    'generate_differential_diagnosis': generate_differential_diagnosis,
+    'safety_check': safety_check,
+    'check_health_literacy': check_health_literacy,
+}
+
+
 # ============================================================================
 # CREW FACTORY
 # ============================================================================
@@ -64,14 +77,22 @@ def check_health_literacy(medical_text: str) -> str:
 class CrewFactory:
     """Factory for creating configured medical diagnostic crews"""
 
-    def __init__(self, prompts_dir: Path = PROMPTS_DIR):
+    def __init__(
+        self,
+        prompts_dir: Path = PROMPTS_DIR,
+        llm_registry: LLMRegistry = None,
+        profile: str = PROMPT_PROFILE
+    ):
         """
         Initialize the crew factory.
 
         Args:
             prompts_dir: Path to prompts directory
+            llm_registry: LLM provider registry (defaults to the shared registry)
+            profile: Prompt profile the agents and tasks are configured from
         """
-        self.prompt_loader = PromptLoader(prompts_dir)
+        self.prompt_loader = PromptLoader(prompts_dir, profile)
+        self.llm_registry = llm_registry or get_llm_registry()
 
     def create_agent(self, agent_name: str, tools: list = None) -> Agent:
         """
@@ -90,6 +111,7 @@ class CrewFactory:
             role=config['role'],
             goal=config['goal'],
             backstory=config['backstory'],
+            llm=self.llm_registry.create_llm(config.get('llm')),
             verbose=CREW_VERBOSE,
             allow_delegation=False,
             memory=CREW_MEMORY_ENABLED,
@@ -101,7 +123,8 @@ class CrewFactory:
         task_name: str,
         agent: Agent,
         context: list = None,
-        inputs: Dict[str, Any] = None
+        inputs: Dict[str, Any] = None,
+        name: str = None
     ) -> Task:
         """
         Create a task based on configuration.
@@ -111,6 +134,7 @@ class CrewFactory:
             agent: Agent to assign to this task
             context: List of tasks that provide context
             inputs: Input parameters for the task
+            name: Task name (defaults to task_name)
 
         Returns:
             Configured Task instance
@@ -118,70 +142,169 @@ class CrewFactory:
         config = self.prompt_loader.get_task_config(task_name)
 
         return Task(
+            name=name or task_name,
             description=config['description'],
             expected_output=config['expected_output'],
             agent=agent,
             context=context or []
         )
 
-    def create_medical_diagnostic_crew(self) -> Crew:
+    def _pipeline_nodes(self) -> Dict[str, Dict[str, Any]]:
+        """Nodes of pipeline.json keyed by name"""
+        return {node['name']: node for node in self.prompt_loader.load_pipeline()['nodes']}
+
+    def get_stage_names(self) -> List[str]:
         """
-        Create the complete medical diagnostic crew.
+        Get the pipeline's task names.
 
         Returns:
-            Configured Crew instance
+            Task names in an order where every task follows its dependencies
         """
-        # Create agents
-        intake_coordinator = self.create_agent(
-            'intake_coordinator',
-            tools=[conduct_medical_interview]
-        )
+        nodes = self._pipeline_nodes()
+        return topological_order({name: node.get('depends_on', []) for name, node in nodes.items()})
 
-        diagnostic_physician = self.create_agent(
-            'diagnostic_physician',
-            tools=[generate_differential_diagnosis, safety_check]
-        )
+    def get_output_stage(self) -> str:
+        """Name of the task whose output is the analysis result"""
+        return self.prompt_loader.load_pipeline().get('output') or self.get_stage_names()[-1]
 
-        communication_specialist = self.create_agent(
-            'communication_specialist',
-            tools=[check_health_literacy]
-        )
+    def get_intake_stage(self) -> Optional[str]:
+        """Name of the intake task (gated for completeness, updated by sessions)"""
+        return self.prompt_loader.load_pipeline().get('intake')
 
-        # Create tasks
-        interview_task = self.create_task(
-            'interview_task',
-            agent=intake_coordinator
-        )
+    def get_streaming_config(self) -> Optional[Dict[str, Any]]:
+        """The 'streaming' block of pipeline.json (source and target stage, drafted sections)"""
+        return self.prompt_loader.load_pipeline().get('streaming')
 
-        diagnosis_task = self.create_task(
-            'diagnosis_task',
-            agent=diagnostic_physician,
-            context=[interview_task]
-        )
+    def get_long_input_config(self) -> Optional[Dict[str, Any]]:
+        """The 'long_input' block of pipeline.json (chunked stage, extract and merge tasks)"""
+        return self.prompt_loader.load_pipeline().get('long_input')
 
-        communication_task = self.create_task(
-            'communication_task',
-            agent=communication_specialist,
-            context=[interview_task, diagnosis_task]
+    def get_validation_config(self) -> Optional[Dict[str, Any]]:
+        """The 'validation' block of pipeline.json (required sections per stage, regeneration task)"""
+        return self.prompt_loader.load_pipeline().get('validation')
+
+    def get_stage_llm_config(self, name: str) -> Dict[str, Any]:
+        """The 'llm' block of the agent that runs a stage (empty for the defaults)"""
+        agent = self._pipeline_nodes()[name]['agent']
+        return self.prompt_loader.get_agent_config(agent).get('llm') or {}
+
+    def get_stage_prompts(self, name: str) -> Dict[str, Any]:
+        """
+        Everything a stage's prompt is built from, without creating its agent.
+
+        Args:
+            name: Pipeline task name
+
+        Returns:
+            Dict with the stage's 'agent' and 'task' configurations, the
+            'task_name' the latter is loaded by, its 'tools' and the stages
+            it 'depends_on'
+        """
+        node = self._pipeline_nodes()[name]
+        return {
+            "agent": self.prompt_loader.get_agent_config(node['agent']),
+            "task": self.prompt_loader.get_task_config(node.get('task', name)),
+            "task_name": node.get('task', name),
+            "tools": [TOOLS[tool_name] for tool_name in node.get('tools', []) if tool_name in TOOLS],
+            "depends_on": node.get('depends_on', [])
+        }
+
+    def create_executor(self) -> DAGExecutor:
+        """
+        Create an executor for the pipeline graph.
+
+        Returns:
+            DAGExecutor with the graph's dependencies, parallelism limit
+            and per-node timeouts
+        """
+        pipeline = self.prompt_loader.load_pipeline()
+        nodes = self._pipeline_nodes()
+        return DAGExecutor(
+            {name: node.get('depends_on', []) for name, node in nodes.items()},
+            max_parallelism=pipeline.get('max_parallelism', PIPELINE_MAX_PARALLELISM),
+            timeouts={
+                name: node['timeout_seconds']
+                for name, node in nodes.items() if 'timeout_seconds' in node
+            }
         )
 
-        # Create and configure crew
-        crew = Crew(
-            agents=[
-                intake_coordinator,
-                diagnostic_physician,
-                communication_specialist
-            ],
-            tasks=[
-                interview_task,
-                diagnosis_task,
-                communication_task
-            ],
+    def create_medical_diagnostic_tasks(self, incremental: bool = False) -> Dict[str, Task]:
+        """
+        Create the agents and tasks of the pipeline declared in pipeline.json.
+
+        Every task gets its own agent so independent tasks can run at the
+        same time, and takes the tasks it depends on as context.
+
+        Args:
+            incremental: Use each node's 'incremental_task' configuration
+                where it has one (the intake becomes an update of a previous
+                intake report with {previous_intake} and {new_information})
+
+        Returns:
+            Tasks keyed by task name, dependencies first
+        """
+        nodes = self._pipeline_nodes()
+        tasks = {}
+
+        for name in self.get_stage_names():
+            node = nodes[name]
+            unknown = [tool_name for tool_name in node.get('tools', []) if tool_name not in TOOLS]
+            if unknown:
+                raise ValueError(f"Pipeline node '{name}' uses unknown tools: {', '.join(unknown)}")
+
+            agent = self.create_agent(node['agent'], tools=[TOOLS[t] for t in node.get('tools', [])])
+            task_name = node.get('task', name)
+            if incremental:
+                task_name = node.get('incremental_task', task_name)
+
+            tasks[name] = self.create_task(
+                task_name,
+                agent=agent,
+                context=[tasks[dep] for dep in node.get('depends_on', [])],
+                name=name
+            )
+
+        return tasks
+
+    def create_crew(self, tasks: List[Task], task_callback: Callable = None) -> Crew:
+        """
+        Create a sequential crew for the given tasks.
+
+        Tasks may take context from tasks outside the crew, as long as
+        those already carry an output (e.g. restored from a checkpoint).
+
+        Args:
+            tasks: Tasks to run, in order
+            task_callback: Called with each TaskOutput as its task completes
+
+        Returns:
+            Configured Crew instance
+        """
+        agents = []
+        for task in tasks:
+            if task.agent not in agents:
+                agents.append(task.agent)
+
+        return Crew(
+            agents=agents,
+            tasks=tasks,
             process=Process.sequential,
             memory=CREW_MEMORY_ENABLED,
             verbose=CREW_VERBOSE,
             max_rpm=CREW_MAX_RPM,
+            task_callback=task_callback,
             full_output=True
         )
 
-        return crew
+    def create_medical_diagnostic_crew(self) -> Crew:
+        """
+        Create the complete medical diagnostic crew.
+
+        The pipeline's tasks run sequentially in dependency order; use
+        create_executor() to run independent tasks in parallel.
+
+        Returns:
+            Configured Crew instance
+        """
+        tasks = self.create_medical_diagnostic_tasks()
+        return self.create_crew(list(tasks.values()))
@@ -0,0 +1,289 @@
+"""
+DAG Executor
+Runs pipeline nodes as soon as their dependencies finish, independent
+nodes in parallel
+
+Nodes are task names and edges their context dependencies. Running a
+node is delegated to a callable, so the executor knows nothing about
+CrewAI.
+
+A worker thread cannot be killed, so cancellation is cooperative: when a
+node times out or fails, the run's cancellation event is set and every
+node still running raises NodeCancelledError at its next check_cancelled()
+call (made before each LLM request and before a stage output is stored).
+The executor then waits up to cancel_grace seconds for those nodes to
+stop and names the ones that did not in the NodeTimeoutError.
+"""
+
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Callable, Awaitable, Iterable, Optional, Set
+
+from backend.config import PIPELINE_MAX_PARALLELISM, PIPELINE_NODE_TIMEOUT, PIPELINE_CANCEL_GRACE
+
+logger = logging.getLogger(__name__)
+
+# Cancellation event of the pipeline run the current node belongs to
+_cancelled: contextvars.ContextVar[Optional[threading.Event]] = contextvars.ContextVar(
+    'pipeline_cancelled', default=None
+)
+
+
+class NodeTimeoutError(TimeoutError):
+    """Raised when a pipeline node runs longer than its timeout"""
+
+    def __init__(self, message: str, abandoned: Iterable[str] = ()):
+        """
+        Args:
+            message: Error message
+            abandoned: Nodes still running after the cancel grace period
+        """
+        super().__init__(message)
+        self.abandoned = list(abandoned)
+
+
+class NodeCancelledError(RuntimeError):
+    """Raised inside a node whose pipeline run was cancelled"""
+
+
+def check_cancelled():
+    """Raise NodeCancelledError when the pipeline run of the calling node was cancelled"""
+    event = _cancelled.get()
+    if event is not None and event.is_set():
+        raise NodeCancelledError("Pipeline run was cancelled")
+
+
+def topological_order(dependencies: Dict[str, List[str]]) -> List[str]:
+    """
+    Order nodes so every node comes after its dependencies.
+
+    Ties keep declaration order.
+
+    Args:
+        dependencies: Dependencies of each node, in declaration order
+
+    Returns:
+        Node names in execution order
+
+    Raises:
+        ValueError: On unknown dependencies or cycles
+    """
+    for name, deps in dependencies.items():
+        unknown = [dep for dep in deps if dep not in dependencies]
+        if unknown:
+            raise ValueError(f"Node '{name}' depends on unknown nodes: {', '.join(unknown)}")
+
+    order, placed = [], set()
+    while len(order) < len(dependencies):
+        ready = [
+            name for name, deps in dependencies.items()
+            if name not in placed and all(dep in placed for dep in deps)
+        ]
+        if not ready:
+            cycle = [name for name in dependencies if name not in placed]
+            raise ValueError(f"Pipeline has a dependency cycle among: {', '.join(cycle)}")
+        order.extend(ready)
+        placed.update(ready)
+    return order
+
+
+class DAGExecutor:
+    """Schedules a dependency graph with a parallelism limit and per-node timeouts"""
+
+    def __init__(
+        self,
+        dependencies: Dict[str, List[str]],
+        max_parallelism: int = PIPELINE_MAX_PARALLELISM,
+        timeouts: Dict[str, float] = None,
+        default_timeout: float = PIPELINE_NODE_TIMEOUT,
+        cancel_grace: float = PIPELINE_CANCEL_GRACE
+    ):
+        """
+        Initialize the executor.
+
+        Args:
+            dependencies: Dependencies of each node
+            max_parallelism: Maximum nodes running at once
+            timeouts: Per-node timeouts in seconds
+            default_timeout: Timeout for nodes without their own
+            cancel_grace: Seconds to wait for running nodes to stop after
+                a timeout or failure
+        """
+        self.order = topological_order(dependencies)
+        self.dependencies = {name: list(dependencies[name]) for name in self.order}
+        self.max_parallelism = max(1, max_parallelism)
+        self.timeouts = timeouts or {}
+        self.default_timeout = default_timeout
+        self.cancel_grace = cancel_grace
+
+    def timeout(self, name: str) -> float:
+        """Timeout of a node in seconds"""
+        return self.timeouts.get(name, self.default_timeout)
+
+    def _ready(self, done: Set[str], started: Set[str]) -> List[str]:
+        return [
+            name for name in self.order
+            if name not in started and all(dep in done for dep in self.dependencies[name])
+        ]
+
+    def _timed_out(self, running: dict, abandoned: List[str]) -> NodeTimeoutError:
+        name = min(running.values(), key=lambda entry: entry[1])[0]
+        message = f"Pipeline node '{name}' timed out after {self.timeout(name)}s"
+        if abandoned:
+            message += f"; still running after cancellation: {', '.join(abandoned)}"
+        return NodeTimeoutError(message, abandoned)
+
+    @staticmethod
+    def _run_with(cancelled: threading.Event, run_node: Callable, name: str):
+        _cancelled.set(cancelled)
+        return run_node(name)
+
+    def _stop_running(self, running: dict, cancelled: threading.Event) -> List[str]:
+        """Cancel the running nodes and wait for them to stop; returns those that did not"""
+        cancelled.set()
+        if running:
+            wait(running, timeout=self.cancel_grace)
+        abandoned = [name for future, (name, _) in running.items() if not future.done()]
+        if abandoned:
+            logger.warning(f"Pipeline nodes still running after cancellation: {', '.join(abandoned)}")
+        return abandoned
+
+    async def _stop_running_async(self, running: dict, cancelled: threading.Event) -> List[str]:
+        """Async counterpart of _stop_running; the tasks are left to finish, not cancelled"""
+        cancelled.set()
+        if running:
+            await asyncio.wait(running, timeout=self.cancel_grace)
+        abandoned = [name for task, (name, _) in running.items() if not task.done()]
+        if abandoned:
+            logger.warning(f"Pipeline nodes still running after cancellation: {', '.join(abandoned)}")
+        return abandoned
+
+    def run(
+        self,
+        run_node: Callable[[str], None],
+        completed: Iterable[str] = (),
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> List[str]:
+        """
+        Run every node not already completed.
+
+        A node failure or timeout stops scheduling and cancels the nodes
+        still running (see check_cancelled), waiting up to cancel_grace
+        seconds for them to stop; the failure is then raised.
+
+        Args:
+            run_node: Runs one node given its name
+            completed: Nodes that already have an output
+            should_stop: Checked before scheduling more nodes; returning
+                True lets running nodes finish but starts no new ones
+
+        Returns:
+            Names of the nodes run, in completion order
+
+        Raises:
+            NodeTimeoutError: When a node timed out; 'abandoned' names the
+                nodes that had not stopped within the grace period
+        """
+        done = set(completed)
+        started = set(done)
+        finished = []
+        running = {}  # future -> (name, deadline)
+        cancelled = threading.Event()
+
+        pool = ThreadPoolExecutor(max_workers=self.max_parallelism, thread_name_prefix='pipeline-node')
+        try:
+            while True:
+                if not (should_stop and should_stop()):
+                    for name in self._ready(done, started)[:self.max_parallelism - len(running)]:
+                        logger.info(f"Starting pipeline node '{name}'")
+                        started.add(name)
+                        future = pool.submit(self._run_with, cancelled, run_node, name)
+                        running[future] = (name, time.monotonic() + self.timeout(name))
+                if not running:
+                    return finished
+
+                nearest = min(deadline for _, deadline in running.values())
+                complete, _ = wait(running, timeout=max(0.0, nearest - time.monotonic()), return_when=FIRST_COMPLETED)
+                if not complete:
+                    raise self._timed_out(running, self._stop_running(running, cancelled))
+
+                for future in complete:
+                    name, _ = running.pop(future)
+                    if future.exception() is not None:
+                        self._stop_running(running, cancelled)
+                    future.result()
+                    done.add(name)
+                    finished.append(name)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def run_async(
+        self,
+        run_node: Callable[[str], Awaitable[None]],
+        completed: Iterable[str] = (),
+        should_stop: Optional[Callable[[], bool]] = None
+    ) -> List[str]:
+        """
+        Async counterpart of run.
+
+        A failure or timeout sets the cancellation event and waits up to
+        cancel_grace seconds for the running tasks, including the work they
+        handed to threads, to stop at their next check_cancelled() call.
+        Tasks still running after that are cancelled, but their threads
+        cannot be, so they are named in the NodeTimeoutError.
+
+        Args:
+            run_node: Coroutine function running one node given its name
+            completed: Nodes that already have an output
+            should_stop: Checked before scheduling more nodes
+
+        Returns:
+            Names of the nodes run, in completion order
+
+        Raises:
+            NodeTimeoutError: When a node timed out; 'abandoned' names the
+                nodes that had not stopped within the grace period
+        """
+        done = set(completed)
+        started = set(done)
+        finished = []
+        running = {}  # asyncio task -> (name, deadline)
+        cancelled = threading.Event()
+        loop = asyncio.get_running_loop()
+
+        try:
+            while True:
+                if not (should_stop and should_stop()):
+                    for name in self._ready(done, started)[:self.max_parallelism - len(running)]:
+                        logger.info(f"Starting pipeline node '{name}'")
+                        started.add(name)
+                        # Each node's context (copied into its threads) carries the run's event
+                        context = contextvars.copy_context()
+                        context.run(_cancelled.set, cancelled)
+                        task = loop.create_task(run_node(name), context=context)
+                        running[task] = (name, time.monotonic() + self.timeout(name))
+                if not running:
+                    return finished
+
+                nearest = min(deadline for _, deadline in running.values())
+                complete, _ = await asyncio.wait(
+                    running, timeout=max(0.0, nearest - time.monotonic()), return_when=asyncio.FIRST_COMPLETED
+                )
+                if not complete:
+                    raise self._timed_out(running, await self._stop_running_async(running, cancelled))
+
+                for future in complete:
+                    name, _ = running.pop(future)
+                    if future.exception() is not None:
+                        await self._stop_running_async(running, cancelled)
+                    future.result()
+                    done.add(name)
+                    finished.append(name)
+        finally:
+            cancelled.set()
+            for future in running:
+                future.cancel()
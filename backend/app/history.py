@@ -0,0 +1,316 @@
+"""
+Analysis History
+Searchable record of every analysis, kept in SQLite with an FTS5 index
+
+Each finished analysis (completed, needing more information or failed)
+is stored with its input, final report, urgency level, prompt version,
+timing and token usage. Records are handed to a background writer that
+inserts them in batches, so recording never waits on the database.
+Listings page by keyset (the id of the last row seen) rather than by
+offset, so every page costs the same however deep it is, and rows
+written while paging do not shift later pages.
+"""
+
+import atexit
+import json
+import logging
+import queue
+import re
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from .sqlite_store import SQLiteStore
+from backend.config import (
+    HISTORY_DB_PATH,
+    HISTORY_BATCH_SIZE,
+    HISTORY_FLUSH_INTERVAL,
+    HISTORY_QUEUE_SIZE,
+    HISTORY_RETENTION_HOURS
+)
+
+logger = logging.getLogger(__name__)
+
+FAILED = 'failed'
+
+# "Urgency Level: Urgent" in the diagnostic report's safety assessment
+URGENCY = re.compile(r"urgency level\s*:\s*\**\s*(emergent|urgent|non[- ]?urgent)", re.IGNORECASE)
+PREVIEW_CHARS = 200
+
+COLUMNS = (
+    "request_id", "session_id", "created_at", "status", "urgency", "prompt_version",
+    "duration_seconds", "prompt_tokens", "completion_tokens", "patient_input", "report",
+    "error", "metadata"
+)
+LISTED = (
+    "id", "request_id", "session_id", "created_at", "status", "urgency", "prompt_version",
+    "duration_seconds", "prompt_tokens", "completion_tokens"
+)
+
+
+def parse_urgency(*reports: Optional[str]) -> Optional[str]:
+    """
+    Urgency level stated in the first report that states one.
+
+    Args:
+        reports: Report texts, most authoritative first (None is skipped)
+
+    Returns:
+        'emergent', 'urgent' or 'non-urgent', or None
+    """
+    for report in reports:
+        match = URGENCY.search(report or "")
+        if match:
+            level = match.group(1).lower()
+            return 'non-urgent' if level.startswith('non') else level
+    return None
+
+
+def search_query(text: str) -> Optional[str]:
+    """
+    FTS5 query matching rows that contain every word of a free-text search.
+
+    Words are quoted, so FTS5 operators and punctuation in the search are
+    taken literally; a trailing '*' on a word keeps its prefix match.
+
+    Args:
+        text: Search as typed
+
+    Returns:
+        FTS5 MATCH expression, or None when the search has no words
+    """
+    terms = []
+    for match in re.finditer(r"(\w+)(\*?)", text, re.UNICODE):
+        word, prefix = match.groups()
+        terms.append(f'"{word}"' + prefix)
+    return " ".join(terms) or None
+
+
+class HistoryStore(SQLiteStore):
+    """Analysis history with full-text search over inputs and reports, written in batches"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS history (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        request_id TEXT,
+        session_id TEXT,
+        created_at REAL NOT NULL,
+        status TEXT NOT NULL,
+        urgency TEXT,
+        prompt_version TEXT,
+        duration_seconds REAL,
+        prompt_tokens INTEGER,
+        completion_tokens INTEGER,
+        patient_input TEXT NOT NULL,
+        report TEXT,
+        error TEXT,
+        metadata TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_history_request ON history (request_id);
+    CREATE INDEX IF NOT EXISTS idx_history_created ON history (created_at);
+    CREATE INDEX IF NOT EXISTS idx_history_status ON history (status, id);
+    CREATE INDEX IF NOT EXISTS idx_history_urgency ON history (urgency, id);
+    CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5 (
+        patient_input, report, content='history', content_rowid='id', tokenize='porter unicode61'
+    );
+    CREATE TRIGGER IF NOT EXISTS history_fts_insert AFTER INSERT ON history BEGIN
+        INSERT INTO history_fts (rowid, patient_input, report)
+        VALUES (new.id, new.patient_input, new.report);
+    END;
+    CREATE TRIGGER IF NOT EXISTS history_fts_delete AFTER DELETE ON history BEGIN
+        INSERT INTO history_fts (history_fts, rowid, patient_input, report)
+        VALUES ('delete', old.id, old.patient_input, old.report);
+    END;
+    """
+
+    def __init__(
+        self,
+        db_path: Path = HISTORY_DB_PATH,
+        batch_size: int = HISTORY_BATCH_SIZE,
+        flush_interval: float = HISTORY_FLUSH_INTERVAL,
+        queue_size: int = HISTORY_QUEUE_SIZE,
+        retention_hours: float = HISTORY_RETENTION_HOURS
+    ):
+        """
+        Initialize the store and start its writer thread.
+
+        Args:
+            db_path: SQLite database file
+            batch_size: Most records written in one transaction
+            flush_interval: Seconds the writer waits to fill a batch
+            queue_size: Records that may wait for the writer; further
+                records are dropped (and logged) rather than block
+            retention_hours: How long records are kept; 0 keeps them forever
+        """
+        super().__init__(db_path)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retention_seconds = retention_hours * 3600
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.flush)
+
+    def record(
+        self,
+        patient_input: str,
+        response: Dict[str, Any],
+        stages: Dict[str, Optional[str]] = None
+    ):
+        """
+        Queue an analysis for the history; returns without touching the database.
+
+        Args:
+            patient_input: Patient's description of symptoms
+            response: The analysis response (success or failure)
+            stages: Raw stage outputs, searched for the urgency level when
+                the final report does not state it
+        """
+        metadata = response.get('metadata') or {}
+        usage = metadata.get('token_usage') or {}
+        report = response.get('result') if response.get('success') else None
+        row = (
+            metadata.get('request_id'),
+            metadata.get('session_id'),
+            time.time(),
+            response.get('status', FAILED) if response.get('success') else FAILED,
+            parse_urgency(report, *reversed(list((stages or {}).values()))),
+            metadata.get('prompt_version'),
+            metadata.get('duration_seconds'),
+            usage.get('prompt_tokens'),
+            usage.get('completion_tokens'),
+            patient_input or "",
+            report,
+            response.get('error'),
+            json.dumps(metadata, default=str)
+        )
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            logger.warning(f"History queue is full, dropped the record of {metadata.get('request_id')}")
+
+    def _write_loop(self):
+        """Writer thread: insert queued records in batches"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                with self._connect() as conn:
+                    conn.executemany(
+                        f"INSERT INTO history ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                        batch
+                    )
+            except Exception as e:
+                logger.error(f"Could not write {len(batch)} history records: {str(e)}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued record has been written"""
+        self._queue.join()
+
+    def list(
+        self,
+        query: str = None,
+        status: str = None,
+        urgency: str = None,
+        prompt_version: str = None,
+        before: int = None,
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """
+        Page through the history, newest first.
+
+        Args:
+            query: Free-text search over inputs and reports (every word must match)
+            status: Only records with this status
+            urgency: Only records with this urgency level
+            prompt_version: Only records produced with this prompt version
+            before: Cursor: only records older than this id (the previous
+                page's 'next_cursor')
+            limit: Records per page
+
+        Returns:
+            Dict with the page's 'items' and the 'next_cursor' (None on the
+            last page)
+        """
+        conditions, params = [], []
+        select = ", ".join(f"h.{column}" for column in LISTED)
+        source = "history h"
+        match = search_query(query) if query else None
+        if query and not match:
+            return {"items": [], "next_cursor": None}
+        if match:
+            select += ", snippet(history_fts, -1, '[', ']', '…', 16)"
+            source = "history_fts JOIN history h ON h.id = history_fts.rowid"
+            conditions.append("history_fts MATCH ?")
+            params.append(match)
+        else:
+            select += ", substr(h.patient_input, 1, ?)"
+            params.insert(0, PREVIEW_CHARS)
+        for column, value in (("status", status), ("urgency", urgency), ("prompt_version", prompt_version)):
+            if value:
+                conditions.append(f"h.{column} = ?")
+                params.append(value)
+        if before is not None:
+            conditions.append("h.id < ?")
+            params.append(before)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT {select} FROM {source} {where} ORDER BY h.id DESC LIMIT ?",
+                (*params, limit + 1)
+            ).fetchall()
+
+        items = []
+        for row in rows[:limit]:
+            item = dict(zip(LISTED, row))
+            item['created_at'] = datetime.fromtimestamp(item['created_at']).isoformat()
+            item['snippet' if match else 'input_preview'] = row[len(LISTED)]
+            items.append(item)
+        return {"items": items, "next_cursor": items[-1]['id'] if len(rows) > limit else None}
+
+    def get(self, history_id: int) -> Optional[Dict[str, Any]]:
+        """
+        One history record with its full input, report and metadata.
+
+        Args:
+            history_id: Record id, as listed
+
+        Returns:
+            The record as a dict, or None if unknown
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT id, {', '.join(COLUMNS)} FROM history WHERE id = ?", (history_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        record = dict(zip(("id", *COLUMNS), row))
+        record['created_at'] = datetime.fromtimestamp(record['created_at']).isoformat()
+        record['metadata'] = json.loads(record['metadata'])
+        return record
+
+    def purge_expired(self) -> int:
+        """
+        Delete records past the retention period.
+
+        Returns:
+            Number of records removed
+        """
+        if not self.retention_seconds:
+            return 0
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM history WHERE created_at < ?", (time.time() - self.retention_seconds,)
+            )
+        return cursor.rowcount
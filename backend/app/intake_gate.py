@@ -0,0 +1,164 @@
+"""
+Intake Completeness Gate
+Scores an intake report and decides whether diagnosis is worth running
+
+The intake report follows the sections of interview_task's expected
+output. Each field below is looked up in its section (or by its label)
+and counts towards the score unless it is empty or a placeholder such
+as "not provided".
+
+A report whose RED FLAGS IDENTIFIED section holds anything but "None" or
+a placeholder always passes the gate, however incomplete it is: warning
+signs must reach the diagnosis and the patient's emergency guidance
+rather than a request for more information.
+"""
+
+import re
+from typing import Dict, Any, List
+
+from backend.config import INTAKE_MIN_COMPLETENESS
+
+# (field, section header pattern, line label pattern, weight, follow-up question)
+# A field with a label is found on a "Label: value" line anywhere in the
+# report; a field without one is present when its section has content.
+INTAKE_FIELDS = [
+    ("demographics", r"DEMOGRAPHICS", None, 1.0,
+     "How old are you, and what is your sex?"),
+    ("chief_complaint", r"CHIEF COMPLAINT", None, 3.0,
+     "What is the main symptom or problem you need help with?"),
+    ("onset", None, r"onset", 1.5,
+     "When did the symptoms start, and did they begin suddenly or gradually?"),
+    ("provocation", None, r"provocation|aggravating|relieving", 0.5,
+     "Does anything make it better or worse?"),
+    ("quality", None, r"quality|character", 1.0,
+     "How would you describe the feeling (sharp, dull, burning, pressure)?"),
+    ("radiation", None, r"radiation|location", 0.5,
+     "Where exactly is it, and does it spread anywhere else?"),
+    ("severity", None, r"severity", 1.0,
+     "How bad is it on a scale of 1 to 10, and does it stop you doing daily activities?"),
+    ("timing", None, r"time|timing|duration|pattern", 1.0,
+     "Is it constant or does it come and go, and how long does each episode last?"),
+    ("associated_symptoms", None, r"associated", 0.5,
+     "Have you noticed any other symptoms at the same time?"),
+    ("medical_history", r"PAST MEDICAL HISTORY", None, 1.0,
+     "Do you have any ongoing medical conditions or past surgeries?"),
+    ("medications", None, r"(current )?medications?", 0.5,
+     "Which medications or supplements do you take?"),
+]
+
+FOLLOW_UP_SECTION = "FOLLOW-UP QUESTIONS"
+RED_FLAGS_SECTION = "RED FLAGS"
+# A "Red flags: ..." line written outside the section
+RED_FLAGS_LABEL = re.compile(r"^red flags?\b[^:]*:(?P<value>.*)$", re.IGNORECASE)
+
+HEADER = re.compile(r"^\s*#*\s*\**([A-Z][A-Z /&\-]{3,}?)\s*(\(.*\))?\**:?\s*$")
+PLACEHOLDER = re.compile(
+    r"^(none (provided|reported|mentioned|given|identified)"
+    r"|not (provided|reported|mentioned|specified|stated|available|documented|given|known)"
+    r"|unknown|unclear|n/?a|no information|missing|-|\[.*\])\.?$",
+    re.IGNORECASE
+)
+
+
+def _clean(line: str) -> str:
+    return line.strip().lstrip("-*•").strip()
+
+
+def _is_missing(value: str) -> bool:
+    value = value.strip()
+    return not value or bool(PLACEHOLDER.match(value))
+
+
+def _sections(report: str) -> Dict[str, List[str]]:
+    """Split a report into its upper-case sections"""
+    sections, current = {}, ""
+    for line in report.splitlines():
+        match = HEADER.match(line)
+        if match:
+            current = match.group(1).strip()
+            sections.setdefault(current, [])
+        elif _clean(line):
+            sections.setdefault(current, []).append(_clean(line))
+    return sections
+
+
+def _field_present(sections: Dict[str, List[str]], section: str, label: str) -> bool:
+    if label is None:
+        lines = [line for name, body in sections.items() if re.search(section, name) for line in body]
+        return any(not _is_missing(line.partition(":")[2] if ":" in line else line) for line in lines)
+
+    pattern = re.compile(rf"^({label})\b[^:]*:(?P<value>.*)$", re.IGNORECASE)
+    for body in sections.values():
+        for line in body:
+            match = pattern.match(line)
+            if match and not _is_missing(match.group('value')):
+                return True
+    return False
+
+
+def _red_flags(sections: Dict[str, List[str]]) -> List[str]:
+    """The warning signs the report lists, without 'None' and placeholders"""
+    values = [line for name, body in sections.items() if RED_FLAGS_SECTION in name for line in body]
+    values += [
+        match.group('value') for body in sections.values() for line in body
+        for match in [RED_FLAGS_LABEL.match(line)] if match
+    ]
+    return [
+        value.strip() for value in values
+        if not _is_missing(value) and value.strip().lower().rstrip(".") != "none"
+    ]
+
+
+def assess_intake(report: str, threshold: float = INTAKE_MIN_COMPLETENESS) -> Dict[str, Any]:
+    """
+    Score how complete an intake report is.
+
+    Args:
+        report: Raw intake report
+        threshold: Minimum score for the analysis to continue
+
+    Returns:
+        Dictionary with 'score' (0-1), 'sufficient' (always True when red
+        flags are listed), 'red_flags', 'missing_fields' and
+        'follow_up_questions' (the report's own questions, or generated
+        ones for the missing fields)
+    """
+    sections = _sections(report or "")
+    total = present = 0.0
+    missing, generated = [], []
+
+    for name, section, label, weight, question in INTAKE_FIELDS:
+        total += weight
+        if _field_present(sections, section, label):
+            present += weight
+        else:
+            missing.append(name)
+            generated.append(question)
+
+    score = round(present / total, 3)
+    asked = [
+        line for line in sections.get(FOLLOW_UP_SECTION, [])
+        if not _is_missing(line) and line.lower().rstrip(".") != "none"
+    ]
+
+    red_flags = _red_flags(sections)
+
+    return {
+        "score": score,
+        "sufficient": bool(red_flags) or (score >= threshold and "chief_complaint" not in missing),
+        "red_flags": red_flags,
+        "missing_fields": missing,
+        "follow_up_questions": asked or generated
+    }
+
+
+def format_follow_up(assessment: Dict[str, Any]) -> str:
+    """Patient-facing message asking the follow-up questions"""
+    questions = "\n".join(f"{i}. {q}" for i, q in enumerate(assessment["follow_up_questions"], 1))
+    return (
+        "We need a little more information before we can give you useful guidance.\n\n"
+        "Please answer these questions and submit your description again:\n\n"
+        f"{questions}\n\n"
+        "If you have severe or sudden symptoms, such as chest pain, trouble breathing "
+        "or fainting, call 911 or go to the nearest emergency room now."
+    )
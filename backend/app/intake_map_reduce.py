@@ -0,0 +1,319 @@
+"""
+Intake Map-Reduce
+Writes the intake report of a very long patient history chunk by chunk
+
+Discharge summaries and multi-visit histories can overflow the model's
+context, and a long input makes a long intake report, which every later
+stage receives as context. With INTAKE_MAP_REDUCE_ENABLED, inputs over
+INTAKE_MAP_REDUCE_THRESHOLD tokens are cut at paragraph and section
+boundaries into chunks of about INTAKE_CHUNK_TOKENS. The intake agent's LLM
+notes the intake facts of each chunk (the 'extract_task' of the
+'long_input' block in pipeline.json) on a thread pool, starting while later
+chunks are still being cut. When the notes together are still longer than
+INTAKE_MERGE_MAX_TOKENS, consecutive notes are condensed the same way. The
+'merge_task' then writes one compact intake report from the notes, in the
+intake task's usual format.
+"""
+
+import logging
+import math
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from crewai import Task
+from crewai.tasks.task_output import TaskOutput
+from crewai.utilities.string_utils import interpolate_only
+
+from .token_estimator import StageTimings, count_tokens, system_prompt
+from backend.config import (
+    INTAKE_MAP_REDUCE_THRESHOLD,
+    INTAKE_CHUNK_TOKENS,
+    INTAKE_CHUNK_CONCURRENCY,
+    INTAKE_EXTRACT_MAX_TOKENS,
+    INTAKE_MERGE_MAX_TOKENS
+)
+
+logger = logging.getLogger(__name__)
+
+# A line that opens a section of a clinical document: "## Labs",
+# "DISCHARGE MEDICATIONS", "Hospital Course:", "2024-03-01 follow-up visit"
+SECTION_START = re.compile(
+    r"^\s*(#+\s+\S.*"
+    r"|[A-Z][A-Z0-9 /&(),'-]{3,60}:?"
+    r"|[A-Z][A-Za-z0-9 /&(),'-]{2,60}:"
+    r"|\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}\b.{0,60})\s*$"
+)
+
+SENTENCE_END = re.compile(r"(?<=[.!?;])\s+")
+
+Notes = Tuple[str, str]
+
+
+def _blocks(text: str) -> Iterator[str]:
+    """Paragraphs of a text; a section heading starts a new one"""
+    lines: List[str] = []
+    for line in text.splitlines():
+        if not line.strip() or (lines and SECTION_START.match(line)):
+            if lines:
+                yield "\n".join(lines)
+            lines = [line] if line.strip() else []
+        else:
+            lines.append(line)
+    if lines:
+        yield "\n".join(lines)
+
+
+def _split_block(block: str, tokens: int, max_tokens: int) -> Iterator[Tuple[str, int]]:
+    """Pieces of a paragraph longer than a chunk: whole sentences, else runs of words"""
+    pieces = SENTENCE_END.split(block)
+    if len(pieces) == 1:
+        words = block.split()
+        size = math.ceil(len(words) / math.ceil(tokens / max_tokens))
+        for start in range(0, len(words), size):
+            piece = " ".join(words[start:start + size])
+            yield piece, count_tokens(piece)
+        return
+    for piece in pieces:
+        piece_tokens = count_tokens(piece)
+        if piece_tokens > max_tokens:
+            yield from _split_block(piece, piece_tokens, max_tokens)
+        else:
+            yield piece, piece_tokens
+
+
+def chunk_text(text: str, max_tokens: int) -> Iterator[str]:
+    """
+    Cut a text into chunks of at most about max_tokens tokens.
+
+    Chunks end at paragraph boundaries, and preferably before a section
+    heading once they are three quarters full. Paragraphs longer than a chunk are
+    cut between sentences.
+
+    Args:
+        text: Text to cut
+        max_tokens: Largest chunk
+
+    Yields:
+        Chunks in the order of the text, as soon as each is complete
+    """
+    chunk: List[str] = []
+    size = 0
+    for block in _blocks(text):
+        tokens = count_tokens(block)
+        pieces = [(block, tokens)] if tokens <= max_tokens else _split_block(block, tokens, max_tokens)
+        at_heading = bool(SECTION_START.match(block.split("\n", 1)[0]))
+        for piece, piece_tokens in pieces:
+            if chunk and (size + piece_tokens > max_tokens or (at_heading and size >= max_tokens * 3 / 4)):
+                yield "\n\n".join(chunk)
+                chunk, size = [], 0
+            chunk.append(piece)
+            size += piece_tokens
+            at_heading = False
+    if chunk:
+        yield "\n\n".join(chunk)
+
+
+def _listing(notes: List[Notes]) -> str:
+    return "\n\n".join(f"[{label}]\n{text}" for label, text in notes)
+
+
+def _groups(notes: List[Notes], max_tokens: int) -> List[List[Notes]]:
+    """Consecutive notes packed into groups of about max_tokens tokens"""
+    groups: List[List[Notes]] = []
+    size = 0
+    for label, text in notes:
+        tokens = count_tokens(text)
+        if not groups or size + tokens > max_tokens:
+            groups.append([])
+            size = 0
+        groups[-1].append((label, text))
+        size += tokens
+    return groups
+
+
+class IntakeMapReduce:
+    """Runs the intake stage of a long input as chunked extraction and a merge"""
+
+    def __init__(
+        self,
+        crew_factory,
+        config: Dict[str, Any],
+        threshold: int = INTAKE_MAP_REDUCE_THRESHOLD,
+        chunk_tokens: int = INTAKE_CHUNK_TOKENS,
+        concurrency: int = INTAKE_CHUNK_CONCURRENCY,
+        extract_max_tokens: int = INTAKE_EXTRACT_MAX_TOKENS,
+        merge_max_tokens: int = INTAKE_MERGE_MAX_TOKENS,
+        timings: StageTimings = None
+    ):
+        """
+        Initialize the map-reduce.
+
+        Args:
+            crew_factory: CrewFactory the tasks and crews are created with
+            config: 'long_input' block of pipeline.json
+            threshold: Input tokens above which the stage is chunked
+            chunk_tokens: Largest chunk
+            concurrency: Chunks extracted at the same time per analysis
+            extract_max_tokens: Completion limit of each extraction
+            merge_max_tokens: Largest notes total the merge is given at once
+            timings: Store the extraction calls are recorded in for estimates
+        """
+        self.crew_factory = crew_factory
+        self.stage = config['stage']
+        # Extraction calls are recorded in StageTimings under this name
+        self.extract_stage = f"{self.stage}:extract"
+        self.extract_config = crew_factory.prompt_loader.get_task_config(config['extract_task'])
+        self.merge_task = config['merge_task']
+        self.threshold = threshold
+        self.chunk_tokens = chunk_tokens
+        self.concurrency = concurrency
+        self.extract_max_tokens = extract_max_tokens
+        self.merge_max_tokens = merge_max_tokens
+        self.timings = timings or StageTimings()
+        self._overheads: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def applies(self, tasks: Dict[str, Task], name: str, inputs: Dict[str, Any]) -> bool:
+        """Whether a node about to run is the chunked stage, prompted with a long input"""
+        if name != self.stage or '{patient_input}' not in tasks[name].description:
+            return False
+        patient_input = inputs.get('patient_input') or ''
+        # No token is shorter than a character
+        return len(patient_input) > self.threshold and count_tokens(patient_input) > self.threshold
+
+    def _extract(self, llm_config: Dict[str, Any], system: str, part: str, excerpt: str) -> str:
+        """Note the intake facts of one chunk (or of a run of earlier notes)"""
+        # An LLM of its own per call, so its usage counts this call only
+        llm = self.crew_factory.llm_registry.create_llm(llm_config).model_copy(
+            update={"max_tokens": self.extract_max_tokens}
+        )
+        messages = [
+            {"role": "system", "content": system},
+            {"role": "user", "content": (
+                f"{interpolate_only(self.extract_config['description'], {'part': part, 'excerpt': excerpt})}\n\n"
+                f"This is the expected criteria for your final answer: {self.extract_config['expected_output']}"
+            )}
+        ]
+        start = time.perf_counter()
+        notes = str(llm.call(messages)).strip()
+        seconds = time.perf_counter() - start
+        usage = llm.get_token_usage_summary()
+        if usage.completion_tokens:
+            try:
+                rendered = sum(count_tokens(message['content']) for message in messages)
+                self.timings.record(self.extract_stage, seconds, rendered, usage.prompt_tokens, usage.completion_tokens)
+            except Exception as e:
+                logger.warning(f"Could not record timing of {self.extract_stage}: {str(e)}")
+        return notes
+
+    def run(self, tasks: Dict[str, Task], inputs: Dict[str, Any], task_callback=None):
+        """
+        Produce the stage's output from the chunks of the patient input.
+
+        Args:
+            tasks: Pipeline tasks keyed by name
+            inputs: Crew inputs, with the long 'patient_input'
+            task_callback: Called with the stage's output
+        """
+        task = tasks[self.stage]
+        agent = task.agent
+        llm_config = self.crew_factory.get_stage_llm_config(self.stage)
+        system = f"You are {agent.role}. {agent.backstory}\nYour personal goal is: {agent.goal}"
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="intake-extract") as pool:
+            # Chunks are submitted as the chunker yields them
+            futures = [
+                (f"PART {number}", pool.submit(self._extract, llm_config, system, f"part {number}", chunk))
+                for number, chunk in enumerate(chunk_text(inputs['patient_input'], self.chunk_tokens), start=1)
+            ]
+            notes = [(label, future.result()) for label, future in futures]
+            chunks = len(notes)
+
+            while len(notes) > 1 and count_tokens(_listing(notes)) > self.merge_max_tokens:
+                groups = _groups(notes, self.merge_max_tokens)
+                if len(groups) == len(notes):
+                    break
+                futures = []
+                for group in groups:
+                    first = group[0][0].split()[-1].split("-")[0]
+                    last = group[-1][0].split("-")[-1].split()[-1]
+                    label = f"PARTS {first}-{last}" if first != last else f"PART {first}"
+                    futures.append((label, pool.submit(self._extract, llm_config, system, label.lower(), _listing(group))))
+                notes = [(label, future.result()) for label, future in futures]
+
+        listing = _listing(notes)
+        logger.info(f"Noted {chunks} chunks of a long input in {count_tokens(listing)} tokens")
+
+        merge = self.crew_factory.create_task(self.merge_task, agent=agent, name=self.stage)
+        self.crew_factory.create_crew([merge]).kickoff(inputs={**inputs, "chunk_extracts": listing})
+        task.output = TaskOutput(name=self.stage, description=task.description, raw=merge.output.raw, agent=agent.role)
+        if task_callback:
+            task_callback(task.output)
+
+    def _prompt_overheads(self) -> Tuple[int, int]:
+        """Tokens of an extraction prompt without its excerpt and of the merge prompt without its notes"""
+        version = self.crew_factory.prompt_loader.get_prompt_version()
+        with self._lock:
+            if version in self._overheads:
+                return self._overheads[version]
+        stage = self.crew_factory.get_stage_prompts(self.stage)
+        merge = self.crew_factory.prompt_loader.get_task_config(self.merge_task)
+        extract = count_tokens(system_prompt(stage['agent'], [])) + count_tokens(
+            self.extract_config['description'] + self.extract_config['expected_output']
+        )
+        merged = count_tokens(system_prompt(stage['agent'], stage['tools'])) + count_tokens(
+            merge['description'].replace('{chunk_extracts}', '') + merge['expected_output']
+        )
+        with self._lock:
+            self._overheads = {version: (extract, merged)}
+        return extract, merged
+
+    def estimate(
+        self,
+        input_tokens: int,
+        completion_tokens: int,
+        tokens_per_second: float,
+        prefill_tokens_per_second: float
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Estimate the extraction calls for an input.
+
+        Args:
+            input_tokens: Tokens of the patient input
+            completion_tokens: Notes written per extraction call
+            tokens_per_second: Generation speed of the extraction calls
+            prefill_tokens_per_second: Prompt processing speed
+
+        Returns:
+            None below the threshold, else a dict with the extraction 'calls',
+            their 'prompt_tokens', 'completion_tokens' and 'latency_seconds',
+            and the 'merge_prompt_tokens' of the final merge
+        """
+        if input_tokens <= self.threshold:
+            return None
+        extract, merge = self._prompt_overheads()
+        calls = total_calls = math.ceil(input_tokens / self.chunk_tokens)
+        text = input_tokens
+        prompt = completion = latency = 0.0
+        while True:
+            prompt += calls * extract + text
+            completion += calls * completion_tokens
+            waves = math.ceil(calls / self.concurrency)
+            latency += waves * (
+                (extract + text / calls) / prefill_tokens_per_second + completion_tokens / tokens_per_second
+            )
+            text = calls * completion_tokens
+            if calls == 1 or text <= self.merge_max_tokens:
+                break
+            calls = math.ceil(text / self.merge_max_tokens)
+            total_calls += calls
+        return {
+            "calls": total_calls,
+            "prompt_tokens": round(prompt),
+            "completion_tokens": round(completion),
+            "latency_seconds": latency,
+            "merge_prompt_tokens": merge + text
+        }
@@ -0,0 +1,219 @@
+"""
+Job Queue
+Durable SQLite queue handing analyses from API processes to worker processes
+
+API processes enqueue jobs and poll for their results; workers lease a
+job, run it and store the result. A lease expires after the visibility
+timeout unless the worker extends it, so jobs of a crashed worker are
+delivered again (and resume from their checkpoints). Jobs that fail
+JOB_MAX_ATTEMPTS times are marked failed.
+
+A job's payload holds the patient input as submitted, so it is cleared
+once the job is done or has failed for good; only the result is kept
+for the retention period. Each job records the client that enqueued it,
+and only that client is shown its state and result.
+
+The database is in WAL mode, so any number of processes on the host can
+share it. WAL relies on shared memory, so every process must run on that
+one host: a database on a network filesystem is not supported.
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from .sqlite_store import SQLiteStore
+from backend.config import JOB_QUEUE_DB_PATH, JOB_MAX_ATTEMPTS, JOB_RETENTION_HOURS
+
+
+class JobQueue(SQLiteStore):
+    """SQLite queue of analysis jobs with leases and redelivery"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        client_id TEXT NOT NULL,
+        priority INTEGER NOT NULL,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker_id TEXT,
+        lease_expires_at REAL,
+        result TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, priority, created_at);
+    """
+
+    QUEUED = 'queued'
+    LEASED = 'leased'
+    DONE = 'done'
+    FAILED = 'failed'
+
+    def __init__(
+        self,
+        db_path: Path = JOB_QUEUE_DB_PATH,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+        retention_hours: float = JOB_RETENTION_HOURS
+    ):
+        """
+        Initialize the queue.
+
+        Args:
+            db_path: SQLite database file
+            max_attempts: Deliveries before a job is marked failed
+            retention_hours: How long finished jobs and their results are kept
+        """
+        super().__init__(db_path)
+        self.max_attempts = max_attempts
+        self.retention_seconds = retention_hours * 3600
+
+    def enqueue(self, job_id: str, kind: str, payload: Dict[str, Any], priority: int = 0, client_id: str = '') -> bool:
+        """
+        Add a job.
+
+        Args:
+            job_id: Job identifier (the analysis request id)
+            kind: Service call to make ('analyze' or 'append_to_session')
+            payload: Keyword arguments of the call
+            priority: Lower values are leased first
+            client_id: Client the job is run for
+
+        Returns:
+            False when a job with this id is already queued or running
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute("SELECT status FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+            if row is not None and row[0] in (self.QUEUED, self.LEASED):
+                return False
+            conn.execute(
+                "INSERT OR REPLACE INTO jobs (job_id, kind, payload, client_id, priority, status, attempts, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)",
+                (job_id, kind, json.dumps(payload), client_id, priority, self.QUEUED, now, now)
+            )
+        return True
+
+    def lease(self, worker_id: str, visibility_timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        Take the next ready job: queued, or leased by a worker whose lease expired.
+
+        Args:
+            worker_id: Identifier of the leasing worker
+            visibility_timeout: Seconds before the job is delivered again
+                unless the lease is extended
+
+        Returns:
+            Dictionary with 'job_id', 'kind', 'payload' and 'attempts', or
+            None when no job is ready
+        """
+        now = time.time()
+        with self._connect() as conn:
+            # Jobs whose lease expired too often are given up on
+            conn.execute(
+                "UPDATE jobs SET status = ?, payload = '{}', error = 'Lease expired too many times', updated_at = ? "
+                "WHERE status = ? AND lease_expires_at < ? AND attempts >= ?",
+                (self.FAILED, now, self.LEASED, now, self.max_attempts)
+            )
+            row = conn.execute(
+                "UPDATE jobs SET status = ?, worker_id = ?, lease_expires_at = ?, "
+                "attempts = attempts + 1, updated_at = ? "
+                "WHERE job_id = (SELECT job_id FROM jobs WHERE status = ? "
+                "OR (status = ? AND lease_expires_at < ?) ORDER BY priority, created_at LIMIT 1) "
+                "RETURNING job_id, kind, payload, attempts",
+                (self.LEASED, worker_id, now + visibility_timeout, now, self.QUEUED, self.LEASED, now)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"job_id": row[0], "kind": row[1], "payload": json.loads(row[2]), "attempts": row[3]}
+
+    def extend(self, job_id: str, worker_id: str, visibility_timeout: float) -> bool:
+        """
+        Extend a lease while the job is still running.
+
+        Returns:
+            False when the lease was lost to another worker
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires_at = ? WHERE job_id = ? AND worker_id = ? AND status = ?",
+                (time.time() + visibility_timeout, job_id, worker_id, self.LEASED)
+            )
+        return cursor.rowcount == 1
+
+    def complete(self, job_id: str, worker_id: str, result: Dict[str, Any]):
+        """Store a job's result and clear its payload"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, payload = '{}', result = ?, lease_expires_at = NULL, updated_at = ? "
+                "WHERE job_id = ? AND worker_id = ?",
+                (self.DONE, json.dumps(result), time.time(), job_id, worker_id)
+            )
+
+    def fail(self, job_id: str, worker_id: str, error: str):
+        """
+        Release a job after an error; it is retried until it runs out of
+        attempts, and its payload is cleared when it is marked failed.
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, "
+                "payload = CASE WHEN attempts >= ? THEN '{}' ELSE payload END, "
+                "error = ?, worker_id = NULL, lease_expires_at = NULL, updated_at = ? "
+                "WHERE job_id = ? AND worker_id = ?",
+                (self.max_attempts, self.FAILED, self.QUEUED, self.max_attempts,
+                 error, time.time(), job_id, worker_id)
+            )
+
+    def get(self, job_id: str, client_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Get a job's state.
+
+        Args:
+            job_id: Job identifier
+            client_id: When given, a job enqueued by another client is
+                reported as unknown
+
+        Returns:
+            Dictionary with 'job_id', 'status', 'attempts', 'result' (for
+            done jobs) and 'error', or None if the job is unknown
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT status, attempts, result, error, client_id FROM jobs WHERE job_id = ?", (job_id,)
+            ).fetchone()
+        if row is None or (client_id is not None and row[4] != client_id):
+            return None
+        status, attempts, result, error, _ = row
+        return {
+            "job_id": job_id,
+            "status": status,
+            "attempts": attempts,
+            "result": json.loads(result) if result else None,
+            "error": error
+        }
+
+    def stats(self) -> Dict[str, int]:
+        """Number of jobs in each status"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: 0 for status in (self.QUEUED, self.LEASED, self.DONE, self.FAILED)} | dict(rows)
+
+    def purge_expired(self) -> int:
+        """
+        Delete finished jobs older than the retention period.
+
+        Returns:
+            Number of jobs deleted
+        """
+        cutoff = time.time() - self.retention_seconds
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+                (self.DONE, self.FAILED, cutoff)
+            )
+        return cursor.rowcount
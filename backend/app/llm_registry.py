@@ -0,0 +1,303 @@
+"""
+LLM Provider Registry
+Shares one pooled HTTP client per provider and routes agents to models
+
+Retries happen in the resilient transport under each pool, so the SDK
+clients are created with max_retries=0 to avoid retrying twice. With
+LLM_CASSETTE_MODE set, the pool is recorded to or replaced by a cassette.
+"""
+
+import importlib.util
+import json
+import logging
+import os
+import threading
+from typing import Dict, Any, Optional
+
+import httpx
+from crewai import LLM
+from crewai.llms.providers.openai.completion import OpenAICompletion
+from openai import OpenAI, AsyncOpenAI
+
+from backend.config import (
+    OPENAI_API_KEY,
+    OPENAI_MODEL_NAME,
+    OPENAI_ORGANIZATION,
+    OPENAI_BASE_URL,
+    DEFAULT_LLM_PROVIDER,
+    LLM_REQUEST_TIMEOUT,
+    LLM_HTTP2_ENABLED,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_CASSETTE_MODE
+)
+from .resilience import ResilientTransport, AsyncResilientTransport, HEDGE_HEADER
+from .cassettes import (
+    RecordingTransport,
+    AsyncRecordingTransport,
+    ReplayTransport,
+    AsyncReplayTransport,
+    get_cassette
+)
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional 'h2' package (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+
+class LLMProvider:
+    """An OpenAI-compatible provider with shared, pooled HTTP clients"""
+
+    def __init__(
+        self,
+        name: str,
+        api_key: str,
+        base_url: str = None,
+        organization: str = None,
+        http2: bool = LLM_HTTP2_ENABLED,
+        max_connections: int = LLM_MAX_CONNECTIONS,
+        max_keepalive_connections: int = LLM_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry: float = LLM_KEEPALIVE_EXPIRY,
+        timeout: float = LLM_REQUEST_TIMEOUT
+    ):
+        """
+        Initialize the provider.
+
+        Args:
+            name: Provider name referenced from agent configuration
+            api_key: API key sent to the provider
+            base_url: Base URL of the OpenAI-compatible API (None for OpenAI)
+            organization: Optional OpenAI organization id
+            http2: Negotiate HTTP/2 when the 'h2' package is installed
+            max_connections: Maximum open connections in the pool
+            max_keepalive_connections: Idle connections kept alive for reuse
+            keepalive_expiry: Seconds an idle connection stays in the pool
+            timeout: Request timeout in seconds
+        """
+        self.name = name
+        self.api_key = api_key
+        self.base_url = base_url
+        self.organization = organization
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning(
+                f"HTTP/2 requested for provider '{name}' but 'h2' is not installed; "
+                "falling back to HTTP/1.1 keep-alive"
+            )
+
+        self._lock = threading.Lock()
+        self._client = None
+        self._async_client = None
+
+    def _client_params(self) -> Dict[str, Any]:
+        """Parameters shared by the sync and async SDK clients"""
+        params = {
+            "api_key": self.api_key,
+            "base_url": self.base_url,
+            "organization": self.organization,
+            "timeout": self.timeout,
+            "max_retries": 0
+        }
+        return {k: v for k, v in params.items() if v is not None}
+
+    def _network_transport(self) -> httpx.BaseTransport:
+        """Pooled transport, recorded to or replaced by the cassette when enabled"""
+        if LLM_CASSETTE_MODE == 'replay':
+            return ReplayTransport(get_cassette())
+        transport = httpx.HTTPTransport(http2=self.http2, limits=self.limits)
+        if LLM_CASSETTE_MODE == 'record':
+            return RecordingTransport(transport, get_cassette())
+        return transport
+
+    def _async_network_transport(self) -> httpx.AsyncBaseTransport:
+        """Async counterpart of _network_transport"""
+        if LLM_CASSETTE_MODE == 'replay':
+            return AsyncReplayTransport(get_cassette())
+        transport = httpx.AsyncHTTPTransport(http2=self.http2, limits=self.limits)
+        if LLM_CASSETTE_MODE == 'record':
+            return AsyncRecordingTransport(transport, get_cassette())
+        return transport
+
+    def get_client(self) -> OpenAI:
+        """Get the shared synchronous SDK client (created on first use)"""
+        with self._lock:
+            if self._client is None:
+                transport = ResilientTransport(self._network_transport(), provider=self.name)
+                http_client = httpx.Client(transport=transport, timeout=self.timeout)
+                self._client = OpenAI(http_client=http_client, **self._client_params())
+            return self._client
+
+    def get_async_client(self) -> AsyncOpenAI:
+        """Get the shared asynchronous SDK client (created on first use)"""
+        with self._lock:
+            if self._async_client is None:
+                transport = AsyncResilientTransport(self._async_network_transport(), provider=self.name)
+                http_client = httpx.AsyncClient(transport=transport, timeout=self.timeout)
+                self._async_client = AsyncOpenAI(http_client=http_client, **self._client_params())
+            return self._async_client
+
+    def close(self):
+        """Close the synchronous connection pool"""
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    async def aclose(self):
+        """Close the asynchronous connection pool"""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+
+
+class LLMRegistry:
+    """Registry of LLM providers and per-agent model routing"""
+
+    def __init__(self, default_provider: str = DEFAULT_LLM_PROVIDER):
+        """
+        Initialize the registry with the provider configured in settings.
+
+        Args:
+            default_provider: Provider used when an agent does not name one
+        """
+        self.default_provider = default_provider
+        self._providers: Dict[str, LLMProvider] = {}
+        self._templates: Dict[str, LLM] = {}
+        self._lock = threading.Lock()
+
+        self.register(LLMProvider(
+            'openai',
+            api_key=OPENAI_API_KEY,
+            base_url=OPENAI_BASE_URL,
+            organization=OPENAI_ORGANIZATION
+        ))
+
+    def register(self, provider: LLMProvider):
+        """
+        Register (or replace) a provider.
+
+        Args:
+            provider: Provider to register under its name
+        """
+        with self._lock:
+            previous = self._providers.get(provider.name)
+            self._providers[provider.name] = provider
+            self._templates.clear()
+        if previous is not None:
+            previous.close()
+
+    def get_provider(self, name: str = None) -> LLMProvider:
+        """
+        Get a provider by name.
+
+        Providers that were not registered explicitly are created from
+        LLM_PROVIDER_<NAME>_BASE_URL and LLM_PROVIDER_<NAME>_API_KEY.
+
+        Args:
+            name: Provider name (defaults to the registry default)
+
+        Returns:
+            The matching LLMProvider
+        """
+        name = name or self.default_provider
+        with self._lock:
+            provider = self._providers.get(name)
+        if provider is not None:
+            return provider
+
+        prefix = f"LLM_PROVIDER_{name.upper()}_"
+        base_url = os.getenv(prefix + 'BASE_URL')
+        if not base_url:
+            raise ValueError(
+                f"LLM provider '{name}' is not registered and "
+                f"{prefix}BASE_URL is not set"
+            )
+        provider = LLMProvider(name, api_key=os.getenv(prefix + 'API_KEY', ''), base_url=base_url)
+        with self._lock:
+            return self._providers.setdefault(name, provider)
+
+    def create_llm(self, llm_config: Optional[Dict[str, Any]] = None) -> LLM:
+        """
+        Create an LLM for an agent, backed by its provider's shared pool.
+
+        Constructing an LLM builds (and discards) a pair of SDK clients,
+        which costs tens of milliseconds of SSL setup. Each distinct
+        configuration is therefore built once and later calls return
+        cheap copies of it that share the pooled clients.
+
+        Args:
+            llm_config: Optional 'llm' block from agent_roles.json with
+                'provider', 'model', 'hedge_after_seconds' and any extra
+                LLM parameters
+
+        Returns:
+            Configured LLM instance
+        """
+        key = json.dumps(llm_config or {}, sort_keys=True, default=str)
+        with self._lock:
+            template = self._templates.get(key)
+        if template is None:
+            template = self._build_llm(dict(llm_config or {}))
+            with self._lock:
+                template = self._templates.setdefault(key, template)
+
+        llm = template.model_copy()
+        # Usage counters are per agent, not shared with the template
+        llm._token_usage = dict.fromkeys(template._token_usage, 0)
+        return llm
+
+    def _build_llm(self, llm_config: Dict[str, Any]) -> LLM:
+        provider = self.get_provider(llm_config.pop('provider', None))
+        model = llm_config.pop('model', OPENAI_MODEL_NAME)
+        hedge_after = llm_config.pop('hedge_after_seconds', None)
+
+        llm = LLM(
+            model=model,
+            provider='openai',
+            api_key=provider.api_key,
+            base_url=provider.base_url,
+            timeout=provider.timeout,
+            **llm_config
+        )
+
+        # Swap the per-instance SDK clients for the provider's pooled ones
+        if isinstance(llm, OpenAICompletion):
+            client = provider.get_client()
+            async_client = provider.get_async_client()
+            if hedge_after is not None:
+                headers = {HEDGE_HEADER: str(hedge_after)}
+                client = client.with_options(default_headers=headers)
+                async_client = async_client.with_options(default_headers=headers)
+            llm._client = client
+            llm._async_client = async_client
+
+        return llm
+
+    def close(self):
+        """Close every provider's connection pool"""
+        with self._lock:
+            providers = list(self._providers.values())
+        for provider in providers:
+            provider.close()
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_llm_registry() -> LLMRegistry:
+    """Get the process-wide LLM registry"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = LLMRegistry()
+        return _registry
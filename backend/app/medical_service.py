@@ -3,12 +3,47 @@ Medical Service
 Core business logic for symptom analysis
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Tuple
+import asyncio
 import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager, asynccontextmanager
 from datetime import datetime
 
+from crewai import Task
+from crewai.tasks.task_output import TaskOutput
+
 from .crew_factory import CrewFactory
-from backend.config import LOGS_DIR
+from .dag_executor import check_cancelled
+from .prompt_loader import available_profiles
+from .checkpoints import CheckpointStore
+from .sessions import SessionStore, diff_input
+from .intake_gate import assess_intake, format_follow_up
+from .stage_cache import StageCache, stage_key
+from .near_duplicates import NearDuplicateStore
+from .stage_pipelining import StagePipeline
+from .token_estimator import TokenEstimator, StageTimings
+from .intake_map_reduce import IntakeMapReduce
+from .history import HistoryStore
+from .audit_log import AuditSink
+from .phi_redaction import Redaction, redact
+from .output_validation import OutputValidator, ValidationMetrics
+from backend.config import (
+    LOGS_DIR,
+    STAGE_MAX_RETRIES,
+    STORE_PURGE_INTERVAL,
+    INTAKE_GATE_ENABLED,
+    STAGE_CACHE_ENABLED,
+    NEAR_DUPLICATE_MODE,
+    PIPELINE_STREAMING,
+    INTAKE_MAP_REDUCE_ENABLED,
+    HISTORY_ENABLED,
+    AUDIT_ENABLED,
+    PHI_REDACTION_ENABLED,
+    OUTPUT_VALIDATION_ENABLED
+)
 
 # Configure logging
 logging.basicConfig(
@@ -23,70 +58,1123 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+class PromptProfile:
+    """A prompt profile's crew factory and the components built from its prompts"""
+
+    def __init__(
+        self,
+        crew_factory: CrewFactory,
+        timings: StageTimings = None,
+        validation_metrics: ValidationMetrics = None
+    ):
+        """
+        Args:
+            crew_factory: CrewFactory configured with the profile
+            timings: Store of recorded stage runs, shared between profiles
+            validation_metrics: Output validation counts, shared between profiles
+        """
+        self.name = crew_factory.prompt_loader.profile
+        self.crew_factory = crew_factory
+        streaming = crew_factory.get_streaming_config() if PIPELINE_STREAMING else None
+        self.stage_pipeline = StagePipeline(crew_factory, streaming) if streaming else None
+        long_input = crew_factory.get_long_input_config() if INTAKE_MAP_REDUCE_ENABLED else None
+        self.intake_map_reduce = IntakeMapReduce(crew_factory, long_input) if long_input else None
+        self.estimator = TokenEstimator(crew_factory, timings=timings, map_reduce=self.intake_map_reduce)
+        validation = crew_factory.get_validation_config() if OUTPUT_VALIDATION_ENABLED else None
+        self.validator = OutputValidator(crew_factory, validation, validation_metrics) if validation else None
+
+
 class MedicalService:
     """Service for analyzing patient symptoms"""
 
     def __init__(self):
         """Initialize the medical service"""
-        self.crew_factory = CrewFactory()
+        self.validation_metrics = ValidationMetrics()
+        # The deployment's prompt profile; requests may pick another one
+        profile = PromptProfile(CrewFactory(), validation_metrics=self.validation_metrics)
+        self.crew_factory = profile.crew_factory
+        self.stage_pipeline = profile.stage_pipeline
+        self.intake_map_reduce = profile.intake_map_reduce
+        self.estimator = profile.estimator
+        self._profiles = {profile.name: profile}
+        self._profiles_lock = threading.Lock()
+        self.checkpoints = CheckpointStore()
+        self.sessions = SessionStore()
+        self.stage_cache = StageCache()
+        self.near_duplicates = NearDuplicateStore()
+        self.history = HistoryStore() if HISTORY_ENABLED else None
+        self.audit = AuditSink() if AUDIT_ENABLED else None
+        self._request_locks = {}
+        self._request_locks_guard = threading.Lock()
+        self._async_request_locks = {}
         logger.info("Medical Service initialized")
 
-    def analyze_symptoms(self, patient_input: str) -> Dict[str, Any]:
+    def _get_profile(self, name: Optional[str] = None) -> PromptProfile:
+        """
+        Get a prompt profile, set up on first use.
+
+        Args:
+            name: Profile name; None for the deployment's profile
+
+        Returns:
+            The PromptProfile
+
+        Raises:
+            ValueError: If the profile does not exist
+        """
+        name = name or self.crew_factory.prompt_loader.profile
+        with self._profiles_lock:
+            if name not in self._profiles:
+                crew_factory = CrewFactory(
+                    self.crew_factory.prompt_loader.prompts_dir, self.crew_factory.llm_registry, profile=name
+                )
+                self._profiles[name] = PromptProfile(crew_factory, self.estimator.timings, self.validation_metrics)
+            return self._profiles[name]
+
+    def prompt_profiles(self) -> List[str]:
+        """Names of the prompt profiles requests can pick"""
+        return available_profiles(self.crew_factory.prompt_loader.prompts_dir)
+
+    @contextmanager
+    def _request_lock(self, request_id: str):
+        """Serialize concurrent runs of the same request id"""
+        with self._request_locks_guard:
+            entry = self._request_locks.setdefault(request_id, [threading.Lock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._request_locks_guard:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._request_locks[request_id]
+
+    @asynccontextmanager
+    async def _async_request_lock(self, request_id: str):
+        """Serialize concurrent async runs of the same request id"""
+        entry = self._async_request_locks.setdefault(request_id, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._async_request_locks[request_id]
+
+    def _restore_completed(self, tasks: Dict[str, Task], completed: Dict[str, str]) -> List[Task]:
+        """
+        Attach checkpointed outputs to their tasks.
+
+        Args:
+            tasks: Pipeline tasks keyed by name
+            completed: Checkpointed raw outputs keyed by task name
+
+        Returns:
+            Tasks that still have to run, in order
+        """
+        pending = []
+        for name, task in tasks.items():
+            if name in completed:
+                task.output = TaskOutput(
+                    name=name,
+                    description=task.description,
+                    raw=completed[name],
+                    agent=task.agent.role
+                )
+            else:
+                pending.append(task)
+        return pending
+
+    def _intake_sufficient(self, tasks: Dict[str, Task]) -> bool:
+        """Whether the intake task leaves enough to diagnose"""
+        intake = tasks.get(self.crew_factory.get_intake_stage())
+        if not INTAKE_GATE_ENABLED or intake is None or intake.output is None:
+            return True
+        return assess_intake(intake.output.raw)['sufficient']
+
+    def _restore_cached(self, name: str, task: Task, cached_output: Optional[str], task_callback=None) -> bool:
+        """
+        Attach a stage cache hit to a task about to run.
+
+        Args:
+            name: Task name
+            task: Task about to run
+            cached_output: Output found in the stage cache, None on a miss
+            task_callback: Called with the restored output, as if the task ran
+
+        Returns:
+            True when the task no longer has to run
+        """
+        if cached_output is None:
+            return False
+        logger.info(f"Stage cache hit for {name}")
+        task.output = TaskOutput(name=name, description=task.description, raw=cached_output, agent=task.agent.role)
+        if task_callback:
+            task_callback(task.output)
+        return True
+
+    def _run_tasks(
+        self,
+        tasks: Dict[str, Task],
+        inputs: Dict[str, Any],
+        task_callback=None,
+        profile: PromptProfile = None,
+        validation: Dict[str, Any] = None
+    ) -> List[str]:
+        """
+        Run the tasks without an output through the pipeline executor.
+
+        Each task runs in a crew of its own as soon as the tasks it depends
+        on have finished, so independent tasks run in parallel. Nothing new
+        is started once the intake turns out to be too incomplete. Tasks
+        whose prompt, model and context match an earlier run take their
+        output from the stage cache instead of calling the LLM. With
+        PIPELINE_STREAMING on, the streaming source stage and its target
+        run together through the stage pipeline. The intake of a very long
+        input is written chunk by chunk through the intake map-reduce.
+        Reports with a missing or malformed required section get that
+        section regenerated before later tasks read them.
+
+        Args:
+            tasks: Pipeline tasks keyed by name
+            inputs: Crew inputs used to interpolate the task descriptions
+            task_callback: Called with each finished task's output
+            profile: Prompt profile the tasks were created with (the deployment's by default)
+            validation: Filled with the output validation outcome of each stage that ran
+
+        Returns:
+            Names of the tasks served from the stage cache
+        """
+        profile = profile or self._get_profile()
+        cached = []
+
+        def run_node(name: str):
+            task = tasks[name]
+            if task.output is not None:
+                # Already written by the stage pipeline
+                return
+            key = stage_key(task, inputs) if STAGE_CACHE_ENABLED else None
+            if key and self._restore_cached(name, task, self.stage_cache.get(key), task_callback):
+                cached.append(name)
+                return
+            if profile.stage_pipeline and profile.stage_pipeline.applies(tasks, name):
+                profile.stage_pipeline.run(tasks, inputs, task_callback=task_callback)
+                self._validate_output(profile, tasks, profile.stage_pipeline.target, task_callback, validation)
+                self._cache_pipelined(tasks, inputs, profile.stage_pipeline.target)
+            elif profile.intake_map_reduce and profile.intake_map_reduce.applies(tasks, name, inputs):
+                profile.intake_map_reduce.run(tasks, inputs, task_callback=task_callback)
+            else:
+                crew = self.crew_factory.create_crew([task], task_callback=task_callback)
+                start = time.perf_counter()
+                crew.kickoff(inputs=inputs)
+                self._observe_stage(task, inputs, time.perf_counter() - start, crew)
+            check_cancelled()
+            self._validate_output(profile, tasks, name, task_callback, validation)
+            if key:
+                self.stage_cache.put(key, name, task.output.raw)
+
+        self.crew_factory.create_executor().run(
+            run_node,
+            completed=[name for name, task in tasks.items() if task.output is not None],
+            should_stop=lambda: not self._intake_sufficient(tasks)
+        )
+        return cached
+
+    async def _run_tasks_async(
+        self,
+        tasks: Dict[str, Task],
+        inputs: Dict[str, Any],
+        task_callback=None,
+        profile: PromptProfile = None,
+        validation: Dict[str, Any] = None
+    ) -> List[str]:
+        """
+        Async counterpart of _run_tasks using the crew's native async kickoff.
+
+        Args:
+            tasks: Pipeline tasks keyed by name
+            inputs: Crew inputs used to interpolate the task descriptions
+            task_callback: Called with each finished task's output
+            profile: Prompt profile the tasks were created with (the deployment's by default)
+            validation: Filled with the output validation outcome of each stage that ran
+
+        Returns:
+            Names of the tasks served from the stage cache
+        """
+        profile = profile or self._get_profile()
+        cached = []
+
+        async def run_node(name: str):
+            task = tasks[name]
+            if task.output is not None:
+                # Already written by the stage pipeline
+                return
+            key = stage_key(task, inputs) if STAGE_CACHE_ENABLED else None
+            if key:
+                cached_output = await asyncio.to_thread(self.stage_cache.get, key)
+                if self._restore_cached(name, task, cached_output, task_callback):
+                    cached.append(name)
+                    return
+            if profile.stage_pipeline and profile.stage_pipeline.applies(tasks, name):
+                # Streaming and drafting run on threads of their own
+                await asyncio.to_thread(profile.stage_pipeline.run, tasks, inputs, task_callback)
+                await asyncio.to_thread(
+                    self._validate_output, profile, tasks, profile.stage_pipeline.target, task_callback, validation
+                )
+                await asyncio.to_thread(self._cache_pipelined, tasks, inputs, profile.stage_pipeline.target)
+            elif profile.intake_map_reduce and profile.intake_map_reduce.applies(tasks, name, inputs):
+                # Chunk extractions run on threads of their own
+                await asyncio.to_thread(profile.intake_map_reduce.run, tasks, inputs, task_callback)
+            else:
+                crew = self.crew_factory.create_crew([task], task_callback=task_callback)
+                # akickoff is CrewAI's native async path; older releases only
+                # offer kickoff_async
+                kickoff = getattr(crew, 'akickoff', None) or crew.kickoff_async
+                start = time.perf_counter()
+                await kickoff(inputs=inputs)
+                await asyncio.to_thread(self._observe_stage, task, inputs, time.perf_counter() - start, crew)
+            check_cancelled()
+            await asyncio.to_thread(self._validate_output, profile, tasks, name, task_callback, validation)
+            if key:
+                await asyncio.to_thread(self.stage_cache.put, key, name, task.output.raw)
+
+        await self.crew_factory.create_executor().run_async(
+            run_node,
+            completed=[name for name, task in tasks.items() if task.output is not None],
+            should_stop=lambda: not self._intake_sufficient(tasks)
+        )
+        return cached
+
+    def _observe_stage(self, task: Task, inputs: Dict[str, Any], seconds: float, crew):
+        """Record a stage's duration and token usage for the pre-flight estimates"""
+        try:
+            self.estimator.observe(task, inputs, seconds, crew.usage_metrics)
+        except Exception as e:
+            logger.warning(f"Could not record timing of {task.name}: {str(e)}")
+
+    def _validate_output(
+        self,
+        profile: PromptProfile,
+        tasks: Dict[str, Task],
+        name: str,
+        task_callback=None,
+        validation: Dict[str, Any] = None
+    ):
+        """Check a finished stage's report and regenerate its missing or malformed sections"""
+        task = tasks[name]
+        if not profile.validator or not profile.validator.applies(name) or task.output is None:
+            return
+        try:
+            outcome = profile.validator.repair(name, task, task_callback)
+        except Exception as e:
+            logger.warning(f"Could not validate the output of {name}: {str(e)}")
+            return
+        if validation is not None:
+            validation[name] = {
+                "valid": not outcome['unresolved'],
+                "problems": outcome['problems'],
+                "regenerated": outcome['regenerated']
+            }
+
+    def _cache_pipelined(self, tasks: Dict[str, Task], inputs: Dict[str, Any], target_name: str):
+        """Store the stage pipeline's target output under the target's own cache key"""
+        if STAGE_CACHE_ENABLED:
+            target = tasks[target_name]
+            self.stage_cache.put(stage_key(target, inputs), target.name, target.output.raw)
+
+    def _stage_outputs(self, tasks: Dict[str, Task], run_id: str) -> Dict[str, Optional[str]]:
+        """Raw output of every task keyed by task name (None when skipped)"""
+        stages = {name: task.output.raw if task.output else None for name, task in tasks.items()}
+        skipped = [name for name, raw in stages.items() if raw is None]
+        if skipped:
+            logger.info(f"Intake for {run_id} is incomplete, skipped: {', '.join(skipped)}")
+        return stages
+
+    def _analysis_status(self, stages: Dict[str, Optional[str]]) -> str:
+        """Final checkpoint status for a pipeline run"""
+        if None in stages.values():
+            return CheckpointStore.NEEDS_MORE_INFO
+        return CheckpointStore.COMPLETED
+
+    def _add_token_usage(self, usage: Dict[str, int], tasks: Dict[str, Task]) -> Dict[str, int]:
+        """Add the tokens the tasks' agents used to a running total"""
+        for task in tasks.values():
+            summary = task.agent.llm.get_token_usage_summary()
+            usage["prompt_tokens"] += summary.prompt_tokens
+            usage["completion_tokens"] += summary.completion_tokens
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        return usage
+
+    def _redact(self, patient_input: str) -> Redaction:
+        """Patient input with its identifiers replaced, when redaction is enabled"""
+        return redact(patient_input) if PHI_REDACTION_ENABLED else Redaction(patient_input)
+
+    def _rehydrate(self, response: Dict[str, Any], redaction: Redaction):
+        """Put the identifiers back into a response and count what was redacted"""
+        if redaction.originals:
+            redaction.rehydrate_response(response)
+            response["metadata"]["phi_redacted"] = redaction.counts()
+
+    def _record_analysis(self, patient_input: str, response: Dict[str, Any], stages: Dict[str, Optional[str]] = None):
+        """Queue an analysis for the history store and the audit log (neither waits for a write)"""
+        if self.history:
+            self.history.record(patient_input, response, stages)
+        if self.audit:
+            metadata = response.get('metadata') or {}
+            self.audit.write(
+                'analysis',
+                request_id=metadata.get('request_id'),
+                session_id=metadata.get('session_id'),
+                prompt_version=metadata.get('prompt_version'),
+                status=response.get('status') if response.get('success') else 'failed',
+                patient_input=patient_input,
+                stages={name: raw for name, raw in (stages or {}).items() if raw is not None},
+                result=response.get('result'),
+                error=response.get('error'),
+                metadata=metadata
+            )
+
+    def _run_pipeline(
+        self,
+        patient_input: str,
+        request_id: str,
+        prompt_version: str,
+        profile: PromptProfile
+    ) -> Tuple[Dict[str, Optional[str]], List[str], Dict[str, int], Dict[str, Any]]:
+        """
+        Run the pipeline, resuming after the last checkpointed task.
+
+        A failed stage is retried up to STAGE_MAX_RETRIES times; each retry
+        starts at the failed task instead of re-running completed ones. A
+        timed-out stage is only retried once every node of the attempt has
+        stopped.
+
+        Args:
+            patient_input: Patient's description of symptoms
+            request_id: Request identifier used for checkpoints
+            prompt_version: Prompt version the checkpoints are keyed by
+            profile: Prompt profile the tasks are created with
+
+        Returns:
+            Raw output of every task keyed by task name, in order (None for
+            stages skipped by the intake gate), the names of the tasks
+            served from the stage cache, the tokens the agents used
+            (failed attempts included) and the output validation outcome of
+            each validated stage
+        """
+        def checkpoint(output: TaskOutput):
+            # A cancelled node must not store an output the retry is about to write
+            check_cancelled()
+            self.checkpoints.save(request_id, prompt_version, output.name, output.raw)
+
+        cached = []
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        validation = {}
+        for attempt in range(STAGE_MAX_RETRIES + 1):
+            tasks = profile.crew_factory.create_medical_diagnostic_tasks()
+            completed = self.checkpoints.load(request_id, prompt_version)
+            pending = self._restore_completed(tasks, completed)
+
+            if completed:
+                logger.info(f"Resuming request {request_id} after: {', '.join(completed)}")
+
+            try:
+                if pending:
+                    logger.info("Running crew analysis...")
+                    cached += self._run_tasks(
+                        tasks, {"patient_input": patient_input}, task_callback=checkpoint,
+                        profile=profile, validation=validation
+                    )
+                stages = self._stage_outputs(tasks, request_id)
+                return stages, cached, self._add_token_usage(usage, tasks), validation
+            except Exception as e:
+                self._add_token_usage(usage, tasks)
+                # A node that did not stop when cancelled would race the retry
+                if attempt >= STAGE_MAX_RETRIES or getattr(e, 'abandoned', None):
+                    raise
+                logger.warning(
+                    f"Stage failed for request {request_id} ({str(e)}), "
+                    f"retry {attempt + 1}/{STAGE_MAX_RETRIES}"
+                )
+
+    async def _run_pipeline_async(
+        self,
+        patient_input: str,
+        request_id: str,
+        prompt_version: str,
+        profile: PromptProfile
+    ) -> Tuple[Dict[str, Optional[str]], List[str], Dict[str, int], Dict[str, Any]]:
+        """
+        Async counterpart of _run_pipeline using the crew's native async kickoff.
+
+        Args:
+            patient_input: Patient's description of symptoms
+            request_id: Request identifier used for checkpoints
+            prompt_version: Prompt version the checkpoints are keyed by
+            profile: Prompt profile the tasks are created with
+
+        Returns:
+            Raw output of every task keyed by task name, in order (None for
+            stages skipped by the intake gate), the names of the tasks
+            served from the stage cache, the tokens the agents used
+            (failed attempts included) and the output validation outcome of
+            each validated stage
+        """
+        def checkpoint(output: TaskOutput):
+            # A cancelled node must not store an output the retry is about to write
+            check_cancelled()
+            self.checkpoints.save(request_id, prompt_version, output.name, output.raw)
+
+        cached = []
+        usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        validation = {}
+        for attempt in range(STAGE_MAX_RETRIES + 1):
+            tasks = profile.crew_factory.create_medical_diagnostic_tasks()
+            completed = await asyncio.to_thread(self.checkpoints.load, request_id, prompt_version)
+            pending = self._restore_completed(tasks, completed)
+
+            if completed:
+                logger.info(f"Resuming request {request_id} after: {', '.join(completed)}")
+
+            try:
+                if pending:
+                    logger.info("Running crew analysis (async)...")
+                    cached += await self._run_tasks_async(
+                        tasks, {"patient_input": patient_input}, task_callback=checkpoint,
+                        profile=profile, validation=validation
+                    )
+                stages = self._stage_outputs(tasks, request_id)
+                return stages, cached, self._add_token_usage(usage, tasks), validation
+            except Exception as e:
+                self._add_token_usage(usage, tasks)
+                # A node that did not stop when cancelled would race the retry
+                if attempt >= STAGE_MAX_RETRIES or getattr(e, 'abandoned', None):
+                    raise
+                logger.warning(
+                    f"Stage failed for request {request_id} ({str(e)}), "
+                    f"retry {attempt + 1}/{STAGE_MAX_RETRIES}"
+                )
+
+    def analyze_symptoms(
+        self,
+        patient_input: str,
+        request_id: str = None,
+        include_stages: bool = False,
+        prompt_profile: str = None
+    ) -> Dict[str, Any]:
         """
         Analyze patient symptoms using the medical diagnostic crew.
 
         Args:
             patient_input: Patient's description of symptoms and relevant information
+            request_id: Identifier of the analysis; pass the id of an
+                interrupted analysis to resume it from its last completed task
+            include_stages: Also return each task's raw output under 'stages'
+            prompt_profile: Prompt profile to run with (PROMPT_PROFILE by default)
 
         Returns:
             Dictionary containing analysis results and metadata
         """
         logger.info("Starting symptom analysis")
         start_time = datetime.now()
+        request_id = request_id or uuid.uuid4().hex
+        prompt_version = self.crew_factory.prompt_loader.get_prompt_version()
+        resumed_stages = []
 
         try:
             # Validate input
             if not patient_input or not patient_input.strip():
                 raise ValueError("Patient input cannot be empty")
+            profile = self._get_profile(prompt_profile)
+            prompt_version = profile.crew_factory.prompt_loader.get_prompt_version()
+            # The LLM only ever sees the redacted input
+            redaction = self._redact(patient_input)
 
-            # Create crew
-            crew = self.crew_factory.create_medical_diagnostic_crew()
+            # Run analysis, resuming from any persisted checkpoints
+            with self._request_lock(request_id):
+                # Checkpoints of a reused request id with another input are dropped by start()
+                resumed_stages = list(self.checkpoints.load(request_id, prompt_version, patient_input))
+                near_duplicate = None if resumed_stages else self._find_near_duplicate(redaction.text, prompt_version)
+                if near_duplicate and NEAR_DUPLICATE_MODE == 'result':
+                    response = self._format_near_duplicate(
+                        near_duplicate, request_id, prompt_version, start_time, patient_input, include_stages
+                    )
+                    response["metadata"]["prompt_profile"] = profile.name
+                    self._rehydrate(response, redaction)
+                    self._record_analysis(patient_input, response)
+                    return response
 
-            # Run analysis
-            logger.info("Running crew analysis...")
-            result = crew.kickoff(inputs={
-                "patient_input": patient_input
-            })
+                self.checkpoints.start(request_id, prompt_version, patient_input)
+                if near_duplicate:
+                    self._reuse_intake(near_duplicate, request_id, prompt_version)
+                stages, cached_stages, usage, validation = self._run_pipeline(
+                    redaction.text, request_id, prompt_version, profile
+                )
+                self.checkpoints.complete(request_id, self._analysis_status(stages))
 
-            end_time = datetime.now()
-            duration = (end_time - start_time).total_seconds()
+            response = self._format_analysis(
+                stages, request_id, prompt_version, start_time,
+                patient_input, resumed_stages, cached_stages, usage, validation, include_stages
+            )
+            response["metadata"]["prompt_profile"] = profile.name
+            self._remember_input(response, stages, redaction.text, near_duplicate)
+            self._rehydrate(response, redaction)
+            self._record_analysis(patient_input, response, stages)
+            return response
 
-            logger.info(f"Analysis completed in {duration:.2f} seconds")
+        except Exception as e:
+            logger.error(f"Error during symptom analysis: {str(e)}", exc_info=True)
+            completed = self.checkpoints.load(request_id, prompt_version, patient_input or '')
+            response = self._format_error(e, request_id, start_time, list(completed))
+            self._record_analysis(patient_input, response, completed)
+            return response
 
-            # Format response
-            response = {
-                "success": True,
-                "result": str(result),
-                "metadata": {
-                    "start_time": start_time.isoformat(),
-                    "end_time": end_time.isoformat(),
-                    "duration_seconds": duration,
-                    "patient_input_length": len(patient_input)
+    async def analyze_symptoms_async(
+        self,
+        patient_input: str,
+        request_id: str = None,
+        include_stages: bool = False,
+        prompt_profile: str = None
+    ) -> Dict[str, Any]:
+        """
+        Analyze patient symptoms with the LLM calls on the event loop.
+
+        Same behaviour and response as analyze_symptoms, but the crew runs
+        through CrewAI's native async kickoff on the providers' async
+        clients. The path is not thread-free: checkpoint, cache and
+        near-duplicate reads and writes, output validation, pipelined
+        stages and intake map-reduce run in the default executor's threads.
+
+        Args:
+            patient_input: Patient's description of symptoms and relevant information
+            request_id: Identifier of the analysis; pass the id of an
+                interrupted analysis to resume it from its last completed task
+            include_stages: Also return each task's raw output under 'stages'
+            prompt_profile: Prompt profile to run with (PROMPT_PROFILE by default)
+
+        Returns:
+            Dictionary containing analysis results and metadata
+        """
+        logger.info("Starting symptom analysis (async)")
+        start_time = datetime.now()
+        request_id = request_id or uuid.uuid4().hex
+        prompt_version = self.crew_factory.prompt_loader.get_prompt_version()
+        resumed_stages = []
+
+        try:
+            # Validate input
+            if not patient_input or not patient_input.strip():
+                raise ValueError("Patient input cannot be empty")
+            profile = self._get_profile(prompt_profile)
+            prompt_version = profile.crew_factory.prompt_loader.get_prompt_version()
+            # The LLM only ever sees the redacted input
+            redaction = self._redact(patient_input)
+
+            # Run analysis, resuming from any persisted checkpoints
+            async with self._async_request_lock(request_id):
+                # Checkpoints of a reused request id with another input are dropped by start()
+                resumed_stages = list(await asyncio.to_thread(
+                    self.checkpoints.load, request_id, prompt_version, patient_input
+                ))
+                near_duplicate = None
+                if not resumed_stages:
+                    near_duplicate = await asyncio.to_thread(self._find_near_duplicate, redaction.text, prompt_version)
+                if near_duplicate and NEAR_DUPLICATE_MODE == 'result':
+                    response = self._format_near_duplicate(
+                        near_duplicate, request_id, prompt_version, start_time, patient_input, include_stages
+                    )
+                    response["metadata"]["prompt_profile"] = profile.name
+                    self._rehydrate(response, redaction)
+                    self._record_analysis(patient_input, response)
+                    return response
+
+                await asyncio.to_thread(self.checkpoints.start, request_id, prompt_version, patient_input)
+                if near_duplicate:
+                    await asyncio.to_thread(self._reuse_intake, near_duplicate, request_id, prompt_version)
+                stages, cached_stages, usage, validation = await self._run_pipeline_async(
+                    redaction.text, request_id, prompt_version, profile
+                )
+                await asyncio.to_thread(self.checkpoints.complete, request_id, self._analysis_status(stages))
+
+            response = self._format_analysis(
+                stages, request_id, prompt_version, start_time,
+                patient_input, resumed_stages, cached_stages, usage, validation, include_stages
+            )
+            response["metadata"]["prompt_profile"] = profile.name
+            await asyncio.to_thread(self._remember_input, response, stages, redaction.text, near_duplicate)
+            self._rehydrate(response, redaction)
+            self._record_analysis(patient_input, response, stages)
+            return response
+
+        except Exception as e:
+            logger.error(f"Error during symptom analysis: {str(e)}", exc_info=True)
+            completed = await asyncio.to_thread(
+                self.checkpoints.load, request_id, prompt_version, patient_input or ''
+            )
+            response = self._format_error(e, request_id, start_time, list(completed))
+            self._record_analysis(patient_input, response, completed)
+            return response
+
+    def _find_near_duplicate(self, patient_input: str, prompt_version: str) -> Optional[Dict[str, Any]]:
+        """Earlier analysis of a near-duplicate description, when reuse is enabled"""
+        if NEAR_DUPLICATE_MODE not in ('intake', 'result'):
+            return None
+        match = self.near_duplicates.find(patient_input, prompt_version)
+        if match:
+            logger.info(
+                f"Input is a near-duplicate of request {match['request_id']} "
+                f"(similarity {match['similarity']}), reusing its {NEAR_DUPLICATE_MODE}"
+            )
+        return match
+
+    def _reuse_intake(self, near_duplicate: Dict[str, Any], request_id: str, prompt_version: str):
+        """Checkpoint a near-duplicate's intake report so the run resumes after intake"""
+        intake_stage = self.crew_factory.get_intake_stage()
+        self.checkpoints.save(request_id, prompt_version, intake_stage, near_duplicate['intake_report'])
+
+    def _remember_input(
+        self,
+        response: Dict[str, Any],
+        stages: Dict[str, Optional[str]],
+        patient_input: str,
+        near_duplicate: Optional[Dict[str, Any]]
+    ):
+        """
+        Index a finished analysis for near-duplicate lookups.
+
+        Args:
+            response: Response of the analysis
+            stages: Raw stage outputs, None for skipped stages
+            patient_input: Patient's description of symptoms, as the LLM saw it
+            near_duplicate: Analysis whose intake was reused, if any
+        """
+        metadata = response["metadata"]
+        if near_duplicate:
+            metadata["near_duplicate"] = {
+                "request_id": near_duplicate['request_id'],
+                "similarity": near_duplicate['similarity'],
+                "reused": "intake"
+            }
+            # The intake was not derived from this input, so it is not indexed
+            return
+
+        intake_report = stages.get(self.crew_factory.get_intake_stage())
+        if NEAR_DUPLICATE_MODE in ('intake', 'result') and intake_report is not None:
+            self.near_duplicates.add(
+                metadata['request_id'], metadata['prompt_version'], patient_input,
+                response['status'], intake_report, response['result']
+            )
+
+    def _format_near_duplicate(
+        self,
+        near_duplicate: Dict[str, Any],
+        request_id: str,
+        prompt_version: str,
+        start_time: datetime,
+        patient_input: str,
+        include_stages: bool
+    ) -> Dict[str, Any]:
+        """Build the response serving a near-duplicate's earlier result"""
+        end_time = datetime.now()
+        response = {
+            "success": True,
+            "status": near_duplicate['status'],
+            "result": near_duplicate['result'],
+            "metadata": {
+                "request_id": request_id,
+                "prompt_version": prompt_version,
+                "start_time": start_time.isoformat(),
+                "end_time": end_time.isoformat(),
+                "duration_seconds": (end_time - start_time).total_seconds(),
+                "patient_input_length": len(patient_input),
+                "approximate": True,
+                "near_duplicate": {
+                    "request_id": near_duplicate['request_id'],
+                    "similarity": near_duplicate['similarity'],
+                    "reused": "result"
                 }
             }
+        }
+        if near_duplicate['status'] == CheckpointStore.NEEDS_MORE_INFO:
+            response["follow_up_questions"] = assess_intake(near_duplicate['intake_report'])['follow_up_questions']
+        if include_stages:
+            response["stages"] = {self.crew_factory.get_intake_stage(): near_duplicate['intake_report']}
+        return response
+
+    def _format_analysis(
+        self,
+        stages: Dict[str, Optional[str]],
+        request_id: str,
+        prompt_version: str,
+        start_time: datetime,
+        patient_input: str,
+        resumed_stages: List[str],
+        cached_stages: List[str],
+        token_usage: Dict[str, int],
+        validation: Dict[str, Any],
+        include_stages: bool
+    ) -> Dict[str, Any]:
+        """Build the response for a finished analysis"""
+        end_time = datetime.now()
+        duration = (end_time - start_time).total_seconds()
+
+        logger.info(f"Analysis completed in {duration:.2f} seconds")
+
+        response = {
+            "success": True,
+            "status": self._analysis_status(stages),
+            "result": stages[self.crew_factory.get_output_stage()],
+            "metadata": {
+                "request_id": request_id,
+                "prompt_version": prompt_version,
+                "start_time": start_time.isoformat(),
+                "end_time": end_time.isoformat(),
+                "duration_seconds": duration,
+                "patient_input_length": len(patient_input),
+                "resumed_stages": resumed_stages,
+                "cached_stages": cached_stages,
+                "token_usage": token_usage,
+                "output_validation": validation
+            }
+        }
+        if response["status"] == CheckpointStore.NEEDS_MORE_INFO:
+            self._add_follow_up(response, stages)
+        if include_stages:
+            response["stages"] = {name: raw for name, raw in stages.items() if raw is not None}
+
+        return response
+
+    def _add_follow_up(self, response: Dict[str, Any], stages: Dict[str, Optional[str]]):
+        """
+        Turn a response whose run stopped after intake into a follow-up request.
+
+        Sets the follow-up message as the result, adds the questions, and
+        records the completeness score and what skipping the remaining
+        stages saved in the metadata.
+
+        Args:
+            response: Response being built
+            stages: Raw stage outputs, None for skipped stages
+        """
+        intake_report = stages[self.crew_factory.get_intake_stage()]
+        assessment = assess_intake(intake_report)
+        skipped = [name for name, raw in stages.items() if raw is None]
+
+        saved_tokens = sum(self.estimator.stage_tokens(name, intake_report) for name in skipped)
+
+        response["result"] = format_follow_up(assessment)
+        response["follow_up_questions"] = assessment['follow_up_questions']
+        response["metadata"].update({
+            "completeness_score": assessment['score'],
+            "missing_fields": assessment['missing_fields'],
+            "stages_skipped": skipped,
+            "llm_calls_saved": len(skipped),
+            "estimated_prompt_tokens_saved": saved_tokens
+        })
+
+    def _format_error(
+        self,
+        error: Exception,
+        request_id: str,
+        start_time: datetime,
+        completed_stages: List[str]
+    ) -> Dict[str, Any]:
+        """Build the response for a failed analysis"""
+        return {
+            "success": False,
+            "error": str(error),
+            "metadata": {
+                "request_id": request_id,
+                "start_time": start_time.isoformat(),
+                "end_time": datetime.now().isoformat(),
+                "completed_stages": completed_stages
+            }
+        }
+
+    def get_analysis(self, request_id: str, include_stages: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Get a previous analysis from the checkpoint store.
+
+        Finished analyses no longer hold their input, so identifiers
+        redacted from it appear as placeholders in the result.
+
+        Args:
+            request_id: Request identifier
+            include_stages: Also return each task's raw output under 'stages'
+
+        Returns:
+            Dictionary containing the result and metadata, or None if the
+            request id is unknown or has expired
+        """
+        analysis = self.checkpoints.get_analysis(request_id)
+        if analysis is None:
+            return None
+
+        stages = self.checkpoints.load(request_id, analysis['prompt_version'])
+        metadata = {
+            "request_id": request_id,
+            "prompt_version": analysis['prompt_version'],
+            "status": analysis['status']
+        }
+
+        if analysis['status'] == CheckpointStore.RUNNING:
+            metadata["patient_input_length"] = len(analysis['patient_input'])
+            metadata["completed_stages"] = list(stages)
+            return {"success": False, "error": "Analysis has not finished", "metadata": metadata}
+
+        response = {
+            "success": True,
+            "status": analysis['status'],
+            "result": stages.get(self.crew_factory.get_output_stage()),
+            "metadata": metadata
+        }
+        if analysis['status'] == CheckpointStore.NEEDS_MORE_INFO:
+            self._add_follow_up(
+                response, {name: stages.get(name) for name in self.crew_factory.get_stage_names()}
+            )
+        if include_stages:
+            response["stages"] = stages
+        # The input was cleared when the analysis finished, so redacted
+        # identifiers stay placeholders; resubmitting the request restores them
+        return response
+
+    def append_to_session(self, session_id: str, patient_input: str) -> Dict[str, Any]:
+        """
+        Re-analyze a session's resubmitted description incrementally.
+
+        When the new description only adds information, the cached intake
+        report is updated with the added text and just the downstream tasks
+        re-run. Unknown or expired sessions and edited descriptions get a
+        full analysis.
+
+        Args:
+            session_id: Session identifier
+            patient_input: Full updated description (previous text plus additions)
+
+        Returns:
+            Dictionary containing analysis results and metadata, including
+            the stages that were updated from the session and those skipped
+        """
+        logger.info(f"Appending to session {session_id}")
+        start_time = datetime.now()
+        try:
+            # Validate input
+            if not patient_input or not patient_input.strip():
+                raise ValueError("Patient input cannot be empty")
+
+            with self._request_lock(f"session:{session_id}"):
+                # Sessions keep the redacted input; appended text keeps the placeholders before it
+                redaction = self._redact(patient_input)
+                session = self.sessions.get(session_id)
+                delta = diff_input(session['patient_input'], redaction.text) if session else None
+
+                if delta is None:
+                    # New session, or earlier information was edited
+                    response = self.analyze_symptoms(patient_input)
+                    metadata = response['metadata']
+                    metadata.update({"session_id": session_id, "mode": "full"})
+                    metadata.setdefault("stages_skipped", [])
+                    metadata["stages_updated"] = []
+                    if response['success']:
+                        state = self._session_state(metadata)
+                        if state is None:
+                            logger.warning(f"Session {session_id}: no intake report to keep, not saved")
+                        else:
+                            self.sessions.save(session_id, redaction.text, *state)
+                    return response
+
+                if not delta:
+                    logger.info(f"Session {session_id} input unchanged, returning cached result")
+                    result, cached, stages, validation = session['result'], [], None, {}
+                    usage = {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+                    if not INTAKE_GATE_ENABLED or assess_intake(session['intake_report'])['sufficient']:
+                        status = CheckpointStore.COMPLETED
+                    else:
+                        status = CheckpointStore.NEEDS_MORE_INFO
+                    mode, updated, skipped = "unchanged", [], self.crew_factory.get_stage_names()
+                else:
+                    logger.info(f"Session {session_id}: updating intake with {len(delta)} new characters")
+                    tasks = self.crew_factory.create_medical_diagnostic_tasks(incremental=True)
+                    validation = {}
+                    cached = self._run_tasks(tasks, {
+                        "patient_input": redaction.text,
+                        "previous_intake": session['intake_report'],
+                        "new_information": delta
+                    }, validation=validation)
+                    stages = self._stage_outputs(tasks, f"session {session_id}")
+                    usage = self._add_token_usage({"prompt_tokens": 0, "completion_tokens": 0}, tasks)
+                    result = stages[self.crew_factory.get_output_stage()]
+                    status = self._analysis_status(stages)
+                    # The intake task runs again, updating the cached report with the new text
+                    mode, updated, skipped = "incremental", [self.crew_factory.get_intake_stage()], []
+
+                end_time = datetime.now()
+                duration = (end_time - start_time).total_seconds()
+
+                response = {
+                    "success": True,
+                    "status": status,
+                    "result": result,
+                    "metadata": {
+                        "session_id": session_id,
+                        "mode": mode,
+                        "prompt_version": self.crew_factory.prompt_loader.get_prompt_version(),
+                        "stages_updated": updated,
+                        "stages_skipped": skipped,
+                        "cached_stages": cached,
+                        "new_information_length": len(delta),
+                        "start_time": start_time.isoformat(),
+                        "end_time": end_time.isoformat(),
+                        "duration_seconds": duration,
+                        "patient_input_length": len(patient_input),
+                        "token_usage": usage,
+                        "output_validation": validation
+                    }
+                }
+                if mode == "incremental":
+                    if status == CheckpointStore.NEEDS_MORE_INFO:
+                        self._add_follow_up(response, stages)
+                    # Sessions keep the result with its placeholders, like the checkpoints
+                    intake_report = stages[self.crew_factory.get_intake_stage()]
+                    self.sessions.save(session_id, redaction.text, intake_report, response["result"])
+                self._rehydrate(response, redaction)
+
+            logger.info(f"Session analysis ({mode}) completed in {duration:.2f} seconds")
+            self._record_analysis(patient_input, response, stages)
 
             return response
 
         except Exception as e:
-            logger.error(f"Error during symptom analysis: {str(e)}", exc_info=True)
-            return {
+            logger.error(f"Error during session analysis: {str(e)}", exc_info=True)
+            response = {
                 "success": False,
                 "error": str(e),
                 "metadata": {
+                    "session_id": session_id,
                     "start_time": start_time.isoformat(),
                     "end_time": datetime.now().isoformat()
                 }
             }
+            self._record_analysis(patient_input, response)
+            return response
+
+    def _session_state(self, metadata: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """
+        Intake report and result of a finished analysis, as a session keeps them.
+
+        Both are read back with their placeholders: from the checkpoints
+        the run wrote, or from the near-duplicate analysis whose result
+        was served instead of running.
+
+        Args:
+            metadata: Metadata of the analysis response
+
+        Returns:
+            (intake report, result), or None when no intake report is stored
+        """
+        near_duplicate = metadata.get('near_duplicate')
+        if near_duplicate and near_duplicate['reused'] == 'result':
+            record = self.near_duplicates.get(near_duplicate['request_id'])
+            return (record['intake_report'], record['result']) if record else None
+
+        completed = self.checkpoints.load(metadata['request_id'], metadata['prompt_version'])
+        intake_report = completed.get(self.crew_factory.get_intake_stage())
+        if intake_report is None:
+            return None
+        result = completed.get(self.crew_factory.get_output_stage())
+        if result is None:
+            # The intake gate stopped the run; its result was the follow-up request
+            result = format_follow_up(assess_intake(intake_report))
+        return intake_report, result
+
+    def estimate(self, patient_input: str, prompt_profile: str = None) -> Dict[str, Any]:
+        """
+        Pre-flight estimate of a full analysis, checked against the token limits.
+
+        Args:
+            patient_input: Patient's description of symptoms
+            prompt_profile: Prompt profile the analysis would run with
+
+        Returns:
+            The estimator's token and latency estimate with 'admitted',
+            the refusal 'reason' (None when admitted) and the 'limits'
+        """
+        profile = self._get_profile(prompt_profile)
+        estimate = profile.estimator.estimate(self._redact(patient_input).text)
+        reason = profile.estimator.check(estimate)
+        return {
+            **estimate,
+            "prompt_profile": profile.name,
+            "admitted": reason is None,
+            "reason": reason,
+            "limits": profile.estimator.limits()
+        }
+
+    def purge_expired(self) -> Dict[str, int]:
+        """
+        Delete whatever has outlived its retention period in every store.
+
+        Returns:
+            Number of entries removed, by store
+        """
+        purged = {
+            "checkpoints": self.checkpoints.purge_expired(),
+            "sessions": self.sessions.purge_expired(),
+            "stage_cache": self.stage_cache.purge_expired(),
+            "near_duplicates": self.near_duplicates.purge_expired()
+        }
+        if self.history:
+            purged["history"] = self.history.purge_expired()
+        return purged
+
+    def start_purging(self, interval: float = STORE_PURGE_INTERVAL) -> threading.Event:
+        """
+        Purge expired entries every `interval` seconds on a background thread.
+
+        Args:
+            interval: Seconds between purges
+
+        Returns:
+            Event that stops the thread when set
+        """
+        stop = threading.Event()
+
+        def purge_loop():
+            while not stop.wait(interval):
+                try:
+                    purged = self.purge_expired()
+                    if any(purged.values()):
+                        logger.info(f"Purged expired entries: {purged}")
+                except Exception as e:
+                    logger.error(f"Could not purge expired entries: {str(e)}")
+
+        threading.Thread(target=purge_loop, name="store-purge", daemon=True).start()
+        return stop
+
+    def resume_incomplete(self) -> int:
+        """
+        Resume analyses interrupted by a worker restart.
+
+        Expired analyses are purged first; only analyses started with the
+        current prompt version of one of the prompt profiles are resumed.
+
+        Returns:
+            Number of analyses resumed
+        """
+        self.purge_expired()
+        resumed = 0
+        for name in self.prompt_profiles():
+            prompt_version = self._get_profile(name).crew_factory.prompt_loader.get_prompt_version()
+            for analysis in self.checkpoints.list_incomplete(prompt_version):
+                logger.info(f"Resuming interrupted analysis {analysis['request_id']} ({name} prompts)")
+                self.analyze_symptoms(
+                    analysis['patient_input'], request_id=analysis['request_id'], prompt_profile=name
+                )
+                resumed += 1
+
+        return resumed
 
     def health_check(self) -> Dict[str, Any]:
         """
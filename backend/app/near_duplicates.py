@@ -0,0 +1,355 @@
+"""
+Near-Duplicate Inputs
+Finds earlier analyses of almost the same patient description with a SimHash index
+
+Descriptions are normalized (case, punctuation and stop words dropped)
+and reduced to a 64-bit SimHash of their words and in-sentence word
+pairs, so inputs that differ by punctuation, sentence order or a filler
+word land a few bits apart. The index splits each hash into max_distance + 1 blocks and
+keeps one table per block: any hash within max_distance bits of a query
+shares at least one block with it exactly, so a lookup only compares
+against the few entries in the query's buckets.
+
+A few bits of SimHash cover clinically different descriptions: another
+age, dose or duration, or "do not feel" instead of "also feel". A match is
+therefore only reused when both descriptions hold exactly the same numbers
+and the same negated words (see facts()).
+
+Every API and worker process keeps its own in-memory index. Before each
+lookup it reads the analyses added since its last one, by any process,
+in insertion order.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from .sqlite_store import SQLiteStore
+from backend.config import (
+    NEAR_DUPLICATE_DB_PATH,
+    NEAR_DUPLICATE_THRESHOLD,
+    NEAR_DUPLICATE_RETENTION_HOURS
+)
+
+HASH_BITS = 64
+MASK = (1 << HASH_BITS) - 1
+
+SENTENCE = re.compile(r"[.!?;\n]+")
+WORD = re.compile(r"[a-z0-9]+")
+NUMBER = re.compile(r"\d+(?:[.,]\d+)?")
+# Negation words (and contractions such as "don't") with the word they negate
+NEGATION = re.compile(
+    r"\b(no|not|never|none|nor|neither|without|den(?:y|ies|ied)|negative|[a-z]+n't|cannot)\b"
+    r"(?:\W+(?:(?:a|an|the|any|have|has|had|do|does|did|be|been|feel|felt|get|got)\W+)*([a-z]+))?"
+)
+# Filler words, and function words shared by most descriptions (which
+# would otherwise pull every hash towards the same bits); negations stay
+STOP_WORDS = frozenset({
+    "a", "an", "the", "um", "uh", "er", "like", "just", "really", "very",
+    "so", "well", "actually", "basically", "kind", "sort", "of", "quite", "pretty",
+    "i", "im", "m", "ve", "my", "me", "it", "its", "is", "am", "are", "was", "were",
+    "be", "been", "have", "has", "had", "and", "or", "for", "to", "in", "on", "at",
+    "with", "when", "that", "this", "also", "get", "gets", "got"
+})
+
+
+def normalize(text: str) -> List[str]:
+    """Lower-case words of a description without punctuation or stop words"""
+    return [word for word in WORD.findall(text.lower()) if word not in STOP_WORDS]
+
+
+def facts(text: str) -> str:
+    """
+    The numbers and negations of a description, in a canonical form.
+
+    Two descriptions are only near-duplicates when these agree exactly.
+
+    Args:
+        text: Patient description
+
+    Returns:
+        Sorted numbers and negated words, e.g. "45 7|no fever|not dizzy"
+    """
+    lowered = text.lower().replace("\u2019", "'")
+    numbers = sorted(number.replace(",", ".") for number in NUMBER.findall(lowered))
+    negations = sorted(f"{word} {negated}".strip() for word, negated in NEGATION.findall(lowered))
+    return "|".join([" ".join(numbers), *negations])
+
+
+@lru_cache(maxsize=1 << 16)
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def simhash(text: str) -> int:
+    """
+    64-bit SimHash of a description's words and adjacent word pairs.
+
+    Args:
+        text: Patient description
+
+    Returns:
+        Unsigned 64-bit hash
+    """
+    # Word pairs do not span sentences, so reordering sentences changes nothing
+    features = set()
+    for sentence in SENTENCE.split(text):
+        words = normalize(sentence)
+        features.update(words)
+        features.update(f"{a} {b}" for a, b in zip(words, words[1:]))
+    if not features:
+        return 0
+
+    # Count, for every bit position at once, how many feature hashes set
+    # it: planes[j] holds bit j of all 64 counters (a bit-sliced adder)
+    planes = []
+    for feature in features:
+        carry = _feature_hash(feature)
+        for j, plane in enumerate(planes):
+            planes[j], carry = plane ^ carry, plane & carry
+            if not carry:
+                break
+        if carry:
+            planes.append(carry)
+
+    # A result bit is set where its counter exceeds half the features
+    threshold = len(features) // 2
+    greater, equal = 0, MASK
+    for j in reversed(range(len(planes))):
+        if threshold >> j & 1:
+            equal &= planes[j]
+        else:
+            greater |= equal & planes[j]
+            equal &= ~planes[j] & MASK
+    return greater
+
+
+class SimHashIndex:
+    """In-memory index of SimHashes answering 'which entries are within k bits'"""
+
+    def __init__(self, max_distance: int = 3):
+        """
+        Initialize an empty index.
+
+        Args:
+            max_distance: Largest Hamming distance a lookup matches
+        """
+        self.max_distance = max_distance
+        blocks = max_distance + 1
+        width = HASH_BITS // blocks
+        # Block boundaries; the last block takes the remaining bits
+        self._blocks = [
+            (i * width, HASH_BITS - i * width if i == blocks - 1 else width)
+            for i in range(blocks)
+        ]
+        # Each bucket holds its entries' hashes and positions side by side
+        self._tables: List[Dict[int, tuple]] = [{} for _ in self._blocks]
+        self._keys: List[Any] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _block_values(self, value: int):
+        return [(value >> shift) & ((1 << width) - 1) for shift, width in self._blocks]
+
+    def add(self, value: int, key: Any):
+        """
+        Add a hash.
+
+        Args:
+            value: SimHash
+            key: Identifier returned by lookups
+        """
+        position = len(self._keys)
+        self._keys.append(key)
+        for table, block in zip(self._tables, self._block_values(value)):
+            hashes, positions = table.setdefault(block, ([], []))
+            hashes.append(value)
+            positions.append(position)
+
+    def lookup(self, value: int, max_distance: int = None) -> List[tuple]:
+        """
+        Find entries within max_distance bits of a hash.
+
+        Args:
+            value: SimHash to look up
+            max_distance: Largest distance to match (at most the index's own)
+
+        Returns:
+            (distance, key) pairs, closest first
+        """
+        limit = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        found = {}
+        for table, block in zip(self._tables, self._block_values(value)):
+            bucket = table.get(block)
+            if bucket is None:
+                continue
+            hashes, positions = bucket
+            for i in [i for i, other in enumerate(hashes) if (other ^ value).bit_count() <= limit]:
+                found[positions[i]] = (hashes[i] ^ value).bit_count()
+        return sorted(((distance, self._keys[position]) for position, distance in found.items()),
+                      key=lambda match: match[0])
+
+
+class NearDuplicateStore(SQLiteStore):
+    """Past analyses searchable by near-duplicate input, with their intake and result"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS analyses (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        request_id TEXT NOT NULL UNIQUE,
+        prompt_version TEXT NOT NULL,
+        simhash INTEGER NOT NULL,
+        facts TEXT NOT NULL,
+        status TEXT NOT NULL,
+        intake_report TEXT NOT NULL,
+        result TEXT NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_analyses_created ON analyses (created_at);
+    """
+
+    def __init__(
+        self,
+        db_path: Path = NEAR_DUPLICATE_DB_PATH,
+        threshold: float = NEAR_DUPLICATE_THRESHOLD,
+        retention_hours: float = NEAR_DUPLICATE_RETENTION_HOURS
+    ):
+        """
+        Initialize the store; the index is loaded on the first lookup.
+
+        Args:
+            db_path: SQLite database file
+            threshold: Minimum similarity (0-1) of a near-duplicate
+            retention_hours: How long an analysis stays matchable
+        """
+        super().__init__(db_path)
+        self.threshold = threshold
+        self.retention_seconds = retention_hours * 3600
+        self._index = None
+        self._indexed_seq = 0
+        self._index_lock = threading.Lock()
+
+    @property
+    def max_distance(self) -> int:
+        """Largest Hamming distance allowed by the similarity threshold"""
+        return int((1 - self.threshold) * HASH_BITS + 1e-9)
+
+    def _refresh_index(self):
+        """Add the analyses recorded since the last refresh, by any process (call with _index_lock held)"""
+        if self._index is None:
+            self._index, self._indexed_seq = SimHashIndex(self.max_distance), 0
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT seq, simhash, request_id FROM analyses WHERE seq > ? AND created_at >= ? ORDER BY seq",
+                (self._indexed_seq, time.time() - self.retention_seconds)
+            ).fetchall()
+        for seq, value, request_id in rows:
+            self._index.add(value & MASK, request_id)
+            self._indexed_seq = seq
+
+    def add(self, request_id: str, prompt_version: str, patient_input: str, status: str, intake_report: str, result: str):
+        """
+        Record a finished analysis.
+
+        Args:
+            request_id: Request identifier
+            prompt_version: Prompt version the analysis ran with
+            patient_input: Patient's description of symptoms
+            status: Final analysis status
+            intake_report: Raw output of the intake stage
+            result: Analysis result
+        """
+        # Indexed by the next lookup's refresh
+        value = simhash(patient_input)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO analyses "
+                "(request_id, prompt_version, simhash, facts, status, intake_report, result, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                # SQLite integers are signed 64-bit
+                (request_id, prompt_version, value - (1 << HASH_BITS) if value >> 63 else value,
+                 facts(patient_input), status, intake_report, result, time.time())
+            )
+
+    def find(self, patient_input: str, prompt_version: str) -> Optional[Dict[str, Any]]:
+        """
+        Find the closest earlier analysis of a near-duplicate description.
+
+        Only analyses whose description has exactly the same numbers and
+        negations match.
+
+        Args:
+            patient_input: Patient's description of symptoms
+            prompt_version: Only analyses run with this prompt version match
+
+        Returns:
+            Dictionary with 'request_id', 'similarity', 'status',
+            'intake_report' and 'result', or None
+        """
+        value = simhash(patient_input)
+        with self._index_lock:
+            self._refresh_index()
+            matches = self._index.lookup(value)
+        if not matches:
+            return None
+
+        distances = {request_id: distance for distance, request_id in reversed(matches)}
+        placeholders = ", ".join("?" * len(distances))
+        with self._connect() as conn:
+            rows = conn.execute(
+                f"SELECT request_id, status, intake_report, result FROM analyses "
+                f"WHERE request_id IN ({placeholders}) AND prompt_version = ? AND facts = ? AND created_at >= ?",
+                (*distances, prompt_version, facts(patient_input), time.time() - self.retention_seconds)
+            ).fetchall()
+        if not rows:
+            return None
+
+        request_id, status, intake_report, result = min(rows, key=lambda row: distances[row[0]])
+        return {
+            "request_id": request_id,
+            "similarity": round(1 - distances[request_id] / HASH_BITS, 3),
+            "status": status,
+            "intake_report": intake_report,
+            "result": result
+        }
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a recorded analysis by its request id.
+
+        Args:
+            request_id: Request identifier
+
+        Returns:
+            Dictionary with 'status', 'intake_report' and 'result', or None
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT status, intake_report, result FROM analyses WHERE request_id = ?", (request_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"status": row[0], "intake_report": row[1], "result": row[2]}
+
+    def purge_expired(self) -> int:
+        """
+        Delete analyses past the retention period.
+
+        The index is rebuilt on the next lookup, since other processes may
+        have purged analyses it still holds.
+
+        Returns:
+            Number of analyses removed
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM analyses WHERE created_at < ?", (time.time() - self.retention_seconds,)
+            )
+        with self._index_lock:
+            self._index = None
+        return cursor.rowcount
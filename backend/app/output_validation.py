@@ -0,0 +1,332 @@
+"""
+Output Validation
+Checks each stage's report against the sections of its expected_output
+
+The 'validation' block of pipeline.json lists the sections a stage's report
+must have. Each one names a heading from the task's expected_output and,
+optionally, the fewest numbered items ('min_items') or '- ' bullets
+('min_bullets') it must hold, or a phrase it must contain ('contains').
+A finished report is cut into sections at its capitalised heading lines
+(emoji, markdown and "Final Answer:" ignored) and checked locally.
+
+A missing or malformed section is rewritten on its own, instead of the
+whole analysis being run again. A single call to the stage agent's LLM is
+given the report, the reports the stage read, and the section's layout cut
+out of the expected_output. It returns only that section. The rewrite
+replaces the malformed section, or is inserted where the expected_output
+places a missing one; the rest of the report is kept as it is.
+"""
+
+import logging
+import re
+import threading
+from typing import Dict, Any, List, Optional, Tuple
+
+from crewai import Task
+from crewai.tasks.task_output import TaskOutput
+from crewai.utilities.string_utils import interpolate_only
+
+from .stage_pipelining import ITEM
+from backend.config import OUTPUT_REGENERATION_ATTEMPTS
+
+logger = logging.getLogger(__name__)
+
+# An unindented line in capitals, after any emoji or markdown
+# ("⚠️ WHEN TO SEEK IMMEDIATE EMERGENCY CARE", "## SAFETY ASSESSMENT")
+HEADING = re.compile(
+    r"^(?:Final Answer:\s*)?[^\w\s]*\s*(?P<title>[A-Z][A-Z0-9 /&'-]{3,}?)\s*(?:\([^)]*\))?[*:\s]*$"
+)
+
+# Leading emoji, markdown and bullets of a line
+DECORATION = re.compile(r"^(?:Final Answer:\s*)?[^\w\s]*\s*")
+
+BULLET = re.compile(r"^\s*[-•*]\s+\S", re.MULTILINE)
+
+# A required heading may also be written in other case ("## When to seek
+# immediate emergency care"), followed by at most this many characters
+HEADING_SLACK = 30
+
+Section = Tuple[str, int, int, int]
+
+
+def split_sections(text: str, headings: List[str] = ()) -> List[Section]:
+    """
+    Cut a report into sections at its heading lines.
+
+    Args:
+        text: Report
+        headings: Required headings, recognised in any case
+
+    Returns:
+        (title, start of the heading line, start of the body, end of the
+        body) of every section, in order
+    """
+    found = []
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        title = None
+        if not line[:1].isspace():
+            match = HEADING.match(line.rstrip())
+            if match:
+                title = match.group('title')
+            else:
+                cleaned = DECORATION.sub('', line).strip().rstrip(':*').strip().upper()
+                title = next(
+                    (heading for heading in headings
+                     if cleaned.startswith(heading) and len(cleaned) <= len(heading) + HEADING_SLACK),
+                    None
+                )
+        if title:
+            found.append((title, offset, offset + len(line)))
+        offset += len(line)
+    return [
+        (title, start, body, found[i + 1][1] if i + 1 < len(found) else len(text))
+        for i, (title, start, body) in enumerate(found)
+    ]
+
+
+def find_section(sections: List[Section], heading: str) -> Optional[Section]:
+    """The first section whose title starts with the heading"""
+    return next((section for section in sections if section[0].startswith(heading)), None)
+
+
+def check_section(body: str, rule: Dict[str, Any]) -> Optional[str]:
+    """
+    Check one section's body against its rule.
+
+    Returns:
+        The problem ('empty', 'too_few_items', 'too_few_bullets' or
+        'missing_text'), or None when the section is well-formed
+    """
+    if not body.strip():
+        return "empty"
+    if 'min_items' in rule and sum(1 for line in body.splitlines() if ITEM.match(line)) < rule['min_items']:
+        return "too_few_items"
+    if 'min_bullets' in rule and len(BULLET.findall(body)) < rule['min_bullets']:
+        return "too_few_bullets"
+    if 'contains' in rule and rule['contains'].lower() not in body.lower():
+        return "missing_text"
+    return None
+
+
+def describe(problem: str, rule: Dict[str, Any]) -> str:
+    """A problem in words, for the regeneration prompt"""
+    return {
+        "missing": "is missing from the report",
+        "empty": "is empty",
+        "too_few_items": f"lists fewer than {rule.get('min_items')} numbered items",
+        "too_few_bullets": f"has fewer than {rule.get('min_bullets')} lines starting with '- '",
+        "missing_text": f"does not say \"{rule.get('contains')}\""
+    }[problem]
+
+
+class ValidationMetrics:
+    """Validation outcomes and regeneration counts since startup, per stage"""
+
+    def __init__(self):
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, outcome: Dict[str, Any]):
+        """Count one validated report"""
+        with self._lock:
+            counts = self._stages.setdefault(stage, {
+                "validated": 0, "valid": 0, "repaired": 0, "invalid": 0,
+                "regeneration_calls": 0, "sections_regenerated": 0, "problems": {}
+            })
+            counts['validated'] += 1
+            if not outcome['problems']:
+                counts['valid'] += 1
+            elif outcome['unresolved']:
+                counts['invalid'] += 1
+            else:
+                counts['repaired'] += 1
+            counts['regeneration_calls'] += outcome['regeneration_calls']
+            counts['sections_regenerated'] += len(outcome['regenerated'])
+            for problem in outcome['problems']:
+                key = f"{problem['section']}: {problem['problem']}"
+                counts['problems'][key] = counts['problems'].get(key, 0) + 1
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Copy of the counts of every stage"""
+        with self._lock:
+            return {stage: {**counts, "problems": dict(counts['problems'])} for stage, counts in self._stages.items()}
+
+
+class OutputValidator:
+    """Validates stage reports and regenerates their missing or malformed sections"""
+
+    def __init__(
+        self,
+        crew_factory,
+        config: Dict[str, Any],
+        metrics: ValidationMetrics = None,
+        attempts: int = OUTPUT_REGENERATION_ATTEMPTS
+    ):
+        """
+        Initialize the validator.
+
+        Args:
+            crew_factory: CrewFactory whose task configurations describe the reports
+            config: 'validation' block of pipeline.json
+            metrics: Counts the outcomes (shared between prompt profiles)
+            attempts: Regeneration calls per section before it is left as it is
+        """
+        self.crew_factory = crew_factory
+        self.stages = config['stages']
+        self.regenerate_config = crew_factory.prompt_loader.get_task_config(config['regenerate_task'])
+        self.metrics = metrics or ValidationMetrics()
+        self.attempts = attempts
+
+    def applies(self, name: str) -> bool:
+        """Whether a stage's report is validated"""
+        return name in self.stages
+
+    def validate(self, name: str, raw: str) -> List[Dict[str, str]]:
+        """
+        Check a stage's report.
+
+        Args:
+            name: Pipeline task name
+            raw: The stage's report
+
+        Returns:
+            The problems found, each with its 'section' and 'problem'
+            ('missing' or one of check_section's), empty for a valid report
+        """
+        rules = self.stages[name]
+        sections = split_sections(raw, [rule['heading'] for rule in rules])
+        problems = []
+        for rule in rules:
+            section = find_section(sections, rule['heading'])
+            problem = "missing" if section is None else check_section(raw[section[2]:section[3]], rule)
+            if problem:
+                problems.append({"section": rule['heading'], "problem": problem})
+        return problems
+
+    def _layout(self, name: str, heading: str) -> Tuple[str, str, List[str]]:
+        """
+        A section as the expected_output lays it out.
+
+        Returns:
+            (heading line, body layout, headings of the sections after it)
+        """
+        expected = self.crew_factory.prompt_loader.get_task_config(
+            self.crew_factory.get_stage_prompts(name)['task_name']
+        )['expected_output']
+        sections = split_sections(expected)
+        section = find_section(sections, heading)
+        if section is None:
+            return heading, "", []
+        position = sections.index(section)
+        return (
+            expected[section[1]:section[2]].strip(),
+            expected[section[2]:section[3]].strip(),
+            [title for title, *_ in sections[position + 1:]]
+        )
+
+    def _regenerate(
+        self,
+        task: Task,
+        rule: Dict[str, Any],
+        heading_line: str,
+        layout: str,
+        problem: str,
+        report: str
+    ) -> str:
+        """Write one section again with the stage agent's LLM"""
+        agent = task.agent
+        context = "\n\n----------\n\n".join(
+            dependency.output.raw for dependency in task.context or [] if dependency.output is not None
+        )
+        inputs = {
+            "section": heading_line,
+            "problem": describe(problem, rule),
+            "layout": layout or "(no fixed layout)",
+            "report": report,
+            "context": context or "(none)"
+        }
+        messages = [
+            {"role": "system", "content": f"You are {agent.role}. {agent.backstory}\nYour personal goal is: {agent.goal}"},
+            {"role": "user", "content": (
+                f"{interpolate_only(self.regenerate_config['description'], inputs)}\n\n"
+                f"This is the expected criteria for your final answer: {self.regenerate_config['expected_output']}"
+            )}
+        ]
+        body = str(agent.llm.call(messages)).strip()
+        # The heading is added here; drop it if the LLM wrote it anyway
+        lines = body.splitlines()
+        if lines and find_section(split_sections(lines[0], [rule['heading']]), rule['heading']):
+            body = "\n".join(lines[1:]).strip()
+        return body
+
+    def _splice(self, raw: str, rule: Dict[str, Any], heading_line: str, later: List[str], body: str) -> str:
+        """Put a regenerated section into the report, replacing the old one or where it belongs"""
+        headings = [rule['heading']] + later
+        sections = split_sections(raw, headings)
+        section = find_section(sections, rule['heading'])
+        if section is not None:
+            rest = raw[section[3]:].lstrip("\n")
+            return raw[:section[2]] + body + ("\n\n" + rest if rest else "")
+        following = next(
+            (found for found in sections if any(found[0].startswith(title) for title in later)), None
+        )
+        block = f"{heading_line}\n{body}\n\n"
+        if following is None:
+            return raw.rstrip("\n") + "\n\n" + block.rstrip("\n")
+        return raw[:following[1]] + block + raw[following[1]:]
+
+    def repair(self, name: str, task: Task, task_callback=None) -> Dict[str, Any]:
+        """
+        Validate a finished stage and regenerate what is missing or malformed.
+
+        The task's output is replaced when a section was regenerated, and
+        task_callback is called with the new output.
+
+        Args:
+            name: Pipeline task name
+            task: The finished task
+            task_callback: Called with the repaired output
+
+        Returns:
+            Outcome with the 'problems' found, the sections 'regenerated',
+            those still 'unresolved' and the 'regeneration_calls' made
+        """
+        raw = task.output.raw
+        problems = self.validate(name, raw)
+        outcome = {"problems": problems, "regenerated": [], "unresolved": [], "regeneration_calls": 0}
+
+        rules = {rule['heading']: rule for rule in self.stages[name]}
+        for problem in problems:
+            rule = rules[problem['section']]
+            heading_line, layout, later = self._layout(name, rule['heading'])
+            current = problem['problem']
+            for _ in range(self.attempts):
+                outcome['regeneration_calls'] += 1
+                try:
+                    body = self._regenerate(task, rule, heading_line, layout, current, raw)
+                except Exception as e:
+                    logger.warning(f"Could not regenerate '{rule['heading']}' of {name}: {str(e)}")
+                    continue
+                repaired = self._splice(raw, rule, heading_line, later, body)
+                current = next(
+                    (found['problem'] for found in self.validate(name, repaired)
+                     if found['section'] == rule['heading']),
+                    None
+                )
+                if current is None:
+                    raw = repaired
+                    outcome['regenerated'].append(rule['heading'])
+                    break
+            else:
+                outcome['unresolved'].append(rule['heading'])
+
+        if outcome['regenerated']:
+            logger.info(f"Regenerated {', '.join(outcome['regenerated'])} of {name}")
+            task.output = TaskOutput(name=name, description=task.description, raw=raw, agent=task.agent.role)
+            if task_callback:
+                task_callback(task.output)
+        if outcome['unresolved']:
+            logger.warning(f"{name} still lacks a valid {', '.join(outcome['unresolved'])} section")
+        self.metrics.record(name, outcome)
+        return outcome
@@ -0,0 +1,239 @@
+"""
+PHI Redaction
+Replaces patient identifiers with short placeholders before the LLM sees them
+
+Names, phone numbers, e-mail addresses, street addresses, record numbers
+and social security numbers carry no diagnostic value. All of them are
+matched by one compiled pattern in a single scan of the input. Each
+distinct value gets a placeholder such as [NAME1] or [PHONE2], and the
+same value always gets the same placeholder. Names are only recognised
+after a cue ("my name is", "Name:", "Mr.", "Dr."). Once found, a name's
+parts are replaced wherever else they appear. "I'm" and "I am" are not
+cues: what follows them is far more often a condition, a sex or an
+ethnicity ("I'm Type 1 diabetic", "I am Ashkenazi Jewish") than a name.
+
+Every identifier starts at a digit, a capital, '(', '+' or '@'. The
+pattern starts with that character class, so the regex engine skips
+through ordinary prose without trying a match; the branch for each kind
+begins with a lookbehind on the character it starts at. Labels such as
+"MRN:" are checked in Python only for the few number-like values that
+follow a colon or a word.
+
+Placeholders are numbered in order of first appearance, so redacting the
+same text again gives the same placeholders. Checkpoints, cached stages
+and resumed runs therefore line up without storing the mapping. The
+placeholders in the final report are swapped back for the originals
+(re-hydrated) before it is returned.
+"""
+
+import re
+from typing import Dict, Any, Optional
+
+STREET_TYPES = ("Street", "St", "Avenue", "Ave", "Road", "Rd", "Boulevard", "Blvd", "Lane", "Ln",
+                "Drive", "Dr", "Court", "Ct", "Way", "Place", "Pl", "Terrace", "Circle")
+
+# Text right before a name; the capital that follows starts the name
+NAME_CUES = ("Mr. ", "Mrs. ", "Ms. ", "Dr. ", "Mr ", "Mrs ", "Ms ", "Dr ", "Miss ", "Prof. ",
+             "name is ", "Name is ", "Name: ", "name: ", "NAME: ",
+             "Regards, ", "regards, ", "Signed, ", "Sincerely, ")
+
+# Text right before a record number, and the labels it must end (checked after matching)
+ID_CUES = (": ", ":", "# ", "#", "MRN ", "ID ", "id ", "number ", "no. ", "No. ", "no ", "is ")
+ID_LABEL = re.compile(
+    r"(?i:\b(?:MRN|medical record(?: number| no\.?)?|record (?:number|no\.?|#)|patient id|"
+    r"account (?:number|no\.?|#)|member id|insurance id|policy (?:number|no\.?))"
+    r"\s*(?:is\s+)?[:#]?\s*)$"
+)
+
+
+def _after(cues, start: str) -> str:
+    """
+    Lookbehinds for any of the cues followed by the start character.
+
+    A first lookbehind on the cues' last three characters turns most
+    positions (a capital starting a sentence) away before the cues are
+    tried one by one.
+    """
+    tails = {}
+    for cue in cues:
+        tails.setdefault(len(cue[-3:]), []).append(cue[-3:])
+    quick = [
+        "(?<=" + "".join(
+            "[" + "".join(sorted({re.escape(tail[i]) for tail in group})) + "]" for i in range(length)
+        ) + start + ")"
+        for length, group in sorted(tails.items())
+    ]
+    exact = [f"(?<={re.escape(cue)}{start})" for cue in cues]
+    return "(?:" + "|".join(quick) + ")(?:" + "|".join(exact) + ")"
+
+
+# The match starts at the identifier's first character (or the '@' of an
+# e-mail address, whose local part is taken in Python). Group names give
+# the kind, up to the first underscore.
+IDENTIFIERS = re.compile(
+    r"[0-9(+@A-Z](?:"
+    # Starting at a digit that does not continue a word or a number
+    r"(?<=[0-9])(?<![\w+.-][0-9])(?:"
+    r"(?P<SSN>[0-9]{2}-[0-9]{2}-[0-9]{4}(?![\w-]))"
+    r"|(?P<PHONE>(?:(?<=1)[ .-](?:\([0-9]{3}\)\s?|[0-9]{3}[ .-])|[0-9]{2}[ .-])[0-9]{3}[ .-][0-9]{4}(?![\w-]))"
+    r"|(?P<ADDRESS>[0-9]{0,5}\s+(?:[A-Z][a-z]+\.?\s+){1,3}(?:" + "|".join(STREET_TYPES) + r")\b\.?"
+    r"(?:,?\s+(?:Apt|Apartment|Suite|Unit)\.?\s*#?\w+)?"
+    r"(?:,\s*[A-Z][a-z]+(?:\s[A-Z][a-z]+)?)?(?:,\s*[A-Z]{2})?(?:\s+[0-9]{5}(?:-[0-9]{4})?)?)"
+    r")"
+    r"|(?<=\()(?<![\w+]\()(?P<PHONE_AREA>[0-9]{3}\)\s?[0-9]{3}[ .-][0-9]{4}(?![0-9]))"
+    r"|(?<=\+)(?P<PHONE_INTL>1[ .-]?(?:\([0-9]{3}\)\s?|[0-9]{3}[ .-])[0-9]{3}[ .-][0-9]{4}(?![0-9]))"
+    r"|(?<=@)(?P<EMAIL>[\w-]+(?:\.[\w-]+)+)"
+    # Starting at a capital after a cue
+    r"|" + _after(NAME_CUES, "[A-Z]") + r"(?P<NAME>[a-z]+(?:[ -][A-Z][a-z]+){0,2})"
+    # Starting at a digit or capital after a possible label, with a digit early on
+    r"|" + _after(ID_CUES, "[0-9A-Z]") + r"(?:(?<=[0-9])|(?=[A-Za-z-]{0,5}[0-9]))(?P<ID>[A-Za-z0-9-]{3,}(?![\w-]))"
+    r")"
+)
+
+# Local part of an e-mail address, read backwards from the '@'
+EMAIL_LOCAL = re.compile(r"[\w.+-]+$")
+
+# Capitalized words that follow a name cue without being names ("Name: Not given")
+NOT_NAMES = frozenset({
+    "Hispanic", "Latino", "Latina", "Asian", "Black", "White", "Caucasian", "African", "American",
+    "Diabetic", "Pregnant", "Allergic", "Not", "Very", "Also", "Currently", "On", "In", "At", "The",
+    "Worried", "Concerned", "Feeling", "Here", "Writing", "Calling", "Having", "Still", "Now"
+})
+
+PLACEHOLDER = re.compile(r"\[(?P<kind>[A-Z]+)(?P<number>\d+)\]")
+
+
+class Redaction:
+    """A redacted text and the placeholders needed to restore it"""
+
+    def __init__(self, text: str, originals: Dict[str, str] = None):
+        """
+        Args:
+            text: Text with identifiers replaced by placeholders
+            originals: Original value of each placeholder
+        """
+        self.text = text
+        self.originals = originals or {}
+
+    def counts(self) -> Dict[str, int]:
+        """Number of distinct identifiers replaced, by kind"""
+        counts = {}
+        for placeholder in self.originals:
+            kind = PLACEHOLDER.fullmatch(placeholder).group('kind')
+            counts[kind] = counts.get(kind, 0) + 1
+        return counts
+
+    def rehydrate(self, text: Optional[str]) -> Optional[str]:
+        """
+        Put the original values back in place of this redaction's placeholders.
+
+        Placeholders this redaction did not produce are left as they are.
+
+        Args:
+            text: Text written from the redacted input (None passes through)
+
+        Returns:
+            The text with the original identifiers
+        """
+        if not text or not self.originals:
+            return text
+        return PLACEHOLDER.sub(lambda match: self.originals.get(match.group(0), match.group(0)), text)
+
+    def rehydrate_response(self, response: Dict[str, Any]):
+        """Re-hydrate an analysis response's result and stage outputs in place"""
+        if not self.originals:
+            return
+        if response.get('result'):
+            response['result'] = self.rehydrate(response['result'])
+        if response.get('stages'):
+            response['stages'] = {name: self.rehydrate(raw) for name, raw in response['stages'].items()}
+
+
+def _renumber(text: str, originals: Dict[str, str]):
+    """
+    Number placeholders in order of appearance in the text.
+
+    Name mentions are numbered after every cued identifier; renumbering
+    keeps the placeholders of a text's beginning unchanged when text is
+    appended to it, as session updates do.
+    """
+    numbers: Dict[str, int] = {}
+    renamed: Dict[str, str] = {}
+
+    def rename(match: re.Match) -> str:
+        old = match.group(0)
+        if old not in renamed:
+            kind = match.group('kind')
+            numbers[kind] = numbers.get(kind, 0) + 1
+            renamed[old] = f"[{kind}{numbers[kind]}]"
+        return renamed[old]
+
+    text = PLACEHOLDER.sub(rename, text)
+    return text, {renamed[old]: value for old, value in originals.items() if old in renamed}
+
+
+def redact(text: str) -> Redaction:
+    """
+    Replace the identifiers in a text with numbered placeholders.
+
+    Args:
+        text: Patient input
+
+    Returns:
+        The Redaction holding the redacted text and the originals
+    """
+    placeholders: Dict[tuple, str] = {}
+    originals: Dict[str, str] = {}
+    numbers: Dict[str, int] = {}
+    names = set()
+
+    def placeholder(kind: str, value: str) -> str:
+        key = (kind, value.lower() if kind in ("EMAIL", "NAME") else value)
+        if key not in placeholders:
+            numbers[kind] = numbers.get(kind, 0) + 1
+            placeholders[key] = f"[{kind}{numbers[kind]}]"
+            originals[placeholders[key]] = value
+        return placeholders[key]
+
+    pieces = []
+    last = 0
+    for match in IDENTIFIERS.finditer(text):
+        kind = match.lastgroup.split('_')[0]
+        start, end = match.span()
+        if kind == "EMAIL":
+            local = EMAIL_LOCAL.search(text, max(last, start - 64), start)
+            if not local:
+                continue
+            start = local.start()
+        elif kind == "NAME":
+            if match.group(0).split()[0].split('-')[0] in NOT_NAMES:
+                continue
+            names.add(match.group(0))
+        elif kind == "ID":
+            if not ID_LABEL.search(text, max(0, start - 32), start):
+                continue
+        pieces.append(text[last:start])
+        pieces.append(placeholder(kind, text[start:end]))
+        last = end
+    pieces.append(text[last:])
+    redacted = "".join(pieces)
+
+    if names:
+        # Later mentions of a found name's parts ("Smith called") get placeholders of their own,
+        # so that re-hydrating gives back exactly the words that were there
+        parts = {
+            part for name in names for part in re.split(r"[ -]", name)
+            if len(part) > 2 and part not in NOT_NAMES
+        }
+        if parts:
+            # A literal alternation scans fast; the word boundary before it is checked here
+            mentions = re.compile("(?:" + "|".join(map(re.escape, sorted(parts, key=len, reverse=True))) + r")\b")
+            redacted, replaced = mentions.subn(
+                lambda match: match.group(0) if match.start() and redacted[match.start() - 1].isalnum()
+                else placeholder("NAME", match.group(0)),
+                redacted
+            )
+            if replaced:
+                redacted, originals = _renumber(redacted, originals)
+
+    return Redaction(redacted, originals)
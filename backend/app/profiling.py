@@ -0,0 +1,231 @@
+"""
+Request Profiling
+Samples the stacks of the threads working on a request and saves flame graphs
+
+The sampler wakes every few milliseconds and records the stack of every
+thread currently running code under backend/, so threads idling in a
+pool are left out while time spent in CrewAI, Pydantic, logging or
+waiting on sockets below an analysis is kept. Profiles are written as
+speedscope JSON and as collapsed stacks (one 'frame;frame;frame count'
+line per stack, the input of flamegraph.pl).
+
+Nothing is sampled unless a profile is requested; other requests running
+at the same time show up in the profile too.
+"""
+
+import json
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from backend.config import PROFILES_DIR, PROFILE_SAMPLE_INTERVAL, PROFILE_MAX_FILES
+
+# Profile files are named <profile id>.<format extension>
+FORMATS = {
+    'speedscope': '.speedscope.json',
+    'collapsed': '.collapsed.txt'
+}
+
+PROFILE_ID = re.compile(r"^[0-9A-Za-z_\-]+$")
+
+# Stacks without a frame in the backend package are not sampled
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+Frame = Tuple[str, str, int]
+
+
+def _frame_label(frame: Frame) -> str:
+    name, filename, line = frame
+    if filename == "<thread>":
+        return name
+    return f"{name} ({Path(filename).name}:{line})"
+
+
+class SamplingProfiler:
+    """Wall-clock sampling profiler over all threads running project code"""
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL, root: Path = BACKEND_DIR):
+        """
+        Initialize the profiler.
+
+        Args:
+            interval: Seconds between samples
+            root: Only stacks with a frame under this directory are kept
+        """
+        self.interval = interval
+        self.root = str(root)
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _stack(self, frame, thread_name: str) -> Optional[Tuple[Frame, ...]]:
+        stack, relevant = [], False
+        while frame is not None:
+            code = frame.f_code
+            relevant = relevant or code.co_filename.startswith(self.root)
+            stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+            frame = frame.f_back
+        if not relevant:
+            return None
+        # Pool threads are numbered; one root per pool keeps the graph readable
+        stack.append((re.sub(r"_\d+$", "", thread_name), "<thread>", 0))
+        return tuple(reversed(stack))
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = self._stack(frame, names.get(ident, str(ident)))
+                if stack:
+                    self.stacks[stack] += 1
+            self.samples += 1
+
+    def __enter__(self) -> "SamplingProfiler":
+        self._start = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._start
+
+    def to_collapsed(self) -> str:
+        """Collapsed stacks, one 'root;...;leaf count' line per stack"""
+        return "".join(
+            ";".join(_frame_label(frame) for frame in stack) + f" {count}\n"
+            for stack, count in self.stacks.most_common()
+        )
+
+    def to_speedscope(self, name: str) -> Dict[str, Any]:
+        """
+        Profile in speedscope's file format (https://www.speedscope.app).
+
+        Args:
+            name: Profile name shown in speedscope
+
+        Returns:
+            Speedscope document with one sampled profile in milliseconds
+        """
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in self.stacks.most_common():
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+            samples.append([index[frame] for frame in stack])
+            weights.append(round(count * self.interval * 1000, 3))
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "medical-diagnostic-api",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "milliseconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 3),
+                "samples": samples,
+                "weights": weights
+            }]
+        }
+
+
+class ProfileStore:
+    """Directory of saved request profiles"""
+
+    def __init__(self, profiles_dir: Path = PROFILES_DIR, max_files: int = PROFILE_MAX_FILES):
+        """
+        Initialize the store.
+
+        Args:
+            profiles_dir: Directory the profiles are written to
+            max_files: Profiles kept; the oldest are deleted beyond this
+        """
+        self.profiles_dir = Path(profiles_dir)
+        self.max_files = max_files
+
+    def save(self, profiler: SamplingProfiler, request_id: str) -> str:
+        """
+        Write a finished profile in every format.
+
+        Args:
+            profiler: Profiler that has stopped sampling
+            request_id: Request the profile belongs to
+
+        Returns:
+            Profile id
+        """
+        self.profiles_dir.mkdir(parents=True, exist_ok=True)
+        profile_id = f"{datetime.now():%Y%m%d-%H%M%S}-{re.sub(r'[^0-9A-Za-z_-]', '', request_id)[:32]}"
+        (self.profiles_dir / (profile_id + FORMATS['collapsed'])).write_text(
+            profiler.to_collapsed(), encoding='utf-8'
+        )
+        speedscope = profiler.to_speedscope(f"analysis {request_id} ({profiler.duration:.2f}s)")
+        (self.profiles_dir / (profile_id + FORMATS['speedscope'])).write_text(
+            json.dumps(speedscope, separators=(',', ':')), encoding='utf-8'
+        )
+        self._prune()
+        return profile_id
+
+    def _prune(self):
+        profiles = self.list()
+        for profile in profiles[self.max_files:]:
+            for path in self.paths(profile['id']).values():
+                path.unlink(missing_ok=True)
+
+    def paths(self, profile_id: str) -> Dict[str, Path]:
+        """Files of a profile keyed by format"""
+        return {fmt: self.profiles_dir / (profile_id + suffix) for fmt, suffix in FORMATS.items()}
+
+    def list(self) -> List[Dict[str, Any]]:
+        """
+        List saved profiles, newest first.
+
+        Returns:
+            Dictionaries with 'id', 'created_at', 'formats' and 'size_bytes'
+        """
+        if not self.profiles_dir.exists():
+            return []
+        profiles = []
+        for path in self.profiles_dir.glob('*' + FORMATS['speedscope']):
+            profile_id = path.name[:-len(FORMATS['speedscope'])]
+            existing = {fmt: p for fmt, p in self.paths(profile_id).items() if p.exists()}
+            profiles.append({
+                "id": profile_id,
+                "created_at": datetime.fromtimestamp(path.stat().st_mtime).isoformat(),
+                "formats": list(existing),
+                "size_bytes": sum(p.stat().st_size for p in existing.values())
+            })
+        profiles.sort(key=lambda profile: profile['created_at'], reverse=True)
+        return profiles
+
+    def get_path(self, profile_id: str, fmt: str = 'speedscope') -> Optional[Path]:
+        """
+        File of a saved profile.
+
+        Args:
+            profile_id: Profile id
+            fmt: 'speedscope' or 'collapsed'
+
+        Returns:
+            Path of the file, or None when the profile or format is unknown
+        """
+        if not PROFILE_ID.match(profile_id) or fmt not in FORMATS:
+            return None
+        path = self.paths(profile_id)[fmt]
+        return path if path.exists() else None
@@ -1,53 +1,113 @@
 """
 Prompt Loader Utility
-Loads agent roles and task descriptions from external JSON files
+Loads agent roles, task descriptions and the pipeline graph from external JSON files
+
+A prompt profile is a directory under prompts/profiles/ holding its own
+agent_roles.json and task_descriptions.json. Their entries override the
+fields of the same-named entries of the base files, so a profile such as
+'compact' only lists what it rewrites. The pipeline graph is shared by
+all profiles.
 """
 
+import hashlib
 import json
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, List
+
+# Profile that uses the base files as they are
+DEFAULT_PROFILE = 'default'
+
+
+def available_profiles(prompts_dir: Path) -> List[str]:
+    """
+    List the prompt profiles of a prompts directory.
+
+    Args:
+        prompts_dir: Path to the prompts directory
+
+    Returns:
+        'default' followed by the profile directory names, sorted
+    """
+    profiles_dir = Path(prompts_dir) / 'profiles'
+    names = sorted(path.name for path in profiles_dir.iterdir() if path.is_dir()) if profiles_dir.is_dir() else []
+    return [DEFAULT_PROFILE] + [name for name in names if name != DEFAULT_PROFILE]
 
 
 class PromptLoader:
     """Loads and manages prompts from external configuration files"""
 
-    def __init__(self, prompts_dir: Path):
+    def __init__(self, prompts_dir: Path, profile: str = DEFAULT_PROFILE):
         """
         Initialize the prompt loader.
 
         Args:
             prompts_dir: Path to the prompts directory
+            profile: Prompt profile whose overrides apply ('default' for none)
+
+        Raises:
+            ValueError: If the profile does not exist
         """
         self.prompts_dir = Path(prompts_dir)
+        self.profile = profile or DEFAULT_PROFILE
+        if self.profile not in available_profiles(self.prompts_dir):
+            raise ValueError(
+                f"Prompt profile '{self.profile}' not found; "
+                f"available: {', '.join(available_profiles(self.prompts_dir))}"
+            )
         self._agent_roles = None
         self._task_descriptions = None
+        self._pipeline = None
+        self._prompt_version = None
+
+    def _load_with_profile(self, filename: str) -> Dict[str, Any]:
+        """Entries of a base file with the profile's field overrides applied"""
+        with open(self.prompts_dir / filename, 'r', encoding='utf-8') as f:
+            entries = json.load(f)
+        if self.profile != DEFAULT_PROFILE:
+            overrides_file = self.prompts_dir / 'profiles' / self.profile / filename
+            if overrides_file.exists():
+                with open(overrides_file, 'r', encoding='utf-8') as f:
+                    for name, fields in json.load(f).items():
+                        entries[name] = {**entries.get(name, {}), **fields}
+        return entries
 
     def load_agent_roles(self) -> Dict[str, Any]:
         """
-        Load agent roles from agent_roles.json
+        Load agent roles from agent_roles.json, with the profile's overrides
 
         Returns:
             Dictionary containing agent role configurations
         """
         if self._agent_roles is None:
-            roles_file = self.prompts_dir / 'agent_roles.json'
-            with open(roles_file, 'r', encoding='utf-8') as f:
-                self._agent_roles = json.load(f)
+            self._agent_roles = self._load_with_profile('agent_roles.json')
         return self._agent_roles
 
     def load_task_descriptions(self) -> Dict[str, Any]:
         """
-        Load task descriptions from task_descriptions.json
+        Load task descriptions from task_descriptions.json, with the profile's overrides
 
         Returns:
             Dictionary containing task description configurations
         """
         if self._task_descriptions is None:
-            tasks_file = self.prompts_dir / 'task_descriptions.json'
-            with open(tasks_file, 'r', encoding='utf-8') as f:
-                self._task_descriptions = json.load(f)
+            self._task_descriptions = self._load_with_profile('task_descriptions.json')
         return self._task_descriptions
 
+    def load_pipeline(self) -> Dict[str, Any]:
+        """
+        Load the pipeline graph from pipeline.json
+
+        Returns:
+            Dictionary with the 'nodes' list (task name, agent, tools,
+            dependencies) and optional 'output', 'intake',
+            'max_parallelism' and 'streaming' entries
+        """
+        if self._pipeline is None:
+            pipeline_file = self.prompts_dir / 'pipeline.json'
+            with open(pipeline_file, 'r', encoding='utf-8') as f:
+                self._pipeline = json.load(f)
+        return self._pipeline
+
     def get_agent_config(self, agent_name: str) -> Dict[str, str]:
         """
         Get configuration for a specific agent.
@@ -56,7 +116,8 @@ class PromptLoader:
             agent_name: Name of the agent (e.g., 'intake_coordinator')
 
         Returns:
-            Dictionary with 'role', 'goal', and 'backstory'
+            Dictionary with 'role', 'goal', 'backstory' and an optional
+            'llm' block ('provider', 'model', extra LLM parameters)
         """
         roles = self.load_agent_roles()
         if agent_name not in roles:
@@ -78,7 +139,24 @@ class PromptLoader:
             raise ValueError(f"Task '{task_name}' not found in task_descriptions.json")
         return tasks[task_name]
 
+    def get_prompt_version(self) -> str:
+        """
+        Get a version identifier for the current prompts.
+
+        Returns:
+            Short hash of agent_roles.json, task_descriptions.json and
+            pipeline.json as the profile sees them
+        """
+        if self._prompt_version is None:
+            digest = hashlib.sha256()
+            for data in (self.load_agent_roles(), self.load_task_descriptions(), self.load_pipeline()):
+                digest.update(json.dumps(data, sort_keys=True).encode('utf-8'))
+            self._prompt_version = digest.hexdigest()[:12]
+        return self._prompt_version
+
     def reload(self):
         """Force reload of all prompt files"""
         self._agent_roles = None
         self._task_descriptions = None
+        self._pipeline = None
+        self._prompt_version = None
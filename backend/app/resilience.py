@@ -0,0 +1,398 @@
+"""
+LLM Call Resilience
+Jittered exponential backoff, per provider/model circuit breakers and
+hedged requests, applied as httpx transports under the pooled clients
+
+Every attempt first checks whether the calling pipeline node was
+cancelled (see dag_executor.check_cancelled), so the thread of a timed-out
+node stops at its next LLM call.
+"""
+
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Optional, Tuple
+
+import httpx
+
+from .dag_executor import check_cancelled
+from backend.config import (
+    LLM_RETRY_MAX_ATTEMPTS,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    CIRCUIT_BREAKER_RESET_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+# Status codes worth retrying: rate limits and transient server errors
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# Request header carrying an agent's hedge delay (stripped before sending)
+HEDGE_HEADER = 'x-hedge-after'
+
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because its circuit is open"""
+
+
+# ============================================================================
+# BACKOFF
+# ============================================================================
+
+class RetryPolicy:
+    """Exponential backoff with full jitter"""
+
+    def __init__(
+        self,
+        max_attempts: int = LLM_RETRY_MAX_ATTEMPTS,
+        base_delay: float = LLM_RETRY_BASE_DELAY,
+        max_delay: float = LLM_RETRY_MAX_DELAY
+    ):
+        """
+        Initialize the retry policy.
+
+        Args:
+            max_attempts: Total attempts per call, including the first
+            base_delay: Backoff ceiling for the first retry in seconds
+            max_delay: Upper bound for any single delay in seconds
+        """
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        """
+        Delay before the next attempt.
+
+        Args:
+            attempt: Zero-based index of the attempt that just failed
+            retry_after: Retry-After header from the provider, if any
+
+        Returns:
+            Seconds to wait
+        """
+        if retry_after:
+            try:
+                return min(self.max_delay, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+
+# ============================================================================
+# CIRCUIT BREAKER
+# ============================================================================
+
+class CircuitBreaker:
+    """
+    Closed / open / half-open circuit breaker for one provider and model
+
+    Once the reset timeout has passed, a single trial call is let through;
+    other calls are rejected until it succeeds (closing the circuit) or
+    fails (opening it again). A trial that has not reported back within
+    the reset timeout is given up on and another one is allowed.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = CIRCUIT_BREAKER_RESET_TIMEOUT
+    ):
+        """
+        Initialize the circuit breaker.
+
+        Args:
+            name: Label used in logs and errors (e.g. 'openai/gpt-4o')
+            failure_threshold: Consecutive failures that open the circuit
+            reset_timeout: Seconds to stay open before allowing a trial call
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_started_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through"""
+        with self._lock:
+            now = time.monotonic()
+            if self.state == self.OPEN:
+                if now - self.opened_at < self.reset_timeout:
+                    raise CircuitOpenError(f"Circuit open for {self.name}")
+                self.state = self.HALF_OPEN
+                logger.info(f"Circuit half-open for {self.name}, allowing trial call")
+            elif self.state == self.HALF_OPEN:
+                if now - self.trial_started_at < self.reset_timeout:
+                    raise CircuitOpenError(f"Circuit half-open for {self.name}, trial call in progress")
+                logger.warning(f"Trial call for {self.name} did not report back, allowing another")
+            else:
+                return
+            self.trial_started_at = now
+
+    def record_success(self):
+        """Close the circuit after a successful call"""
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit closed for {self.name}")
+            self.state = self.CLOSED
+            self.failures = 0
+            self.trial_started_at = None
+
+    def record_failure(self):
+        """Count a failure and open the circuit when the threshold is hit"""
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit opened for {self.name} after {self.failures} failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self.trial_started_at = None
+
+
+class CircuitBreakerRegistry:
+    """Circuit breakers keyed by provider and model"""
+
+    def __init__(self):
+        """Initialize an empty registry"""
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, model: str) -> CircuitBreaker:
+        """Get (or create) the breaker for a provider and model"""
+        key = (provider, model)
+        with self._lock:
+            if key not in self._breakers:
+                self._breakers[key] = CircuitBreaker(f"{provider}/{model}")
+            return self._breakers[key]
+
+    def snapshot(self) -> Dict[str, str]:
+        """Current state of every breaker"""
+        with self._lock:
+            return {breaker.name: breaker.state for breaker in self._breakers.values()}
+
+
+circuit_breakers = CircuitBreakerRegistry()
+
+
+# ============================================================================
+# TRANSPORTS
+# ============================================================================
+
+def _inspect_request(request: httpx.Request) -> Tuple[str, bool, Optional[float]]:
+    """
+    Pull the model, streaming flag and hedge delay out of a request.
+
+    The hedge header is removed so it never reaches the provider.
+    """
+    hedge_after = request.headers.get(HEDGE_HEADER)
+    if hedge_after is not None:
+        del request.headers[HEDGE_HEADER]
+        hedge_after = float(hedge_after)
+
+    try:
+        body = json.loads(request.content or b'{}')
+    except (ValueError, httpx.RequestNotRead):
+        body = {}
+    if not isinstance(body, dict):
+        body = {}
+    return str(body.get('model', 'unknown')), bool(body.get('stream')), hedge_after
+
+
+class ResilientTransport(httpx.BaseTransport):
+    """Sync transport adding retries, circuit breaking and hedging"""
+
+    _hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='llm-hedge')
+
+    def __init__(
+        self,
+        transport: httpx.BaseTransport,
+        provider: str,
+        retry_policy: RetryPolicy = None,
+        breakers: CircuitBreakerRegistry = None
+    ):
+        """
+        Initialize the transport.
+
+        Args:
+            transport: Underlying pooled transport
+            provider: Provider name used to key circuit breakers
+            retry_policy: Backoff policy (defaults from settings)
+            breakers: Breaker registry (defaults to the process-wide one)
+        """
+        self._transport = transport
+        self.provider = provider
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breakers = breakers or circuit_breakers
+
+    def _send_and_read(self, request: httpx.Request) -> httpx.Response:
+        response = self._transport.handle_request(request)
+        response.read()
+        return response
+
+    def _send(self, request: httpx.Request, stream: bool, hedge_after: Optional[float]) -> httpx.Response:
+        if hedge_after is None or stream:
+            return self._transport.handle_request(request)
+
+        primary = self._hedge_executor.submit(self._send_and_read, request)
+        done, _ = wait([primary], timeout=hedge_after)
+        pending = {primary}
+        if not done:
+            logger.info(f"Hedging request to {request.url.path} after {hedge_after}s")
+            pending.add(self._hedge_executor.submit(self._send_and_read, request))
+
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.add_done_callback(
+                            lambda f: f.exception() is None and f.result().close()
+                        )
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        model, stream, hedge_after = _inspect_request(request)
+        breaker = self.breakers.get(self.provider, model)
+        policy = self.retry_policy
+
+        for attempt in range(policy.max_attempts):
+            # A node of a timed-out pipeline makes no further calls
+            check_cancelled()
+            breaker.before_call()
+            last_attempt = attempt + 1 >= policy.max_attempts
+            try:
+                response = self._send(request, stream, hedge_after)
+            except httpx.TransportError as e:
+                breaker.record_failure()
+                if last_attempt:
+                    raise
+                delay = policy.backoff(attempt)
+                reason = type(e).__name__
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    breaker.record_success()
+                    return response
+                breaker.record_failure()
+                if last_attempt:
+                    return response
+                delay = policy.backoff(attempt, response.headers.get('retry-after'))
+                reason = f"HTTP {response.status_code}"
+                response.close()
+
+            logger.warning(
+                f"LLM call to {breaker.name} failed ({reason}), "
+                f"retry {attempt + 1}/{policy.max_attempts - 1} in {delay:.2f}s"
+            )
+            time.sleep(delay)
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncResilientTransport(httpx.AsyncBaseTransport):
+    """Async transport adding retries, circuit breaking and hedging"""
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        provider: str,
+        retry_policy: RetryPolicy = None,
+        breakers: CircuitBreakerRegistry = None
+    ):
+        """
+        Initialize the transport.
+
+        Args:
+            transport: Underlying pooled transport
+            provider: Provider name used to key circuit breakers
+            retry_policy: Backoff policy (defaults from settings)
+            breakers: Breaker registry (defaults to the process-wide one)
+        """
+        self._transport = transport
+        self.provider = provider
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breakers = breakers or circuit_breakers
+
+    async def _send_and_read(self, request: httpx.Request) -> httpx.Response:
+        response = await self._transport.handle_async_request(request)
+        await response.aread()
+        return response
+
+    async def _send(self, request: httpx.Request, stream: bool, hedge_after: Optional[float]) -> httpx.Response:
+        if hedge_after is None or stream:
+            return await self._transport.handle_async_request(request)
+
+        primary = asyncio.ensure_future(self._send_and_read(request))
+        done, _ = await asyncio.wait({primary}, timeout=hedge_after)
+        pending = {primary}
+        if not done:
+            logger.info(f"Hedging request to {request.url.path} after {hedge_after}s")
+            pending.add(asyncio.ensure_future(self._send_and_read(request)))
+
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for loser in pending:
+                        loser.cancel()
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        model, stream, hedge_after = _inspect_request(request)
+        breaker = self.breakers.get(self.provider, model)
+        policy = self.retry_policy
+
+        for attempt in range(policy.max_attempts):
+            # A node of a timed-out pipeline makes no further calls
+            check_cancelled()
+            breaker.before_call()
+            last_attempt = attempt + 1 >= policy.max_attempts
+            try:
+                response = await self._send(request, stream, hedge_after)
+            except httpx.TransportError as e:
+                breaker.record_failure()
+                if last_attempt:
+                    raise
+                delay = policy.backoff(attempt)
+                reason = type(e).__name__
+            else:
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    breaker.record_success()
+                    return response
+                breaker.record_failure()
+                if last_attempt:
+                    return response
+                delay = policy.backoff(attempt, response.headers.get('retry-after'))
+                reason = f"HTTP {response.status_code}"
+                await response.aclose()
+
+            logger.warning(
+                f"LLM call to {breaker.name} failed ({reason}), "
+                f"retry {attempt + 1}/{policy.max_attempts - 1} in {delay:.2f}s"
+            )
+            await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self._transport.aclose()
@@ -0,0 +1,227 @@
+"""
+Response Encoding
+Compact payload formats, ETags and negotiated gzip/brotli compression
+
+orjson, msgpack and brotli are optional; without them payloads fall back
+to stdlib JSON and gzip.
+"""
+
+import gzip
+import hashlib
+import json
+from typing import Dict, Any, Optional, Tuple
+
+from backend.config import COMPRESSION_MIN_SIZE, GZIP_LEVEL, BROTLI_QUALITY
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+JSON_MEDIA_TYPE = 'application/json'
+MSGPACK_MEDIA_TYPE = 'application/msgpack'
+MSGPACK_MEDIA_TYPES = {MSGPACK_MEDIA_TYPE, 'application/x-msgpack', 'application/vnd.msgpack'}
+
+# Content types worth compressing
+COMPRESSIBLE_TYPES = ('application/json', 'application/msgpack', 'text/', 'application/javascript')
+
+
+# ============================================================================
+# PAYLOADS
+# ============================================================================
+
+def wants_msgpack(accept: Optional[str] = None, format: Optional[str] = None) -> bool:
+    """Whether the client asked for msgpack via ?format= or the Accept header"""
+    if format:
+        return format.lower() == 'msgpack' and msgpack is not None
+    if not accept or msgpack is None:
+        return False
+    return any(part.split(';')[0].strip() in MSGPACK_MEDIA_TYPES for part in accept.split(','))
+
+
+def serialize_payload(
+    payload: Dict[str, Any],
+    accept: Optional[str] = None,
+    format: Optional[str] = None
+) -> Tuple[bytes, str]:
+    """
+    Encode a payload in the most compact format the client accepts.
+
+    Args:
+        payload: Response dictionary
+        accept: Request Accept header
+        format: Explicit ?format= query value ('json' or 'msgpack')
+
+    Returns:
+        Tuple of (body bytes, media type)
+    """
+    if wants_msgpack(accept, format):
+        return msgpack.packb(payload, use_bin_type=True), MSGPACK_MEDIA_TYPE
+    if orjson is not None:
+        return orjson.dumps(payload), JSON_MEDIA_TYPE
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'), JSON_MEDIA_TYPE
+
+
+def compute_etag(body: bytes, encoding: Optional[str] = None) -> str:
+    """
+    Strong ETag for a response body.
+
+    Args:
+        body: Uncompressed body
+        encoding: Content encoding the body is sent with, which gets its
+            own ETag (as static_assets.Asset.etag does)
+
+    Returns:
+        Quoted ETag
+    """
+    digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+    return f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches the given ETag"""
+    if not if_none_match:
+        return False
+    candidates = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+    return '*' in candidates or etag in candidates
+
+
+# ============================================================================
+# COMPRESSION
+# ============================================================================
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick a content encoding from an Accept-Encoding header.
+
+    Brotli wins over gzip at equal preference when it is installed.
+
+    Args:
+        accept_encoding: Request Accept-Encoding header
+
+    Returns:
+        'br', 'gzip' or None
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+
+    supported = ['br', 'gzip'] if brotli is not None else ['gzip']
+    wildcard = weights.get('*', 0.0)
+    ranked = sorted(
+        (weights.get(name, wildcard), -index, name)
+        for index, name in enumerate(supported)
+    )
+    quality, _, name = ranked[-1]
+    return name if quality > 0 else None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress a body with the negotiated encoding"""
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def add_vary(vary: Optional[bytes], field: bytes) -> bytes:
+    """A Vary header value with one more request header"""
+    return vary + b', ' + field if vary else field
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing single-chunk responses with gzip or brotli.
+
+    Every single-chunk response of a compressible content type varies on
+    Accept-Encoding, so it is sent with 'Vary: Accept-Encoding' even when
+    it is left uncompressed (small body, no accepted encoding). A
+    compressed response's ETag gets the encoding appended. Streaming
+    responses, non-text content types and responses the app already
+    negotiated (Content-Encoding set, or Vary naming Accept-Encoding) pass
+    through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get('headers') or [])
+        encoding = negotiate_encoding(headers.get(b'accept-encoding', b'').decode('latin-1'))
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if message['type'] == 'http.response.start':
+                start_message = message
+                return
+            if message['type'] != 'http.response.body' or passthrough:
+                await send(message)
+                return
+
+            response_headers = dict(start_message.get('headers') or [])
+            content_type = response_headers.get(b'content-type', b'').decode('latin-1')
+            vary = response_headers.get(b'vary')
+            body = message.get('body', b'')
+
+            if (message.get('more_body')
+                    or b'content-encoding' in response_headers
+                    or b'accept-encoding' in (vary or b'').lower()
+                    or not content_type.startswith(COMPRESSIBLE_TYPES)):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            new_headers = [
+                (key, value) for key, value in start_message.get('headers') or []
+                if key != b'vary'
+            ]
+            new_headers.append((b'vary', add_vary(vary, b'Accept-Encoding')))
+            if encoding is None or len(body) < self.minimum_size:
+                await send({**start_message, 'headers': new_headers})
+                await send(message)
+                return
+
+            compressed = compress(body, encoding)
+            etag = response_headers.get(b'etag')
+            new_headers = [
+                (key, value) for key, value in new_headers if key not in (b'content-length', b'etag')
+            ]
+            new_headers += [
+                (b'content-encoding', encoding.encode('latin-1')),
+                (b'content-length', str(len(compressed)).encode('latin-1'))
+            ]
+            if etag:
+                new_headers.append((b'etag', etag[:-1] + b'-' + encoding.encode('latin-1') + b'"'))
+            await send({**start_message, 'headers': new_headers})
+            await send({**message, 'body': compressed})
+
+        await self.app(scope, receive, send_wrapper)
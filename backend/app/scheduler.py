@@ -0,0 +1,337 @@
+"""
+Analysis Scheduler
+Admits analyses to a fixed number of slots with weighted fair queueing and token quotas
+
+Waiting analyses are ordered by priority class first (interactive before
+batch) and then by start-time fair queueing within the class: each
+client's analysis gets a virtual start tag of max(virtual time, the
+client's previous finish tag), and finishes cost / weight later. A client
+submitting a hundred analyses at once therefore queues behind itself,
+while a client with one analysis is admitted after at most one of
+theirs. Costs are estimated prompt tokens, so long descriptions weigh more.
+
+Token quotas are charged at admission to a local SQLite ledger and
+refunded when an analysis fails.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+from .sqlite_store import SQLiteStore
+from backend.config import (
+    SCHEDULER_MAX_CONCURRENT,
+    SCHEDULER_MAX_QUEUED_PER_CLIENT,
+    SCHEDULER_CLIENT_WEIGHTS,
+    CLIENT_TOKEN_QUOTA,
+    CLIENT_QUOTA_WINDOW_HOURS,
+    QUOTA_DB_PATH
+)
+
+logger = logging.getLogger(__name__)
+
+# Priority classes, highest first
+PRIORITIES = ('interactive', 'batch')
+
+# Duration assumed for an analysis before any has finished
+INITIAL_DURATION_SECONDS = 60.0
+
+# Weight of the newest duration in the running average
+DURATION_SMOOTHING = 0.2
+
+
+class SchedulerRejection(Exception):
+    """Raised when an analysis cannot be queued (quota used up or queue full)"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QuotaLedger(SQLiteStore):
+    """SQLite ledger of tokens charged to each client"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS charges (
+        ticket_id TEXT PRIMARY KEY,
+        client_id TEXT NOT NULL,
+        tokens INTEGER NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_charges_client ON charges (client_id, created_at);
+    """
+
+    def __init__(
+        self,
+        db_path: Path = QUOTA_DB_PATH,
+        quota: int = CLIENT_TOKEN_QUOTA,
+        window_hours: float = CLIENT_QUOTA_WINDOW_HOURS
+    ):
+        """
+        Initialize the ledger.
+
+        Args:
+            db_path: SQLite database file
+            quota: Tokens each client may use per window (0 = unlimited)
+            window_hours: Length of the sliding quota window
+        """
+        super().__init__(db_path)
+        self.quota = quota
+        self.window_seconds = window_hours * 3600
+
+    def usage(self, client_id: str) -> Dict[str, Any]:
+        """
+        Tokens a client used in the current window.
+
+        Args:
+            client_id: Client identifier
+
+        Returns:
+            Dictionary with 'used', 'quota' (None when unlimited) and
+            'remaining' (None when unlimited)
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COALESCE(SUM(tokens), 0) FROM charges WHERE client_id = ? AND created_at >= ?",
+                (client_id, time.time() - self.window_seconds)
+            ).fetchone()
+        used = row[0]
+        if not self.quota:
+            return {"used": used, "quota": None, "remaining": None}
+        return {"used": used, "quota": self.quota, "remaining": max(0, self.quota - used)}
+
+    def charge(self, ticket_id: str, client_id: str, tokens: int):
+        """
+        Charge a client for an analysis.
+
+        Raises:
+            SchedulerRejection: When the charge would exceed the client's quota
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM charges WHERE created_at < ?", (now - self.window_seconds,))
+            if self.quota:
+                used, oldest = conn.execute(
+                    "SELECT COALESCE(SUM(tokens), 0), MIN(created_at) FROM charges WHERE client_id = ?",
+                    (client_id,)
+                ).fetchone()
+                if used + tokens > self.quota:
+                    retry_after = int((oldest or now) + self.window_seconds - now) + 1
+                    raise SchedulerRejection(
+                        f"Token quota of {self.quota} per {self.window_seconds / 3600:g}h used up "
+                        f"({used} used, {tokens} needed)",
+                        retry_after
+                    )
+            conn.execute(
+                "INSERT OR REPLACE INTO charges (ticket_id, client_id, tokens, created_at) VALUES (?, ?, ?, ?)",
+                (ticket_id, client_id, tokens, now)
+            )
+
+    def refund(self, ticket_id: str):
+        """Remove the charge of an analysis that did not complete"""
+        with self._connect() as conn:
+            conn.execute("DELETE FROM charges WHERE ticket_id = ?", (ticket_id,))
+
+
+class Ticket:
+    """One analysis waiting for or holding a slot"""
+
+    def __init__(self, ticket_id: str, client_id: str, priority: str, cost: int, start_tag: float):
+        self.id = ticket_id
+        self.client_id = client_id
+        self.priority = priority
+        self.cost = cost
+        self.start_tag = start_tag
+        self.enqueued_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.admitted = asyncio.Event()
+        # Set by the caller when the analysis failed, so its charge is refunded
+        self.failed = False
+
+    @property
+    def waited_seconds(self) -> float:
+        return (self.started_at or time.monotonic()) - self.enqueued_at
+
+
+class FairScheduler:
+    """Weighted fair admission of analyses to a fixed number of slots"""
+
+    def __init__(
+        self,
+        slots: int = SCHEDULER_MAX_CONCURRENT,
+        max_queued_per_client: int = SCHEDULER_MAX_QUEUED_PER_CLIENT,
+        client_weights: Dict[str, float] = None,
+        ledger: QuotaLedger = None
+    ):
+        """
+        Initialize the scheduler.
+
+        Args:
+            slots: Analyses run at the same time
+            max_queued_per_client: Waiting analyses allowed per client
+            client_weights: Share of each client relative to the default of 1
+            ledger: Token quota ledger
+        """
+        self.slots = slots
+        self.max_queued_per_client = max_queued_per_client
+        self.client_weights = SCHEDULER_CLIENT_WEIGHTS if client_weights is None else client_weights
+        self.ledger = ledger or QuotaLedger()
+        self.average_duration = INITIAL_DURATION_SECONDS
+        self._virtual_time = {priority: 0.0 for priority in PRIORITIES}
+        self._finish_tags: Dict[tuple, float] = {}
+        self._waiting: Dict[str, list] = {priority: [] for priority in PRIORITIES}
+        self._tickets: Dict[str, Ticket] = {}
+        self._running = 0
+        self._sequence = itertools.count()
+
+    def _enqueue(self, ticket_id: str, client_id: str, priority: str, cost: int) -> Ticket:
+        queued = sum(1 for t in self._tickets.values() if t.client_id == client_id and t.started_at is None)
+        if queued >= self.max_queued_per_client:
+            raise SchedulerRejection(
+                f"Too many queued analyses for this client ({queued})",
+                int(self.average_duration)
+            )
+        weight = self.client_weights.get(client_id, 1.0)
+        key = (priority, client_id)
+        start_tag = max(self._virtual_time[priority], self._finish_tags.get(key, 0.0))
+        self._finish_tags[key] = start_tag + max(cost, 1) / weight
+
+        ticket = Ticket(ticket_id, client_id, priority, cost, start_tag)
+        self._tickets[ticket_id] = ticket
+        heapq.heappush(self._waiting[priority], (start_tag, next(self._sequence), ticket))
+        return ticket
+
+    def _dispatch(self):
+        """Admit waiting analyses while slots are free, highest class first"""
+        while self._running < self.slots:
+            heap = next((self._waiting[p] for p in PRIORITIES if self._waiting[p]), None)
+            if heap is None:
+                return
+            start_tag, _, ticket = heapq.heappop(heap)
+            self._virtual_time[ticket.priority] = start_tag
+            ticket.started_at = time.monotonic()
+            self._running += 1
+            ticket.admitted.set()
+
+    def _remove_waiting(self, ticket: Ticket):
+        heap = self._waiting[ticket.priority]
+        heap[:] = [entry for entry in heap if entry[2] is not ticket]
+        heapq.heapify(heap)
+
+    def _finish(self, ticket: Ticket):
+        del self._tickets[ticket.id]
+        if ticket.started_at is None:
+            self._remove_waiting(ticket)
+        else:
+            self._running -= 1
+            duration = time.monotonic() - ticket.started_at
+            self.average_duration += DURATION_SMOOTHING * (duration - self.average_duration)
+        if not self._tickets:
+            # Idle: restart virtual time so tags stay small
+            self._finish_tags.clear()
+            self._virtual_time = {priority: 0.0 for priority in PRIORITIES}
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, client_id: str, cost: int, priority: str = 'interactive', ticket_id: str = None):
+        """
+        Wait for a slot and hold it for the duration of the block.
+
+        The cost is charged to the client's quota when queued and refunded
+        when the block raises, the wait is cancelled or the ticket is
+        marked failed.
+
+        Args:
+            client_id: Client the analysis belongs to
+            cost: Estimated prompt tokens of the analysis
+            priority: 'interactive' or 'batch'
+            ticket_id: Identifier to report the queue position under
+
+        Yields:
+            The analysis's Ticket
+
+        Raises:
+            SchedulerRejection: When the quota is used up or the client's queue is full
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {', '.join(PRIORITIES)}")
+        ticket_id = ticket_id or uuid.uuid4().hex
+        if ticket_id in self._tickets:
+            raise SchedulerRejection(f"Analysis '{ticket_id}' is already queued or running", 1)
+        ticket = self._enqueue(ticket_id, client_id, priority, cost)
+        try:
+            await asyncio.to_thread(self.ledger.charge, ticket_id, client_id, cost)
+        except BaseException:
+            self._finish(ticket)
+            raise
+
+        completed = False
+        try:
+            self._dispatch()
+            await ticket.admitted.wait()
+            if ticket.waited_seconds > 1:
+                logger.info(f"Analysis {ticket_id} admitted after {ticket.waited_seconds:.1f}s in queue")
+            yield ticket
+            completed = not ticket.failed
+        finally:
+            self._finish(ticket)
+            if not completed:
+                await asyncio.to_thread(self.ledger.refund, ticket_id)
+
+    def position(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Queue position and estimated wait of an analysis.
+
+        Args:
+            ticket_id: Identifier the analysis was admitted under
+
+        Returns:
+            Dictionary with 'state' ('queued' or 'running'), 'position'
+            (analyses admitted before it), 'estimated_start_seconds' and
+            'waited_seconds', or None when the analysis is unknown
+        """
+        ticket = self._tickets.get(ticket_id)
+        if ticket is None:
+            return None
+        if ticket.started_at is not None:
+            return {"state": "running", "position": 0, "estimated_start_seconds": 0,
+                    "waited_seconds": round(ticket.waited_seconds, 1)}
+
+        key = next((tag, seq) for tag, seq, t in self._waiting[ticket.priority] if t is ticket)
+        ahead = 0
+        for priority in PRIORITIES:
+            if priority == ticket.priority:
+                ahead += sum(1 for tag, seq, _ in self._waiting[priority] if (tag, seq) < key)
+                break
+            ahead += len(self._waiting[priority])
+        # Every slot is busy while anything waits; each frees up after about
+        # one average duration
+        estimate = (ahead // self.slots + 1) * self.average_duration
+        return {
+            "state": "queued",
+            "position": ahead + 1,
+            "estimated_start_seconds": round(estimate, 1),
+            "waited_seconds": round(ticket.waited_seconds, 1)
+        }
+
+    def client_tickets(self, client_id: str) -> List[Dict[str, Any]]:
+        """Positions of a client's queued and running analyses"""
+        return [
+            {"id": ticket_id, "priority": ticket.priority, **self.position(ticket_id)}
+            for ticket_id, ticket in self._tickets.items() if ticket.client_id == client_id
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        """Slots in use and queue lengths per priority class"""
+        return {
+            "slots": self.slots,
+            "running": self._running,
+            "queued": {priority: len(heap) for priority, heap in self._waiting.items()},
+            "average_duration_seconds": round(self.average_duration, 1)
+        }
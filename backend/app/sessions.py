@@ -0,0 +1,131 @@
+"""
+Analysis Sessions
+Remembers each session's last input and intake report for incremental re-analysis
+
+A session expires once it has not been updated for the retention period;
+the next submission then starts it over with a full analysis. Inputs,
+intake reports and results are stored redacted; identifiers are put back
+from each submission when the session's result is returned.
+"""
+
+import difflib
+import re
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from .sqlite_store import SQLiteStore
+from backend.config import SESSION_DB_PATH, SESSION_RETENTION_HOURS
+
+# Inputs are compared sentence by sentence (or line by line)
+SEGMENT_PATTERN = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def _segments(text: str) -> list:
+    return [segment.strip() for segment in SEGMENT_PATTERN.split(text) if segment.strip()]
+
+
+def diff_input(previous: str, current: str) -> Optional[str]:
+    """
+    Find the information added to a patient description.
+
+    Args:
+        previous: Previously analyzed description
+        current: Resubmitted description
+
+    Returns:
+        The added text ('' if nothing changed), or None when earlier
+        information was removed or rewritten and a full re-analysis is needed
+    """
+    old, new = _segments(previous), _segments(current)
+    added = []
+
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+        if tag == 'equal':
+            continue
+        if tag == 'insert':
+            added.extend(new[j1:j2])
+        elif tag == 'replace' and i2 - i1 == 1 and new[j1].startswith(old[i1]):
+            # A sentence that was only extended counts as an addition
+            tail = new[j1][len(old[i1]):].strip()
+            added.extend(([tail] if tail else []) + new[j1 + 1:j2])
+        else:
+            return None
+
+    return ' '.join(added)
+
+
+class SessionStore(SQLiteStore):
+    """SQLite store of analysis sessions"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        session_id TEXT PRIMARY KEY,
+        patient_input TEXT NOT NULL,
+        intake_report TEXT NOT NULL,
+        result TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_sessions_updated ON sessions (updated_at);
+    """
+
+    def __init__(self, db_path: Path = SESSION_DB_PATH, retention_hours: float = SESSION_RETENTION_HOURS):
+        """
+        Initialize the session store.
+
+        Args:
+            db_path: SQLite database file
+            retention_hours: How long a session is kept after its last update
+        """
+        super().__init__(db_path)
+        self.retention_seconds = retention_hours * 3600
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get a session that has not expired.
+
+        Args:
+            session_id: Session identifier
+
+        Returns:
+            Dictionary with 'patient_input', 'intake_report' and 'result', or None
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT patient_input, intake_report, result FROM sessions "
+                "WHERE session_id = ? AND updated_at >= ?",
+                (session_id, time.time() - self.retention_seconds)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"patient_input": row[0], "intake_report": row[1], "result": row[2]}
+
+    def save(self, session_id: str, patient_input: str, intake_report: str, result: str):
+        """
+        Create or update a session.
+
+        Args:
+            session_id: Session identifier
+            patient_input: Latest analyzed description
+            intake_report: Intake report for that description
+            result: Final report for that description
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, patient_input, intake_report, result, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (session_id, patient_input, intake_report, result, time.time())
+            )
+
+    def purge_expired(self) -> int:
+        """
+        Delete sessions past the retention period.
+
+        Returns:
+            Number of sessions removed
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.retention_seconds,)
+            )
+        return cursor.rowcount
@@ -0,0 +1,40 @@
+"""
+SQLite Store Base
+Shared connection handling for the local SQLite-backed stores
+"""
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class SQLiteStore:
+    """Base class for stores kept in a local SQLite database (WAL mode)"""
+
+    SCHEMA = ""
+
+    def __init__(self, db_path: Path):
+        """
+        Initialize the store and create its tables.
+
+        Args:
+            db_path: SQLite database file
+        """
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+
+        with self._connect() as conn:
+            conn.executescript(self.SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection; the block runs in one transaction"""
+        with self._lock:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            try:
+                conn.execute("PRAGMA journal_mode=WAL")
+                with conn:
+                    yield conn
+            finally:
+                conn.close()
@@ -0,0 +1,125 @@
+"""
+Stage Cache
+Memoizes task outputs keyed by everything the task's LLM call depends on
+
+A task's key hashes its rendered description and expected output, its
+agent's prompt and tools, its model settings and the outputs of its
+context tasks. Two analyses whose intake reports come out the same then
+share the diagnosis, and editing one task's prompt only invalidates that
+task and the tasks downstream of it.
+"""
+
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+from crewai import Task
+from crewai.utilities.string_utils import interpolate_only
+
+from .sqlite_store import SQLiteStore
+from backend.config import STAGE_CACHE_DB_PATH, STAGE_CACHE_RETENTION_HOURS
+
+# LLM settings that change what a model answers
+MODEL_FIELDS = ('model', 'base_url', 'temperature', 'top_p', 'max_tokens', 'seed', 'reasoning_effort')
+
+
+def stage_key(task: Task, inputs: Dict[str, Any]) -> str:
+    """
+    Cache key of a task about to run.
+
+    Args:
+        task: Task whose context tasks have all finished
+        inputs: Crew inputs the task's prompts are interpolated with
+
+    Returns:
+        Hex digest identifying the task's LLM call
+    """
+    agent, llm = task.agent, task.agent.llm
+    payload = {
+        "description": interpolate_only(task.description, inputs),
+        "expected_output": interpolate_only(task.expected_output, inputs),
+        "agent": [agent.role, agent.goal, agent.backstory, sorted(tool.name for tool in agent.tools or [])],
+        "model": {field: getattr(llm, field, None) for field in MODEL_FIELDS},
+        "context": [context.output.raw for context in task.context or []]
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()
+
+
+class StageCache(SQLiteStore):
+    """SQLite store of task outputs keyed by stage_key"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS stage_outputs (
+        cache_key TEXT PRIMARY KEY,
+        task_name TEXT NOT NULL,
+        output TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        used_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_stage_outputs_used ON stage_outputs (used_at);
+    """
+
+    def __init__(self, db_path: Path = STAGE_CACHE_DB_PATH, retention_hours: float = STAGE_CACHE_RETENTION_HOURS):
+        """
+        Initialize the stage cache.
+
+        Args:
+            db_path: SQLite database file
+            retention_hours: How long an output stays cached after its last use
+        """
+        super().__init__(db_path)
+        self.retention_seconds = retention_hours * 3600
+
+    def get(self, cache_key: str) -> Optional[str]:
+        """
+        Get a cached output and mark it as used.
+
+        Args:
+            cache_key: Key from stage_key
+
+        Returns:
+            Raw task output, or None on a miss
+        """
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT output FROM stage_outputs WHERE cache_key = ? AND used_at >= ?",
+                (cache_key, now - self.retention_seconds)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE stage_outputs SET used_at = ? WHERE cache_key = ?", (now, cache_key))
+        return row[0]
+
+    def put(self, cache_key: str, task_name: str, output: str):
+        """
+        Cache a task output.
+
+        Args:
+            cache_key: Key from stage_key
+            task_name: Task that produced the output
+            output: Raw task output
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO stage_outputs (cache_key, task_name, output, created_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (cache_key, task_name, output, now, now)
+            )
+
+    def purge_expired(self) -> int:
+        """
+        Delete outputs not used within the retention period.
+
+        Returns:
+            Number of outputs removed
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "DELETE FROM stage_outputs WHERE used_at < ?", (time.time() - self.retention_seconds,)
+            )
+        return cursor.rowcount
@@ -0,0 +1,249 @@
+"""
+Stage Pipelining
+Overlaps the communication stage with the diagnosis it is written from
+
+With PIPELINE_STREAMING on, the 'source' stage of the 'streaming' block in
+pipeline.json (the diagnosis) runs with a streaming LLM. The sections the
+block lists are cut out of the stream as soon as their text is complete
+(one unit per ranked diagnosis for itemised sections), and each unit is
+drafted into its patient-facing section while later sections are still
+being generated. Once the diagnosis is done, a reconciliation pass of the
+'target' stage's agent writes the rest of the guide around the drafts,
+putting a [[PLACEHOLDER]] line where each drafted section belongs, or
+rewrites a section itself when the finished analysis contradicts a draft.
+"""
+
+import logging
+import re
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from crewai import Task
+from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+from crewai.events.types.llm_events import LLMCallType
+from crewai.tasks.task_output import TaskOutput
+from crewai.utilities.string_utils import interpolate_only
+
+from backend.config import PIPELINE_DRAFT_CONCURRENCY
+
+logger = logging.getLogger(__name__)
+
+# An unindented line in capitals ("RECOMMENDED WORKUP", "DIFFERENTIAL
+# DIAGNOSIS (Ranked by Likelihood)"), possibly in markdown or after the
+# agent's "Final Answer:" marker
+HEADING = re.compile(
+    r"^(?:Final Answer:\s*)?[#*]*\s*(?P<title>[A-Z][A-Z0-9 /&'-]{3,}?)\s*(?:\([^)]*\))?[*:\s]*$"
+)
+
+# Start of a numbered item ("1. Stable Angina - Likelihood: High")
+ITEM = re.compile(r"^(?:Final Answer:\s*)?[#*]*\s*\d+[.)]\s")
+
+Unit = Tuple[Dict[str, Any], str]
+
+
+class SectionSplitter:
+    """Cuts a report into the units of its drafted sections as lines arrive"""
+
+    def __init__(self, sections: List[Dict[str, Any]]):
+        """
+        Initialize the splitter.
+
+        Args:
+            sections: Section configurations from the 'streaming' block
+                ('heading', 'placeholder', optional 'per_item' and 'max_items')
+        """
+        self.sections = sections
+        self.reset()
+
+    def reset(self):
+        """Start over, e.g. when the LLM begins a new response"""
+        self._buffer = ""
+        self._section: Optional[Dict[str, Any]] = None
+        self._lines: List[str] = []
+        self._items = 0
+
+    def feed(self, text: str) -> List[Unit]:
+        """
+        Add streamed text.
+
+        Returns:
+            (section, unit text) pairs completed by the text
+        """
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split("\n")
+        units = []
+        for line in lines:
+            units += self._line(line)
+        return units
+
+    def close(self) -> List[Unit]:
+        """Finish the stream and return the units still open"""
+        units = self._line(self._buffer) if self._buffer else []
+        self._buffer = ""
+        return units + self._flush()
+
+    def split(self, text: str) -> List[Unit]:
+        """Units of a complete report"""
+        self.reset()
+        return self.feed(text) + self.close()
+
+    def _flush(self) -> List[Unit]:
+        unit = "\n".join(self._lines).strip()
+        self._lines = []
+        return [(self._section, unit)] if self._section and unit else []
+
+    def _line(self, line: str) -> List[Unit]:
+        heading = None if line[:1].isspace() else HEADING.match(line.rstrip())
+        if heading:
+            units = self._flush()
+            title = heading.group('title')
+            self._section = next((s for s in self.sections if title.startswith(s['heading'])), None)
+            self._items = 0
+            return units
+        if self._section is None:
+            return []
+        if not self._section.get('per_item'):
+            self._lines.append(line)
+            return []
+
+        units = []
+        if ITEM.match(line):
+            units = self._flush()
+            self._items += 1
+        # Lines before the first item and items past the limit are left out
+        if 0 < self._items <= self._section.get('max_items', self._items):
+            self._lines.append(line)
+        return units
+
+
+class StagePipeline:
+    """Runs the source stage streamed and drafts the target stage from it"""
+
+    def __init__(self, crew_factory, config: Dict[str, Any], draft_concurrency: int = PIPELINE_DRAFT_CONCURRENCY):
+        """
+        Initialize the pipeline.
+
+        Args:
+            crew_factory: CrewFactory the tasks and crews are created with
+            config: 'streaming' block of pipeline.json
+            draft_concurrency: Sections drafted at the same time per analysis
+        """
+        self.crew_factory = crew_factory
+        self.source = config['source']
+        self.target = config['target']
+        self.sections = config['sections']
+        self.draft_concurrency = draft_concurrency
+        self.draft_config = crew_factory.prompt_loader.get_task_config(config['draft_task'])
+        self.reconcile_task = config['reconcile_task']
+
+    def applies(self, tasks: Dict[str, Task], name: str) -> bool:
+        """
+        Whether a node about to run should run pipelined with the target.
+
+        Only the source qualifies, and only while the target still has to
+        run and everything else the target depends on has finished.
+        """
+        if name != self.source or self.target not in tasks:
+            return False
+        target = tasks[self.target]
+        if target.output is not None:
+            return False
+        return all(task.output is not None for task in target.context or [] if task is not tasks[name])
+
+    def _draft(self, agent, section: Dict[str, Any], excerpt: str) -> str:
+        """Write one patient-facing unit with the target agent's LLM"""
+        inputs = {
+            "section": section['placeholder'],
+            "instructions": section.get('instructions', ''),
+            "excerpt": excerpt
+        }
+        messages = [
+            {"role": "system", "content": f"You are {agent.role}. {agent.backstory}\nYour personal goal is: {agent.goal}"},
+            {"role": "user", "content": (
+                f"{interpolate_only(self.draft_config['description'], inputs)}\n\n"
+                f"This is the expected criteria for your final answer: {self.draft_config['expected_output']}"
+            )}
+        ]
+        return str(agent.llm.call(messages)).strip()
+
+    def run(self, tasks: Dict[str, Task], inputs: Dict[str, Any], task_callback=None):
+        """
+        Run the source stage and produce the target stage's output.
+
+        Both tasks end up with an output and task_callback is called for
+        each, as if they had run one after the other.
+
+        Args:
+            tasks: Pipeline tasks keyed by name
+            inputs: Crew inputs used to interpolate the task descriptions
+            task_callback: Called with each finished task's output
+        """
+        source, target = tasks[self.source], tasks[self.target]
+        splitter = SectionSplitter(self.sections)
+        drafts: Dict[str, Future] = {}
+        response = {"id": None}
+        pool = ThreadPoolExecutor(max_workers=self.draft_concurrency, thread_name_prefix="section-draft")
+
+        def submit(section: Dict[str, Any], unit: str) -> Future:
+            if unit not in drafts:
+                drafts[unit] = pool.submit(self._draft, target.agent, section, unit)
+            return drafts[unit]
+
+        def on_chunk(_, event: LLMStreamChunkEvent):
+            # Called on the streaming thread, in chunk order
+            if event.task_id != str(source.id) or event.call_type == LLMCallType.TOOL_CALL:
+                return
+            if event.response_id != response["id"]:
+                response["id"] = event.response_id
+                splitter.reset()
+            for section, unit in splitter.feed(event.chunk):
+                submit(section, unit)
+
+        streaming_llm = source.agent.llm
+        source.agent.llm = streaming_llm.model_copy(update={"stream": True})
+        crewai_event_bus.register_handler(LLMStreamChunkEvent, on_chunk)
+        try:
+            crew = self.crew_factory.create_crew([source], task_callback=task_callback)
+            crew.kickoff(inputs=inputs)
+        finally:
+            crewai_event_bus.off(LLMStreamChunkEvent, on_chunk)
+            source.agent.llm = streaming_llm
+
+        try:
+            # Units of the final answer decide; ones that streamed identically
+            # reuse their draft, the rest (the last unit, retried answers)
+            # are drafted now
+            final_units = SectionSplitter(self.sections).split(source.output.raw)
+            streamed = set(drafts)
+            pending = [(section, submit(section, unit)) for section, unit in final_units]
+            reused = sum(1 for _, unit in final_units if unit in streamed)
+            logger.info(f"Drafted {reused} of {len(final_units)} sections while the diagnosis streamed")
+
+            drafted: Dict[str, List[str]] = {section['placeholder']: [] for section in self.sections}
+            for section, future in pending:
+                drafted[section['placeholder']].append(future.result())
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        self._reconcile(target, inputs, drafted, task_callback)
+
+    def _reconcile(self, target: Task, inputs: Dict[str, Any], drafted: Dict[str, List[str]], task_callback=None):
+        """Write the rest of the guide around the drafts and set it as the target's output"""
+        filled = {placeholder: "\n\n".join(units) for placeholder, units in drafted.items() if units}
+        listing = "\n\n".join(f"[[{placeholder}]]\n{text}" for placeholder, text in filled.items())
+
+        task = self.crew_factory.create_task(
+            self.reconcile_task, agent=target.agent, context=target.context, name=self.target
+        )
+        self.crew_factory.create_crew([task]).kickoff(
+            inputs={**inputs, "pipelined_drafts": listing or "(none)"}
+        )
+
+        raw = task.output.raw
+        for placeholder in drafted:
+            if placeholder not in filled and f"[[{placeholder}]]" in raw:
+                logger.warning(f"Nothing was drafted for [[{placeholder}]], the section is left empty")
+            raw = raw.replace(f"[[{placeholder}]]", filled.get(placeholder, ""))
+        target.output = TaskOutput(name=self.target, description=target.description, raw=raw, agent=target.agent.role)
+        if task_callback:
+            task_callback(target.output)
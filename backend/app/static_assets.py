@@ -0,0 +1,167 @@
+"""
+Static Assets
+Serves the frontend from memory with precompressed variants and fingerprinted URLs
+
+Every file under frontend/static and the index page are read once at
+startup. Each gets gzip and brotli variants compressed at the highest
+level (the cost is paid once) and a strong ETag per variant. Static files
+are also served under a fingerprinted name (app.<hash>.js) with a
+year-long immutable Cache-Control; index.html links to those names and is
+revalidated on every load, so a deploy is picked up at once.
+"""
+
+import copy
+import gzip
+import hashlib
+import logging
+import mimetypes
+import re
+from pathlib import Path
+from typing import Dict, Optional
+
+from backend.app.response_encoding import negotiate_encoding, etag_matches, brotli
+from backend.config import STATIC_MAX_AGE
+
+logger = logging.getLogger(__name__)
+
+# Variants smaller than this share of the original are not worth keeping
+MIN_SAVING = 0.9
+
+# Links in index.html to files under frontend/static
+STATIC_LINK = re.compile(r'(?P<attr>(?:href|src)=")(?:\.\./|/)?static/(?P<name>[^"?#]+)"')
+
+# Media types worth compressing
+TEXT_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+
+
+def compressed_variants(body: bytes, content_type: str) -> Dict[Optional[str], bytes]:
+    """
+    Body of a file in every content encoding worth serving.
+
+    Args:
+        body: File contents
+        content_type: Media type of the file
+
+    Returns:
+        Dictionary from encoding ('gzip', 'br', or None for identity) to body
+    """
+    variants: Dict[Optional[str], bytes] = {None: body}
+    if not content_type.startswith(TEXT_TYPES):
+        return variants
+    candidates = {'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        candidates['br'] = brotli.compress(body, quality=11)
+    for encoding, compressed in candidates.items():
+        if len(compressed) < len(body) * MIN_SAVING:
+            variants[encoding] = compressed
+    return variants
+
+
+class Asset:
+    """One file held in memory with its compressed variants"""
+
+    def __init__(self, body: bytes, content_type: str, cache_control: str):
+        """
+        Initialize the asset and precompute its variants.
+
+        Args:
+            body: File contents
+            content_type: Media type sent in Content-Type
+            cache_control: Cache-Control header value
+        """
+        self.content_type = content_type
+        self.cache_control = cache_control
+        self.digest = hashlib.blake2b(body, digest_size=16).hexdigest()
+        self.variants = compressed_variants(body, content_type)
+
+    def with_cache_control(self, cache_control: str) -> "Asset":
+        """Same content and variants under another Cache-Control"""
+        asset = copy.copy(self)
+        asset.cache_control = cache_control
+        return asset
+
+    def etag(self, encoding: Optional[str]) -> str:
+        """Strong ETag of one variant"""
+        return f'"{self.digest}-{encoding}"' if encoding else f'"{self.digest}"'
+
+    def respond(self, accept_encoding: Optional[str], if_none_match: Optional[str]) -> tuple:
+        """
+        Pick the variant for a request.
+
+        Args:
+            accept_encoding: Request Accept-Encoding header
+            if_none_match: Request If-None-Match header
+
+        Returns:
+            Tuple of (status, body, headers); status is 304 with an empty
+            body when the client's copy is current
+        """
+        encoding = negotiate_encoding(accept_encoding)
+        if encoding not in self.variants:
+            encoding = None
+        etag = self.etag(encoding)
+        headers = {
+            "ETag": etag,
+            "Cache-Control": self.cache_control,
+            "Vary": "Accept-Encoding"
+        }
+        if etag_matches(if_none_match, etag):
+            return 304, b"", headers
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return 200, self.variants[encoding], headers
+
+
+class StaticAssets:
+    """The frontend's index page and static files, loaded once"""
+
+    def __init__(self, static_dir: Path, index_path: Path, max_age: int = STATIC_MAX_AGE):
+        """
+        Load and compress every asset.
+
+        Args:
+            static_dir: Directory served under /static
+            index_path: Page served at /
+            max_age: Seconds fingerprinted files may be cached
+        """
+        self.assets: Dict[str, Asset] = {}
+        self.urls: Dict[str, str] = {}
+        self.index: Optional[Asset] = None
+
+        immutable = f"public, max-age={max_age}, immutable"
+        if static_dir.exists():
+            for path in sorted(p for p in static_dir.rglob('*') if p.is_file()):
+                name = path.relative_to(static_dir).as_posix()
+                body = path.read_bytes()
+                asset = Asset(body, self._content_type(path), "no-cache")
+                self.assets[name] = asset
+                fingerprinted = self.fingerprint(name, asset.digest)
+                self.assets[fingerprinted] = asset.with_cache_control(immutable)
+                self.urls[name] = f"/static/{fingerprinted}"
+
+        if index_path.exists():
+            html = STATIC_LINK.sub(self._link, index_path.read_text(encoding='utf-8'))
+            self.index = Asset(html.encode('utf-8'), "text/html; charset=utf-8", "no-cache")
+
+        logger.info(f"Loaded {len(self.urls)} static assets into memory")
+
+    @staticmethod
+    def fingerprint(name: str, digest: str) -> str:
+        """app.js -> app.<first 12 hex digits of the content hash>.js"""
+        stem, dot, suffix = name.rpartition('.')
+        return f"{stem}.{digest[:12]}.{suffix}" if dot else f"{name}.{digest[:12]}"
+
+    @staticmethod
+    def _content_type(path: Path) -> str:
+        content_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+        return content_type
+
+    def _link(self, match: re.Match) -> str:
+        url = self.urls.get(match.group('name'))
+        return f'{match.group("attr")}{url}"' if url else match.group(0)
+
+    def get(self, name: str) -> Optional[Asset]:
+        """Asset served at /static/<name>, by original or fingerprinted name"""
+        return self.assets.get(name)
@@ -0,0 +1,463 @@
+"""
+Token Estimator
+Predicts the tokens and latency of an analysis before it runs
+
+Every stage's prompt is rendered the way its agent sends it (the role,
+backstory and goal, tool descriptions, task description and expected
+output from backend/prompts/*.json, plus the reports of the stages it
+depends on) and counted with tiktoken when it is installed, or at about
+four characters per token otherwise. The parts that do not depend on the
+patient input are counted once per prompt version, so an estimate only
+tokenizes the input itself. prompt_budget() breaks those parts down by
+prompt field, for comparing prompt profiles.
+
+Finished stages record their duration and token usage. From the recent
+records of each stage come its completion size, how much its agent's tool
+use multiplies the rendered prompt and its generation speed; stages that
+have not run yet use the ESTIMATE_* defaults. The intake of a long input is
+estimated as its chunk extractions plus a merge of their notes. Stage
+latencies are added up along the slowest path of the pipeline graph.
+"""
+
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+
+from crewai import Task
+
+from .bulk_mode import render_messages
+from .sqlite_store import SQLiteStore
+from backend.config import (
+    ESTIMATE_TOKENIZER,
+    ESTIMATE_COMPLETION_TOKENS,
+    ESTIMATE_TOKENS_PER_SECOND,
+    ESTIMATE_PREFILL_TOKENS_PER_SECOND,
+    ESTIMATE_WINDOW,
+    MAX_INPUT_TOKENS,
+    MAX_PROMPT_TOKENS,
+    STAGE_TIMINGS_DB_PATH
+)
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+logger = logging.getLogger(__name__)
+
+# Seconds between reloads of the recorded stage statistics
+STATS_REFRESH_SECONDS = 30
+
+_encoding = None
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """tiktoken encoding named by ESTIMATE_TOKENIZER, or None without tiktoken"""
+    global _encoding
+    if tiktoken is None:
+        return None
+    with _encoding_lock:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding(ESTIMATE_TOKENIZER)
+    return _encoding
+
+
+def tokenizer_name() -> str:
+    """Name of the tokenizer count_tokens uses"""
+    return f"tiktoken:{ESTIMATE_TOKENIZER}" if tiktoken is not None else "chars/4"
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text.
+
+    Args:
+        text: Text to count
+
+    Returns:
+        Token count with the configured tiktoken encoding, or the four
+        characters per token heuristic when tiktoken is not installed
+    """
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4
+    return len(encoding.encode_ordinary(text))
+
+
+def system_prompt(agent_config: Dict[str, Any], tools: list) -> str:
+    """System prompt of an agent with its tool descriptions"""
+    prompt = (
+        f"You are {agent_config['role']}. {agent_config['backstory']}\n"
+        f"Your personal goal is: {agent_config['goal']}"
+    )
+    return "\n\n".join([prompt] + [tool.description for tool in tools])
+
+
+def stage_prompt(spec: Dict[str, Any]) -> Tuple[str, str]:
+    """
+    System and user prompt of a stage without the patient input and context.
+
+    Args:
+        spec: The stage's prompts from CrewFactory.get_stage_prompts()
+
+    Returns:
+        (system prompt, user prompt)
+    """
+    task = spec['task']
+    user = (
+        f"{task['description'].replace('{patient_input}', '')}\n\n"
+        f"This is the expected criteria for your final answer: "
+        f"{task['expected_output'].replace('{patient_input}', '')}\n"
+        "you MUST return the actual complete content as the final answer, not a summary."
+    )
+    if spec['depends_on']:
+        user += "\n\nThis is the context you're working with:\n"
+    return system_prompt(spec['agent'], spec['tools']), user
+
+
+def prompt_budget(crew_factory) -> Dict[str, Any]:
+    """
+    Token cost of each prompt field, per stage.
+
+    A stage's fixed prompt is split into its agent's role, goal and
+    backstory, its tool descriptions, its task's description and expected
+    output, and the framing CrewAI wraps around them. Task prompts that
+    stand in for a stage (incremental update, draft, reconcile, chunk
+    extraction and merge) are listed with their own fields under 'tasks'.
+
+    Args:
+        crew_factory: CrewFactory whose prompts are counted
+
+    Returns:
+        Dict with the 'profile', 'prompt_version' and 'tokenizer', the
+        fields and 'total' of every pipeline stage under 'stages', the
+        other task prompts under 'tasks' and the stages' 'total'
+    """
+    stages = {}
+    used = set()
+    for name in crew_factory.get_stage_names():
+        spec = crew_factory.get_stage_prompts(name)
+        used.add(spec['task_name'])
+        system, user = stage_prompt(spec)
+        fields = {
+            "role": count_tokens(spec['agent']['role']),
+            "goal": count_tokens(spec['agent']['goal']),
+            "backstory": count_tokens(spec['agent']['backstory']),
+            "tools": sum(count_tokens(tool.description) for tool in spec['tools']),
+            "description": count_tokens(spec['task']['description'].replace('{patient_input}', '')),
+            "expected_output": count_tokens(spec['task']['expected_output'].replace('{patient_input}', ''))
+        }
+        total = count_tokens(system) + count_tokens(user)
+        fields['framing'] = total - sum(fields.values())
+        stages[name] = {"fields": fields, "total": total}
+
+    tasks = {}
+    for name, task in crew_factory.prompt_loader.load_task_descriptions().items():
+        if name in used:
+            continue
+        fields = {
+            "description": count_tokens(task['description'].replace('{patient_input}', '')),
+            "expected_output": count_tokens(task['expected_output'].replace('{patient_input}', ''))
+        }
+        tasks[name] = {"fields": fields, "total": sum(fields.values())}
+
+    return {
+        "profile": crew_factory.prompt_loader.profile,
+        "prompt_version": crew_factory.prompt_loader.get_prompt_version(),
+        "tokenizer": tokenizer_name(),
+        "stages": stages,
+        "tasks": tasks,
+        "total": sum(stage['total'] for stage in stages.values())
+    }
+
+
+def profile(observed: Optional[Dict[str, float]], default_completion: int) -> Tuple[int, float, float]:
+    """
+    Completion size, prompt multiplier and generation speed of a stage.
+
+    Args:
+        observed: The stage's totals from StageTimings.summary(), if any
+        default_completion: Completion tokens assumed before the stage has run
+
+    Returns:
+        (completion tokens per run, prompts sent per rendered prompt,
+        completion tokens per second)
+    """
+    if not observed or not observed['rendered_tokens'] or not observed['completion_tokens']:
+        return default_completion, 1.0, ESTIMATE_TOKENS_PER_SECOND
+    completion = round(observed['completion_tokens'] / observed['runs'])
+    # Tool use and retries send the prompt more than once
+    calls = max(observed['prompt_tokens'] / observed['rendered_tokens'], 1.0)
+    # Part of the stage's time went to reading its prompt
+    prefill = observed['prompt_tokens'] / ESTIMATE_PREFILL_TOKENS_PER_SECOND
+    generating = max(observed['seconds'] - prefill, observed['seconds'] / 2)
+    return completion, calls, observed['completion_tokens'] / generating
+
+
+class StageTimings(SQLiteStore):
+    """SQLite store of recent stage runs: duration and token usage"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS stage_timings (
+        task_name TEXT NOT NULL,
+        seconds REAL NOT NULL,
+        rendered_tokens INTEGER NOT NULL,
+        prompt_tokens INTEGER NOT NULL,
+        completion_tokens INTEGER NOT NULL,
+        created_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_stage_timings_task ON stage_timings (task_name, created_at);
+    """
+
+    def __init__(self, db_path: Path = STAGE_TIMINGS_DB_PATH, window: int = ESTIMATE_WINDOW):
+        """
+        Initialize the store.
+
+        Args:
+            db_path: SQLite database file
+            window: Runs kept per stage
+        """
+        super().__init__(db_path)
+        self.window = window
+
+    def record(self, task_name: str, seconds: float, rendered_tokens: int, prompt_tokens: int, completion_tokens: int):
+        """
+        Record a finished stage, dropping the stage's runs beyond the window.
+
+        Args:
+            task_name: Pipeline task name
+            seconds: Wall time of the stage's crew
+            rendered_tokens: Tokens of the stage's rendered prompt
+            prompt_tokens: Prompt tokens the provider reported over all its LLM calls
+            completion_tokens: Completion tokens the provider reported
+        """
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO stage_timings "
+                "(task_name, seconds, rendered_tokens, prompt_tokens, completion_tokens, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (task_name, seconds, rendered_tokens, prompt_tokens, completion_tokens, time.time())
+            )
+            conn.execute(
+                "DELETE FROM stage_timings WHERE task_name = ? AND rowid NOT IN ("
+                "SELECT rowid FROM stage_timings WHERE task_name = ? ORDER BY created_at DESC LIMIT ?)",
+                (task_name, task_name, self.window)
+            )
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """
+        Totals over the recorded runs of each stage.
+
+        Returns:
+            Dict keyed by task name with 'runs', 'seconds',
+            'rendered_tokens', 'prompt_tokens' and 'completion_tokens'
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT task_name, COUNT(*), SUM(seconds), SUM(rendered_tokens), "
+                "SUM(prompt_tokens), SUM(completion_tokens) FROM stage_timings GROUP BY task_name"
+            ).fetchall()
+        return {
+            row[0]: {
+                "runs": row[1],
+                "seconds": row[2],
+                "rendered_tokens": row[3],
+                "prompt_tokens": row[4],
+                "completion_tokens": row[5]
+            }
+            for row in rows
+        }
+
+
+class TokenEstimator:
+    """Estimates an analysis's tokens and latency and checks them against the limits"""
+
+    def __init__(
+        self,
+        crew_factory,
+        timings: StageTimings = None,
+        map_reduce=None,
+        max_input_tokens: int = MAX_INPUT_TOKENS,
+        max_prompt_tokens: int = MAX_PROMPT_TOKENS
+    ):
+        """
+        Initialize the estimator.
+
+        Args:
+            crew_factory: CrewFactory whose prompts and pipeline are estimated
+            timings: Store of recorded stage runs
+            map_reduce: IntakeMapReduce that writes the intake of long inputs, if enabled
+            max_input_tokens: Largest patient input admitted (0 = no limit)
+            max_prompt_tokens: Largest estimated prompt total admitted (0 = no limit)
+        """
+        self.crew_factory = crew_factory
+        self.timings = timings or StageTimings()
+        self.map_reduce = map_reduce
+        self.max_input_tokens = max_input_tokens
+        self.max_prompt_tokens = max_prompt_tokens
+        self._fixed: Dict[str, Any] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._stats_loaded = 0.0
+        self._lock = threading.Lock()
+
+    def _stage_prompts(self) -> Dict[str, Dict[str, Any]]:
+        """Token counts of every stage's prompt without the patient input and context"""
+        version = self.crew_factory.prompt_loader.get_prompt_version()
+        with self._lock:
+            if version in self._fixed:
+                return self._fixed[version]
+
+        stages = {}
+        for name in self.crew_factory.get_stage_names():
+            spec = self.crew_factory.get_stage_prompts(name)
+            template = spec['task']['description'] + spec['task']['expected_output']
+            system, user = stage_prompt(spec)
+            stages[name] = {
+                "fixed_tokens": count_tokens(system) + count_tokens(user),
+                "input_mentions": template.count('{patient_input}'),
+                "depends_on": spec['depends_on']
+            }
+
+        with self._lock:
+            self._fixed = {version: stages}
+        return stages
+
+    def stage_tokens(self, name: str, context: str = "") -> int:
+        """
+        Tokens of a stage's rendered prompt without the patient input.
+
+        Args:
+            name: Pipeline task name
+            context: Reports of the stages it depends on
+
+        Returns:
+            Prompt tokens of one call to the stage
+        """
+        return self._stage_prompts()[name]['fixed_tokens'] + (count_tokens(context) if context else 0)
+
+    def _stage_stats(self) -> Dict[str, Dict[str, float]]:
+        """Recorded stage totals, reloaded every STATS_REFRESH_SECONDS"""
+        now = time.monotonic()
+        if now - self._stats_loaded > STATS_REFRESH_SECONDS:
+            try:
+                stats = self.timings.summary()
+            except Exception as e:
+                logger.warning(f"Could not load stage timings: {str(e)}")
+                stats = self._stats
+            with self._lock:
+                self._stats, self._stats_loaded = stats, now
+        return self._stats
+
+    def estimate(self, patient_input: str) -> Dict[str, Any]:
+        """
+        Estimate a full analysis of a patient input.
+
+        Args:
+            patient_input: Patient's description of symptoms
+
+        Returns:
+            Dict with 'input_tokens', per-stage estimates under 'stages',
+            the totals 'prompt_tokens', 'completion_tokens' and
+            'total_tokens', the end-to-end 'latency_seconds' and the
+            'tokenizer' used
+        """
+        input_tokens = count_tokens(patient_input)
+        stats = self._stage_stats()
+        stages: Dict[str, Dict[str, Any]] = {}
+        finished_at: Dict[str, float] = {}
+
+        for name, prompt in self._stage_prompts().items():
+            observed = stats.get(name)
+            completion, calls, tokens_per_second = profile(observed, ESTIMATE_COMPLETION_TOKENS)
+
+            chunked = None
+            if self.map_reduce and name == self.map_reduce.stage and prompt['input_mentions']:
+                extract_completion, _, extract_speed = profile(
+                    stats.get(self.map_reduce.extract_stage), self.map_reduce.extract_max_tokens
+                )
+                chunked = self.map_reduce.estimate(
+                    input_tokens, extract_completion, extract_speed, ESTIMATE_PREFILL_TOKENS_PER_SECOND
+                )
+            if chunked:
+                # The merge reads the chunks' notes instead of the input
+                rendered = chunked['merge_prompt_tokens']
+            else:
+                rendered = prompt['fixed_tokens'] + prompt['input_mentions'] * input_tokens
+            rendered += sum(stages[dep]['completion_tokens'] for dep in prompt['depends_on'])
+            prompt_tokens = round(rendered * calls)
+
+            latency = prompt_tokens / ESTIMATE_PREFILL_TOKENS_PER_SECOND + completion / tokens_per_second
+            stage = {"observed_runs": observed['runs'] if observed else 0}
+            if chunked:
+                latency += chunked['latency_seconds']
+                stage['chunk_calls'] = chunked['calls']
+                stage['chunk_prompt_tokens'] = chunked['prompt_tokens']
+                stage['chunk_completion_tokens'] = chunked['completion_tokens']
+            finished_at[name] = max((finished_at[dep] for dep in prompt['depends_on']), default=0.0) + latency
+            stages[name] = {
+                "prompt_tokens": prompt_tokens + (chunked['prompt_tokens'] if chunked else 0),
+                "completion_tokens": completion,
+                "latency_seconds": round(latency, 2),
+                **stage
+            }
+
+        prompt_total = sum(stage['prompt_tokens'] for stage in stages.values())
+        completion_total = sum(
+            stage['completion_tokens'] + stage.get('chunk_completion_tokens', 0) for stage in stages.values()
+        )
+        return {
+            "input_tokens": input_tokens,
+            "prompt_tokens": prompt_total,
+            "completion_tokens": completion_total,
+            "total_tokens": prompt_total + completion_total,
+            "latency_seconds": round(max(finished_at.values(), default=0.0), 2),
+            "stages": stages,
+            "tokenizer": tokenizer_name()
+        }
+
+    def check(self, estimate: Dict[str, Any]) -> Optional[str]:
+        """
+        Check an estimate against the configured limits.
+
+        Args:
+            estimate: Result of estimate()
+
+        Returns:
+            Why the analysis is refused, or None when it is admitted
+        """
+        if self.max_input_tokens and estimate['input_tokens'] > self.max_input_tokens:
+            return (
+                f"Patient input is about {estimate['input_tokens']} tokens; "
+                f"the limit is {self.max_input_tokens}. Please shorten the description."
+            )
+        if self.max_prompt_tokens and estimate['prompt_tokens'] > self.max_prompt_tokens:
+            return (
+                f"The analysis would send about {estimate['prompt_tokens']} prompt tokens; "
+                f"the limit is {self.max_prompt_tokens}. Please shorten the description."
+            )
+        return None
+
+    def limits(self) -> Dict[str, int]:
+        """The configured limits (0 = no limit)"""
+        return {"max_input_tokens": self.max_input_tokens, "max_prompt_tokens": self.max_prompt_tokens}
+
+    def observe(self, task: Task, inputs: Dict[str, Any], seconds: float, usage):
+        """
+        Record a stage that ran through its own crew.
+
+        Args:
+            task: Finished task, with its context tasks finished
+            inputs: Crew inputs its description was interpolated with
+            seconds: Wall time of the crew's kickoff
+            usage: The crew's usage_metrics
+        """
+        if not usage or not usage.completion_tokens:
+            # Providers that do not report usage leave nothing to learn from
+            return
+        messages = render_messages(task, inputs, [context.output.raw for context in task.context or []])
+        rendered = sum(count_tokens(message['content']) for message in messages)
+        rendered += sum(count_tokens(tool.description) for tool in task.agent.tools or [])
+        self.timings.record(task.name, seconds, rendered, usage.prompt_tokens, usage.completion_tokens)
@@ -0,0 +1,102 @@
+"""
+Audit Log Reader
+Lists, streams, seeks and verifies the audit log segments
+
+    # Segments with their record counts and time ranges
+    python -m backend.audit segments
+
+    # Stream records as JSON lines, optionally within a time range or for
+    # one request; blocks outside the range are not decompressed
+    python -m backend.audit cat --since 2026-10-19T08:00 --until 2026-10-19T09:00
+    python -m backend.audit cat --request-id 9ea75b28a5194833892dfc2b6ff9eeaa
+
+    # One record by the address listed with it, decompressing one block
+    python -m backend.audit get audit-20261019T080112-4242-0:1830
+
+    # Check every block's checksum
+    python -m backend.audit verify
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path FIRST
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.app.audit_log import AuditReader, AuditLogError
+from backend.config import AUDIT_DIR
+
+
+def timestamp(value: str) -> float:
+    """Epoch seconds of an ISO date or date-time"""
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"'{value}' is not an ISO date or date-time")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Read the audit log segments")
+    parser.add_argument("--dir", type=Path, default=AUDIT_DIR, help="Audit log directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("segments", help="List segments")
+
+    cat = commands.add_parser("cat", help="Stream records as JSON lines")
+    cat.add_argument("--since", type=timestamp, help="Only records at or after this time")
+    cat.add_argument("--until", type=timestamp, help="Only records at or before this time")
+    cat.add_argument("--request-id", help="Only records of this request")
+    cat.add_argument("--session-id", help="Only records of this session")
+    cat.add_argument("--segment", help="Only this segment")
+
+    get = commands.add_parser("get", help="Print one record by address")
+    get.add_argument("address", help="segment:position")
+
+    commands.add_parser("verify", help="Check every block's header and checksum")
+
+    args = parser.parse_args()
+    reader = AuditReader(args.dir)
+
+    try:
+        if args.command == "segments":
+            for segment in reader.segments():
+                print(json.dumps(segment.summary()))
+
+        elif args.command == "cat":
+            if args.segment:
+                records = reader.segment(args.segment).iter_records(args.since, args.until)
+            else:
+                records = reader.iter_records(args.since, args.until)
+            for record in records:
+                if args.request_id and record.get('request_id') != args.request_id:
+                    continue
+                if args.session_id and record.get('session_id') != args.session_id:
+                    continue
+                print(json.dumps(record, ensure_ascii=False))
+
+        elif args.command == "get":
+            print(json.dumps(reader.get(args.address), indent=2, ensure_ascii=False))
+
+        else:
+            corrupt = 0
+            for segment in reader.segments():
+                problems = segment.verify()
+                corrupt += bool(problems)
+                status = "ok" if not problems else "; ".join(problems)
+                print(f"{segment.name}: {segment.records} records in {len(segment.blocks)} blocks, {status}")
+            if corrupt:
+                sys.exit(1)
+
+    except (AuditLogError, IndexError) as e:
+        parser.exit(1, f"error: {str(e)}\n")
+    except BrokenPipeError:
+        # Output piped into head & co.
+        sys.stderr.close()
+
+
+if __name__ == "__main__":
+    main()
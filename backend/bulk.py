@@ -0,0 +1,115 @@
+"""
+Bulk Analysis
+Re-analyzes many patients offline through the provider Batch API
+
+    # Patients from a JSON lines file ('patient_id', 'patient_input' and
+    # optionally a stored 'intake_report'), waiting for the reports
+    python -m backend.bulk submit --input patients.jsonl --wait
+
+    # Every intake report stored by earlier analyses
+    python -m backend.bulk submit --from-checkpoints
+
+    # Resume polling a run, or check its progress
+    python -m backend.bulk run <run_id>
+    python -m backend.bulk status <run_id>
+"""
+
+import argparse
+import json
+import logging
+import sys
+from pathlib import Path
+
+# Add project root to path FIRST
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.app.bulk_mode import BulkRunner
+from backend.app.checkpoints import CheckpointStore
+from backend.config import BULK_POLL_INTERVAL
+
+
+def read_patients(path: Path, intake_stage: str) -> list:
+    """Patients of a JSON lines file; a stored 'intake_report' skips the intake stage"""
+    patients = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            patient = {
+                "patient_id": record.get('patient_id', number),
+                "patient_input": record['patient_input']
+            }
+            if record.get('intake_report'):
+                patient['outputs'] = {intake_stage: record['intake_report']}
+            patients.append(patient)
+    return patients
+
+
+def stored_intakes(intake_stage: str) -> list:
+    """Patients of earlier analyses, starting from their checkpointed intake report"""
+    return [
+        {
+            "patient_id": record['request_id'],
+            "patient_input": record['patient_input'],
+            "outputs": {intake_stage: record['output']}
+        }
+        for record in CheckpointStore().list_stage_outputs(intake_stage)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run analyses in bulk through the Batch API")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    submit = commands.add_parser("submit", help="Create a run and submit its first batches")
+    source = submit.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", type=Path, help="JSON lines file of patients")
+    source.add_argument("--from-checkpoints", action="store_true",
+                        help="Re-analyze every stored intake report")
+    submit.add_argument("--run-id")
+    submit.add_argument("--wait", action="store_true", help="Poll until the run has finished")
+
+    run = commands.add_parser("run", help="Poll a run until it has finished")
+    run.add_argument("run_id")
+
+    status = commands.add_parser("status", help="Show a run's progress")
+    status.add_argument("run_id")
+
+    for command in (submit, run):
+        command.add_argument("--poll-interval", type=float, default=BULK_POLL_INTERVAL)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    runner = BulkRunner()
+
+    if args.command == "status":
+        record = runner.ledger.get_run(args.run_id)
+        if record is None:
+            parser.error(f"Unknown run '{args.run_id}'")
+        print(json.dumps({**record, "stages": runner.ledger.progress(args.run_id)}, indent=2))
+        return
+
+    if args.command == "submit":
+        if args.from_checkpoints:
+            patients = stored_intakes(runner.intake_stage)
+        else:
+            patients = read_patients(args.input, runner.intake_stage)
+        run_id = runner.create_run(patients, args.run_id)
+        print(f"Run {run_id}: {len(patients)} patients")
+        if not args.wait:
+            runner.step(run_id)
+            print(f"Submitted; continue with: python -m backend.bulk run {run_id}")
+            return
+    else:
+        run_id = args.run_id
+        if runner.ledger.get_run(run_id) is None:
+            parser.error(f"Unknown run '{run_id}'")
+
+    path = runner.run(run_id, args.poll_interval)
+    print(f"Reports written to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,19 +2,229 @@
 from .settings import (
     OPENAI_API_KEY,
     OPENAI_MODEL_NAME,
+    OPENAI_ORGANIZATION,
+    OPENAI_BASE_URL,
+    DEFAULT_LLM_PROVIDER,
+    LLM_REQUEST_TIMEOUT,
+    LLM_HTTP2_ENABLED,
+    LLM_MAX_CONNECTIONS,
+    LLM_MAX_KEEPALIVE_CONNECTIONS,
+    LLM_KEEPALIVE_EXPIRY,
+    LLM_RETRY_MAX_ATTEMPTS,
+    LLM_RETRY_BASE_DELAY,
+    LLM_RETRY_MAX_DELAY,
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+    CIRCUIT_BREAKER_RESET_TIMEOUT,
+    STAGE_MAX_RETRIES,
     CREW_MAX_RPM,
     CREW_VERBOSE,
     CREW_MEMORY_ENABLED,
+    CREW_ASYNC_EXECUTION,
+    CHECKPOINT_RETENTION_HOURS,
+    SESSION_RETENTION_HOURS,
+    RESUME_ON_STARTUP,
+    STORE_PURGE_INTERVAL,
+    INTAKE_GATE_ENABLED,
+    INTAKE_MIN_COMPLETENESS,
+    INTAKE_MAP_REDUCE_ENABLED,
+    INTAKE_MAP_REDUCE_THRESHOLD,
+    INTAKE_CHUNK_TOKENS,
+    INTAKE_CHUNK_CONCURRENCY,
+    INTAKE_EXTRACT_MAX_TOKENS,
+    INTAKE_MERGE_MAX_TOKENS,
+    PIPELINE_MAX_PARALLELISM,
+    PIPELINE_NODE_TIMEOUT,
+    PIPELINE_CANCEL_GRACE,
+    PIPELINE_STREAMING,
+    PIPELINE_DRAFT_CONCURRENCY,
+    PROMPT_PROFILE,
+    OUTPUT_VALIDATION_ENABLED,
+    OUTPUT_REGENERATION_ATTEMPTS,
+    STAGE_CACHE_ENABLED,
+    STAGE_CACHE_RETENTION_HOURS,
+    NEAR_DUPLICATE_MODE,
+    NEAR_DUPLICATE_THRESHOLD,
+    NEAR_DUPLICATE_RETENTION_HOURS,
+    LLM_CASSETTE_MODE,
+    LLM_CASSETTE_LATENCY_SCALE,
+    LLM_CASSETTE_STRICT,
+    SCHEDULER_MAX_CONCURRENT,
+    SCHEDULER_MAX_QUEUED_PER_CLIENT,
+    SCHEDULER_CLIENT_WEIGHTS,
+    CLIENT_TOKEN_QUOTA,
+    CLIENT_QUOTA_WINDOW_HOURS,
+    CLIENT_API_KEYS,
+    WORKER_MODE,
+    WORKER_CONCURRENCY,
+    JOB_VISIBILITY_TIMEOUT,
+    JOB_MAX_ATTEMPTS,
+    JOB_POLL_INTERVAL,
+    JOB_WAIT_TIMEOUT,
+    JOB_RETENTION_HOURS,
+    JOB_PURGE_INTERVAL,
+    BULK_BATCH_MAX_REQUESTS,
+    BULK_COMPLETION_WINDOW,
+    BULK_POLL_INTERVAL,
+    BULK_MAX_ATTEMPTS,
+    ESTIMATE_TOKENIZER,
+    ESTIMATE_COMPLETION_TOKENS,
+    ESTIMATE_TOKENS_PER_SECOND,
+    ESTIMATE_PREFILL_TOKENS_PER_SECOND,
+    ESTIMATE_WINDOW,
+    MAX_INPUT_TOKENS,
+    MAX_PROMPT_TOKENS,
+    PHI_REDACTION_ENABLED,
+    HISTORY_ENABLED,
+    HISTORY_BATCH_SIZE,
+    HISTORY_FLUSH_INTERVAL,
+    HISTORY_QUEUE_SIZE,
+    HISTORY_RETENTION_HOURS,
+    HISTORY_ADMIN_TOKEN,
+    AUDIT_ENABLED,
+    AUDIT_COMPRESSION,
+    AUDIT_BUFFER_RECORDS,
+    AUDIT_BUFFER_BYTES,
+    AUDIT_FLUSH_INTERVAL,
+    AUDIT_SEGMENT_MAX_BYTES,
+    AUDIT_SEGMENT_MAX_SECONDS,
+    AUDIT_FSYNC,
+    PROFILING_ENABLED,
+    PROFILING_ADMIN_TOKEN,
+    PROFILE_SAMPLE_INTERVAL,
+    PROFILE_MAX_FILES,
+    COMPRESSION_MIN_SIZE,
+    GZIP_LEVEL,
+    BROTLI_QUALITY,
+    STATIC_MAX_AGE,
     PROMPTS_DIR,
-    LOGS_DIR
+    LOGS_DIR,
+    PROFILES_DIR,
+    DATA_DIR,
+    CHECKPOINT_DB_PATH,
+    SESSION_DB_PATH,
+    STAGE_CACHE_DB_PATH,
+    NEAR_DUPLICATE_DB_PATH,
+    QUOTA_DB_PATH,
+    JOB_QUEUE_DB_PATH,
+    BULK_DB_PATH,
+    BULK_OUTPUT_DIR,
+    STAGE_TIMINGS_DB_PATH,
+    HISTORY_DB_PATH,
+    AUDIT_DIR,
+    LLM_CASSETTE_PATH
 )
 
 __all__ = [
     'OPENAI_API_KEY',
     'OPENAI_MODEL_NAME',
+    'OPENAI_ORGANIZATION',
+    'OPENAI_BASE_URL',
+    'DEFAULT_LLM_PROVIDER',
+    'LLM_REQUEST_TIMEOUT',
+    'LLM_HTTP2_ENABLED',
+    'LLM_MAX_CONNECTIONS',
+    'LLM_MAX_KEEPALIVE_CONNECTIONS',
+    'LLM_KEEPALIVE_EXPIRY',
+    'LLM_RETRY_MAX_ATTEMPTS',
+    'LLM_RETRY_BASE_DELAY',
+    'LLM_RETRY_MAX_DELAY',
+    'CIRCUIT_BREAKER_FAILURE_THRESHOLD',
+    'CIRCUIT_BREAKER_RESET_TIMEOUT',
+    'STAGE_MAX_RETRIES',
     'CREW_MAX_RPM',
     'CREW_VERBOSE',
     'CREW_MEMORY_ENABLED',
+    'CREW_ASYNC_EXECUTION',
+    'CHECKPOINT_RETENTION_HOURS',
+    'SESSION_RETENTION_HOURS',
+    'RESUME_ON_STARTUP',
+    'STORE_PURGE_INTERVAL',
+    'INTAKE_GATE_ENABLED',
+    'INTAKE_MIN_COMPLETENESS',
+    'INTAKE_MAP_REDUCE_ENABLED',
+    'INTAKE_MAP_REDUCE_THRESHOLD',
+    'INTAKE_CHUNK_TOKENS',
+    'INTAKE_CHUNK_CONCURRENCY',
+    'INTAKE_EXTRACT_MAX_TOKENS',
+    'INTAKE_MERGE_MAX_TOKENS',
+    'PIPELINE_MAX_PARALLELISM',
+    'PIPELINE_NODE_TIMEOUT',
+    'PIPELINE_CANCEL_GRACE',
+    'PIPELINE_STREAMING',
+    'PIPELINE_DRAFT_CONCURRENCY',
+    'PROMPT_PROFILE',
+    'OUTPUT_VALIDATION_ENABLED',
+    'OUTPUT_REGENERATION_ATTEMPTS',
+    'STAGE_CACHE_ENABLED',
+    'STAGE_CACHE_RETENTION_HOURS',
+    'NEAR_DUPLICATE_MODE',
+    'NEAR_DUPLICATE_THRESHOLD',
+    'NEAR_DUPLICATE_RETENTION_HOURS',
+    'LLM_CASSETTE_MODE',
+    'LLM_CASSETTE_LATENCY_SCALE',
+    'LLM_CASSETTE_STRICT',
+    'SCHEDULER_MAX_CONCURRENT',
+    'SCHEDULER_MAX_QUEUED_PER_CLIENT',
+    'SCHEDULER_CLIENT_WEIGHTS',
+    'CLIENT_TOKEN_QUOTA',
+    'CLIENT_QUOTA_WINDOW_HOURS',
+    'CLIENT_API_KEYS',
+    'WORKER_MODE',
+    'WORKER_CONCURRENCY',
+    'JOB_VISIBILITY_TIMEOUT',
+    'JOB_MAX_ATTEMPTS',
+    'JOB_POLL_INTERVAL',
+    'JOB_WAIT_TIMEOUT',
+    'JOB_RETENTION_HOURS',
+    'JOB_PURGE_INTERVAL',
+    'BULK_BATCH_MAX_REQUESTS',
+    'BULK_COMPLETION_WINDOW',
+    'BULK_POLL_INTERVAL',
+    'BULK_MAX_ATTEMPTS',
+    'ESTIMATE_TOKENIZER',
+    'ESTIMATE_COMPLETION_TOKENS',
+    'ESTIMATE_TOKENS_PER_SECOND',
+    'ESTIMATE_PREFILL_TOKENS_PER_SECOND',
+    'ESTIMATE_WINDOW',
+    'MAX_INPUT_TOKENS',
+    'MAX_PROMPT_TOKENS',
+    'PHI_REDACTION_ENABLED',
+    'HISTORY_ENABLED',
+    'HISTORY_BATCH_SIZE',
+    'HISTORY_FLUSH_INTERVAL',
+    'HISTORY_QUEUE_SIZE',
+    'HISTORY_RETENTION_HOURS',
+    'HISTORY_ADMIN_TOKEN',
+    'AUDIT_ENABLED',
+    'AUDIT_COMPRESSION',
+    'AUDIT_BUFFER_RECORDS',
+    'AUDIT_BUFFER_BYTES',
+    'AUDIT_FLUSH_INTERVAL',
+    'AUDIT_SEGMENT_MAX_BYTES',
+    'AUDIT_SEGMENT_MAX_SECONDS',
+    'AUDIT_FSYNC',
+    'PROFILING_ENABLED',
+    'PROFILING_ADMIN_TOKEN',
+    'PROFILE_SAMPLE_INTERVAL',
+    'PROFILE_MAX_FILES',
+    'COMPRESSION_MIN_SIZE',
+    'GZIP_LEVEL',
+    'BROTLI_QUALITY',
+    'STATIC_MAX_AGE',
     'PROMPTS_DIR',
-    'LOGS_DIR'
+    'LOGS_DIR',
+    'PROFILES_DIR',
+    'DATA_DIR',
+    'CHECKPOINT_DB_PATH',
+    'SESSION_DB_PATH',
+    'STAGE_CACHE_DB_PATH',
+    'NEAR_DUPLICATE_DB_PATH',
+    'QUOTA_DB_PATH',
+    'JOB_QUEUE_DB_PATH',
+    'BULK_DB_PATH',
+    'BULK_OUTPUT_DIR',
+    'STAGE_TIMINGS_DB_PATH',
+    'HISTORY_DB_PATH',
+    'AUDIT_DIR',
+    'LLM_CASSETTE_PATH'
 ]
@@ -15,11 +15,197 @@ load_dotenv(dotenv_path=env_path)
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 OPENAI_MODEL_NAME = os.getenv('OPENAI_MODEL_NAME', 'gpt-4o')
 OPENAI_ORGANIZATION = os.getenv('OPENAI_ORGANIZATION', None)
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', None)
+
+# LLM Provider Configuration
+DEFAULT_LLM_PROVIDER = os.getenv('DEFAULT_LLM_PROVIDER', 'openai')
+LLM_REQUEST_TIMEOUT = float(os.getenv('LLM_REQUEST_TIMEOUT', '120'))
+LLM_HTTP2_ENABLED = os.getenv('LLM_HTTP2_ENABLED', 'True').lower() == 'true'
+LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '100'))
+LLM_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv('LLM_MAX_KEEPALIVE_CONNECTIONS', '20'))
+LLM_KEEPALIVE_EXPIRY = float(os.getenv('LLM_KEEPALIVE_EXPIRY', '60'))
+
+# LLM Resilience Configuration
+LLM_RETRY_MAX_ATTEMPTS = int(os.getenv('LLM_RETRY_MAX_ATTEMPTS', '4'))
+LLM_RETRY_BASE_DELAY = float(os.getenv('LLM_RETRY_BASE_DELAY', '1.0'))
+LLM_RETRY_MAX_DELAY = float(os.getenv('LLM_RETRY_MAX_DELAY', '30'))
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_BREAKER_FAILURE_THRESHOLD', '5'))
+CIRCUIT_BREAKER_RESET_TIMEOUT = float(os.getenv('CIRCUIT_BREAKER_RESET_TIMEOUT', '30'))
+STAGE_MAX_RETRIES = int(os.getenv('STAGE_MAX_RETRIES', '1'))
+
+# Checkpoint Configuration
+CHECKPOINT_RETENTION_HOURS = float(os.getenv('CHECKPOINT_RETENTION_HOURS', '24'))
+# Sessions idle for longer than this start over with a full analysis
+SESSION_RETENTION_HOURS = float(os.getenv('SESSION_RETENTION_HOURS', '24'))
+RESUME_ON_STARTUP = os.getenv('RESUME_ON_STARTUP', 'True').lower() == 'true'
+# Seconds between purges of expired checkpoints, sessions, cached stages,
+# near-duplicates and history records by the API and worker processes
+STORE_PURGE_INTERVAL = float(os.getenv('STORE_PURGE_INTERVAL', '600'))
+
+# Intake Gate Configuration
+INTAKE_GATE_ENABLED = os.getenv('INTAKE_GATE_ENABLED', 'True').lower() == 'true'
+INTAKE_MIN_COMPLETENESS = float(os.getenv('INTAKE_MIN_COMPLETENESS', '0.5'))
+
+# Long Input Configuration
+# Inputs over INTAKE_MAP_REDUCE_THRESHOLD tokens are cut into chunks whose
+# intake facts are extracted in parallel and merged into one intake report
+INTAKE_MAP_REDUCE_ENABLED = os.getenv('INTAKE_MAP_REDUCE_ENABLED', 'True').lower() == 'true'
+INTAKE_MAP_REDUCE_THRESHOLD = int(os.getenv('INTAKE_MAP_REDUCE_THRESHOLD', '12000'))
+INTAKE_CHUNK_TOKENS = int(os.getenv('INTAKE_CHUNK_TOKENS', '6000'))
+INTAKE_CHUNK_CONCURRENCY = int(os.getenv('INTAKE_CHUNK_CONCURRENCY', '8'))
+INTAKE_EXTRACT_MAX_TOKENS = int(os.getenv('INTAKE_EXTRACT_MAX_TOKENS', '600'))
+INTAKE_MERGE_MAX_TOKENS = int(os.getenv('INTAKE_MERGE_MAX_TOKENS', '8000'))
+
+# Pipeline Configuration (defaults for prompts/pipeline.json)
+PIPELINE_MAX_PARALLELISM = int(os.getenv('PIPELINE_MAX_PARALLELISM', '4'))
+PIPELINE_NODE_TIMEOUT = float(os.getenv('PIPELINE_NODE_TIMEOUT', '300'))
+# Seconds a timed-out or failed pipeline waits for its other running nodes
+# to stop; a timed-out analysis is not retried while one is still running
+PIPELINE_CANCEL_GRACE = float(os.getenv('PIPELINE_CANCEL_GRACE', '60'))
+# Stream the diagnosis and draft patient-facing sections while it is generated
+PIPELINE_STREAMING = os.getenv('PIPELINE_STREAMING', 'False').lower() == 'true'
+PIPELINE_DRAFT_CONCURRENCY = int(os.getenv('PIPELINE_DRAFT_CONCURRENCY', '4'))
+
+# Prompt Profile Configuration
+# 'default' or the name of a directory under prompts/profiles/ (such as
+# 'compact') whose prompts override the base ones; analysis requests can
+# pick another profile with 'prompt_profile'
+PROMPT_PROFILE = os.getenv('PROMPT_PROFILE', 'default').lower()
+
+# Output Validation Configuration
+# Check stage reports against the 'validation' block of pipeline.json and
+# regenerate a missing or malformed section with a targeted LLM call
+OUTPUT_VALIDATION_ENABLED = os.getenv('OUTPUT_VALIDATION_ENABLED', 'True').lower() == 'true'
+OUTPUT_REGENERATION_ATTEMPTS = int(os.getenv('OUTPUT_REGENERATION_ATTEMPTS', '2'))
+
+# Stage Cache Configuration
+STAGE_CACHE_ENABLED = os.getenv('STAGE_CACHE_ENABLED', 'True').lower() == 'true'
+STAGE_CACHE_RETENTION_HOURS = float(os.getenv('STAGE_CACHE_RETENTION_HOURS', '168'))
+
+# Near-Duplicate Input Configuration
+# NEAR_DUPLICATE_MODE: 'off', 'intake' (reuse the intake report) or 'result'
+# (serve the earlier result, flagged as approximate)
+NEAR_DUPLICATE_MODE = os.getenv('NEAR_DUPLICATE_MODE', 'off').lower()
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv('NEAR_DUPLICATE_THRESHOLD', '0.95'))
+NEAR_DUPLICATE_RETENTION_HOURS = float(os.getenv('NEAR_DUPLICATE_RETENTION_HOURS', '168'))
+
+# LLM Cassette Configuration
+# LLM_CASSETTE_MODE: 'off', 'record' (save every LLM call) or 'replay'
+# (answer LLM calls from the cassette instead of the provider)
+LLM_CASSETTE_MODE = os.getenv('LLM_CASSETTE_MODE', 'off').lower()
+LLM_CASSETTE_LATENCY_SCALE = float(os.getenv('LLM_CASSETTE_LATENCY_SCALE', '1.0'))
+# Replay only calls recorded with the same request; when false, a call whose
+# prompt changed replays a recording of the same model and agent instead
+LLM_CASSETTE_STRICT = os.getenv('LLM_CASSETTE_STRICT', 'true').lower() == 'true'
+
+# Scheduler Configuration
+# Analyses beyond SCHEDULER_MAX_CONCURRENT wait in per-client fair queues.
+# SCHEDULER_CLIENT_WEIGHTS gives clients a larger or smaller share, e.g.
+# "key:3f2a9c1d04b7e6a8=2,ip:10.0.0.7=0.5" (ids as shown by /api/queue).
+# CLIENT_TOKEN_QUOTA is in estimated prompt tokens per window; 0 = unlimited
+SCHEDULER_MAX_CONCURRENT = int(os.getenv('SCHEDULER_MAX_CONCURRENT', '8'))
+SCHEDULER_MAX_QUEUED_PER_CLIENT = int(os.getenv('SCHEDULER_MAX_QUEUED_PER_CLIENT', '50'))
+SCHEDULER_CLIENT_WEIGHTS = {
+    client.strip(): float(weight)
+    for client, _, weight in (
+        entry.rpartition('=') for entry in os.getenv('SCHEDULER_CLIENT_WEIGHTS', '').split(',') if '=' in entry
+    )
+}
+CLIENT_TOKEN_QUOTA = int(os.getenv('CLIENT_TOKEN_QUOTA', '0'))
+CLIENT_QUOTA_WINDOW_HOURS = float(os.getenv('CLIENT_QUOTA_WINDOW_HOURS', '24'))
+# Comma-separated API keys whose X-API-Key header is honoured; other clients
+# are identified by IP address and always scheduled as 'batch'
+CLIENT_API_KEYS = frozenset(key.strip() for key in os.getenv('CLIENT_API_KEYS', '').split(',') if key.strip())
+
+# Worker Configuration
+# 'inline' runs analyses in the API process; 'queue' hands them to
+# `python -m backend.worker` processes on the same host through the job
+# queue (SQLite WAL does not work over a network filesystem). Workers
+# delete finished jobs past JOB_RETENTION_HOURS every JOB_PURGE_INTERVAL seconds
+WORKER_MODE = os.getenv('WORKER_MODE', 'inline').lower()
+WORKER_CONCURRENCY = int(os.getenv('WORKER_CONCURRENCY', '4'))
+JOB_VISIBILITY_TIMEOUT = float(os.getenv('JOB_VISIBILITY_TIMEOUT', '120'))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', '0.5'))
+JOB_WAIT_TIMEOUT = float(os.getenv('JOB_WAIT_TIMEOUT', '600'))
+JOB_RETENTION_HOURS = float(os.getenv('JOB_RETENTION_HOURS', '24'))
+JOB_PURGE_INTERVAL = float(os.getenv('JOB_PURGE_INTERVAL', '600'))
+
+# Bulk Mode Configuration (offline runs through the provider Batch API)
+BULK_BATCH_MAX_REQUESTS = int(os.getenv('BULK_BATCH_MAX_REQUESTS', '5000'))
+BULK_COMPLETION_WINDOW = os.getenv('BULK_COMPLETION_WINDOW', '24h')
+BULK_POLL_INTERVAL = float(os.getenv('BULK_POLL_INTERVAL', '60'))
+BULK_MAX_ATTEMPTS = int(os.getenv('BULK_MAX_ATTEMPTS', '3'))
+
+# Pre-flight Estimate Configuration
+# Token counts use tiktoken's ESTIMATE_TOKENIZER encoding when tiktoken is
+# installed. Until a stage has finished in ESTIMATE_WINDOW recent runs, its
+# completion size and generation speed come from the defaults below.
+# Analyses over MAX_INPUT_TOKENS or MAX_PROMPT_TOKENS are refused; 0 = no limit
+ESTIMATE_TOKENIZER = os.getenv('ESTIMATE_TOKENIZER', 'o200k_base')
+ESTIMATE_COMPLETION_TOKENS = int(os.getenv('ESTIMATE_COMPLETION_TOKENS', '800'))
+ESTIMATE_TOKENS_PER_SECOND = float(os.getenv('ESTIMATE_TOKENS_PER_SECOND', '40'))
+ESTIMATE_PREFILL_TOKENS_PER_SECOND = float(os.getenv('ESTIMATE_PREFILL_TOKENS_PER_SECOND', '2000'))
+ESTIMATE_WINDOW = int(os.getenv('ESTIMATE_WINDOW', '50'))
+MAX_INPUT_TOKENS = int(os.getenv('MAX_INPUT_TOKENS', '150000'))
+MAX_PROMPT_TOKENS = int(os.getenv('MAX_PROMPT_TOKENS', '300000'))
+
+# PHI Redaction Configuration
+# Names, phone numbers, e-mail and street addresses, record numbers and
+# SSNs in patient input are replaced with placeholders before any LLM
+# call, and put back into the returned report
+PHI_REDACTION_ENABLED = os.getenv('PHI_REDACTION_ENABLED', 'True').lower() == 'true'
+
+# History Configuration
+# Every analysis is recorded for /api/history; records are written by a
+# background thread in batches of up to HISTORY_BATCH_SIZE, and dropped
+# when more than HISTORY_QUEUE_SIZE are waiting. 0 retention = keep forever.
+# /api/history is only served to requests sending HISTORY_ADMIN_TOKEN in the
+# X-Admin-Token header, and not at all while no token is set
+HISTORY_ENABLED = os.getenv('HISTORY_ENABLED', 'True').lower() == 'true'
+HISTORY_BATCH_SIZE = int(os.getenv('HISTORY_BATCH_SIZE', '100'))
+HISTORY_FLUSH_INTERVAL = float(os.getenv('HISTORY_FLUSH_INTERVAL', '1.0'))
+HISTORY_QUEUE_SIZE = int(os.getenv('HISTORY_QUEUE_SIZE', '10000'))
+HISTORY_RETENTION_HOURS = float(os.getenv('HISTORY_RETENTION_HOURS', '720'))
+HISTORY_ADMIN_TOKEN = os.getenv('HISTORY_ADMIN_TOKEN', '')
+
+# Audit Log Configuration
+# Every analysis input and output is appended to compressed segment files
+# (read them with `python -m backend.audit`). Records are buffered until
+# AUDIT_BUFFER_RECORDS / AUDIT_BUFFER_BYTES or AUDIT_FLUSH_INTERVAL seconds,
+# then written as one block; AUDIT_COMPRESSION is 'zstd' (needs zstandard)
+# or 'gzip'
+AUDIT_ENABLED = os.getenv('AUDIT_ENABLED', 'True').lower() == 'true'
+AUDIT_COMPRESSION = os.getenv('AUDIT_COMPRESSION', 'zstd').lower()
+AUDIT_BUFFER_RECORDS = int(os.getenv('AUDIT_BUFFER_RECORDS', '64'))
+AUDIT_BUFFER_BYTES = int(os.getenv('AUDIT_BUFFER_BYTES', str(1024 * 1024)))
+AUDIT_FLUSH_INTERVAL = float(os.getenv('AUDIT_FLUSH_INTERVAL', '2.0'))
+AUDIT_SEGMENT_MAX_BYTES = int(os.getenv('AUDIT_SEGMENT_MAX_BYTES', str(64 * 1024 * 1024)))
+AUDIT_SEGMENT_MAX_SECONDS = float(os.getenv('AUDIT_SEGMENT_MAX_SECONDS', '3600'))
+AUDIT_FSYNC = os.getenv('AUDIT_FSYNC', 'True').lower() == 'true'
+
+# Profiling Configuration
+# Profiles are only taken when enabled, and only for requests sending
+# PROFILING_ADMIN_TOKEN in the X-Admin-Token header (none without a token)
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False').lower() == 'true'
+PROFILING_ADMIN_TOKEN = os.getenv('PROFILING_ADMIN_TOKEN', '')
+PROFILE_SAMPLE_INTERVAL = float(os.getenv('PROFILE_SAMPLE_INTERVAL', '0.005'))
+PROFILE_MAX_FILES = int(os.getenv('PROFILE_MAX_FILES', '50'))
+
+# Response Encoding Configuration
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', '500'))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', '5'))
+# Seconds browsers may cache fingerprinted static files (/static/app.<hash>.js)
+STATIC_MAX_AGE = int(os.getenv('STATIC_MAX_AGE', '31536000'))
 
 # Crew Configuration
 CREW_MAX_RPM = int(os.getenv('CREW_MAX_RPM', '10'))
 CREW_VERBOSE = os.getenv('CREW_VERBOSE', 'True').lower() == 'true'
-CREW_MEMORY_ENABLED = os.getenv('CREW_MEMORY_ENABLED', 'True').lower() == 'true'
+# CrewAI memory is stored on disk and shared by every analysis, so one
+# patient's details could surface in another's; leave it off in a service
+CREW_MEMORY_ENABLED = os.getenv('CREW_MEMORY_ENABLED', 'False').lower() == 'true'
+CREW_ASYNC_EXECUTION = os.getenv('CREW_ASYNC_EXECUTION', 'True').lower() == 'true'
 
 # Application Settings
 APP_NAME = "Medical Diagnostic Team"
@@ -30,9 +216,24 @@ APP_DEBUG = os.getenv('APP_DEBUG', 'False').lower() == 'true'
 BASE_DIR = Path(__file__).parent.parent
 PROMPTS_DIR = BASE_DIR / 'prompts'
 LOGS_DIR = BASE_DIR / 'logs'
+PROFILES_DIR = LOGS_DIR / 'profiles'
+DATA_DIR = Path(os.getenv('DATA_DIR', BASE_DIR / 'data'))
+CHECKPOINT_DB_PATH = DATA_DIR / 'checkpoints.db'
+SESSION_DB_PATH = DATA_DIR / 'sessions.db'
+STAGE_CACHE_DB_PATH = DATA_DIR / 'stage_cache.db'
+NEAR_DUPLICATE_DB_PATH = DATA_DIR / 'near_duplicates.db'
+QUOTA_DB_PATH = DATA_DIR / 'quotas.db'
+JOB_QUEUE_DB_PATH = DATA_DIR / 'jobs.db'
+BULK_DB_PATH = DATA_DIR / 'bulk.db'
+BULK_OUTPUT_DIR = DATA_DIR / 'bulk'
+STAGE_TIMINGS_DB_PATH = DATA_DIR / 'stage_timings.db'
+HISTORY_DB_PATH = DATA_DIR / 'history.db'
+AUDIT_DIR = Path(os.getenv('AUDIT_DIR', DATA_DIR / 'audit'))
+LLM_CASSETTE_PATH = Path(os.getenv('LLM_CASSETTE_PATH', DATA_DIR / 'llm_cassette.jsonl.gz'))
 
-# Create logs directory if it doesn't exist
+# Create logs and data directories if they don't exist
 LOGS_DIR.mkdir(exist_ok=True)
+DATA_DIR.mkdir(parents=True, exist_ok=True)
 
 # Validation
 if not OPENAI_API_KEY:
@@ -0,0 +1,82 @@
+"""
+Prompt Token Budget
+Reports the tokens each prompt field costs, per pipeline stage
+
+    # Fields of every stage with the deployment's prompt profile
+    python -m backend.prompt_budget
+
+    # Another profile, or every profile side by side with its savings
+    python -m backend.prompt_budget --profile compact
+    python -m backend.prompt_budget --compare
+
+    # Machine-readable output
+    python -m backend.prompt_budget --compare --json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+# Add project root to path FIRST
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.app.crew_factory import CrewFactory
+from backend.app.prompt_loader import available_profiles
+from backend.app.token_estimator import prompt_budget
+from backend.config import PROMPTS_DIR, PROMPT_PROFILE
+
+FIELDS = ("role", "goal", "backstory", "tools", "description", "expected_output", "framing")
+
+
+def print_budget(budget: dict):
+    """One line per stage and task prompt with the tokens of each field"""
+    print(f"profile {budget['profile']} (prompt version {budget['prompt_version']}, {budget['tokenizer']})")
+    print(f"{'stage':<30}" + "".join(f"{field[:9]:>10}" for field in FIELDS) + f"{'total':>8}")
+    for name, stage in budget['stages'].items():
+        print(f"{name:<30}" + "".join(f"{stage['fields'][field]:>10}" for field in FIELDS) + f"{stage['total']:>8}")
+    print(f"{'all stages':<30}{'':>{10 * len(FIELDS)}}{budget['total']:>8}")
+    for name, task in budget['tasks'].items():
+        print(f"{name:<30}{'':>40}" + "".join(
+            f"{task['fields'][field]:>10}" for field in ("description", "expected_output")
+        ) + f"{'':>10}{task['total']:>8}")
+
+
+def print_comparison(budgets: list):
+    """Each profile's total per stage and task prompt, and what it saves against the first"""
+    base = budgets[0]
+    print(f"{'prompt':<30}" + "".join(f"{budget['profile']:>12}" for budget in budgets)
+          + "".join(f"{'saved':>10}" for _ in budgets[1:]))
+    rows = [(name, 'stages') for name in base['stages']] + [(name, 'tasks') for name in base['tasks']]
+    for name, kind in rows + [("all stages", None)]:
+        totals = [budget['total'] if kind is None else budget[kind][name]['total'] for budget in budgets]
+        print(f"{name:<30}" + "".join(f"{total:>12}" for total in totals)
+              + "".join(f"{(totals[0] - total) / totals[0]:>10.0%}" for total in totals[1:]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report the token cost of every prompt field")
+    parser.add_argument("--prompts-dir", type=Path, default=PROMPTS_DIR, help="Prompts directory")
+    parser.add_argument("--profile", default=PROMPT_PROFILE, help="Prompt profile to report")
+    parser.add_argument("--compare", action="store_true", help="Compare every prompt profile")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    profiles = available_profiles(args.prompts_dir) if args.compare else [args.profile]
+    try:
+        budgets = [prompt_budget(CrewFactory(args.prompts_dir, profile=name)) for name in profiles]
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        sys.exit(1)
+
+    if args.json:
+        print(json.dumps(budgets if args.compare else budgets[0], indent=2))
+    elif args.compare:
+        print_comparison(budgets)
+    else:
+        print_budget(budgets[0])
+
+
+if __name__ == "__main__":
+    main()
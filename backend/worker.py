@@ -0,0 +1,158 @@
+"""
+Analysis Worker
+Runs analyses queued by API processes started with WORKER_MODE=queue
+
+Each worker process leases jobs from the shared job queue and runs them
+through MedicalService on a pool of threads, extending the lease while a
+job runs. Start as many workers as the LLM budget allows, on the same
+host as the API processes: the queue is a SQLite database in WAL mode,
+which needs shared memory and so does not work over a network filesystem.
+
+    python -m backend.worker --concurrency 4
+
+Each worker also deletes finished jobs past their retention period every
+JOB_PURGE_INTERVAL seconds.
+"""
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add project root to path FIRST
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from backend.app import MedicalService
+from backend.app.job_queue import JobQueue
+from backend.config import WORKER_CONCURRENCY, JOB_VISIBILITY_TIMEOUT, JOB_POLL_INTERVAL, JOB_PURGE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+
+class Worker:
+    """Leases queued analyses and runs them until stopped"""
+
+    def __init__(
+        self,
+        service: MedicalService,
+        queue: JobQueue,
+        concurrency: int = WORKER_CONCURRENCY,
+        visibility_timeout: float = JOB_VISIBILITY_TIMEOUT,
+        poll_interval: float = JOB_POLL_INTERVAL,
+        purge_interval: float = JOB_PURGE_INTERVAL
+    ):
+        """
+        Initialize the worker.
+
+        Args:
+            service: Service the jobs are run with
+            queue: Queue the jobs are leased from
+            concurrency: Jobs run at the same time
+            visibility_timeout: Lease length; leases are extended every third of it
+            poll_interval: Seconds between polls of an empty queue
+            purge_interval: Seconds between purges of expired jobs
+        """
+        self.service = service
+        self.queue = queue
+        self.concurrency = concurrency
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self.worker_id = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Finish the running jobs and stop leasing new ones"""
+        self._stop.set()
+
+    def run(self):
+        """Run jobs on `concurrency` threads until stop() is called"""
+        logger.info(f"Worker {self.worker_id} started with {self.concurrency} slots")
+        threading.Thread(target=self._purge_loop, name="job-purge", daemon=True).start()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="analysis-worker") as pool:
+            for _ in range(self.concurrency):
+                pool.submit(self._slot)
+        logger.info(f"Worker {self.worker_id} stopped")
+
+    def _purge_loop(self):
+        """Delete expired jobs at startup and then every purge_interval seconds"""
+        while True:
+            try:
+                purged = self.queue.purge_expired()
+                if purged:
+                    logger.info(f"Purged {purged} expired jobs")
+            except Exception as e:
+                logger.error(f"Could not purge expired jobs: {str(e)}")
+            if self._stop.wait(self.purge_interval):
+                return
+
+    def _slot(self):
+        while not self._stop.is_set():
+            try:
+                job = self.queue.lease(self.worker_id, self.visibility_timeout)
+            except Exception as e:
+                logger.error(f"Could not lease a job: {str(e)}")
+                job = None
+            if job is None:
+                self._stop.wait(self.poll_interval)
+                continue
+            self._run_job(job)
+
+    def _heartbeat(self, job_id: str, done: threading.Event):
+        while not done.wait(self.visibility_timeout / 3):
+            if not self.queue.extend(job_id, self.worker_id, self.visibility_timeout):
+                logger.warning(f"Lost the lease on job {job_id}")
+                return
+
+    def _run_job(self, job: dict):
+        job_id, payload = job['job_id'], job['payload']
+        logger.info(f"Running job {job_id} ({job['kind']}, attempt {job['attempts']})")
+        done = threading.Event()
+        threading.Thread(target=self._heartbeat, args=(job_id, done), daemon=True).start()
+        try:
+            if job['kind'] == 'append_to_session':
+                result = self.service.append_to_session(payload['session_id'], payload['patient_input'])
+            else:
+                result = self.service.analyze_symptoms(
+                    payload['patient_input'],
+                    request_id=job_id,
+                    include_stages=payload.get('include_stages', False),
+                    prompt_profile=payload.get('prompt_profile')
+                )
+            if not result['success'] and job['attempts'] < self.queue.max_attempts:
+                # Retried from its checkpoints; the error is returned once attempts run out
+                self.queue.fail(job_id, self.worker_id, result.get('error') or 'Analysis failed')
+            else:
+                self.queue.complete(job_id, self.worker_id, result)
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}", exc_info=True)
+            self.queue.fail(job_id, self.worker_id, str(e))
+        finally:
+            done.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued medical analyses")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY)
+    parser.add_argument("--visibility-timeout", type=float, default=JOB_VISIBILITY_TIMEOUT)
+    args = parser.parse_args()
+
+    queue = JobQueue()
+    service = MedicalService()
+    service.start_purging()
+    worker = Worker(service, queue, args.concurrency, args.visibility_timeout)
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: worker.stop())
+    worker.run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Async vs Threaded Execution Benchmark
+Runs concurrent analyses through the threaded and asyncio-native paths
+
+Each mode runs in its own process with its own data directory, so thread
+counts, memory and stored analyses are not shared; the fake LLM server
+stays in the parent process. The stage cache and near-duplicate reuse are
+off, so both modes make every LLM call instead of the second one reading
+the first one's answers.
+
+The async path still uses threads for its SQLite reads and writes (see
+MedicalService.analyze_symptoms_async); the thread counts show how many.
+
+Usage:
+    python -m benchmarks.bench_async_vs_threaded --concurrency 20 --latency 0.3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.fake_llm_server import FakeLLMServer, use_fake_llm
+
+PATIENT_INPUT = "I'm a 45-year-old male with chest pain for 3 days, case {}"
+
+
+def _rss_mb() -> float:
+    """Resident memory of this process in MB (Linux only, 0 elsewhere)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+class ResourceSampler:
+    """Samples thread count and memory in the background"""
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.peak_threads = 0
+        self.peak_rss_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            # The sampler thread itself is not counted
+            self.peak_threads = max(self.peak_threads, threading.active_count() - 1)
+            self.peak_rss_mb = max(self.peak_rss_mb, _rss_mb())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_mode(mode: str, concurrency: int) -> dict:
+    """Run one mode inside the current process and return its measurements"""
+    from backend.app import MedicalService
+
+    service = MedicalService()
+
+    async def threaded():
+        return await asyncio.gather(*[
+            asyncio.to_thread(service.analyze_symptoms, PATIENT_INPUT.format(i))
+            for i in range(concurrency)
+        ])
+
+    async def native():
+        return await asyncio.gather(*[
+            service.analyze_symptoms_async(PATIENT_INPUT.format(i))
+            for i in range(concurrency)
+        ])
+
+    runner = native if mode == 'async' else threaded
+
+    # Warm up imports, prompt loading and connection pools
+    service.analyze_symptoms(PATIENT_INPUT.format('warmup'))
+    baseline_threads = threading.active_count()
+
+    with ResourceSampler() as sampler:
+        start = time.perf_counter()
+        results = asyncio.run(runner())
+        elapsed = time.perf_counter() - start
+
+    return {
+        "mode": mode,
+        "seconds": elapsed,
+        "succeeded": sum(1 for r in results if r.get("success")),
+        "throughput": concurrency / elapsed,
+        "baseline_threads": baseline_threads,
+        "peak_threads": sampler.peak_threads,
+        "peak_rss_mb": sampler.peak_rss_mb
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark async vs threaded analyses")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--mode", choices=["threaded", "async"],
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        # Child process: the parent already pointed the environment at its server
+        print(json.dumps(run_mode(args.mode, args.concurrency)))
+        return
+
+    server = FakeLLMServer(latency=args.latency).start_background()
+    use_fake_llm(server)
+    os.environ.setdefault('RESUME_ON_STARTUP', 'false')
+    os.environ['STAGE_CACHE_ENABLED'] = 'false'
+    os.environ['NEAR_DUPLICATE_MODE'] = 'off'
+
+    print("=" * 70)
+    print(f"ASYNC VS THREADED BENCHMARK ({args.concurrency} concurrent analyses, "
+          f"{args.latency}s LLM latency)")
+    print("=" * 70)
+
+    for mode in ("threaded", "async"):
+        server.reset_stats()
+        with tempfile.TemporaryDirectory(prefix=f"bench-{mode}-") as data_dir:
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_async_vs_threaded",
+                 "--mode", mode, "--concurrency", str(args.concurrency)],
+                cwd=Path(__file__).parent.parent,
+                env={**os.environ, "DATA_DIR": data_dir},
+                capture_output=True,
+                text=True,
+                check=True
+            ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        stats = server.stats()
+        print(f"{mode:9s}: {result['seconds']:6.2f} s, {result['throughput']:5.2f} analyses/s, "
+              f"{result['succeeded']}/{args.concurrency} ok, "
+              f"threads {result['baseline_threads']} -> {result['peak_threads']}, "
+              f"peak RSS {result['peak_rss_mb']:.0f} MB, "
+              f"{stats['connections']} connections")
+
+    print("=" * 70)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
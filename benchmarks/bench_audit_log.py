@@ -0,0 +1,151 @@
+"""
+Audit Log Benchmark
+Compares line-by-line logging of analysis transcripts with the audit sink
+
+Each record is a full analysis (input, intake, diagnosis and patient
+report) with a varied input. The baseline writes one JSON line per
+record through a logging FileHandler, the way transcripts went to
+medical_service.log. The audit sink buffers the records and writes
+compressed blocks from its own thread. The benchmark reports the time
+spent in the calling thread (per record and at the 99th percentile), the
+bytes on disk, and the cost of reading back one record at random.
+
+Usage:
+    python -m benchmarks.bench_audit_log --records 20000
+"""
+
+import argparse
+import json
+import logging
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.fake_llm_server import (
+    FakeLLMServer,
+    use_fake_llm,
+    INTAKE_REPORT,
+    DIAGNOSIS_REPORT,
+    COMMUNICATION_REPORT
+)
+
+SYMPTOMS = ["chest pain", "headache", "shortness of breath", "dizziness", "abdominal pain",
+            "back pain", "palpitations", "fatigue", "fever", "nausea"]
+
+
+def sample_record(number: int, rng: random.Random) -> dict:
+    """Fields of one analysis, with a varied patient input and request id"""
+    symptoms = ", ".join(rng.sample(SYMPTOMS, 3))
+    return {
+        "request_id": f"{number:032x}",
+        "prompt_version": "3a1f0c9e2b7d",
+        "status": "completed",
+        "patient_input": f"I'm {rng.randint(18, 90)} and have had {symptoms} for {rng.randint(1, 30)} days. "
+                         + " ".join(rng.choice(SYMPTOMS) for _ in range(rng.randint(20, 120))),
+        "stages": {
+            "interview_task": INTAKE_REPORT,
+            "diagnosis_task": DIAGNOSIS_REPORT,
+            "communication_task": COMMUNICATION_REPORT
+        },
+        "result": COMMUNICATION_REPORT,
+        "metadata": {"duration_seconds": rng.uniform(20, 90), "token_usage": {"prompt_tokens": rng.randint(4000, 9000)}}
+    }
+
+
+def timed_writes(write, records: list) -> list:
+    """Seconds each write call took in the calling thread"""
+    latencies = []
+    for record in records:
+        start = time.perf_counter()
+        write(record)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def directory_bytes(path: Path) -> int:
+    return sum(f.stat().st_size for f in path.rglob('*') if f.is_file())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the compressed audit log against line logging")
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--reads", type=int, default=200, help="Random single-record reads")
+    parser.add_argument("--compression", choices=["zstd", "gzip"], default="zstd")
+    args = parser.parse_args()
+
+    # Settings are read at import time, so point them at a (never called) fake LLM
+    use_fake_llm(FakeLLMServer())
+    from backend.app.audit_log import AuditSink, AuditReader, zstandard
+
+    rng = random.Random(7)
+    records = [sample_record(number, rng) for number in range(args.records)]
+    work = Path(tempfile.mkdtemp(prefix="bench_audit_"))
+
+    print("=" * 78)
+    print(f"AUDIT LOG BENCHMARK ({args.records} analyses, "
+          f"{args.compression if zstandard or args.compression == 'gzip' else 'gzip (no zstandard)'})")
+    print("=" * 78)
+    print(f"{'sink':<22}{'us/record':>11}{'p99 us':>10}{'total s':>9}{'MB on disk':>12}{'read 1 ms':>11}")
+
+    try:
+        # Baseline: one JSON line per record through a logging FileHandler
+        log_path = work / "transcripts.log"
+        handler = logging.FileHandler(log_path)
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        audit_logger = logging.getLogger("bench.transcripts")
+        audit_logger.propagate = False
+        audit_logger.addHandler(handler)
+        audit_logger.setLevel(logging.INFO)
+
+        start = time.perf_counter()
+        latencies = timed_writes(lambda record: audit_logger.info(json.dumps(record)), records)
+        handler.close()
+        total = time.perf_counter() - start
+
+        # A line log has no index: finding record n means reading up to it
+        read_start = time.perf_counter()
+        for _ in range(args.reads):
+            target = rng.randrange(args.records)
+            with open(log_path, 'r', encoding='utf-8') as f:
+                for number, line in enumerate(f):
+                    if number == target:
+                        break
+        read_ms = (time.perf_counter() - read_start) / args.reads * 1000
+        print(f"{'FileHandler (lines)':<22}{statistics.mean(latencies) * 1e6:>11.1f}"
+              f"{statistics.quantiles(latencies, n=100)[98] * 1e6:>10.1f}{total:>9.2f}"
+              f"{directory_bytes(work) / 1e6:>12.1f}{read_ms:>11.2f}")
+
+        # Audit sink: buffered, compressed blocks written off the calling thread
+        audit_dir = work / "audit"
+        sink = AuditSink(audit_dir, compression=args.compression)
+        start = time.perf_counter()
+        latencies = timed_writes(lambda record: sink.write('analysis', **record), records)
+        sink.close()
+        total = time.perf_counter() - start
+
+        reader = AuditReader(audit_dir)
+        addresses = [
+            f"{segment.name}:{position}"
+            for segment in reader.segments() for position in range(segment.records)
+        ]
+        read_start = time.perf_counter()
+        for _ in range(args.reads):
+            reader.get(rng.choice(addresses))
+        read_ms = (time.perf_counter() - read_start) / args.reads * 1000
+        print(f"{'AuditSink (blocks)':<22}{statistics.mean(latencies) * 1e6:>11.1f}"
+              f"{statistics.quantiles(latencies, n=100)[98] * 1e6:>10.1f}{total:>9.2f}"
+              f"{directory_bytes(audit_dir) / 1e6:>12.1f}{read_ms:>11.2f}")
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Connection Reuse Benchmark
+Compares a fresh HTTP client per crew build with the pooled provider clients
+
+Usage:
+    python -m benchmarks.bench_connection_reuse --requests 50 --latency 0.01
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.fake_llm_server import FakeLLMServer, use_fake_llm
+
+
+def run_requests(get_client, requests: int) -> float:
+    """Send chat completions through clients returned by get_client"""
+    start = time.perf_counter()
+    for _ in range(requests):
+        client = get_client()
+        client.chat.completions.create(
+            model="gpt-4o",
+            messages=[{"role": "user", "content": "ping"}]
+        )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark LLM connection reuse")
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--crews", type=int, default=5,
+                        help="Full analyses to run through MedicalService")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(latency=args.latency).start_background()
+    use_fake_llm(server)
+
+    from openai import OpenAI
+    from backend.app.llm_registry import LLMProvider
+
+    print("=" * 70)
+    print("CONNECTION REUSE BENCHMARK")
+    print("=" * 70)
+
+    # New SDK client per request: what each crew build did before
+    server.reset_stats()
+    elapsed = run_requests(
+        lambda: OpenAI(api_key="fake-key", base_url=server.base_url),
+        args.requests
+    )
+    fresh = server.stats()
+    print(f"Fresh client per call : {fresh['connections']:4d} connections, "
+          f"{fresh['requests']:4d} requests, {elapsed * 1000:8.1f} ms")
+
+    # Shared pooled provider client
+    server.reset_stats()
+    provider = LLMProvider("bench", api_key="fake-key", base_url=server.base_url)
+    elapsed = run_requests(provider.get_client, args.requests)
+    pooled = server.stats()
+    print(f"Pooled provider client: {pooled['connections']:4d} connections, "
+          f"{pooled['requests']:4d} requests, {elapsed * 1000:8.1f} ms")
+    provider.close()
+
+    # End to end through the service
+    if args.crews:
+        from backend.app import MedicalService
+
+        service = MedicalService()
+        server.reset_stats()
+        start = time.perf_counter()
+        for _ in range(args.crews):
+            service.analyze_symptoms("I'm a 45-year-old male with chest pain for 3 days")
+        elapsed = time.perf_counter() - start
+        crews = server.stats()
+        print(f"MedicalService x{args.crews:<3d}  : {crews['connections']:4d} connections, "
+              f"{crews['requests']:4d} requests, {elapsed * 1000:8.1f} ms")
+
+    print("=" * 70)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
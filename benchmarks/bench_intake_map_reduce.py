@@ -0,0 +1,146 @@
+"""
+Intake Map-Reduce Benchmark
+Compares a direct intake with the chunked intake on long synthetic histories
+
+Each history is a run of dated visit notes (complaint, vitals, medications,
+assessment) padded with narrative text, from 2k to 100k words. The fake LLM
+server reads prompts at a fixed prefill rate, generates at a fixed token
+rate and rejects prompts over its context window, like a real model. Each
+(mode, size) pair runs in its own process (settings are read at import
+time) with the stage cache and near-duplicate reuse off.
+
+Usage:
+    python -m benchmarks.bench_intake_map_reduce --sizes 2000 10000 25000 50000 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.fake_llm_server import FakeLLMServer, use_fake_llm
+
+COMPLAINTS = [
+    "chest pressure on exertion radiating to the left arm",
+    "intermittent palpitations at rest",
+    "shortness of breath climbing stairs",
+    "ankle swelling worse in the evening",
+    "dizziness when standing up quickly",
+    "burning epigastric pain after meals",
+]
+MEDICATIONS = ["lisinopril 10mg daily", "atorvastatin 40mg nightly", "metformin 500mg twice daily",
+               "aspirin 81mg daily", "metoprolol 25mg twice daily", "omeprazole 20mg daily"]
+NARRATIVE = (
+    "The patient reports that symptoms were discussed in detail and that daily activities such as "
+    "walking the dog, gardening and climbing the stairs at work were reviewed. Diet, sleep and "
+    "stress at work were covered, and the patient was counselled on exercise and follow-up. "
+    "Previous results were reviewed with the patient and questions were answered."
+).split()
+
+
+def synthetic_history(words: int, seed: int = 7) -> str:
+    """A multi-visit patient history of about `words` words"""
+    rng = random.Random(seed)
+    notes, total, day = [], 0, 0
+    while total < words:
+        day += rng.randint(7, 60)
+        visit = (
+            f"{2018 + day // 365}-{1 + day % 365 // 31:02d}-{1 + day % 28:02d} FOLLOW-UP VISIT\n\n"
+            f"Chief complaint: {rng.choice(COMPLAINTS)} for {rng.randint(1, 14)} days.\n"
+            f"Vital signs: BP {rng.randint(118, 162)}/{rng.randint(70, 98)}, HR {rng.randint(58, 104)}, "
+            f"RR {rng.randint(12, 20)}, T {rng.uniform(36.4, 37.6):.1f}C.\n"
+            f"Medications: {', '.join(rng.sample(MEDICATIONS, 3))}.\n\n"
+            f"History: {' '.join(rng.choice(NARRATIVE) for _ in range(rng.randint(120, 260)))}.\n\n"
+            f"Assessment and plan: {' '.join(rng.choice(NARRATIVE) for _ in range(rng.randint(40, 90)))}."
+        )
+        notes.append(visit)
+        total += len(visit.split())
+    return ("I'm a 58-year-old man. Here is my full history from the clinic:\n\n" + "\n\n".join(notes))
+
+
+def run_one(words: int) -> dict:
+    """Estimate and run one analysis of a synthetic history in the current process"""
+    from backend.app import MedicalService
+
+    service = MedicalService()
+    patient_input = synthetic_history(words)
+    estimate = service.estimate(patient_input)
+    start = time.perf_counter()
+    result = service.analyze_symptoms(patient_input, include_stages=True)
+    seconds = time.perf_counter() - start
+    intake = (result.get("stages") or {}).get(service.crew_factory.get_intake_stage()) or ""
+    return {
+        "seconds": seconds,
+        "success": bool(result.get("success")),
+        "error": result.get("error"),
+        "estimated_seconds": estimate["latency_seconds"],
+        "estimated_prompt_tokens": estimate["prompt_tokens"],
+        "input_tokens": estimate["input_tokens"],
+        "intake_chars": len(intake)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the chunked intake of long patient histories")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 10000, 25000, 50000, 100000],
+                        help="History lengths in words")
+    parser.add_argument("--latency", type=float, default=0.3,
+                        help="Seconds before the first token of each answer")
+    parser.add_argument("--token-rate", type=float, default=60.0,
+                        help="Completion tokens the fake LLM generates per second")
+    parser.add_argument("--prefill-rate", type=float, default=4000.0,
+                        help="Prompt tokens the fake LLM reads per second")
+    parser.add_argument("--context-window", type=int, default=128000,
+                        help="Largest prompt the fake LLM accepts, in tokens")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Child process: the parent already set up the environment
+        print(json.dumps(run_one(args.child)))
+        return
+
+    server = FakeLLMServer(latency=args.latency, token_rate=args.token_rate,
+                           prefill_rate=args.prefill_rate, context_window=args.context_window).start_background()
+    use_fake_llm(server)
+    os.environ.setdefault('RESUME_ON_STARTUP', 'false')
+    os.environ['STAGE_CACHE_ENABLED'] = 'false'
+    os.environ['NEAR_DUPLICATE_MODE'] = 'off'
+
+    print("=" * 96)
+    print(f"INTAKE MAP-REDUCE BENCHMARK ({args.latency}s to first token, {args.token_rate:g} tokens/s, "
+          f"{args.prefill_rate:g} prompt tokens/s, {args.context_window} token context)")
+    print("=" * 96)
+    print(f"{'words':>7} {'mode':>10} {'seconds':>8} {'estimate':>9} {'calls':>6} "
+          f"{'prompt tok':>11} {'compl tok':>10} {'intake chars':>13}  result")
+
+    for words in args.sizes:
+        for mode, enabled in (("direct", "false"), ("map-reduce", "true")):
+            server.reset_stats()
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_intake_map_reduce", "--child", str(words)],
+                cwd=Path(__file__).parent.parent,
+                env={**os.environ, "INTAKE_MAP_REDUCE_ENABLED": enabled},
+                capture_output=True,
+                text=True,
+                check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            stats = server.stats()
+            status = "ok" if result["success"] else f"failed: {(result['error'] or '')[:40]}"
+            print(f"{words:>7} {mode:>10} {result['seconds']:8.2f} {result['estimated_seconds']:9.2f} "
+                  f"{stats['requests']:>6} {stats['prompt_tokens']:>11} {stats['completion_tokens']:>10} "
+                  f"{result['intake_chars']:>13}  {status}")
+
+    print("=" * 96)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
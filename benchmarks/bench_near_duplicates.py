@@ -0,0 +1,158 @@
+"""
+Near-Duplicate Index Benchmark
+Measures SimHash index build and lookup time over synthetic patient descriptions
+
+Each size builds a fresh index, then looks up reworded copies of indexed
+descriptions (shuffled sentences, a filler word, different punctuation)
+and descriptions that were never indexed.
+
+Usage:
+    python -m benchmarks.bench_near_duplicates --sizes 100000 1000000 --queries 2000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault('OPENAI_API_KEY', 'benchmark')
+
+from backend.app.near_duplicates import SimHashIndex, simhash, HASH_BITS
+from backend.config import NEAR_DUPLICATE_THRESHOLD
+
+SYMPTOMS = [
+    "chest pain", "a headache", "a dry cough", "shortness of breath", "nausea",
+    "lower back pain", "a sore throat", "dizziness", "a rash on my arm", "fatigue",
+    "stomach cramps", "a fever", "joint pain in my knees", "blurred vision",
+    "heart palpitations", "numbness in my left hand", "ear pain", "a runny nose"
+]
+TRIGGERS = [
+    "when I climb stairs", "after eating", "at night", "in the morning", "when I lie down",
+    "when I cough", "after exercise", "when I stand up quickly", "for no obvious reason"
+]
+HISTORY = [
+    "I have high blood pressure", "I have type 2 diabetes", "I had my appendix removed",
+    "I have asthma", "I have no other conditions", "I smoke a pack a day", "I take ibuprofen"
+]
+FILLERS = ["like", "really", "just", "actually", "basically"]
+
+
+def _rss_mb() -> float:
+    """Resident memory of this process in MB (Linux only, 0 elsewhere)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return 0.0
+
+
+def make_description(rng: random.Random) -> list:
+    """Random description as a list of sentences"""
+    sentences = [
+        f"I'm a {rng.randint(18, 90)}-year-old {rng.choice(['man', 'woman'])}",
+        f"I've had {rng.choice(SYMPTOMS)} for {rng.randint(1, 30)} {rng.choice(['days', 'weeks'])}",
+        f"It gets worse {rng.choice(TRIGGERS)}",
+    ]
+    for _ in range(rng.randint(0, 3)):
+        sentences.append(f"I also have {rng.choice(SYMPTOMS)} {rng.choice(TRIGGERS)}")
+    sentences.append(rng.choice(HISTORY))
+    return sentences
+
+
+def reword(sentences: list, rng: random.Random) -> str:
+    """Same description with shuffled sentences, a filler word and other punctuation"""
+    sentences = list(sentences)
+    rng.shuffle(sentences)
+    index = rng.randrange(len(sentences))
+    words = sentences[index].split()
+    words.insert(rng.randint(1, len(words)), rng.choice(FILLERS) + ",")
+    sentences[index] = " ".join(words)
+    return "! ".join(sentences).lower()
+
+
+def percentile(values: list, pct: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(len(values) * pct))]
+
+
+def run_size(size: int, queries: int, max_distance: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    descriptions = [make_description(rng) for _ in range(size)]
+    rss_before = _rss_mb()
+
+    start = time.perf_counter()
+    hashes = [simhash(". ".join(sentences)) for sentences in descriptions]
+    hash_seconds = time.perf_counter() - start
+
+    index = SimHashIndex(max_distance)
+    start = time.perf_counter()
+    for position, value in enumerate(hashes):
+        index.add(value, position)
+    insert_seconds = time.perf_counter() - start
+
+    sample = rng.sample(range(size), min(queries, size))
+    near_latencies, found = [], 0
+    for position in sample:
+        text = reword(descriptions[position], rng)
+        start = time.perf_counter()
+        matches = index.lookup(simhash(text))
+        near_latencies.append(time.perf_counter() - start)
+        found += any(key == position or hashes[key] == hashes[position] for _, key in matches)
+
+    novel_latencies = []
+    novel_rng = random.Random(seed + 1)
+    for _ in range(len(sample)):
+        text = ". ".join(make_description(novel_rng))
+        start = time.perf_counter()
+        index.lookup(simhash(text))
+        novel_latencies.append(time.perf_counter() - start)
+
+    return {
+        "size": size,
+        "hash_seconds": hash_seconds,
+        "insert_seconds": insert_seconds,
+        "index_mb": _rss_mb() - rss_before,
+        "recall": found / len(sample),
+        "near_p50_ms": statistics.median(near_latencies) * 1000,
+        "near_p99_ms": percentile(near_latencies, 0.99) * 1000,
+        "novel_p50_ms": statistics.median(novel_latencies) * 1000,
+        "novel_p99_ms": percentile(novel_latencies, 0.99) * 1000
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the near-duplicate SimHash index")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--threshold", type=float, default=NEAR_DUPLICATE_THRESHOLD)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    max_distance = int((1 - args.threshold) * HASH_BITS + 1e-9)
+
+    print("=" * 70)
+    print(f"NEAR-DUPLICATE INDEX BENCHMARK (threshold {args.threshold}, "
+          f"max distance {max_distance} bits)")
+    print("=" * 70)
+
+    for size in args.sizes:
+        result = run_size(size, args.queries, max_distance, args.seed)
+        print(f"{size:>9,} entries: hash {result['hash_seconds']:6.1f} s, "
+              f"index build {result['insert_seconds']:5.1f} s, "
+              f"~{result['index_mb']:.0f} MB")
+        print(f"{'':>19}reworded lookup p50 {result['near_p50_ms']:.3f} ms, "
+              f"p99 {result['near_p99_ms']:.3f} ms, recall {result['recall']:.1%}")
+        print(f"{'':>19}novel lookup    p50 {result['novel_p50_ms']:.3f} ms, "
+              f"p99 {result['novel_p99_ms']:.3f} ms")
+
+    print("=" * 70)
+
+
+if __name__ == "__main__":
+    main()
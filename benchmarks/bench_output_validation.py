@@ -0,0 +1,138 @@
+"""
+Output Validation Benchmark
+Compares regenerating a missing section with resubmitting the whole analysis
+
+The fake LLM server leaves a required section out of a share of its
+diagnosis and communication reports (the diagnosis lists 3 conditions
+instead of 5, the patient guide lacks its emergency-care warning signs).
+Each mode runs the same descriptions in its own process (settings are read
+at import time) with the stage cache and near-duplicate reuse off:
+
+- rerun: validation off; an analysis whose reports fail the local check
+  is submitted again, up to --max-runs times, as a client would have to
+- regenerate: validation on; the missing sections are written again with
+  one targeted call each
+
+The benchmark reports the tokens and time per analysis, how many analyses
+ended valid, and the sections regenerated.
+
+Usage:
+    python -m benchmarks.bench_output_validation --analyses 10 --incomplete-rate 0.5
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.fake_llm_server import FakeLLMServer, use_fake_llm
+from benchmarks.bench_prompt_profiles import description
+
+
+def run_analyses(count: int, max_runs: int) -> dict:
+    """Run `count` analyses in the current process, resubmitting invalid ones when validation is off"""
+    from backend.app import MedicalService
+    from backend.app.output_validation import OutputValidator
+
+    service = MedicalService()
+    checker = OutputValidator(service.crew_factory, service.crew_factory.get_validation_config())
+    rng = random.Random(11)
+    valid = runs = regenerated = 0
+    start = time.perf_counter()
+    for _ in range(count):
+        patient_input = description(rng)
+        for _ in range(max_runs):
+            runs += 1
+            result = service.analyze_symptoms(patient_input, include_stages=True)
+            if not result.get("success"):
+                return {"success": False, "error": result.get("error")}
+            regenerated += sum(
+                len(outcome['regenerated']) for outcome in result["metadata"]["output_validation"].values()
+            )
+            if not any(checker.validate(name, raw) for name, raw in result["stages"].items() if checker.applies(name)):
+                valid += 1
+                break
+    return {
+        "success": True,
+        "seconds": time.perf_counter() - start,
+        "runs": runs,
+        "valid": valid,
+        "regenerated": regenerated
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark targeted section regeneration against full reruns")
+    parser.add_argument("--analyses", type=int, default=10, help="Analyses per mode")
+    parser.add_argument("--incomplete-rate", type=float, default=0.5,
+                        help="Share of reports the fake LLM returns with a section missing")
+    parser.add_argument("--max-runs", type=int, default=4, help="Submissions per analysis in rerun mode")
+    parser.add_argument("--prefill-rate", type=float, default=2000, help="Prompt tokens the fake LLM reads per second")
+    parser.add_argument("--token-rate", type=float, default=400, help="Tokens the fake LLM writes per second")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Child process: the parent already set up the environment
+        print(json.dumps(run_analyses(args.child, args.max_runs)))
+        return
+
+    server = FakeLLMServer(
+        token_rate=args.token_rate, prefill_rate=args.prefill_rate, incomplete_rate=args.incomplete_rate
+    ).start_background()
+    use_fake_llm(server)
+    os.environ.setdefault('RESUME_ON_STARTUP', 'false')
+    os.environ['STAGE_CACHE_ENABLED'] = 'false'
+    os.environ['NEAR_DUPLICATE_MODE'] = 'off'
+
+    print("=" * 78)
+    print(f"OUTPUT VALIDATION BENCHMARK ({args.analyses} analyses, "
+          f"{args.incomplete_rate:.0%} of reports incomplete)")
+    print("=" * 78)
+    print(f"{'mode':<12}{'runs':>6}{'valid':>7}{'regen':>7}{'prompt tok':>12}{'completion':>12}{'s/analysis':>12}")
+    measured = {}
+    for mode, enabled, max_runs in (("rerun", "false", args.max_runs), ("regenerate", "true", 1)):
+        server.reset_stats()
+        # The same reports come back incomplete in both modes
+        random.seed(3)
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_output_validation",
+             "--child", str(args.analyses), "--max-runs", str(max_runs)],
+            cwd=Path(__file__).parent.parent,
+            env={**os.environ, "OUTPUT_VALIDATION_ENABLED": enabled},
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if not result["success"]:
+            print(f"{mode:<12}failed: {result['error']}")
+            continue
+        stats = server.stats()
+        measured[mode] = {
+            "tokens": (stats["prompt_tokens"] + stats["completion_tokens"]) / args.analyses,
+            "seconds": result["seconds"] / args.analyses
+        }
+        print(f"{mode:<12}{result['runs']:>6}{result['valid']:>7}{result['regenerated']:>7}"
+              f"{stats['prompt_tokens'] / args.analyses:>12.0f}{stats['completion_tokens'] / args.analyses:>12.0f}"
+              f"{measured[mode]['seconds']:>12.2f}")
+
+    if len(measured) == 2:
+        saved = measured["rerun"]["tokens"] - measured["regenerate"]["tokens"]
+        faster = measured["rerun"]["seconds"] - measured["regenerate"]["seconds"]
+        print(f"regenerate vs rerun: {saved:.0f} tokens saved per analysis "
+              f"({saved / measured['rerun']['tokens']:.1%}), {faster:.2f} s faster "
+              f"({faster / measured['rerun']['seconds']:.1%})")
+
+    print("=" * 78)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
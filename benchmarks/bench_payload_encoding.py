@@ -0,0 +1,101 @@
+"""
+Payload Encoding Benchmark
+Measures response size and serialization time for each format and compression
+
+Usage:
+    python -m benchmarks.bench_payload_encoding --iterations 2000
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.fake_llm_server import (
+    FakeLLMServer,
+    use_fake_llm,
+    INTAKE_REPORT,
+    DIAGNOSIS_REPORT,
+    COMMUNICATION_REPORT
+)
+
+
+def sample_payload(include_stages: bool) -> dict:
+    """A response shaped like MedicalService.analyze_symptoms output"""
+    payload = {
+        "success": True,
+        "result": COMMUNICATION_REPORT,
+        "metadata": {
+            "request_id": "0f6c1b0d2c5e4a9f8e7d6c5b4a392817",
+            "prompt_version": "3a1f0c9e2b7d",
+            "start_time": "2026-01-01T12:00:00.000000",
+            "end_time": "2026-01-01T12:01:30.000000",
+            "duration_seconds": 90.0,
+            "patient_input_length": 512,
+            "resumed_stages": []
+        }
+    }
+    if include_stages:
+        payload["stages"] = {
+            "interview_task": INTAKE_REPORT,
+            "diagnosis_task": DIAGNOSIS_REPORT,
+            "communication_task": COMMUNICATION_REPORT
+        }
+    return payload
+
+
+def measure(fn, iterations: int) -> float:
+    """Mean microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response payload encodings")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    # Settings are read at import time, so point them at a (never called) fake LLM
+    use_fake_llm(FakeLLMServer())
+
+    from backend.app import response_encoding
+    from backend.app.response_encoding import compress, orjson, msgpack, brotli
+
+    encoders = {"json (baseline)": lambda p: json.dumps(p).encode("utf-8")}
+    encoders["json (compact)"] = lambda p: response_encoding.serialize_payload(p)[0]
+    if msgpack is not None:
+        encoders["msgpack"] = lambda p: response_encoding.serialize_payload(p, format="msgpack")[0]
+    encodings = [None, "gzip"] + (["br"] if brotli is not None else [])
+
+    print("=" * 78)
+    print("PAYLOAD ENCODING BENCHMARK")
+    print(f"orjson: {'yes' if orjson else 'no'}  msgpack: {'yes' if msgpack else 'no'}  "
+          f"brotli: {'yes' if brotli else 'no'}")
+    print("=" * 78)
+
+    for include_stages in (False, True):
+        payload = sample_payload(include_stages)
+        print(f"\n{'With stages' if include_stages else 'Final report only'}")
+        print(f"{'format':<18}{'encoding':<10}{'bytes':>10}{'serialize us':>15}{'compress us':>15}")
+
+        for name, encode in encoders.items():
+            body = encode(payload)
+            serialize_us = measure(lambda: encode(payload), args.iterations)
+            for encoding in encodings:
+                if encoding is None:
+                    size, compress_us = len(body), 0.0
+                else:
+                    size = len(compress(body, encoding))
+                    compress_us = measure(lambda: compress(body, encoding), max(1, args.iterations // 10))
+                print(f"{name:<18}{encoding or 'identity':<10}{size:>10}{serialize_us:>15.1f}{compress_us:>15.1f}")
+
+    print("=" * 78)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,162 @@
+"""
+PHI Redaction Benchmark
+Measures redaction throughput and the prompt tokens redaction saves
+
+The throughput part redacts synthetic multi-visit histories of 1 to 16 MB
+in which every visit note carries a header with the patient's name,
+record number, phone number, address and e-mail address, and re-hydrates
+the redacted text. The token part runs full analyses of short
+identifier-heavy descriptions against the fake LLM server with redaction
+on and off, each in its own process (settings are read at import time)
+with the stage cache and near-duplicate reuse off.
+
+Usage:
+    python -m benchmarks.bench_phi_redaction --sizes 1 4 16 --analyses 20
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.fake_llm_server import FakeLLMServer, use_fake_llm
+from benchmarks.bench_intake_map_reduce import synthetic_history
+
+FIRST_NAMES = ["John", "Maria", "Wei", "Aisha", "Robert", "Elena", "Kwame", "Sofia", "David", "Priya"]
+LAST_NAMES = ["Smith", "Garcia", "Chen", "Okafor", "Johnson", "Rossi", "Mensah", "Novak", "Miller", "Patel"]
+STREETS = ["Oak Tree Lane", "Main Street", "Cedar Avenue", "Lakeview Drive", "Hill Road"]
+SYMPTOMS = ["chest pain radiating to my left arm", "a pounding headache", "shortness of breath",
+            "dizziness when I stand up", "burning stomach pain after meals", "palpitations at night"]
+
+
+def identifiers(rng: random.Random) -> dict:
+    """One synthetic patient's identifiers"""
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    return {
+        "name": f"{first} {last}",
+        "last": last,
+        "mrn": f"{rng.randint(0, 99999999):08d}",
+        "phone": f"({rng.randint(200, 999)}) {rng.randint(200, 999)}-{rng.randint(0, 9999):04d}",
+        "address": f"{rng.randint(1, 9999)} {rng.choice(STREETS)}, Springfield, IL {rng.randint(10000, 99999)}",
+        "email": f"{first.lower()}.{last.lower()}@example.com",
+        "doctor": rng.choice(LAST_NAMES)
+    }
+
+
+def history_with_identifiers(megabytes: float, seed: int = 7) -> str:
+    """A synthetic history of about `megabytes` MB with an identifier header on every visit"""
+    rng = random.Random(seed)
+    patient = identifiers(rng)
+    header = (f"Patient: Mr. {patient['name']}, MRN: {patient['mrn']}, phone {patient['phone']}, "
+              f"address {patient['address']}, e-mail {patient['email']}. Seen by Dr. {patient['doctor']}.\n")
+    # synthetic_history averages about 7 characters per word
+    visits = synthetic_history(int(megabytes * 1e6 / 7), seed).split("\n\n")
+    return "\n\n".join(header + visit if "VISIT" in visit else visit for visit in visits)
+
+
+def description(rng: random.Random) -> str:
+    """A short description with the identifiers patients tend to include"""
+    patient = identifiers(rng)
+    return (
+        f"Hi, my name is {patient['name']}, I'm {rng.randint(18, 90)} and I've had {rng.choice(SYMPTOMS)} "
+        f"for {rng.randint(1, 14)} days. Dr. {patient['doctor']} saw me last month (MRN: {patient['mrn']}). "
+        f"I live at {patient['address']}. Please call me at {patient['phone']} or e-mail {patient['email']}. "
+        f"{patient['last']} family history of heart disease. I take lisinopril 10mg daily."
+    )
+
+
+def timed(function, *args, repeat: int = 3):
+    """Best wall time of `repeat` calls, and the last call's result"""
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def run_analyses(count: int) -> dict:
+    """Run `count` analyses of generated descriptions in the current process"""
+    from backend.app import MedicalService
+
+    service = MedicalService()
+    rng = random.Random(11)
+    redacted = 0
+    for _ in range(count):
+        result = service.analyze_symptoms(description(rng))
+        if not result.get("success"):
+            return {"success": False, "error": result.get("error")}
+        redacted += sum((result["metadata"].get("phi_redacted") or {}).values())
+    return {"success": True, "identifiers": redacted}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PHI redaction throughput and token savings")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4, 16], help="History sizes in MB")
+    parser.add_argument("--analyses", type=int, default=20, help="Analyses per token measurement")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Child process: the parent already set up the environment
+        print(json.dumps(run_analyses(args.child)))
+        return
+
+    server = FakeLLMServer().start_background()
+    use_fake_llm(server)
+    os.environ.setdefault('RESUME_ON_STARTUP', 'false')
+    os.environ['STAGE_CACHE_ENABLED'] = 'false'
+    os.environ['NEAR_DUPLICATE_MODE'] = 'off'
+    from backend.app.phi_redaction import redact
+
+    print("=" * 78)
+    print("PHI REDACTION BENCHMARK")
+    print("=" * 78)
+    print(f"{'history':<16}{'MB':>6}{'redact ms':>11}{'MB/s':>8}{'found':>7}{'rehydrate ms':>14}{'exact':>7}")
+    plain = "The patient reports mild pain and some nausea after eating. " * 17000
+    for label, text in [("plain prose", plain)] + [
+        ("with identifiers", history_with_identifiers(size)) for size in args.sizes
+    ]:
+        megabytes = len(text.encode()) / 1e6
+        seconds, redaction = timed(redact, text)
+        rehydrate_seconds, restored = timed(redaction.rehydrate, redaction.text)
+        print(f"{label:<16}{megabytes:>6.1f}{seconds * 1000:>11.1f}{megabytes / seconds:>8.0f}"
+              f"{len(redaction.originals):>7}{rehydrate_seconds * 1000:>14.1f}{str(restored == text):>7}")
+
+    print("-" * 78)
+    print(f"{'redaction':<16}{'analyses':>9}{'prompt tok':>12}{'per analysis':>14}{'identifiers':>13}")
+    per_analysis = {}
+    for mode, enabled in (("off", "false"), ("on", "true")):
+        server.reset_stats()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_phi_redaction", "--child", str(args.analyses)],
+            cwd=Path(__file__).parent.parent,
+            env={**os.environ, "PHI_REDACTION_ENABLED": enabled},
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if not result["success"]:
+            print(f"{mode:<16}failed: {result['error']}")
+            continue
+        stats = server.stats()
+        per_analysis[mode] = stats["prompt_tokens"] / args.analyses
+        print(f"{mode:<16}{args.analyses:>9}{stats['prompt_tokens']:>12}{per_analysis[mode]:>14.0f}"
+              f"{result['identifiers'] / args.analyses:>13.1f}")
+    if len(per_analysis) == 2:
+        saved = per_analysis["off"] - per_analysis["on"]
+        print(f"saved per analysis: {saved:.0f} prompt tokens ({saved / per_analysis['off']:.1%})")
+
+    print("=" * 78)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Prompt Profile Benchmark
+Compares the tokens and latency of analyses run with each prompt profile
+
+The static part prints every profile's prompt token budget per stage (see
+backend/prompt_budget.py). The measured part runs full analyses of varied
+descriptions against the fake LLM server, which reads prompts at a prefill
+rate and writes its canned reports at a token rate, once per profile and
+each in its own process, with the stage cache and near-duplicate reuse
+off. The profile is picked per request, the way /api/analyze does it.
+
+The fake server's reports do not depend on the prompt, so completion
+tokens stay the same; what a profile changes here is the prompt tokens
+and the time spent reading them.
+
+Usage:
+    python -m benchmarks.bench_prompt_profiles --analyses 10 --prefill-rate 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.fake_llm_server import FakeLLMServer, use_fake_llm
+
+SYMPTOMS = ["chest pain radiating to my left arm", "a pounding headache", "shortness of breath",
+            "dizziness when I stand up", "burning stomach pain after meals", "palpitations at night",
+            "a dry cough and fever", "swelling in both ankles"]
+
+
+def description(rng: random.Random) -> str:
+    """A short description with enough detail to pass the intake gate"""
+    first, second = rng.sample(SYMPTOMS, 2)
+    return (
+        f"I'm a {rng.randint(18, 90)}-year-old {rng.choice(['male', 'female'])} and I've had {first} "
+        f"for {rng.randint(1, 14)} days, and {second} since yesterday. It is worse in the evening. "
+        f"I take lisinopril 10mg daily, I'm allergic to penicillin and my father had heart disease."
+    )
+
+
+def run_analyses(count: int, prompt_profile: str) -> dict:
+    """Run `count` analyses with a prompt profile in the current process"""
+    from backend.app import MedicalService
+
+    service = MedicalService()
+    rng = random.Random(11)
+    statuses = {}
+    start = time.perf_counter()
+    for _ in range(count):
+        result = service.analyze_symptoms(description(rng), prompt_profile=prompt_profile)
+        if not result.get("success"):
+            return {"success": False, "error": result.get("error")}
+        statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+    return {"success": True, "seconds": time.perf_counter() - start, "statuses": statuses}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tokens and latency of each prompt profile")
+    parser.add_argument("--analyses", type=int, default=10, help="Analyses per profile")
+    parser.add_argument("--prefill-rate", type=float, default=2000, help="Prompt tokens the fake LLM reads per second")
+    parser.add_argument("--token-rate", type=float, default=400, help="Tokens the fake LLM writes per second")
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--profile", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Child process: the parent already set up the environment
+        print(json.dumps(run_analyses(args.child, args.profile)))
+        return
+
+    server = FakeLLMServer(token_rate=args.token_rate, prefill_rate=args.prefill_rate).start_background()
+    use_fake_llm(server)
+    os.environ.setdefault('RESUME_ON_STARTUP', 'false')
+    os.environ['STAGE_CACHE_ENABLED'] = 'false'
+    os.environ['NEAR_DUPLICATE_MODE'] = 'off'
+    from backend.app.crew_factory import CrewFactory
+    from backend.app.prompt_loader import available_profiles
+    from backend.app.token_estimator import prompt_budget
+    from backend.config import PROMPTS_DIR
+
+    profiles = available_profiles(PROMPTS_DIR)
+    budgets = {name: prompt_budget(CrewFactory(profile=name)) for name in profiles}
+
+    print("=" * 78)
+    print(f"PROMPT PROFILE BENCHMARK (prefill {args.prefill_rate:.0f} tok/s, generation {args.token_rate:.0f} tok/s)")
+    print("=" * 78)
+    print(f"{'fixed prompt tokens':<24}" + "".join(f"{name:>12}" for name in profiles))
+    for stage in budgets[profiles[0]]['stages']:
+        print(f"{stage:<24}" + "".join(f"{budgets[name]['stages'][stage]['total']:>12}" for name in profiles))
+    print(f"{'all stages':<24}" + "".join(f"{budgets[name]['total']:>12}" for name in profiles))
+
+    print("-" * 78)
+    print(f"{'profile':<12}{'analyses':>9}{'prompt tok':>12}{'completion':>12}{'s/analysis':>12}  statuses")
+    measured = {}
+    for name in profiles:
+        server.reset_stats()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_prompt_profiles",
+             "--child", str(args.analyses), "--profile", name],
+            cwd=Path(__file__).parent.parent,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if not result["success"]:
+            print(f"{name:<12}failed: {result['error']}")
+            continue
+        stats = server.stats()
+        measured[name] = {
+            "prompt": stats["prompt_tokens"] / args.analyses,
+            "completion": stats["completion_tokens"] / args.analyses,
+            "seconds": result["seconds"] / args.analyses
+        }
+        print(f"{name:<12}{args.analyses:>9}{measured[name]['prompt']:>12.0f}{measured[name]['completion']:>12.0f}"
+              f"{measured[name]['seconds']:>12.2f}  {result['statuses']}")
+
+    base = measured.get(profiles[0])
+    for name in profiles[1:]:
+        if base and name in measured:
+            saved = base['prompt'] - measured[name]['prompt']
+            faster = base['seconds'] - measured[name]['seconds']
+            print(f"{name} vs {profiles[0]}: {saved:.0f} prompt tokens saved per analysis "
+                  f"({saved / base['prompt']:.1%}), {faster:.2f} s faster ({faster / base['seconds']:.1%})")
+
+    print("=" * 78)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Stage Pipelining Benchmark
+Compares end-to-end analysis latency with and without PIPELINE_STREAMING
+
+The fake LLM server generates answers at a fixed token rate, so stage
+latency grows with output length the way it does with a real model. Each
+mode runs in its own process (settings are read at import time) with the
+stage cache and near-duplicate reuse off, so every analysis calls the LLM.
+
+Usage:
+    python -m benchmarks.bench_stage_pipelining --runs 5 --token-rate 100
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.fake_llm_server import FakeLLMServer, use_fake_llm
+
+PATIENT_INPUT = "I'm a 45-year-old male with chest pain for 3 days radiating to my left arm, case {}"
+
+
+def run_mode(runs: int) -> dict:
+    """Run analyses one after another in the current process and time each"""
+    from backend.app import MedicalService
+
+    service = MedicalService()
+    # Warm up imports, prompt loading and connection pools
+    service.analyze_symptoms(PATIENT_INPUT.format('warmup'))
+
+    seconds, succeeded = [], 0
+    for i in range(runs):
+        start = time.perf_counter()
+        result = service.analyze_symptoms(PATIENT_INPUT.format(i))
+        seconds.append(time.perf_counter() - start)
+        succeeded += bool(result.get("success"))
+
+    return {"seconds": seconds, "succeeded": succeeded}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipelined diagnosis and communication stages")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--latency", type=float, default=0.3,
+                        help="Seconds before the first token of each answer")
+    parser.add_argument("--token-rate", type=float, default=100.0,
+                        help="Completion tokens the fake LLM generates per second")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # Child process: the parent already set up the environment
+        print(json.dumps(run_mode(args.runs)))
+        return
+
+    server = FakeLLMServer(latency=args.latency, token_rate=args.token_rate).start_background()
+    use_fake_llm(server)
+    os.environ.setdefault('RESUME_ON_STARTUP', 'false')
+    os.environ['STAGE_CACHE_ENABLED'] = 'false'
+    os.environ['NEAR_DUPLICATE_MODE'] = 'off'
+
+    print("=" * 70)
+    print(f"STAGE PIPELINING BENCHMARK ({args.runs} analyses, {args.latency}s to first token, "
+          f"{args.token_rate:g} tokens/s)")
+    print("=" * 70)
+
+    medians = {}
+    for mode, streaming in (("sequential", "false"), ("pipelined", "true")):
+        server.reset_stats()
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_stage_pipelining",
+             "--child", "--runs", str(args.runs)],
+            cwd=Path(__file__).parent.parent,
+            env={**os.environ, "PIPELINE_STREAMING": streaming},
+            capture_output=True,
+            text=True,
+            check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        seconds = result["seconds"]
+        medians[mode] = statistics.median(seconds)
+        requests = server.stats()["requests"] / (args.runs + 1)
+        print(f"{mode:10s}: median {medians[mode]:6.2f} s, min {min(seconds):6.2f} s, "
+              f"max {max(seconds):6.2f} s, {result['succeeded']}/{args.runs} ok, "
+              f"{requests:.0f} LLM calls per analysis")
+
+    saved = medians["sequential"] - medians["pipelined"]
+    print("-" * 70)
+    print(f"Pipelining saves {saved:.2f} s per analysis "
+          f"({saved / medians['sequential'] * 100:.0f}% of end-to-end latency)")
+    print("=" * 70)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
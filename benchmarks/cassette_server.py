@@ -0,0 +1,195 @@
+"""
+Cassette Server
+OpenAI-compatible endpoint that replays a cassette, or records one while proxying
+
+Lets processes that do not record themselves, such as crew.py batches or
+checkouts of older revisions, run against recorded LLM traffic: point
+OPENAI_BASE_URL at the server. Replayed responses keep their recorded
+chunk timing, scaled by --latency-scale.
+
+Usage:
+    python -m benchmarks.cassette_server --cassette calls.jsonl.gz --record --upstream https://api.openai.com/v1
+    python -m benchmarks.cassette_server --cassette calls.jsonl.gz --latency-scale 0
+    python -m benchmarks.cassette_server --cassette calls.jsonl.gz --allow-fallback
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault('OPENAI_API_KEY', 'cassette')
+
+import httpx
+
+from backend.app.cassettes import Cassette, CassetteMissError, RecordingTransport, decode_chunk
+
+# Request headers passed on to the upstream provider
+FORWARDED_HEADERS = ('authorization', 'content-type', 'openai-organization', 'accept')
+
+
+class CassetteHandler(BaseHTTPRequestHandler):
+    """Answers chat completion requests from (or through) the cassette"""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _start_chunked(self, status: int, headers: dict):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+    def _write_chunk(self, chunk: bytes):
+        if chunk:
+            self.wfile.write(f"{len(chunk):x}\r\n".encode("ascii") + chunk + b"\r\n")
+            self.wfile.flush()
+
+    def _end_chunked(self):
+        self.wfile.write(b"0\r\n\r\n")
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/stats"):
+            self._send_json(200, self.server.cassette.stats)
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.server.upstream:
+            self._proxy(body)
+        else:
+            self._replay(body)
+
+    def _replay(self, body: bytes):
+        start = time.perf_counter()
+        try:
+            record = self.server.cassette.match(body)
+        except CassetteMissError as e:
+            self._send_json(404, {"error": {"message": str(e), "code": "cassette_miss"}})
+            return
+
+        scale = self.server.latency_scale
+        time.sleep(record["headers_after"] * scale)
+        self._start_chunked(record["status"], {**record["headers"], "x-cassette-match": record["match"]})
+        for offset, chunk in record["chunks"]:
+            delay = start + offset * scale - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            self._write_chunk(decode_chunk(chunk))
+        self._end_chunked()
+
+    def _proxy(self, body: bytes):
+        url = self.server.upstream + self.path.removeprefix("/v1")
+        headers = {name: self.headers[name] for name in FORWARDED_HEADERS if name in self.headers}
+        request = self.server.client.build_request("POST", url, content=body, headers=headers)
+        response = self.server.client.send(request, stream=True)
+        try:
+            kept = {
+                name: response.headers[name]
+                for name in ("content-type", "content-encoding") if name in response.headers
+            }
+            self._start_chunked(response.status_code, kept)
+            for chunk in response.iter_raw():
+                self._write_chunk(chunk)
+            self._end_chunked()
+        finally:
+            response.close()
+
+
+class CassetteServer(ThreadingHTTPServer):
+    """Threaded server replaying or recording a cassette"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        cassette: Cassette,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency_scale: float = 1.0,
+        upstream: str = None
+    ):
+        super().__init__((host, port), CassetteHandler)
+        self.cassette = cassette
+        self.latency_scale = latency_scale
+        self.upstream = upstream.rstrip("/") if upstream else None
+        self.client = None
+        if self.upstream:
+            self.client = httpx.Client(
+                transport=RecordingTransport(httpx.HTTPTransport(), cassette),
+                timeout=None
+            )
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start_background(self) -> "CassetteServer":
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def shutdown(self):
+        super().shutdown()
+        if self.client is not None:
+            self.client.close()
+            self.cassette.save()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay or record an LLM cassette")
+    parser.add_argument("--cassette", type=Path, required=True)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Multiplier on recorded timing (0 = as fast as possible)")
+    parser.add_argument("--record", action="store_true", help="Proxy to --upstream and record")
+    parser.add_argument("--upstream", default="https://api.openai.com/v1")
+    parser.add_argument("--allow-fallback", action="store_true",
+                        help="Replay a recording of the same agent when a prompt changed")
+    args = parser.parse_args()
+
+    cassette = Cassette(args.cassette, strict=not args.allow_fallback)
+    server = CassetteServer(
+        cassette, args.host, args.port, args.latency_scale,
+        upstream=args.upstream if args.record else None
+    )
+    action = f"recording calls to {server.upstream}" if args.record else \
+        f"replaying {len(cassette.records)} calls"
+    print(f"Cassette server {action} on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server.client is not None:
+            server.client.close()
+            cassette.save()
+            print(f"Saved {len(cassette.records)} calls to {args.cassette}")
+
+
+if __name__ == "__main__":
+    main()
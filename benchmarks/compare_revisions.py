@@ -0,0 +1,165 @@
+"""
+Revision Comparison Runner
+Replays one cassette against two code revisions and diffs latency and tokens
+
+Each revision is checked out into a temporary git worktree (or the
+working tree itself for --head '') and runs the same patient descriptions
+through MedicalService.analyze_symptoms in a subprocess with a fresh data
+directory. Both talk to one cassette server, so any difference comes from
+the code and prompts, not the provider.
+
+Calls are replayed only when recorded with the same request. To compare
+a prompt edit, pass --allow-fallback: calls whose prompt changed then
+replay the agent's recording, and are counted as cassette fallbacks.
+
+Usage:
+    python -m benchmarks.compare_revisions --cassette calls.jsonl.gz --base HEAD~3 --head ''
+    python -m benchmarks.compare_revisions --cassette calls.jsonl.gz --base HEAD~1 --allow-fallback
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.cassette_server import CassetteServer
+from backend.app.cassettes import Cassette
+
+DEFAULT_INPUTS = [
+    "I'm a 45-year-old male with chest pain for 3 days that gets worse when I climb stairs. "
+    "I have high blood pressure and take lisinopril.",
+    "I'm a 30-year-old woman with a headache behind my eyes for a week, worse in the morning.",
+    "I feel bad",
+]
+
+# Run inside the revision's checkout, so it only uses what every revision has
+WORKLOAD = """
+import json, sys, time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, '.')
+from backend.app import MedicalService
+
+inputs, concurrency = json.loads(sys.argv[1]), int(sys.argv[2])
+service = MedicalService()
+
+def run(patient_input):
+    start = time.perf_counter()
+    response = service.analyze_symptoms(patient_input)
+    return time.perf_counter() - start, bool(response.get('success'))
+
+start = time.perf_counter()
+with ThreadPoolExecutor(max_workers=concurrency) as pool:
+    results = list(pool.map(run, inputs))
+print(json.dumps({
+    "seconds": time.perf_counter() - start,
+    "latencies": [latency for latency, _ in results],
+    "succeeded": sum(ok for _, ok in results)
+}))
+"""
+
+
+def checkout(revision: str, directory: Path) -> Path:
+    """Path of a revision's code ('' is the working tree)"""
+    if not revision:
+        return ROOT
+    subprocess.run(
+        ["git", "worktree", "add", "--detach", str(directory), revision],
+        cwd=ROOT, check=True, capture_output=True
+    )
+    return directory
+
+
+def run_revision(revision: str, server: CassetteServer, inputs: list, concurrency: int) -> dict:
+    """Run the workload on one revision and collect its timings and token counts"""
+    server.cassette.reset_stats()
+    with tempfile.TemporaryDirectory(prefix="compare-") as temp:
+        code = checkout(revision, Path(temp) / "code")
+        env = dict(
+            os.environ,
+            OPENAI_API_KEY="cassette",
+            OPENAI_BASE_URL=server.base_url,
+            DATA_DIR=str(Path(temp) / "data"),
+            RESUME_ON_STARTUP="false",
+            LLM_CASSETTE_MODE="off",
+            CREW_VERBOSE="False",
+            CREW_MEMORY_ENABLED="False",
+            CREWAI_TRACING_ENABLED="false",
+            OTEL_SDK_DISABLED="true"
+        )
+        try:
+            output = subprocess.run(
+                [sys.executable, "-c", WORKLOAD, json.dumps(inputs), str(concurrency)],
+                cwd=code, env=env, capture_output=True, text=True, check=True
+            ).stdout
+        finally:
+            if code != ROOT:
+                subprocess.run(["git", "worktree", "remove", "--force", str(code)], cwd=ROOT, capture_output=True)
+
+    result = json.loads(output.strip().splitlines()[-1])
+    result.update(server.cassette.stats)
+    return result
+
+
+def summarize(result: dict) -> dict:
+    latencies = sorted(result["latencies"])
+    return {
+        "wall seconds": result["seconds"],
+        "p50 latency s": statistics.median(latencies),
+        "max latency s": latencies[-1],
+        "succeeded": result["succeeded"],
+        "LLM calls": result["calls"],
+        "prompt tokens": result["prompt_tokens"],
+        "completion tokens": result["completion_tokens"],
+        "cassette fallbacks": result["fallback"],
+        "cassette misses": result["misses"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two revisions against a recorded cassette")
+    parser.add_argument("--cassette", type=Path, required=True)
+    parser.add_argument("--base", default="HEAD", help="Baseline revision")
+    parser.add_argument("--head", default="", help="Revision to compare ('' = working tree)")
+    parser.add_argument("--inputs", type=Path, help="File with one patient description per line")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--latency-scale", type=float, default=1.0,
+                        help="Multiplier on recorded timing (0 = as fast as possible)")
+    parser.add_argument("--allow-fallback", action="store_true",
+                        help="Replay the agent's recording for calls whose prompt changed")
+    args = parser.parse_args()
+
+    inputs = DEFAULT_INPUTS
+    if args.inputs:
+        inputs = [line.strip() for line in args.inputs.read_text().splitlines() if line.strip()]
+
+    server = CassetteServer(Cassette(args.cassette, strict=not args.allow_fallback), latency_scale=args.latency_scale).start_background()
+    labels = (args.base or "working tree", args.head or "working tree")
+
+    print("=" * 70)
+    print(f"REVISION COMPARISON ({len(inputs)} analyses, concurrency {args.concurrency}, "
+          f"latency scale {args.latency_scale})")
+    print("=" * 70)
+
+    base = summarize(run_revision(args.base, server, inputs, args.concurrency))
+    head = summarize(run_revision(args.head, server, inputs, args.concurrency))
+
+    print(f"{'':20s} {labels[0][:14]:>14s} {labels[1][:14]:>14s} {'change':>10s}")
+    for name in base:
+        before, after = base[name], head[name]
+        change = f"{(after - before) / before:+.1%}" if before else "-"
+        print(f"{name:20s} {before:14.3f} {after:14.3f} {change:>10s}" if isinstance(before, float) else
+              f"{name:20s} {before:14d} {after:14d} {change:>10s}")
+
+    print("=" * 70)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
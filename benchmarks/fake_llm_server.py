@@ -0,0 +1,809 @@
+"""
+Fake LLM Server
+Local OpenAI-compatible chat completions endpoint for offline benchmarks
+
+Serves canned intake, diagnosis and communication reports with a
+configurable latency so the crew pipeline can be exercised end to end
+without calling a real provider. With a token rate set, generating the
+answer takes time as well, and requests with "stream": true receive it
+as server-sent event chunks at that rate. The server keeps HTTP/1.1
+connections alive and counts how many TCP connections it has accepted.
+
+A prefill rate makes long prompts slow to read, and a context window
+rejects prompts that are too long, as a real model would. An incomplete
+rate makes that share of the diagnosis and communication reports come
+back with a required section cut short or missing; requests to
+regenerate one section get that section alone.
+
+It also stands in for the Batch API (/files and /batches): uploaded
+request files are answered in the background after a configurable delay,
+so bulk mode can run offline.
+"""
+
+import argparse
+import email.parser
+import json
+import os
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# ============================================================================
+# CANNED RESPONSES
+# ============================================================================
+
+INTAKE_REPORT = """PATIENT DEMOGRAPHICS
+- 45-year-old male, office worker
+
+CHIEF COMPLAINT
+- "Chest pain for 3 days"
+
+HISTORY OF PRESENT ILLNESS
+- Onset: gradual, 3 days ago
+- Provocation: worse with exertion, better with rest
+- Quality: pressure-like
+- Radiation: left arm
+- Severity: 6/10
+- Time: intermittent, episodes of 5-10 minutes
+- Associated symptoms: mild shortness of breath
+
+PAST MEDICAL HISTORY
+- Chronic conditions: hypertension
+- Current medications: lisinopril 10mg daily
+- Allergies: none known
+- Family history: father with myocardial infarction at 55
+
+VITAL SIGNS
+- Not provided
+
+SOCIAL/CONTEXTUAL FACTORS
+- Smoker, 20 pack-years
+
+RED FLAGS IDENTIFIED
+- Exertional chest pain radiating to the left arm
+
+FOLLOW-UP QUESTIONS
+- None
+
+ADDITIONAL NOTES
+- Information gaps: vital signs, ECG findings"""
+
+# Intake report for descriptions too short to work with
+SPARSE_INTAKE_REPORT = """PATIENT DEMOGRAPHICS
+- Not provided
+
+CHIEF COMPLAINT
+- "Not feeling well"
+
+HISTORY OF PRESENT ILLNESS
+- Onset: Not provided
+- Provocation: Not provided
+- Quality: Not provided
+- Radiation: Not provided
+- Severity: Not provided
+- Time: Not provided
+- Associated symptoms: Not provided
+
+PAST MEDICAL HISTORY
+- Chronic conditions: Not provided
+- Current medications: Not provided
+
+RED FLAGS IDENTIFIED
+- None identified
+
+FOLLOW-UP QUESTIONS
+- What symptoms are you having, and where in your body?
+- When did they start?
+- How old are you, and do you have any medical conditions?
+
+ADDITIONAL NOTES
+- Information gaps: almost all history is missing"""
+
+# Patient descriptions shorter than this get the sparse intake report
+SPARSE_INPUT_LENGTH = 40
+
+DIAGNOSIS_REPORT = """CLINICAL SUMMARY
+- Middle-aged male smoker with hypertension and exertional chest pressure.
+
+DIFFERENTIAL DIAGNOSIS (Ranked by Likelihood)
+
+1. Stable Angina - Likelihood: High
+   Supporting Evidence:
+   - Exertional pressure relieved by rest
+   Contradicting Factors:
+   - None significant
+   Clinical Reasoning:
+   - Classic presentation with multiple risk factors
+
+2. Unstable Angina - Likelihood: Medium
+   Supporting Evidence:
+   - New onset within 3 days
+   Contradicting Factors:
+   - No rest pain reported
+   Clinical Reasoning:
+   - New-onset angina must be treated as unstable until proven otherwise
+
+3. Gastroesophageal Reflux Disease - Likelihood: Low
+   Supporting Evidence:
+   - Chest discomfort
+   Contradicting Factors:
+   - Exertional pattern
+   Clinical Reasoning:
+   - Common mimic of cardiac pain
+
+4. Musculoskeletal Chest Pain - Likelihood: Low
+   Supporting Evidence:
+   - Office work posture
+   Contradicting Factors:
+   - Radiation to arm with exertion
+   Clinical Reasoning:
+   - Frequent benign cause
+
+5. Anxiety Disorder - Likelihood: Low
+   Supporting Evidence:
+   - Intermittent episodes
+   Contradicting Factors:
+   - Exertional trigger
+   Clinical Reasoning:
+   - Diagnosis of exclusion
+
+CRITICAL RED FLAGS
+- Possible acute coronary syndrome
+
+DIAGNOSTIC UNCERTAINTIES
+- No ECG or troponin available
+
+RECOMMENDED WORKUP
+- Diagnostic Tests: ECG, troponin, lipid panel
+- Physical Examination: cardiovascular exam
+- Specialist Consultation: cardiology
+- Monitoring: chest pain frequency
+
+MEDICATION/INTERACTION CONSIDERATIONS
+- Lisinopril is compatible with standard angina therapy
+
+SAFETY ASSESSMENT
+- Urgency Level: Urgent
+- Reasoning: new exertional chest pain with risk factors"""
+
+COMMUNICATION_REPORT = """━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+MEDICAL SYMPTOM ANALYSIS - YOUR GUIDE
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━
+
+📋 SUMMARY OVERVIEW
+Your chest pain that comes on with activity may be a sign that your heart is
+not getting enough blood. This needs to be checked by a doctor soon.
+
+🔍 POSSIBLE CONDITIONS TO DISCUSS WITH YOUR DOCTOR
+
+1. Angina (heart-related chest pain)
+   What it is: Chest pain when the heart muscle needs more oxygen
+   Why we're considering it: Your pain starts with activity and stops with rest
+   Seriousness: Needs prompt attention
+
+2. Acid reflux
+   What it is: Stomach acid moving up into the food pipe
+   Why we're considering it: It can feel like chest pressure
+   Seriousness: Usually not dangerous
+
+3. Strained chest muscles
+   What it is: Soreness in the muscles of the chest wall
+   Why we're considering it: Posture at work can cause it
+   Seriousness: Not dangerous
+
+🎯 WHAT THIS MEANS FOR YOU
+You should see a doctor within the next day or two.
+
+⚠️ WHEN TO SEEK IMMEDIATE EMERGENCY CARE
+
+Go to the emergency room or call 911 if you experience:
+- Chest pain that does not go away with rest
+- Pain with sweating, nausea or fainting
+- Sudden severe shortness of breath
+
+📅 NEXT STEPS - WHAT TO DO NOW
+
+PRIORITY ACTIONS:
+1. Book a doctor visit within 24-48 hours
+2. Avoid heavy exercise until you are checked
+3. Write down when the pain happens
+
+PREPARE FOR YOUR DOCTOR VISIT:
+- Bring: your medication list
+- Ask about: heart tests
+- Mention: your family history
+
+🏥 WHAT YOUR DOCTOR MAY DO
+- Tests that may be ordered: heart tracing (ECG), blood tests
+- Examinations to expect: listening to your heart and lungs
+- Possible specialists: heart doctor (cardiologist)
+
+📊 WHAT TO MONITOR AT HOME
+- Watch for: pain at rest
+- Keep track of: how long each episode lasts
+- Report to doctor: any change in the pattern
+
+⚕️ IMPORTANT MEDICAL DISCLAIMER
+
+This analysis is based on the symptoms you provided and is meant to help you
+prepare for a medical appointment. It is NOT a definitive diagnosis.
+
+• A healthcare provider needs to examine you in person
+• Medical tests and imaging may be necessary
+• Only a licensed physician can provide an official diagnosis
+• This is educational information to guide your healthcare decisions
+
+Your symptoms deserve professional medical evaluation. Please schedule an
+appointment with your healthcare provider.
+
+━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"""
+
+# The communication guide as the stage pipeline's reconciliation pass
+# writes it: drafted sections are left as placeholders
+RECONCILED_REPORT = re.sub(
+    r"(\n\n)1\. Angina.*?(\n\n🎯)", r"\1[[CONDITIONS]]\2",
+    re.sub(
+        r"(call 911 if you experience:\n).*?(\n\n📅)", r"\1[[EMERGENCY_SIGNS]]\2",
+        re.sub(r"(🏥 WHAT YOUR DOCTOR MAY DO\n).*?(\n\n📊)", r"\1[[DOCTOR_VISIT]]\2",
+               COMMUNICATION_REPORT, flags=re.DOTALL),
+        flags=re.DOTALL
+    ),
+    flags=re.DOTALL
+)
+
+# Sections drafted by the stage pipeline while the diagnosis streams
+SECTION_DRAFTS = {
+    "CONDITIONS": """{number}. {name}
+   What it is: A condition your doctor will explain in more detail
+   Why we're considering it: Some of your symptoms fit it
+   Seriousness: {seriousness}""",
+    "EMERGENCY_SIGNS": """- Chest pain that does not go away with rest
+- Pain with sweating, nausea or fainting
+- Sudden severe shortness of breath""",
+    "DOCTOR_VISIT": """- Tests that may be ordered: heart tracing (ECG), blood tests
+- Examinations to expect: listening to your heart and lungs
+- Possible specialists: heart doctor (cardiologist)""",
+}
+
+# Reports with a required section cut short or left out (output validation)
+INCOMPLETE_REPORTS = {
+    DIAGNOSIS_REPORT: re.sub(r"\n\n4\. Musculoskeletal.*?(\n\nCRITICAL RED FLAGS)", r"\1", DIAGNOSIS_REPORT, flags=re.DOTALL),
+    COMMUNICATION_REPORT: re.sub(r"⚠️ WHEN TO SEEK.*?(📅)", r"\1", COMMUNICATION_REPORT, flags=re.DOTALL),
+}
+
+# One section written again on its own, by heading
+REGENERATED_SECTIONS = {
+    "DIFFERENTIAL DIAGNOSIS": re.search(r"\n\n(1\. Stable.*?)\n\nCRITICAL", DIAGNOSIS_REPORT, re.DOTALL).group(1),
+    "SAFETY ASSESSMENT": DIAGNOSIS_REPORT.split("SAFETY ASSESSMENT\n")[1],
+    "WHEN TO SEEK IMMEDIATE EMERGENCY CARE": re.search(
+        r"(Go to the emergency room.*?)\n\n📅", COMMUNICATION_REPORT, re.DOTALL
+    ).group(1),
+    "IMPORTANT MEDICAL DISCLAIMER": re.search(r"DISCLAIMER\n\n(.*?)\n\n━", COMMUNICATION_REPORT, re.DOTALL).group(1),
+}
+
+REGENERATE_SECTION = re.compile(r"REGENERATE SECTION: (.+)")
+DRAFT_SECTION = re.compile(r"DRAFT SECTION: (\w+)")
+DRAFT_ITEM = re.compile(r"(\d+)\. (.+?) - Likelihood: (\w+)")
+SERIOUSNESS = {"High": "Needs prompt attention", "Medium": "Should be checked soon", "Low": "Usually not dangerous"}
+
+# Agent role fragments used to recognise which stage is calling
+# Notes on one chunk of a long history (intake map-reduce)
+INTAKE_NOTES = """HISTORY OF PRESENT ILLNESS
+- 2024-03-02: chest pressure on exertion, 6/10, radiating to left arm, 5-10 minute episodes
+
+PAST MEDICAL HISTORY
+- Hypertension; lisinopril 10mg daily (latest list 2024-02-11)
+
+RED FLAGS
+- Exertional chest pain with radiation"""
+
+STAGE_MARKERS = [
+    ("EXTRACT INTAKE FIELDS", INTAKE_NOTES),
+    ("[[CONDITIONS]]", RECONCILED_REPORT),
+    ("Chief Triage Officer", INTAKE_REPORT),
+    ("Multi-Specialty Medical Diagnostician", DIAGNOSIS_REPORT),
+    ("Medical Translator", COMMUNICATION_REPORT),
+]
+
+
+# Case references found in a prompt are echoed back, so stress tests can
+# check that no output picks up another patient's data
+CASE_REFERENCE = re.compile(r"\bCASE-[0-9A-Za-z]+\b")
+
+PATIENT_INPUT = re.compile(r"Patient Input: (.*?)(?:\n\n|$)", re.DOTALL)
+
+
+def draft_response(section: str, prompt: str) -> str:
+    """Canned patient-facing draft of one diagnosis section"""
+    if section != "CONDITIONS":
+        return SECTION_DRAFTS.get(section, "OK")
+    item = DRAFT_ITEM.search(prompt)
+    if item is None:
+        return "OK"
+    number, name, likelihood = item.groups()
+    return SECTION_DRAFTS[section].format(
+        number=number, name=name, seriousness=SERIOUSNESS.get(likelihood, "Ask your doctor")
+    )
+
+
+def pick_response(messages: list) -> str:
+    """Choose the canned report matching the calling agent's role"""
+    prompt = "\n".join(str(m.get("content", "")) for m in messages)
+    regenerate = REGENERATE_SECTION.search(prompt)
+    if regenerate:
+        return next((text for heading, text in REGENERATED_SECTIONS.items() if heading in regenerate.group(1)), "OK")
+    draft = DRAFT_SECTION.search(prompt)
+    if draft:
+        return draft_response(draft.group(1), prompt)
+    report = next((report for marker, report in STAGE_MARKERS if marker in prompt), "OK")
+    patient_input = PATIENT_INPUT.search(prompt)
+    if report is INTAKE_REPORT and patient_input and len(patient_input.group(1).strip()) < SPARSE_INPUT_LENGTH:
+        report = SPARSE_INTAKE_REPORT
+    cases = sorted(set(CASE_REFERENCE.findall(prompt)))
+    if cases:
+        report += "\n\nCase reference: " + ", ".join(cases)
+    return report
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (4 characters per token)"""
+    return max(1, len(text) // 4)
+
+
+# Characters sent per streamed chunk (about four tokens)
+STREAM_CHUNK_CHARS = 16
+
+
+def answer(request: dict) -> tuple:
+    """Content and token usage of the answer to a chat completion request"""
+    messages = request.get("messages", [])
+    content = pick_response(messages)
+    prompt_tokens = sum(estimate_tokens(str(m.get("content", ""))) for m in messages)
+    completion_tokens = estimate_tokens(content)
+    return content, {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens
+    }
+
+
+def chat_completion(request: dict, content: str, usage: dict) -> dict:
+    """A chat.completion object answering a request"""
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": request.get("model", "fake-model"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop"
+        }],
+        "usage": usage
+    }
+
+
+# ============================================================================
+# SERVER
+# ============================================================================
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """Handles OpenAI-style chat completion requests"""
+
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.stats_lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, completion_id: str, model: str, content: str, usage: dict, include_usage: bool):
+        """Send the answer as chat.completion.chunk events at the token rate"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(choices: list, **extra) -> bytes:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": choices,
+                **extra
+            }
+            return f"data: {json.dumps(payload)}\n\n".encode("utf-8")
+
+        def delta(content: dict, finish_reason: str = None) -> list:
+            return [{"index": 0, "delta": content, "finish_reason": finish_reason}]
+
+        self._send_chunk(event(delta({"role": "assistant", "content": ""})))
+        for start in range(0, len(content), STREAM_CHUNK_CHARS):
+            piece = content[start:start + STREAM_CHUNK_CHARS]
+            self.server.generate(piece)
+            self._send_chunk(event(delta({"content": piece})))
+        self._send_chunk(event(delta({}, "stop")))
+        if include_usage:
+            self._send_chunk(event([], usage=usage))
+        self._send_chunk(b"data: [DONE]\n\n")
+        self._send_chunk(b"")
+
+    def _send_not_found(self):
+        self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        parts = path.split("/")
+        if path.endswith("/stats"):
+            self._send_json(200, self.server.stats())
+        elif len(parts) >= 3 and parts[-3] == "files" and parts[-1] == "content":
+            content = self.server.batch_api.file_content(parts[-2])
+            if content is None:
+                self._send_not_found()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+        elif len(parts) >= 2 and parts[-2] in ("files", "batches"):
+            found = self.server.batch_api.get(parts[-2], parts[-1])
+            if found is None:
+                self._send_not_found()
+            else:
+                self._send_json(200, found)
+        else:
+            self._send_not_found()
+
+    def _upload_file(self, body: bytes):
+        """Store a multipart/form-data upload ('purpose' and 'file' fields)"""
+        header = f"Content-Type: {self.headers.get('Content-Type')}\r\n\r\n".encode("utf-8")
+        form = email.parser.BytesParser().parsebytes(header + body)
+        fields, filename, content = {}, "upload.jsonl", b""
+        for part in form.get_payload():
+            name = part.get_param("name", header="content-disposition")
+            if name == "file":
+                filename = part.get_filename() or filename
+                content = part.get_payload(decode=True)
+            else:
+                fields[name] = part.get_payload(decode=True).decode("utf-8")
+        self._send_json(200, self.server.batch_api.add_file(content, filename, fields.get("purpose", "batch")))
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length)
+        path = self.path.split("?")[0].rstrip("/")
+
+        if path.endswith("/files"):
+            self._upload_file(body)
+            return
+        request = json.loads(body or b"{}")
+        if path.endswith("/batches") or path.endswith("/cancel"):
+            if path.endswith("/cancel"):
+                batch = self.server.batch_api.cancel_batch(path.split("/")[-2])
+            else:
+                batch = self.server.batch_api.create_batch(request, self.server)
+            if batch is None:
+                self._send_not_found()
+            else:
+                self._send_json(200, batch)
+            return
+
+        with self.server.stats_lock:
+            self.server.requests += 1
+
+        if not path.endswith("/chat/completions"):
+            self._send_not_found()
+            return
+
+        failure = self.server.take_failure()
+        if failure:
+            self._send_json(failure, {"error": {"message": "Injected failure", "code": failure}})
+            return
+
+        content, usage = answer(request)
+        content = self.server.degrade(content, usage)
+        if self.server.context_window and usage["prompt_tokens"] > self.server.context_window:
+            self._send_json(400, {"error": {
+                "message": f"This model's maximum context length is {self.server.context_window} tokens, "
+                           f"however you requested {usage['prompt_tokens']} tokens.",
+                "type": "invalid_request_error",
+                "code": "context_length_exceeded"
+            }})
+            return
+        self.server.count_usage(usage)
+
+        time.sleep(self.server.latency)
+        self.server.read_prompt(usage["prompt_tokens"])
+
+        if request.get("stream"):
+            include_usage = bool((request.get("stream_options") or {}).get("include_usage"))
+            self._stream(f"chatcmpl-{uuid.uuid4().hex}", request.get("model", "fake-model"),
+                         content, usage, include_usage)
+            return
+
+        self.server.generate(content)
+        self._send_json(200, chat_completion(request, content, usage))
+
+
+class FakeBatchAPI:
+    """In-memory stand-in for the /files and /batches endpoints"""
+
+    def __init__(self, delay: float = 1.0):
+        """
+        Initialize the stand-in.
+
+        Args:
+            delay: Seconds a batch stays in progress before it completes
+        """
+        self.delay = delay
+        self.files = {}
+        self.contents = {}
+        self.batches = {}
+        self.lock = threading.Lock()
+
+    def add_file(self, content: bytes, filename: str, purpose: str) -> dict:
+        file = {
+            "id": f"file-{uuid.uuid4().hex[:24]}",
+            "object": "file",
+            "bytes": len(content),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed"
+        }
+        with self.lock:
+            self.files[file["id"]] = file
+            self.contents[file["id"]] = content
+        return file
+
+    def file_content(self, file_id: str):
+        with self.lock:
+            return self.contents.get(file_id)
+
+    def get(self, kind: str, object_id: str):
+        with self.lock:
+            found = (self.files if kind == "files" else self.batches).get(object_id)
+            return dict(found) if found else None
+
+    def create_batch(self, request: dict, server: "FakeLLMServer"):
+        input_file_id = request.get("input_file_id")
+        if self.file_content(input_file_id) is None:
+            return None
+        now = int(time.time())
+        batch = {
+            "id": f"batch_{uuid.uuid4().hex[:24]}",
+            "object": "batch",
+            "endpoint": request.get("endpoint", "/v1/chat/completions"),
+            "input_file_id": input_file_id,
+            "completion_window": request.get("completion_window", "24h"),
+            "status": "in_progress",
+            "created_at": now,
+            "in_progress_at": now,
+            "output_file_id": None,
+            "error_file_id": None,
+            "metadata": request.get("metadata"),
+            "request_counts": {"total": 0, "completed": 0, "failed": 0}
+        }
+        with self.lock:
+            self.batches[batch["id"]] = batch
+        threading.Thread(target=self._process, args=(batch["id"], server), daemon=True).start()
+        return dict(batch)
+
+    def cancel_batch(self, batch_id: str):
+        with self.lock:
+            batch = self.batches.get(batch_id)
+            if batch and batch["status"] == "in_progress":
+                batch.update(status="cancelled", cancelled_at=int(time.time()))
+            return dict(batch) if batch else None
+
+    def _process(self, batch_id: str, server: "FakeLLMServer"):
+        """Answer every request of a batch once the delay has passed"""
+        time.sleep(self.delay)
+        batch = self.get("batches", batch_id)
+        if batch["status"] != "in_progress":
+            return
+        outputs, errors = [], []
+        for line in self.file_content(batch["input_file_id"]).decode("utf-8").splitlines():
+            if not line.strip():
+                continue
+            item = json.loads(line)
+            result = {"id": f"batch_req_{uuid.uuid4().hex[:24]}", "custom_id": item.get("custom_id")}
+            failure = server.take_failure()
+            if failure:
+                errors.append({**result, "response": {
+                    "status_code": failure, "request_id": uuid.uuid4().hex,
+                    "body": {"error": {"message": "Injected failure", "code": failure}}
+                }, "error": None})
+                continue
+            content, usage = answer(item.get("body", {}))
+            outputs.append({**result, "response": {
+                "status_code": 200, "request_id": uuid.uuid4().hex,
+                "body": chat_completion(item.get("body", {}), content, usage)
+            }, "error": None})
+            with server.stats_lock:
+                server.batch_requests += 1
+
+        def store(lines: list):
+            if not lines:
+                return None
+            content = "".join(json.dumps(line) + "\n" for line in lines).encode("utf-8")
+            return self.add_file(content, f"{batch_id}_output.jsonl", "batch_output")["id"]
+
+        output_file_id, error_file_id = store(outputs), store(errors)
+        with self.lock:
+            self.batches[batch_id].update(
+                status="completed",
+                completed_at=int(time.time()),
+                output_file_id=output_file_id,
+                error_file_id=error_file_id,
+                request_counts={"total": len(outputs) + len(errors), "completed": len(outputs), "failed": len(errors)}
+            )
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    """Threaded fake LLM server that tracks connection and request counts"""
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        token_rate: float = 0.0,
+        batch_delay: float = 1.0,
+        prefill_rate: float = 0.0,
+        context_window: int = 0,
+        incomplete_rate: float = 0.0
+    ):
+        super().__init__((host, port), FakeLLMHandler)
+        self.latency = latency
+        self.token_rate = token_rate
+        self.prefill_rate = prefill_rate
+        self.context_window = context_window
+        self.incomplete_rate = incomplete_rate
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.batch_api = FakeBatchAPI(batch_delay)
+        self.batch_requests = 0
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.pending_failures = 0
+        self.connections = 0
+        self.requests = 0
+        self.stats_lock = threading.Lock()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def generate(self, text: str):
+        """Wait as long as generating `text` takes at the token rate (0 = instantly)"""
+        if self.token_rate:
+            time.sleep(estimate_tokens(text) / self.token_rate)
+
+    def degrade(self, content: str, usage: dict) -> str:
+        """Leave a required section out of a share of the reports (the incomplete rate)"""
+        if content in INCOMPLETE_REPORTS and random.random() < self.incomplete_rate:
+            content = INCOMPLETE_REPORTS[content]
+            usage["completion_tokens"] = estimate_tokens(content)
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        return content
+
+    def read_prompt(self, prompt_tokens: int):
+        """Wait as long as reading a prompt takes at the prefill rate (0 = instantly)"""
+        if self.prefill_rate:
+            time.sleep(prompt_tokens / self.prefill_rate)
+
+    def count_usage(self, usage: dict):
+        with self.stats_lock:
+            self.prompt_tokens += usage["prompt_tokens"]
+            self.completion_tokens += usage["completion_tokens"]
+
+    def stats(self) -> dict:
+        with self.stats_lock:
+            return {"connections": self.connections, "requests": self.requests,
+                    "batch_requests": self.batch_requests, "prompt_tokens": self.prompt_tokens,
+                    "completion_tokens": self.completion_tokens}
+
+    def reset_stats(self):
+        with self.stats_lock:
+            self.connections = 0
+            self.requests = 0
+            self.batch_requests = 0
+            self.prompt_tokens = 0
+            self.completion_tokens = 0
+
+    def fail_next(self, count: int = 1, status: int = 503):
+        """Answer the next `count` completion requests with an error status"""
+        with self.stats_lock:
+            self.pending_failures += count
+            self.error_status = status
+
+    def take_failure(self) -> int:
+        """Status code to fail the current request with, or 0"""
+        with self.stats_lock:
+            if self.pending_failures > 0:
+                self.pending_failures -= 1
+                return self.error_status
+        if self.error_rate and random.random() < self.error_rate:
+            return self.error_status
+        return 0
+
+    def start_background(self) -> "FakeLLMServer":
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+def use_fake_llm(server: FakeLLMServer):
+    """
+    Point the backend at a fake server.
+
+    Must run before anything under backend/ is imported, since settings
+    are read at import time.
+    """
+    os.environ['OPENAI_API_KEY'] = 'fake-key'
+    os.environ['OPENAI_BASE_URL'] = server.base_url
+    os.environ.setdefault('CREW_VERBOSE', 'False')
+    os.environ.setdefault('CREW_MEMORY_ENABLED', 'False')
+    os.environ.setdefault('CREWAI_TRACING_ENABLED', 'false')
+    os.environ.setdefault('OTEL_SDK_DISABLED', 'true')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="Seconds to wait before answering each request")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with --error-status")
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--token-rate", type=float, default=0.0,
+                        help="Completion tokens generated per second (0 = instantly)")
+    parser.add_argument("--batch-delay", type=float, default=1.0,
+                        help="Seconds each Batch API batch stays in progress")
+    parser.add_argument("--prefill-rate", type=float, default=0.0,
+                        help="Prompt tokens read per second (0 = instantly)")
+    parser.add_argument("--context-window", type=int, default=0,
+                        help="Largest prompt in tokens; longer ones get a 400 error (0 = unlimited)")
+    parser.add_argument("--incomplete-rate", type=float, default=0.0,
+                        help="Fraction of diagnosis and communication reports missing a required section")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(args.host, args.port, args.latency, args.error_rate, args.error_status,
+                           args.token_rate, args.batch_delay, args.prefill_rate, args.context_window,
+                           args.incomplete_rate)
+    print(f"Fake LLM server listening on {server.base_url}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,8 +6,12 @@ System Architecture:
 - Platform: CrewAI with sequential process
 - Memory: Short-term and long-term enabled
 - Agent Count: 3 optimized agents
+- Concurrency: fresh agents and tasks per analysis (see analyze_many)
 """
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
 from crewai import Agent, Task, Crew, Process
 from crewai.tools import tool
 
@@ -55,7 +59,7 @@ def check_health_literacy(medical_text: str) -> str:
 # AGENT 1: MEDICAL INTAKE COORDINATOR
 # ============================================================================
 
-intake_coordinator = Agent(
+INTAKE_COORDINATOR = dict(
     role="Chief Triage Officer and Patient Interview Specialist",
 
     goal="Conduct comprehensive, systematic patient interview to gather all relevant symptoms, "
@@ -72,9 +76,7 @@ intake_coordinator = Agent(
     follow up on vague answers, and have an exceptional ability to make patients feel comfortable
     sharing sensitive information.""",
 
-    verbose=True,
     allow_delegation=False,
-    memory=True,
     tools=[conduct_medical_interview]
 )
 
@@ -83,7 +85,7 @@ intake_coordinator = Agent(
 # AGENT 2: SENIOR DIAGNOSTIC PHYSICIAN
 # ============================================================================
 
-diagnostic_physician = Agent(
+DIAGNOSTIC_PHYSICIAN = dict(
     role="Multi-Specialty Medical Diagnostician and Clinical Reasoning Expert",
 
     goal="Analyze all patient information from multiple medical specialty perspectives, apply "
@@ -111,9 +113,7 @@ diagnostic_physician = Agent(
 
     You never anchor on a single diagnosis too early and always consider the full differential.""",
 
-    verbose=True,
     allow_delegation=False,
-    memory=True,
     tools=[generate_differential_diagnosis, safety_check]
 )
 
@@ -122,7 +122,7 @@ diagnostic_physician = Agent(
 # AGENT 3: PATIENT COMMUNICATION SPECIALIST
 # ============================================================================
 
-communication_specialist = Agent(
+COMMUNICATION_SPECIALIST = dict(
     role="Medical Translator and Patient Education Expert",
 
     goal="Transform complex medical diagnostic analysis into clear, compassionate, actionable "
@@ -151,9 +151,7 @@ communication_specialist = Agent(
     itself. Your goal is to empower patients with knowledge while guiding them toward
     appropriate professional medical care.""",
 
-    verbose=True,
     allow_delegation=False,
-    memory=True,
     tools=[check_health_literacy]
 )
 
@@ -162,7 +160,7 @@ communication_specialist = Agent(
 # TASK 1: PATIENT INTERVIEW AND DATA COLLECTION
 # ============================================================================
 
-interview_task = Task(
+INTERVIEW_TASK = dict(
     description="""Conduct a comprehensive patient assessment through systematic questioning.
 
     You will receive patient-provided symptom information. Your job is to:
@@ -241,9 +239,7 @@ interview_task = Task(
 
     ADDITIONAL NOTES
     - [Relevant physical exam findings that would be useful]
-    - [Information gaps that need addressing]""",
-
-    agent=intake_coordinator
+    - [Information gaps that need addressing]"""
 )
 
 
@@ -251,7 +247,7 @@ interview_task = Task(
 # TASK 2: MEDICAL DIAGNOSTIC ANALYSIS
 # ============================================================================
 
-diagnosis_task = Task(
+DIAGNOSIS_TASK = dict(
     description="""Analyze the complete patient intake report and generate a comprehensive
     differential diagnosis using multi-specialty expertise.
 
@@ -343,10 +339,7 @@ diagnosis_task = Task(
 
     SAFETY ASSESSMENT
     - Urgency Level: [Emergent/Urgent/Non-urgent]
-    - Reasoning: [Why this urgency level]""",
-
-    agent=diagnostic_physician,
-    context=[interview_task]
+    - Reasoning: [Why this urgency level]"""
 )
 
 
@@ -354,7 +347,7 @@ diagnosis_task = Task(
 # TASK 3: PATIENT-FACING COMMUNICATION
 # ============================================================================
 
-communication_task = Task(
+COMMUNICATION_TASK = dict(
     description="""Transform the medical diagnostic analysis into clear, compassionate,
     actionable information that patients can understand.
 
@@ -468,10 +461,7 @@ communication_task = Task(
     Your symptoms deserve professional medical evaluation. Please schedule an
     appointment with your healthcare provider.
 
-    ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━""",
-
-    agent=communication_specialist,
-    context=[interview_task, diagnosis_task]
+    ━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━"""
 )
 
 
@@ -479,27 +469,73 @@ communication_task = Task(
 # CREW CONFIGURATION
 # ============================================================================
 
-def create_medical_diagnostic_crew():
+def create_agents(memory: bool = False, verbose: bool = True) -> Dict[str, Agent]:
+    """
+    Creates a fresh set of agents.
+
+    Agents hold per-run state (executors, memory, token counts), so every
+    analysis gets its own instances built from the configurations above.
+
+    Args:
+        memory: Enable CrewAI memory for the agents (shared on disk across patients)
+        verbose: Print the agents' reasoning
+
+    Returns:
+        Dict[str, Agent]: Agents keyed by configuration name
+    """
+    return {
+        "intake_coordinator": Agent(**INTAKE_COORDINATOR, memory=memory, verbose=verbose),
+        "diagnostic_physician": Agent(**DIAGNOSTIC_PHYSICIAN, memory=memory, verbose=verbose),
+        "communication_specialist": Agent(**COMMUNICATION_SPECIALIST, memory=memory, verbose=verbose)
+    }
+
+
+def create_tasks(agents: Dict[str, Agent]) -> List[Task]:
+    """
+    Creates a fresh interview, diagnosis and communication task chain.
+
+    Args:
+        agents: Agents returned by create_agents()
+
+    Returns:
+        List[Task]: Tasks in execution order
+    """
+    interview_task = Task(**INTERVIEW_TASK, agent=agents["intake_coordinator"])
+    diagnosis_task = Task(
+        **DIAGNOSIS_TASK,
+        agent=agents["diagnostic_physician"],
+        context=[interview_task]
+    )
+    communication_task = Task(
+        **COMMUNICATION_TASK,
+        agent=agents["communication_specialist"],
+        context=[interview_task, diagnosis_task]
+    )
+    return [interview_task, diagnosis_task, communication_task]
+
+
+def create_medical_diagnostic_crew(memory: bool = False, verbose: bool = True):
     """
     Creates and configures the Medical Diagnostic Crew.
 
+    Each call builds new agents and tasks, so crews can run concurrently
+    without sharing outputs as long as memory stays off.
+
+    Args:
+        memory: Enable CrewAI memory (shared on disk across patients)
+        verbose: Print the agents' reasoning
+
     Returns:
         Crew: Configured CrewAI crew ready for symptom analysis
     """
+    agents = create_agents(memory=memory, verbose=verbose)
+
     crew = Crew(
-        agents=[
-            intake_coordinator,
-            diagnostic_physician,
-            communication_specialist
-        ],
-        tasks=[
-            interview_task,
-            diagnosis_task,
-            communication_task
-        ],
+        agents=list(agents.values()),
+        tasks=create_tasks(agents),
         process=Process.sequential,
-        memory=True,
-        verbose=True,
+        memory=memory,
+        verbose=verbose,
         max_rpm=10,
         full_output=True
     )
@@ -511,17 +547,22 @@ def create_medical_diagnostic_crew():
 # MAIN EXECUTION
 # ============================================================================
 
-def analyze_symptoms(patient_input: str) -> str:
+def analyze_symptoms(patient_input: str, memory: bool = False, verbose: bool = True) -> str:
     """
     Analyzes patient symptoms using the medical diagnostic crew.
 
+    Safe to call from several threads at once while memory is off.
+
     Args:
         patient_input: Patient's description of symptoms and relevant information
+        memory: Enable CrewAI memory (stored on disk and shared by every
+            crew, so never enable it for concurrent or multi-patient use)
+        verbose: Print the agents' reasoning
 
     Returns:
         str: Patient-friendly diagnostic guidance
     """
-    crew = create_medical_diagnostic_crew()
+    crew = create_medical_diagnostic_crew(memory=memory, verbose=verbose)
 
     result = crew.kickoff(inputs={
         "patient_input": patient_input
@@ -530,6 +571,50 @@ def analyze_symptoms(patient_input: str) -> str:
     return result
 
 
+def analyze_many(
+    inputs: Iterable[str],
+    concurrency: int = 4,
+    memory: bool = False,
+    verbose: bool = False,
+    return_exceptions: bool = False
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Analyzes several patients concurrently, yielding results as they complete.
+
+    Memory is off by default: CrewAI memory is stored on disk and shared
+    by every crew with the same agents, so details from one patient could
+    surface in another patient's analysis.
+
+    Args:
+        inputs: Patient descriptions
+        concurrency: Number of analyses running at once
+        memory: Enable CrewAI memory
+        verbose: Print the agents' reasoning
+        return_exceptions: Yield a failed analysis' exception instead of raising it
+
+    Yields:
+        Tuple[int, Any]: Index of the input and its result, in completion order
+    """
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        futures = {
+            executor.submit(analyze_symptoms, patient_input, memory, verbose): index
+            for index, patient_input in enumerate(inputs)
+        }
+        try:
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    if not return_exceptions:
+                        raise
+                    result = e
+                yield futures[future], result
+        finally:
+            # Don't start queued analyses when the caller stops early or one fails
+            for future in futures:
+                future.cancel()
+
+
 if __name__ == "__main__":
     # Example usage
     sample_patient_input = """
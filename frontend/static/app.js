@@ -16,6 +16,10 @@ const resultsSection = document.getElementById('resultsSection');
 const errorSection = document.getElementById('errorSection');
 const resultsContent = document.getElementById('resultsContent');
 const errorMessage = document.getElementById('errorMessage');
+const queueStatus = document.getElementById('queueStatus');
+
+// How often to ask for the queue position while an analysis is pending (ms)
+const QUEUE_POLL_INTERVAL = 3000;
 
 // State
 let currentAnalysis = null;
@@ -57,6 +61,10 @@ async function handleAnalyze() {
     loadingSection.style.display = 'block';
     analyzeBtn.disabled = true;
 
+    // Our own request id lets us ask for the queue position while waiting
+    const requestId = crypto.randomUUID().replace(/-/g, '');
+    const queuePoller = setInterval(() => updateQueueStatus(requestId), QUEUE_POLL_INTERVAL);
+
     try {
         // Call API
         const response = await fetch(`${API_BASE_URL}/api/analyze`, {
@@ -65,7 +73,8 @@ async function handleAnalyze() {
                 'Content-Type': 'application/json',
             },
             body: JSON.stringify({
-                patient_input: input
+                patient_input: input,
+                request_id: requestId
             })
         });
 
@@ -93,11 +102,36 @@ async function handleAnalyze() {
             'ודא/י ש-API Server פועל / Ensure API server is running'
         );
     } finally {
+        clearInterval(queuePoller);
+        queueStatus.style.display = 'none';
         loadingSection.style.display = 'none';
         analyzeBtn.disabled = false;
     }
 }
 
+/**
+ * Show the queue position and estimated start of a pending analysis
+ */
+async function updateQueueStatus(requestId) {
+    try {
+        const response = await fetch(`${API_BASE_URL}/api/queue/${requestId}`);
+        if (!response.ok) return;
+        const data = await response.json();
+
+        if (data.state === 'queued') {
+            const minutes = Math.max(1, Math.round(data.estimated_start_seconds / 60));
+            queueStatus.textContent =
+                `מקום בתור: ${data.position} (כ-${minutes} דק׳) / ` +
+                `Queue position: ${data.position} (starts in ~${minutes} min)`;
+            queueStatus.style.display = 'block';
+        } else {
+            queueStatus.style.display = 'none';
+        }
+    } catch (error) {
+        console.warn('Queue status unavailable:', error);
+    }
+}
+
 /**
  * Handle clear button
  */
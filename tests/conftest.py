@@ -0,0 +1,47 @@
+"""
+Test Setup
+Runs the backend against the fake LLM server and a temporary data directory
+
+Settings are read when backend/ is first imported, so the environment is
+set here, before any test module imports it.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.fake_llm_server import FakeLLMServer, use_fake_llm
+
+FAKE_LLM = FakeLLMServer().start_background()
+use_fake_llm(FAKE_LLM)
+os.environ['DATA_DIR'] = tempfile.mkdtemp(prefix='medical-tests-')
+os.environ['RESUME_ON_STARTUP'] = 'false'
+
+
+@pytest.fixture
+def fake_llm() -> FakeLLMServer:
+    """The fake LLM server, with its counters reset"""
+    FAKE_LLM.reset_stats()
+    return FAKE_LLM
+
+
+@pytest.fixture
+def service(tmp_path, fake_llm):
+    """A MedicalService whose stores start empty"""
+    from backend.app import MedicalService
+    from backend.app.checkpoints import CheckpointStore
+    from backend.app.near_duplicates import NearDuplicateStore
+    from backend.app.sessions import SessionStore
+    from backend.app.stage_cache import StageCache
+
+    medical_service = MedicalService()
+    medical_service.checkpoints = CheckpointStore(tmp_path / "checkpoints.db")
+    medical_service.sessions = SessionStore(tmp_path / "sessions.db")
+    medical_service.stage_cache = StageCache(tmp_path / "stage_cache.db")
+    medical_service.near_duplicates = NearDuplicateStore(tmp_path / "near_duplicates.db")
+    return medical_service
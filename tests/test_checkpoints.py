@@ -0,0 +1,33 @@
+"""
+Checkpoint Tests
+A request id reused for another input starts over
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test')
+
+FIRST = "I'm a 45-year-old male with chest pain for 3 days that gets worse when I climb stairs."
+SECOND = "I'm a 30-year-old woman with a headache behind my eyes for a week, worse in the morning."
+
+
+def test_retry_resumes_every_stage(service, fake_llm):
+    assert service.analyze_symptoms(FIRST, request_id="r1")["success"]
+    calls = fake_llm.stats()["requests"]
+
+    response = service.analyze_symptoms(FIRST, request_id="r1")
+    assert response["metadata"]["resumed_stages"] == service.crew_factory.get_stage_names()
+    assert fake_llm.stats()["requests"] == calls
+
+
+def test_reused_request_id_with_other_input_starts_over(service, fake_llm):
+    assert service.analyze_symptoms(FIRST, request_id="r1")["success"]
+    calls = fake_llm.stats()["requests"]
+
+    response = service.analyze_symptoms(SECOND, request_id="r1")
+    assert response["success"]
+    assert response["metadata"]["resumed_stages"] == []
+    assert fake_llm.stats()["requests"] > calls
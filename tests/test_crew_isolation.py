@@ -0,0 +1,51 @@
+"""
+Crew Isolation Tests
+Concurrent analyses never see another patient's data
+
+Every patient description carries a unique case reference that the fake
+LLM server echoes back, so a shared agent, task output or memory shows
+up as a foreign reference in some stage's output.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test')
+
+from benchmarks.fake_llm_server import CASE_REFERENCE
+
+PATIENTS = 12
+CONCURRENCY = 6
+PATIENT_TEMPLATE = (
+    "Patient {case}. I'm a {age}-year-old with chest pain for {days} days "
+    "that gets worse when I climb stairs."
+)
+
+
+def test_concurrent_analyses_stay_isolated(fake_llm, monkeypatch):
+    from crew import analyze_many
+
+    # A little latency makes the completions interleave
+    monkeypatch.setattr(fake_llm, "latency", 0.02)
+    cases = [f"CASE-{index:04d}" for index in range(PATIENTS)]
+    inputs = [
+        PATIENT_TEMPLATE.format(case=case, age=20 + index % 60, days=1 + index % 9)
+        for index, case in enumerate(cases)
+    ]
+
+    results = dict(analyze_many(inputs, concurrency=CONCURRENCY, return_exceptions=True))
+
+    assert sorted(results) == list(range(PATIENTS))
+    stages = 0
+    for index, result in results.items():
+        assert not isinstance(result, Exception), f"{cases[index]}: {result}"
+        for task_output in result.tasks_output:
+            assert set(CASE_REFERENCE.findall(task_output.raw)) == {cases[index]}, (
+                f"{cases[index]}: stage '{task_output.agent}' saw another patient"
+            )
+        stages = len(result.tasks_output)
+    assert stages > 0
+    # One LLM call per stage per patient: nothing was shared or repeated
+    assert fake_llm.stats()["requests"] == PATIENTS * stages
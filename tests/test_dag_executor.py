@@ -0,0 +1,57 @@
+"""
+DAG Executor Tests
+A timed-out run waits for its nodes' threads and names those that keep running
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test')
+
+from backend.app.dag_executor import DAGExecutor, NodeTimeoutError, NodeCancelledError, check_cancelled
+
+
+def slow_node(stopped: threading.Event, checks: bool):
+    """Work handed to a thread that stops at check_cancelled() when `checks`"""
+    try:
+        for _ in range(25):
+            time.sleep(0.02)
+            if checks:
+                check_cancelled()
+    except NodeCancelledError:
+        pass
+    finally:
+        stopped.set()
+
+
+def run_async(checks: bool, cancel_grace: float) -> tuple:
+    stopped = threading.Event()
+
+    async def run_node(name):
+        await asyncio.to_thread(slow_node, stopped, checks)
+
+    async def run():
+        executor = DAGExecutor({"intake": []}, default_timeout=0.05, cancel_grace=cancel_grace)
+        with pytest.raises(NodeTimeoutError) as error:
+            await executor.run_async(run_node)
+        # Checked before asyncio.run() joins the executor's threads
+        return error.value.abandoned, stopped.is_set()
+
+    return asyncio.run(run())
+
+
+def test_async_timeout_waits_for_threads_that_stop():
+    abandoned, stopped = run_async(checks=True, cancel_grace=1.0)
+    assert abandoned == [] and stopped
+
+
+def test_async_timeout_names_threads_that_keep_running():
+    abandoned, stopped = run_async(checks=False, cancel_grace=0.1)
+    assert abandoned == ["intake"] and not stopped
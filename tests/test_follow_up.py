@@ -0,0 +1,28 @@
+"""
+Follow-Up Tests
+A run stopped at the intake gate reports what skipping the other stages saved
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test')
+
+# Short enough for the fake LLM's sparse intake report
+DESCRIPTION = "I don't feel well."
+
+
+def test_saved_tokens_use_the_shared_estimator(service):
+    response = service.analyze_symptoms(DESCRIPTION)
+    assert response["status"] == "needs_more_info", response
+
+    metadata = response["metadata"]
+    intake_report = service.checkpoints.load(metadata["request_id"], metadata["prompt_version"])[
+        service.crew_factory.get_intake_stage()
+    ]
+    assert metadata["stages_skipped"]
+    assert metadata["estimated_prompt_tokens_saved"] == sum(
+        service.estimator.stage_tokens(name, intake_report) for name in metadata["stages_skipped"]
+    )
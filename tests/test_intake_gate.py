@@ -0,0 +1,50 @@
+"""
+Intake Gate Tests
+Reports listing red flags must never stop at the gate
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test')
+
+from backend.app.intake_gate import assess_intake
+
+SPARSE = """PATIENT DEMOGRAPHICS
+- Not provided
+
+CHIEF COMPLAINT
+- Chest pain
+
+HISTORY OF PRESENT ILLNESS
+- Onset: Not provided
+- Severity: Not provided
+
+RED FLAGS IDENTIFIED
+{red_flags}
+
+FOLLOW-UP QUESTIONS
+- How old are you?
+"""
+
+
+def test_sparse_report_without_red_flags_needs_more_info():
+    for red_flags in ("- None", "- Not provided", "- None identified", ""):
+        assessment = assess_intake(SPARSE.format(red_flags=red_flags))
+        assert not assessment["sufficient"]
+        assert assessment["red_flags"] == []
+
+
+def test_red_flags_always_pass():
+    assessment = assess_intake(SPARSE.format(red_flags="- Crushing chest pain with sweating"))
+    assert assessment["sufficient"]
+    assert assessment["red_flags"] == ["Crushing chest pain with sweating"]
+
+
+def test_red_flags_label_outside_the_section():
+    report = SPARSE.format(red_flags="- None").replace(
+        "- Severity: Not provided", "- Severity: Not provided\n- Red flags: fainting"
+    )
+    assert assess_intake(report)["sufficient"]
@@ -0,0 +1,55 @@
+"""
+Near-Duplicate Tests
+Clinically different descriptions must never be reused for one another
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test')
+
+from backend.app.near_duplicates import NearDuplicateStore
+
+BASE = "I am a 45 year old man and I also feel dizzy after standing up in the morning with a headache."
+
+
+def store(tmp_path) -> NearDuplicateStore:
+    near_duplicates = NearDuplicateStore(tmp_path / "near_duplicates.db")
+    near_duplicates.add("r1", "v1", BASE, "completed", "intake", "result")
+    return near_duplicates
+
+
+def test_rewording_matches(tmp_path):
+    match = store(tmp_path).find(BASE.replace(" and", ", and").rstrip("."), "v1")
+    assert match is not None and match["request_id"] == "r1"
+
+
+def test_other_age_does_not_match(tmp_path):
+    assert store(tmp_path).find(BASE.replace("45", "85"), "v1") is None
+
+
+def test_negation_does_not_match(tmp_path):
+    assert store(tmp_path).find(BASE.replace("also feel", "do not feel"), "v1") is None
+
+
+def test_other_prompt_version_does_not_match(tmp_path):
+    assert store(tmp_path).find(BASE, "v2") is None
+
+
+def test_analyses_are_indexed_once(tmp_path):
+    near_duplicates = store(tmp_path)
+    assert near_duplicates.find(BASE, "v1")["request_id"] == "r1"
+    assert len(near_duplicates._index) == 1
+
+
+def test_analyses_added_by_another_process_match(tmp_path):
+    reader = store(tmp_path)
+    assert reader.find(BASE.replace("45", "85"), "v1") is None
+
+    # A second store on the same file stands in for another worker
+    NearDuplicateStore(tmp_path / "near_duplicates.db").add(
+        "r2", "v1", BASE.replace("45", "85"), "completed", "intake", "result"
+    )
+    assert reader.find(BASE.replace("45", "85"), "v1")["request_id"] == "r2"
@@ -0,0 +1,56 @@
+"""
+PHI Redaction Tests
+Clinical and demographic wording must reach the LLM unchanged
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test')
+
+from backend.app.phi_redaction import redact
+
+
+@pytest.mark.parametrize("text", [
+    "I'm Type 1 diabetic and my sugar has been high.",
+    "I'm Male, 54, with chest pain.",
+    "I am Ashkenazi Jewish and my mother had breast cancer.",
+    "I am Parkinson patient with a new tremor in my left hand.",
+    "I'm Taking metformin 500mg twice a day.",
+    "I am Hispanic and pregnant.",
+    "I'm HIV positive and on Biktarvy.",
+])
+def test_clinical_self_descriptions_are_kept(text):
+    redaction = redact(text)
+    assert redaction.text == text
+    assert redaction.originals == {}
+
+
+@pytest.mark.parametrize("text, name", [
+    ("My name is John Smith and I have a cough.", "John Smith"),
+    ("Name: Maria Lopez. Fever for 3 days.", "Maria Lopez"),
+    ("Dr. Patel prescribed amoxicillin.", "Patel"),
+])
+def test_cued_names_are_redacted(text, name):
+    redaction = redact(text)
+    assert name not in redaction.text
+    assert "[NAME1]" in redaction.text
+    assert redaction.rehydrate(redaction.text) == text
+
+
+def test_later_mentions_of_a_name_are_redacted():
+    text = "My name is John Smith. Smith is allergic to penicillin."
+    redaction = redact(text)
+    assert "Smith" not in redaction.text
+    assert redaction.rehydrate(redaction.text) == text
+
+
+def test_contact_details_are_redacted():
+    text = "Call me at (555) 123-4567 or jane.doe@example.com, MRN: 4471823."
+    redaction = redact(text)
+    assert redaction.counts() == {"PHONE": 1, "EMAIL": 1, "ID": 1}
+    assert redaction.rehydrate(redaction.text) == text
@@ -0,0 +1,41 @@
+"""
+Session Tests
+Sessions start from any successful analysis and keep only redacted text
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+os.environ.setdefault('OPENAI_API_KEY', 'sk-test')
+
+DESCRIPTION = (
+    "My name is John Smith. I'm a 45-year-old male with chest pain for 3 days that gets worse "
+    "when I climb stairs. I take lisinopril 10mg daily. Call me at 555-123-4567."
+)
+
+
+def test_session_after_near_duplicate_result(service, monkeypatch):
+    monkeypatch.setattr("backend.app.medical_service.NEAR_DUPLICATE_MODE", "result")
+    assert service.analyze_symptoms(DESCRIPTION)["success"]
+
+    response = service.append_to_session("sess-x", DESCRIPTION)
+    assert response["success"], response.get("error")
+    assert response["metadata"]["near_duplicate"]["reused"] == "result"
+
+    session = service.sessions.get("sess-x")
+    assert session is not None and session["intake_report"]
+    assert service.append_to_session("sess-x", DESCRIPTION)["metadata"]["mode"] == "unchanged"
+
+
+def test_session_stores_placeholders_and_returns_identifiers(service):
+    assert service.append_to_session("sess-y", DESCRIPTION)["success"]
+    session = service.sessions.get("sess-y")
+    assert "John Smith" not in session["patient_input"] + session["result"]
+
+    # A stored result naming the patient is returned with the name put back
+    service.sessions.save("sess-y", session["patient_input"], session["intake_report"], "Report for [NAME1]")
+    response = service.append_to_session("sess-y", DESCRIPTION)
+    assert response["metadata"]["mode"] == "unchanged"
+    assert response["result"] == "Report for John Smith"